@@ -1,293 +1,782 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+from flask import Blueprint, Flask, request, jsonify
 from functools import wraps
 import base64
-import requests
+import contextvars
 import json
 import os
 import logging
+import threading
+import time
 from datetime import datetime
-from dotenv import load_dotenv
-from flask_socketio import SocketIO, emit
-NOTIFICATIONS = []
-ALL_TRANSACTIONS = []  # Store all processed transactions, not just high-risk ones
+from llm_parser import StreamingRiskParser, iter_sse_deltas
+from risk_core import (
+    HIGH_RISK_COUNTRIES,
+    apply_risk_rules,
+    build_batch_groq_prompt,
+    build_notification,
+    build_optimized_groq_prompt,
+    build_transaction_record,
+    fallback_analysis,
+    normalize_risk_analysis,
+    parse_batch_llm_response,
+    parse_llm_response,
+    rule_based_analysis,
+    validate_transaction_data,
+)
+from metrics import METRICS
+from risk_config import ConfigError, ConfigStore, derive_config
+from history import NotificationHistory, TransactionHistory
+from profiling import ProfilerBusy, SamplingProfiler, SlowRequestLog, stage
+from http_cache import ResponseCache
+from entity_links import EntityLinks
+from search_index import SearchIndex, parse_time
+from sketches import AmountProfiles
+from stats import TransactionStats
+from structured_logging import log_context
+from subscriptions import SubscriptionIndex
+# Bounded, compact in-memory history; limits are read again by create_app()
+HISTORY_MAX_RECORDS = int(os.getenv("HISTORY_MAX_RECORDS", "100000"))
+HISTORY_MAX_MB = float(os.getenv("HISTORY_MAX_MB", "256"))
+NOTIFICATIONS = NotificationHistory(HISTORY_MAX_RECORDS, int(HISTORY_MAX_MB * 1024 * 1024))
+STATS = TransactionStats()  # Rollups behind GET /admin/stats, updated as transactions are recorded
+# Amount distributions per merchant and category; each new amount's percentile is a scoring feature
+AMOUNT_PROFILES = AmountProfiles(int(os.getenv("AMOUNT_PROFILES_MAX_KEYS", "10000")))
+# Customers linked through shared IP addresses and cards; cluster sizes are scoring features
+ENTITY_LINKS = EntityLinks(int(os.getenv("ENTITY_LINKS_MAX_ENTITIES", "200000")),
+                           float(os.getenv("ENTITY_LINKS_WINDOW_HOURS", "168")) * 3600)
+# Inverted index of risk factors, reasoning and merchants behind GET /admin/search, bounded like the history
+SEARCH = SearchIndex(int(os.getenv("SEARCH_INDEX_MAX_DOCUMENTS", str(HISTORY_MAX_RECORDS))))
+ALL_TRANSACTIONS = TransactionHistory(HISTORY_MAX_RECORDS, int(HISTORY_MAX_MB * 1024 * 1024))  # Store all processed transactions, not just high-risk ones
 
+# Heavy dependencies (requests, flask_cors, flask_socketio, dotenv) are imported
+# lazily so that importing this module stays cheap; the app itself is built by
+# create_app() and published as the module-level ``app``/``socketio`` globals.
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+# Stream completions and answer as soon as risk_score/recommended_action arrive
+GROQ_STREAMING = os.getenv("GROQ_STREAMING", "").lower() in ("1", "true", "yes")
+AUDIT_LOG = None  # Write-behind audit log, enabled by setting AUDIT_LOG_DIR
+GEO = None  # Local geo/IP reputation tables, enabled by setting GEO_DATA_FILE
+CONFIG = ConfigStore()  # Active risk configuration; file-backed when RISK_CONFIG_FILE is set
+SHADOW = None  # Shadow scorers compared against live traffic, enabled by setting SHADOW_SCORERS
+RECORDER = None  # Replay corpus recorder, enabled by setting RECORD_CORPUS_DIR
+SCHEDULER = None  # Priority lanes for model calls, enabled by setting SCORING_CONCURRENCY
+BATCHER = None  # Micro-batching of concurrent model calls, enabled by setting LLM_BATCH_SIZE above 1
+SUBSCRIPTIONS = SubscriptionIndex()  # Socket.IO clients' alert filters, routed to rooms
+# Requests slower than SLOW_REQUEST_MS are kept with their stage timings (0 disables the capture)
+SLOW_REQUESTS = SlowRequestLog(float(os.getenv("SLOW_REQUEST_MS", "1000")) or None,
+                               int(os.getenv("SLOW_REQUEST_CAPACITY", "100")))
+PROFILER = SamplingProfiler()  # Runs only while GET /admin/profile is being served
+RESPONSES = ResponseCache()  # ETag/compression cache of the polled admin list responses
+RETRY_QUEUE = None  # Re-scoring of decisions made during model outages, enabled by setting RETRY_QUEUE_FILE
+EXPORTER = None  # Columnar (Parquet/Arrow) archive for analytics, enabled by setting COLUMNAR_EXPORT_DIR
+STREAM_COMPLETION_TIMEOUT = 60  # Seconds a streamed reasoning waits for its transaction to be stored
+# Set by a streamed call that returned an early decision; released once the transaction is stored
+_stream_stored = contextvars.ContextVar("stream_stored", default=None)
 
-# Load environment variables
-load_dotenv()
+bp = Blueprint("risk_analyzer", __name__)
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-HIGH_RISK_COUNTRIES = ['RU', 'IR', 'KP', 'VE', 'MM']
+logger = logging.getLogger(__name__)
+
+
+def __getattr__(name):
+    """Lazily provide ``requests`` and the default ``app``/``socketio``"""
+    if name == "requests":
+        import requests
+        return requests
+    if name in ("app", "socketio"):
+        create_app()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_socketio():
+    """Return the Socket.IO server of the current app, building it if needed"""
+    if "socketio" not in globals():
+        create_app()
+    return globals()["socketio"]
+
+
+def create_app():
+    """Application factory: build the Flask app and its Socket.IO server"""
+    global GROQ_API_KEY, GROQ_API_URL, GROQ_STREAMING, AUDIT_LOG, GEO, SHADOW, RECORDER, SCHEDULER, BATCHER, \
+        RETRY_QUEUE, EXPORTER
+    from dotenv import load_dotenv
+    from flask_cors import CORS
+    from flask_socketio import SocketIO
+
+    # Load environment variables
+    load_dotenv()
+    GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+    GROQ_API_URL = os.getenv("GROQ_API_URL", GROQ_API_URL)
+    GROQ_STREAMING = os.getenv("GROQ_STREAMING", "").lower() in ("1", "true", "yes")
+
+    # Configure logging: queued, formatted off the request thread, sampled per event
+    from structured_logging import configure_logging, parse_rates
+
+    log_listener = configure_logging(
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        fmt=os.getenv("LOG_FORMAT", "json"),
+        queue_size=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+        sample_rates=parse_rates(os.getenv("LOG_SAMPLE_RATES")),
+        rate_limits=parse_rates(os.getenv("LOG_RATE_LIMITS")),
+        skip_lookups=os.getenv("LOG_SKIP_RECORD_LOOKUPS", "").lower() in ("1", "true", "yes")
+    )
+    if log_listener is not None:
+        import atexit
+        atexit.register(log_listener.stop)
+
+    max_records = int(os.getenv("HISTORY_MAX_RECORDS", str(HISTORY_MAX_RECORDS)))
+    max_bytes = int(float(os.getenv("HISTORY_MAX_MB", str(HISTORY_MAX_MB))) * 1024 * 1024)
+    ALL_TRANSACTIONS.configure(max_records, max_bytes)
+    NOTIFICATIONS.configure(max_records, max_bytes)
+    SEARCH.max_documents = int(os.getenv("SEARCH_INDEX_MAX_DOCUMENTS", str(max_records)))
+    SLOW_REQUESTS.threshold_ms = float(os.getenv("SLOW_REQUEST_MS", str(SLOW_REQUESTS.threshold_ms or 0))) or None
+    SLOW_REQUESTS.capacity = int(os.getenv("SLOW_REQUEST_CAPACITY", str(SLOW_REQUESTS.capacity)))
+    AMOUNT_PROFILES.max_keys = int(os.getenv("AMOUNT_PROFILES_MAX_KEYS", str(AMOUNT_PROFILES.max_keys)))
+    ENTITY_LINKS.max_entities = int(os.getenv("ENTITY_LINKS_MAX_ENTITIES", str(ENTITY_LINKS.max_entities)))
+    ENTITY_LINKS.window_seconds = float(os.getenv("ENTITY_LINKS_WINDOW_HOURS",
+                                                  str(ENTITY_LINKS.window_seconds / 3600))) * 3600
+
+    geo_data_file = os.getenv("GEO_DATA_FILE")
+    if geo_data_file and GEO is None:
+        from geoip import GeoReputationStore
+        GEO = GeoReputationStore(geo_data_file, check_interval=float(os.getenv("GEO_RELOAD_SECONDS", "5")))
+
+    risk_config_file = os.getenv("RISK_CONFIG_FILE")
+    if risk_config_file and CONFIG.path is None:
+        CONFIG.check_interval = float(os.getenv("RISK_CONFIG_RELOAD_SECONDS", "5"))
+        CONFIG.load_file(risk_config_file)
+
+    scoring_concurrency = os.getenv("SCORING_CONCURRENCY")
+    if scoring_concurrency and SCHEDULER is None:
+        from lanes import LaneScheduler, parse_reservations
+        reservations = os.getenv("SCORING_LANE_RESERVATIONS")
+        SCHEDULER = LaneScheduler(
+            int(scoring_concurrency),
+            reservations=parse_reservations(reservations) if reservations else None,
+            max_wait_ms=float(os.getenv("SCORING_MAX_WAIT_MS", "2000"))
+        )
+
+    batch_size = int(os.getenv("LLM_BATCH_SIZE", "1"))
+    if batch_size > 1 and BATCHER is None:
+        from batching import MicroBatcher
+        BATCHER = MicroBatcher(
+            request_batch_risk_analysis,
+            max_batch=batch_size,
+            max_wait_ms=float(os.getenv("LLM_BATCH_WAIT_MS", "10")),
+            workers=int(os.getenv("LLM_BATCH_WORKERS", os.getenv("SCORING_CONCURRENCY", "4")))
+        )
+
+    shadow_scorers = os.getenv("SHADOW_SCORERS")
+    if shadow_scorers and SHADOW is None:
+        from shadow import ShadowRunner
+        SHADOW = ShadowRunner(
+            build_shadow_scorers(shadow_scorers),
+            sample_rate=float(os.getenv("SHADOW_SAMPLE_RATE", "0.1"))
+        )
+
+    record_corpus_dir = os.getenv("RECORD_CORPUS_DIR")
+    if record_corpus_dir and RECORDER is None:
+        import atexit
+        from replay import CorpusRecorder
+
+        RECORDER = CorpusRecorder(record_corpus_dir, fsync=False)
+        atexit.register(RECORDER.close)
+
+    retry_queue_file = os.getenv("RETRY_QUEUE_FILE")
+    if retry_queue_file and RETRY_QUEUE is None:
+        import atexit
+        from retry_queue import RetryQueue
+
+        RETRY_QUEUE = RetryQueue(
+            retry_queue_file,
+            rescore_transaction,
+            apply_rescored_analysis,
+            max_items=int(os.getenv("RETRY_QUEUE_MAX_ITEMS", "10000")),
+            base_delay=float(os.getenv("RETRY_BASE_DELAY_SECONDS", "1")),
+            max_delay=float(os.getenv("RETRY_MAX_DELAY_SECONDS", "300")),
+            max_attempts=int(os.getenv("RETRY_MAX_ATTEMPTS", "20"))
+        )
+        atexit.register(RETRY_QUEUE.close)
+
+    columnar_export_dir = os.getenv("COLUMNAR_EXPORT_DIR")
+    if columnar_export_dir and EXPORTER is None:
+        import atexit
+        from columnar_export import ColumnarExporter
+
+        EXPORTER = ColumnarExporter(
+            columnar_export_dir,
+            file_format=os.getenv("COLUMNAR_EXPORT_FORMAT", "parquet"),
+            flush_records=int(os.getenv("COLUMNAR_EXPORT_FLUSH_RECORDS", "100000")),
+            flush_interval=float(os.getenv("COLUMNAR_EXPORT_FLUSH_SECONDS", "60"))
+        )
+        atexit.register(EXPORTER.close)
+
+    audit_log_dir = os.getenv("AUDIT_LOG_DIR")
+    if audit_log_dir and AUDIT_LOG is None:
+        import atexit
+        from audit_log import AuditLog
+
+        restore_from_audit_log(audit_log_dir)
+        AUDIT_LOG = AuditLog(
+            audit_log_dir,
+            flush_records=int(os.getenv("AUDIT_LOG_FLUSH_RECORDS", "256")),
+            flush_interval_ms=float(os.getenv("AUDIT_LOG_FLUSH_MS", "50")),
+            segment_bytes=int(float(os.getenv("AUDIT_LOG_SEGMENT_MB", "64")) * 1024 * 1024)
+        )
+        atexit.register(AUDIT_LOG.close)
+
+    app = Flask(__name__)
+    app.register_blueprint(bp)
+
+    CORS(app, resources={
+        r"/*": {
+            "origins": ["http://localhost:3000"],
+            "methods": ["GET", "POST", "PUT"],
+            "allow_headers": ["Content-Type", "Authorization"],
+            "supports_credentials": True
+        }
+    })
+
+    socketio = SocketIO(app, cors_allowed_origins="http://localhost:3000")
+    socketio.on_event('connect', handle_connect)
+    socketio.on_event('disconnect', handle_disconnect)
+    socketio.on_event('subscribe', handle_subscribe)
+    socketio.on_event('unsubscribe', handle_unsubscribe)
+
+    globals().update(app=app, socketio=socketio)
+    return app
+
+def geo_features(transaction_data):
+    """IP geolocation/reputation features for a transaction, or None if disabled"""
+    if GEO is None:
+        return None
+    return GEO.current().features(transaction_data)
+
+
+def local_features(transaction_data):
+    """Locally computed risk signals for the prompt and rules: geo/IP, amount percentiles and links.
+
+    Computed once per request, before the transaction is recorded (which
+    feeds the amount profiles and entity links), and passed on to the shadow
+    scorers and the retry queue so they see the same signals.  Empty if none
+    apply.
+    """
+    features = geo_features(transaction_data) or {}
+    features.update(AMOUNT_PROFILES.features(transaction_data))
+    features.update(ENTITY_LINKS.features(transaction_data))
+    return features
+
+
+_high_risk_cache = (None, None, HIGH_RISK_COUNTRIES)
+
+
+def high_risk_countries(config=None):
+    """The active high-risk country table: the risk config's list plus the geo data's"""
+    global _high_risk_cache
+    config = config or CONFIG.current
+    tables = GEO.current() if GEO is not None else None
+    cached_config, cached_tables, countries = _high_risk_cache
+    if cached_config is not config or cached_tables is not tables:
+        countries = config.high_risk_country_set
+        if tables is not None and tables.high_risk_countries:
+            countries = countries | tables.high_risk_countries
+        _high_risk_cache = (config, tables, countries)
+    return countries
+
+
+def build_shadow_scorers(spec):
+    """Build shadow scorers from a JSON list (inline or a file path) of scorer specs.
+
+    Each spec is ``{"name": ..., "type": "llm", "settings": {...}}`` to call the
+    model with risk configuration overrides (e.g. another model or
+    temperature), or ``{"name": ..., "type": "rules"}`` to score with the
+    local rules alone.
+    """
+    if not spec.lstrip().startswith("["):
+        with open(spec, encoding="utf-8") as spec_file:
+            spec = spec_file.read()
+    scorers = {}
+    for scorer in json.loads(spec):
+        name, kind = scorer["name"], scorer.get("type", "llm")
+        if kind == "rules":
+            scorers[name] = score_with_rules
+        elif kind == "llm":
+            settings = scorer.get("settings", {})
+            derive_config(CONFIG.current, settings)  # Fail at startup on invalid overrides
+            scorers[name] = lambda transaction_data, features, settings=settings: score_with_settings(
+                transaction_data, features, settings)
+        else:
+            raise ValueError(f"Unknown shadow scorer type: {kind}")
+    return scorers
+
+
+def score_with_settings(transaction_data, features, settings):
+    """Shadow scorer: the primary pipeline with risk configuration overrides"""
+    config = derive_config(CONFIG.current, settings)
+    risk_analysis = request_risk_analysis(transaction_data, config, features=features)
+    apply_risk_rules(transaction_data, risk_analysis, features, high_risk_countries(config),
+                     config.high_risk_min_score)
+    return risk_analysis
+
+
+def score_with_rules(transaction_data, features):
+    """Shadow scorer: the local rules without a model call"""
+    config = CONFIG.current
+    return rule_based_analysis(transaction_data, features, high_risk_countries(config),
+                               config.allow_threshold, config.block_threshold, config.high_risk_min_score)
 
-app = Flask(__name__)
 
-CORS(app, resources={
-    r"/*": {
-        "origins": ["http://localhost:3000"],
-        "methods": ["GET", "POST"],
-        "allow_headers": ["Content-Type", "Authorization"],
-        "supports_credentials": True
+def restore_from_audit_log(directory):
+    """Rebuild the in-memory transaction and notification stores from the audit log"""
+    from audit_log import replay
+
+    restored = 0
+    notified = set()
+    transactions, notifications = [], []
+
+    def flush():
+        # Stored in batches, taking each shard's lock once per batch
+        ALL_TRANSACTIONS.extend(transactions)
+        NOTIFICATIONS.extend(notifications)
+        transactions.clear()
+        notifications.clear()
+
+    for entry in replay(directory):
+        kind, data = entry["kind"], entry["data"]
+        if kind == "transaction":
+            transactions.append(data)
+            STATS.record(data, flagged=data.get("transaction_id") in notified, at=entry.get("ts"))
+            AMOUNT_PROFILES.observe(data)
+            ENTITY_LINKS.observe(data, at=entry.get("ts"))
+            SEARCH.add(data)
+        elif kind == "notification":
+            notifications.append(data)
+            notified.add(data.get("transaction_id"))
+        elif kind == "transaction_update":
+            flush()
+            update_stored_analysis(data["transaction_id"], data["risk_analysis"])
+        restored += 1
+    flush()
+    logger.info("Restored %s audit log entries from %s", restored, directory, extra={"event": "audit_log.restored"})
+
+
+def audit(kind, data):
+    """Append a record to the audit log if one is configured"""
+    if AUDIT_LOG is not None:
+        AUDIT_LOG.append(kind, data)
+
+
+def capture_llm_response(transaction_data, prompt, content, batched=False):
+    """Keep the raw model output for the replay corpus if recording is enabled"""
+    if RECORDER is not None:
+        RECORDER.record_response(transaction_data.get("transaction_id"), prompt, content, batched)
+
+
+def record_transaction(transaction_record, flagged=False, features=None):
+    """Store a processed transaction in the history and update the rollups.
+
+    ``features`` are the local features it was scored with, kept for re-scoring.
+    """
+    ALL_TRANSACTIONS.append(transaction_record)
+    STATS.record(transaction_record, flagged=flagged)
+    AMOUNT_PROFILES.observe(transaction_record)
+    ENTITY_LINKS.observe(transaction_record)
+    SEARCH.add(transaction_record)
+    audit("transaction", transaction_record)
+    if EXPORTER is not None:
+        EXPORTER.add(transaction_record, flagged=flagged)
+    if RETRY_QUEUE is not None:
+        from retry_queue import is_degraded
+
+        risk_analysis = transaction_record.get("risk_analysis") or {}
+        if is_degraded(risk_analysis):
+            # Scored with a placeholder during a model outage; re-score once the model is back
+            transaction = {key: value for key, value in transaction_record.items()
+                           if key != "risk_analysis"}
+            RETRY_QUEUE.add(transaction, risk_analysis, features)
+
+
+def publish(event, payload, record=None):
+    """Emit an alert event to the clients whose subscriptions match ``record`` (default: the payload)"""
+    get_socketio().emit(event, payload, to=SUBSCRIPTIONS.route(record or payload))
+
+
+def record_notification(notification):
+    """Store a high-risk notification"""
+    NOTIFICATIONS.append(notification)
+    audit("notification", notification)
+
+
+def update_stored_analysis(transaction_id, risk_analysis):
+    """Apply a risk analysis update to the stored transaction and its notification"""
+    previous = ALL_TRANSACTIONS.get(transaction_id)
+    ALL_TRANSACTIONS.update_analysis(transaction_id, risk_analysis)
+    SEARCH.update(transaction_id, risk_analysis, previous=previous["risk_analysis"] if previous else None)
+    NOTIFICATIONS.update_analysis(transaction_id, {
+        "risk_score": risk_analysis.get("risk_score"),
+        "risk_factors": risk_analysis.get("risk_factors", []),
+        "reasoning": risk_analysis.get("reasoning", ""),
+        "recommended_action": risk_analysis.get("recommended_action", "review")
+    })
+
+
+def export_update(transaction_id):
+    """Append the updated record of a transaction to the columnar archive if exporting is enabled"""
+    if EXPORTER is not None:
+        record = ALL_TRANSACTIONS.get(transaction_id)
+        if record is not None:
+            EXPORTER.add(record, flagged=NOTIFICATIONS.get(transaction_id) is not None)
+
+
+def rescore_transaction(transaction_data, features=None):
+    """Retry queue scorer: a fresh model call plus the server-side rules, on the original local features"""
+    config = CONFIG.get()
+    if features is None:  # Queued without them
+        features = local_features(transaction_data)
+    risk_analysis = request_risk_analysis(transaction_data, config, features=features)
+    apply_risk_rules(transaction_data, risk_analysis, features, high_risk_countries(config),
+                     config.high_risk_min_score)
+    risk_analysis["config_version"] = config.version
+    return risk_analysis
+
+
+def apply_rescored_analysis(transaction_data, old_analysis, risk_analysis):
+    """Replace a placeholder decision with its re-scored analysis"""
+    transaction_id = transaction_data.get("transaction_id")
+    risk_analysis["analysis_status"] = "rescored"
+    update_stored_analysis(transaction_id, risk_analysis)
+    update = {
+        "transaction_id": transaction_id,
+        "risk_analysis": risk_analysis
     }
-})
+    audit("transaction_update", update)
+    export_update(transaction_id)
 
-socketio = SocketIO(app, cors_allowed_origins="http://localhost:3000")
+    STATS.reclassify(old_analysis, risk_analysis)
+    old_action = old_analysis.get("recommended_action")
+    new_action = risk_analysis.get("recommended_action")
+    if new_action != old_action:
+        publish('transaction_corrected', dict(update, previous_analysis=old_analysis),
+                ALL_TRANSACTIONS.get(transaction_id))
+        logger.warning("Re-scored transaction %s: %s -> %s", transaction_id, old_action, new_action,
+                       extra={"event": "transaction.rescored", "transaction_id": transaction_id})
+    else:
+        logger.info("Re-scored transaction %s: %s unchanged", transaction_id, new_action,
+                    extra={"event": "transaction.rescored", "transaction_id": transaction_id})
+
+
+ADMIN_USERNAME, ADMIN_PASSWORD = "admin", "secret123"  # Basic credentials of the webhook and admin routes
+
+
+def check_basic_auth(auth_header, username, password):
+    """Whether an Authorization header carries the given Basic credentials"""
+    if auth_header and auth_header.startswith('Basic '):
+        try:
+            encoded_credentials = auth_header.split(' ')[1]
+            decoded_credentials = base64.b64decode(encoded_credentials).decode('utf-8')
+            incoming_user, incoming_pass = decoded_credentials.split(':')
+            return incoming_user == username and incoming_pass == password
+        except Exception:
+            pass
+    return False
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
 
 # ✅ Basic Authentication Decorator
 def require_basic_auth(username, password):
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            auth_header = request.headers.get('Authorization')
-            if auth_header and auth_header.startswith('Basic '):
-                try:
-                    encoded_credentials = auth_header.split(' ')[1]
-                    decoded_credentials = base64.b64decode(encoded_credentials).decode('utf-8')
-                    incoming_user, incoming_pass = decoded_credentials.split(':')
-                    if incoming_user == username and incoming_pass == password:
-                        return f(*args, **kwargs)
-                except Exception:
-                    pass
+            if check_basic_auth(request.headers.get('Authorization'), username, password):
+                return f(*args, **kwargs)
             return jsonify({'error': 'Unauthorized'}), 401
         return decorated_function
     return decorator
 
-def build_optimized_groq_prompt(transaction):
-    """Build an optimized prompt for GROQ API based on transaction data"""
-    transaction_json = json.dumps(transaction, indent=2)
-    
-    prompt_text = f"""You are a financial risk analyst. Evaluate this transaction and return a risk score (0.0-1.0).
-
-Transaction Data:
-{transaction_json}
-
-Consider these risk factors:
-- Geographic anomalies (high-risk countries(['RU', 'IR', 'KP', 'VE', 'MM'] vs customer country vs payment country ))
-- Unusual amounts for merchant category
-- Payment method risks
-- IP/location inconsistencies
-- Merchant category and typical fraud rates 
-- Merchant's history and reputation
-
+def call_groq_api(transaction_data, config=None, features=None):
+    """Analyze a transaction and stamp the risk config version that was used (default: the active one)"""
+    config = config or CONFIG.get()
+    if features is None:
+        features = local_features(transaction_data)
+    _stream_stored.set(None)
+    if BATCHER is not None and not GROQ_STREAMING:
+        # Joins concurrently pending requests in one model call
+        risk_analysis = BATCHER.submit((transaction_data, config, features))
+    elif SCHEDULER is None:
+        risk_analysis = request_risk_analysis(transaction_data, config, streaming=GROQ_STREAMING, record=True,
+                                              features=features)
+    else:
+        from lanes import classify
+        # Wait for a slot in the transaction's priority lane before calling the model
+        with SCHEDULER.slot(classify(transaction_data, high_risk_countries(config))):
+            risk_analysis = request_risk_analysis(transaction_data, config, streaming=GROQ_STREAMING, record=True,
+                                                  features=features)
+    risk_analysis["config_version"] = config.version
+    return risk_analysis
 
-Respond ONLY in this JSON format:
-{{
-    "risk_score": 0.0,
-    "risk_factors": ["list", "of", "factors"],
-    "reasoning": "brief explanation",
-    "recommended_action": "allow|review|block"
-}}
+def request_risk_analysis(transaction_data, config, streaming=False, record=False, features=None):
+    """Call GROQ API with proper endpoint and error handling
 
-Risk thresholds: 0.0-0.3 = allow, 0.3-0.7 = review, 0.7-1.0 = block"""
-    
-    return {
-        "model": "llama3-8b-8192",
-        "messages": [{"role": "user", "content": prompt_text}],
-        "temperature": 0.1,
-        "max_tokens": 300
-    }
-
-def call_groq_api(transaction_data):
-    """Call GROQ API with proper endpoint and error handling"""
+    With ``record`` the prompt and raw model output are captured for the
+    replay corpus (when recording is enabled).  ``features`` default to
+    local_features() computed now.
+    """
     if not GROQ_API_KEY:
         logger.warning("GROQ API key not configured")
-        return {
-            "risk_score": 0.5,
-            "risk_factors": ["API configuration error"],
-            "reasoning": "GROQ API key not configured",
-            "recommended_action": "review"
-        }
+        return fallback_analysis("API configuration error", "GROQ API key not configured")
     
+    import requests
+
     headers = {
         "Authorization": f"Bearer {GROQ_API_KEY}",
         "Content-Type": "application/json"
     }
     
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    prompt = build_optimized_groq_prompt(transaction_data)
+    url = GROQ_API_URL
+    if features is None:
+        features = local_features(transaction_data)
+    prompt = build_optimized_groq_prompt(transaction_data, features, config)
+    
+    if streaming:
+        return call_groq_api_streaming(transaction_data, url, headers, prompt, record)
     
     try:
         response = requests.post(url, headers=headers, data=json.dumps(prompt), timeout=30)
         response.raise_for_status()
         
-        result = response.json()
-        
-        if "choices" in result and len(result["choices"]) > 0:
-            content = result["choices"][0]["message"]["content"]
-            
-            try:
-                # Clean the content - remove markdown formatting if present
-                content = content.strip()
-                if content.startswith('```json'):
-                    content = content[7:]
-                if content.endswith('```'):
-                    content = content[:-3]
-                content = content.strip()
-                
-                parsed_result = json.loads(content)
-                
-                # Validate and sanitize the response
-                risk_score = float(parsed_result.get("risk_score", 0.5))
-                risk_score = max(0.0, min(1.0, risk_score))  # Clamp between 0 and 1
-                
-                risk_factors = parsed_result.get("risk_factors", [])
-                if not isinstance(risk_factors, list):
-                    risk_factors = ["Analysis completed"]
-                
-                reasoning = parsed_result.get("reasoning", "Risk analysis completed")
-                
-                action = parsed_result.get("recommended_action", "review").lower()
-                if action not in ["allow", "review", "block"]:
-                    action = "review"
-                
-                return {
-                    "risk_score": risk_score,
-                    "risk_factors": risk_factors,
-                    "reasoning": reasoning,
-                    "recommended_action": action
-                }
-                    
-            except (json.JSONDecodeError, ValueError, TypeError) as e:
-                logger.error(f"Failed to parse LLM response: {e}")
-                return {
-                    "risk_score": 0.5,
-                    "risk_factors": ["LLM parsing error"],
-                    "reasoning": f"Could not parse model response: {content[:100]}...",
-                    "recommended_action": "review"
-                }
-        else:
-            raise ValueError("Unexpected response format from GROQ API")
+        return analysis_from_completion(transaction_data, prompt, response.json(), record)
             
     except requests.exceptions.RequestException as e:
-        logger.error(f"API request failed: {str(e)}")
-        return {
-            "risk_score": 0.5,
-            "risk_factors": ["API error"],
-            "reasoning": f"Failed to analyze: {str(e)}",
-            "recommended_action": "review"
-        }
+        logger.error("API request failed: %s", e, extra={"event": "model.request_failed"})
+        return fallback_analysis("API error", f"Failed to analyze: {str(e)}")
     except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}")
-        return {
-            "risk_score": 0.7,
-            "risk_factors": ["Processing error"],
-            "reasoning": f"Error during analysis: {str(e)}",
-            "recommended_action": "review"
-        }
+        logger.error("Unexpected error: %s", e, extra={"event": "model.unexpected_error"})
+        return fallback_analysis("Processing error", f"Error during analysis: {str(e)}", risk_score=0.7)
 
-def validate_transaction_data(data):
-    """Validate that transaction data has required structure"""
-    if not isinstance(data, dict):
-        return False, "Data must be a JSON object"
-    
-    # Required top-level fields
-    required_fields = ["transaction_id", "timestamp", "amount", "currency", "customer", "payment_method", "merchant"]
-    
-    for field in required_fields:
-        if field not in data:
-            return False, f"Missing required field: {field}"
-        # Also check for empty values
-        if data[field] == "" or data[field] is None:
-            return False, f"Empty value for required field: {field}"
+def analysis_from_completion(transaction_data, prompt, result, record=False):
+    """Risk analysis from a (non-streamed) chat completion; shared by the sync and async clients"""
+    if "choices" in result and len(result["choices"]) > 0:
+        content = result["choices"][0]["message"]["content"]
+        if record:
+            capture_llm_response(transaction_data, prompt, content)
         
-     # Validate amount is a valid number
-    try:
-        amount = float(data["amount"])
-        if not (isinstance(amount, (int, float)) and amount >= 0 and amount < float('inf')):
-            return False, "Amount must be a valid positive number"
-        data["amount"] = amount  # Convert to float
-    except (ValueError, TypeError):
-        return False, "Amount must be a valid number"
-    
-    # Validate customer structure
-    customer = data.get("customer", {})
-    customer_fields = ["id", "country", "ip_address"]
-    for field in customer_fields:
-        if field not in customer:
-            return False, f"Missing customer field: {field}"
-        # Check for empty values
-        if customer[field] == "" or customer[field] is None:
-            return False, f"Empty value for customer field: {field}"
-    
-    # Validate payment_method structure
-    payment_method = data.get("payment_method", {})
-    payment_fields = ["type", "last_four", "country_of_issue"]
-    for field in payment_fields:
-        if field not in payment_method:
-            return False, f"Missing payment_method field: {field}"
-        # Check for empty values
-        if payment_method[field] == "" or payment_method[field] is None:
-            return False, f"Empty value for payment_method field: {field}"
+        try:
+            return parse_llm_response(content)
+                
+        except (json.JSONDecodeError, ValueError, TypeError) as e:
+            logger.error("Failed to parse LLM response: %s", e, extra={"event": "model.parse_failed"})
+            return fallback_analysis("LLM parsing error", f"Could not parse model response: {content[:100]}...")
+    else:
+        raise ValueError("Unexpected response format from GROQ API")
+
+def request_batch_risk_analysis(items):
+    """Score a micro-batch of (transaction, config, features) items, one model call per config version"""
+    groups = {}
+    for index, (transaction_data, config, features) in enumerate(items):
+        groups.setdefault(id(config), (config, []))[1].append(index)
+    results = [None] * len(items)
+    for config, indexes in groups.values():
+        transactions = [items[index][0] for index in indexes]
+        features = [items[index][2] for index in indexes]
+        if SCHEDULER is None:
+            analyses = _request_batch(transactions, config, features)
+        else:
+            from lanes import LANES, classify
+            countries = high_risk_countries(config)
+            lane = min((classify(transaction, countries) for transaction in transactions), key=LANES.index)
+            with SCHEDULER.slot(lane):
+                analyses = _request_batch(transactions, config, features)
+        for index, risk_analysis in zip(indexes, analyses):
+            results[index] = risk_analysis
+    return results
+
+def _request_batch(transactions, config, features):
+    """One multi-transaction model call; transactions without a usable result are retried one by one.
+
+    Each transaction's result is captured for the replay corpus on its own.
+    """
+    if len(transactions) == 1 or not GROQ_API_KEY:
+        return [request_risk_analysis(transaction, config, record=True, features=transaction_features)
+                for transaction, transaction_features in zip(transactions, features)]
     
-    # Validate merchant structure
-    merchant = data.get("merchant", {})
-    merchant_fields = ["id", "name", "category"]
-    for field in merchant_fields:
-        if field not in merchant:
-            return False, f"Missing merchant field: {field}"
-        # Check for empty values
-        if merchant[field] == "" or merchant[field] is None:
-            return False, f"Empty value for merchant field: {field}"
+    import requests
+
+    headers = {
+        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    prompt = build_batch_groq_prompt(transactions, features, config)
+    transaction_ids = [transaction.get("transaction_id") for transaction in transactions]
     
-    # Validate data types
     try:
-        float(data["amount"])
-    except (ValueError, TypeError):
-        return False, "Amount must be a valid number"
+        response = requests.post(GROQ_API_URL, headers=headers, data=json.dumps(prompt), timeout=30)
+        response.raise_for_status()
+        content = response.json()["choices"][0]["message"]["content"]
+        try:
+            analyses = parse_batch_llm_response(content, transaction_ids)
+        except (ValueError, TypeError) as e:
+            logger.error("Failed to parse batched LLM response: %s", e, extra={"event": "model.parse_failed"})
+            analyses = {}
+    except requests.exceptions.RequestException as e:
+        logger.error("Batched API request failed: %s", e, extra={"event": "model.request_failed"})
+        return [fallback_analysis("API error", f"Failed to analyze: {str(e)}") for _ in transactions]
+    except Exception as e:
+        logger.error("Unexpected error: %s", e, extra={"event": "model.unexpected_error"})
+        return [fallback_analysis("Processing error", f"Error during analysis: {str(e)}", risk_score=0.7)
+                for _ in transactions]
     
-    return True, "Valid"
+    results = []
+    for transaction, transaction_id, transaction_features in zip(transactions, transaction_ids, features):
+        risk_analysis = analyses.pop(transaction_id, None)
+        if risk_analysis is None:
+            METRICS.increment("batching.retried_single")
+            risk_analysis = request_risk_analysis(transaction, config, record=True, features=transaction_features)
+        else:
+            capture_llm_response(transaction, prompt, json.dumps(risk_analysis), batched=True)
+        results.append(risk_analysis)
+    return results
+
+def call_groq_api_streaming(transaction_data, url, headers, prompt, record=False):
+    """Request a streamed completion and return as soon as a decision is known.
+
+    Once ``risk_score`` and ``recommended_action`` have been parsed the partial
+    analysis (``analysis_status: "partial"``) is returned, and a background
+    thread reads the rest of the stream.  It fills in the reasoning via
+    complete_risk_analysis() once process_scored_transaction() has stored
+    the transaction.
+    """
+    import requests
+
+    parser = StreamingRiskParser()
+    response = None
+    try:
+        response = requests.post(url, headers=headers, data=json.dumps(dict(prompt, stream=True)), timeout=30,
+                                 stream=True)
+        response.raise_for_status()
+        deltas = iter_sse_deltas(response.iter_lines())
+        
+        for delta in deltas:
+            parser.feed(delta)
+            decision = parser.decision()
+            if decision is not None and not parser.complete:
+                risk_analysis = normalize_risk_analysis(decision)
+                risk_analysis.update(risk_factors=[], reasoning="", analysis_status="partial")
+                stored = threading.Event()
+                _stream_stored.set(stored)
+                threading.Thread(
+                    target=_finish_streamed_analysis,
+                    args=(transaction_data, stored, parser, deltas, response, prompt if record else None),
+                    daemon=True
+                ).start()
+                return risk_analysis
+            if parser.complete:
+                break
+        
+        response.close()
+        if record:
+            capture_llm_response(transaction_data, prompt, parser.text)
+        try:
+            return normalize_risk_analysis(parser.result())
+        except (ValueError, TypeError) as e:
+            logger.error("Failed to parse LLM response: %s", e, extra={"event": "model.parse_failed"})
+            return fallback_analysis("LLM parsing error", f"Could not parse model response: {parser.text[:100]}...")
+            
+    except requests.exceptions.RequestException as e:
+        logger.error("API request failed: %s", e, extra={"event": "model.request_failed"})
+        return fallback_analysis("API error", f"Failed to analyze: {str(e)}")
+    except Exception as e:
+        if response is not None:
+            response.close()
+        logger.error("Unexpected error: %s", e, extra={"event": "model.unexpected_error"})
+        return fallback_analysis("Processing error", f"Error during analysis: {str(e)}", risk_score=0.7)
+
+def _finish_streamed_analysis(transaction_data, stored, parser, deltas, response, prompt=None):
+    """Background half of a streamed call: read the remaining reasoning, then wait for ``stored``"""
+    try:
+        for delta in deltas:
+            parser.feed(delta)
+            if parser.complete:
+                break
+        if prompt is not None:
+            capture_llm_response(transaction_data, prompt, parser.text)
+        final_analysis = normalize_risk_analysis(parser.result())
+    except Exception as e:
+        logger.error("Failed to complete streamed analysis: %s", e,
+                     extra={"event": "model.stream_failed", "transaction_id": transaction_data.get("transaction_id")})
+        final_analysis = {"risk_factors": [], "reasoning": f"Reasoning unavailable: {e}"}
+    finally:
+        response.close()
+    transaction_id = transaction_data.get("transaction_id")
+    if not stored.wait(STREAM_COMPLETION_TIMEOUT):
+        logger.warning("Streamed analysis dropped, transaction was never stored: %s", transaction_id,
+                       extra={"event": "transaction.stream_dropped"})
+        return
+    complete_risk_analysis(transaction_id, final_analysis)
+
+def complete_risk_analysis(transaction_id, final_analysis):
+    """Fill in the reasoning of an early decision in the stored record and notification.
 
-def send_admin_notification(transaction_data, risk_analysis):
-    """Send notification to administrators for high-risk transactions"""
-    risk_score = risk_analysis.get("risk_score", 0)
+    Runs after the transaction has been stored.  The completed analysis is a
+    new dict built from the stored one (so it keeps the factors added by the
+    server-side rules); the dict returned to the client is never changed, nor
+    is the decision itself (score and action).  Returns the completed
+    analysis, or None if the record is no longer stored.
+    """
+    record = ALL_TRANSACTIONS.get(transaction_id)
+    if record is None:
+        logger.warning("Streamed analysis completed for an evicted transaction: %s", transaction_id,
+                       extra={"event": "transaction.stream_dropped"})
+        return None
+    current = record["risk_analysis"]
+    final_factors = final_analysis["risk_factors"]
+    # Keep factors added by the server-side rules after the early decision
+    rule_factors = [factor for factor in current.get("risk_factors", []) if factor not in final_factors]
+    risk_analysis = dict(current, risk_factors=final_factors + rule_factors, reasoning=final_analysis["reasoning"],
+                         analysis_status="complete")
     
-    # Check for high-risk countries
-    customer_country = transaction_data.get("customer", {}).get("country")
-    payment_country = transaction_data.get("payment_method", {}).get("country_of_issue")
+    update_stored_analysis(transaction_id, risk_analysis)
+    
+    update = {
+        "transaction_id": transaction_id,
+        "risk_analysis": risk_analysis
+    }
+    audit("transaction_update", update)
+    export_update(transaction_id)
+    publish('transaction_updated', update, ALL_TRANSACTIONS.get(transaction_id))
+    logger.info("Streamed analysis completed for transaction: %s", transaction_id,
+                extra={"event": "transaction.stream_completed", "transaction_id": transaction_id})
+    return risk_analysis
+
+def send_admin_notification(transaction_data, risk_analysis, config=None, features=None):
+    """Send notification to administrators for high-risk transactions.
+
+    ``config`` and ``features`` should be the risk configuration and local
+    features the transaction was scored with, so the rules match its
+    ``config_version`` and prompt (default: the active config, features
+    computed now).
+    """
+    config = config or CONFIG.current
+    if features is None:
+        features = local_features(transaction_data)
     
     # Force high risk if countries involved are in the high-risk list
-    if customer_country in HIGH_RISK_COUNTRIES or payment_country in HIGH_RISK_COUNTRIES:
-        risk_score = max(risk_score, 0.8)  # Ensure it's flagged as high risk
-        # Add high-risk country factor if not already present
-        risk_factors = risk_analysis.get("risk_factors", [])
-        high_risk_country_factor = f"Transaction involves high-risk country: {customer_country if customer_country in HIGH_RISK_COUNTRIES else payment_country}"
-        if not any(factor.startswith("Transaction involves high-risk country") for factor in risk_factors):
-            risk_factors.append(high_risk_country_factor)
-            risk_analysis["risk_factors"] = risk_factors
-            risk_analysis["recommended_action"] = "block"
+    high_risk_country = apply_risk_rules(transaction_data, risk_analysis, features, high_risk_countries(config),
+                                         config.high_risk_min_score)
+    if RECORDER is not None:
+        RECORDER.record_decision(transaction_data, features, risk_analysis, config)
     
-    # Only notify for high-risk transactions (score >= 0.7)
-        # Create notification in the format expected by frontend
-        notification = {
-            "transaction_id": transaction_data.get("transaction_id"),
-            "timestamp": transaction_data.get("timestamp"),
-            "amount": transaction_data.get("amount"),
-            "currency": transaction_data.get("currency"),
-            "alert_type": "high_risk_transaction",
-            "status": "flagged",
-            "admin_notification_sent": True,
-            "risk_analysis": {
-                "risk_score": risk_analysis.get("risk_score"),
-                "risk_factors": risk_analysis.get("risk_factors", []),
-                "reasoning": risk_analysis.get("reasoning", ""),
-                "recommended_action": risk_analysis.get("recommended_action", "review")
-            },
-            # Include full transaction details for expanded view
-            "customer": transaction_data.get("customer", {}),
-            "payment_method": transaction_data.get("payment_method", {}),
-            "merchant": transaction_data.get("merchant", {}),
-            "transaction_details": transaction_data  # Keep original for reference
-        }
+    if high_risk_country:
+        notification = build_notification(transaction_data, risk_analysis)
         
-        logger.warning(f"HIGH RISK TRANSACTION DETECTED: {notification['transaction_id']}")
-        NOTIFICATIONS.append(notification)  # Store notification in memory
+        logger.warning("HIGH RISK TRANSACTION DETECTED: %s", notification['transaction_id'],
+                       extra={"event": "risk.high_risk_detected"})
+        record_notification(notification)  # Store notification in memory
         
         # Emit the notification to all connected clients
-        socketio.emit('new_transaction', notification)
-        logger.info(f"Notification sent via Socket.IO for transaction: {notification['transaction_id']}")
+        publish('new_transaction', notification)
+        logger.info("Notification sent via Socket.IO for transaction: %s", notification['transaction_id'],
+                    extra={"event": "notification.sent"})
         
         return notification
     
@@ -296,27 +785,52 @@ def send_admin_notification(transaction_data, risk_analysis):
 
 
 # ✅ Main webhook endpoint
-@app.route('/webhook', methods=['POST'])
-@require_basic_auth("admin", "secret123")
+@bp.route('/webhook', methods=['POST'])
+@require_basic_auth(ADMIN_USERNAME, ADMIN_PASSWORD)
 def webhook():
     """Main webhook endpoint for processing transactions"""
-    if not request.is_json:
+    with stage("parse"):
+        data = request.get_json(silent=True) if request.is_json else None
+    if not isinstance(data, dict):
         return jsonify({"error": "Request must be JSON"}), 400
 
-    data = request.get_json()
-    logger.info(f"Received transaction: {data.get('transaction_id', 'unknown')}")
+    transaction_id = data.get('transaction_id')
+    # Every record logged while handling the transaction carries its id
+    with log_context(transaction_id=transaction_id):
+        logger.info("Received transaction: %s", transaction_id, extra={"event": "transaction.received"})
 
-    # Validate transaction data
-    is_valid, validation_message = validate_transaction_data(data)
-    if not is_valid:
-        logger.warning(f"Invalid transaction data: {validation_message}")
-        return jsonify({"error": f"Invalid transaction data: {validation_message}"}), 400
+        # Validate transaction data
+        with stage("validate"):
+            is_valid, validation_message = validate_transaction_data(data)
+        if not is_valid:
+            logger.warning("Invalid transaction data: %s", validation_message, extra={"event": "transaction.invalid"})
+            return jsonify({"error": f"Invalid transaction data: {validation_message}"}), 400
+
+        logger.info("Processing transaction: %s", transaction_id, extra={"event": "transaction.processing"})
+        # Analyze transaction with GROQ
+        started = time.perf_counter()
+        config = CONFIG.get()  # Scoring and the rules use the same snapshot and features
+        features = local_features(data)
+        with stage("model"):
+            risk_analysis = call_groq_api(data, config, features)
+        response = process_scored_transaction(data, risk_analysis, started, config, features)
+        with stage("serialize"):
+            return jsonify(response), 200
 
+def process_scored_transaction(data, risk_analysis, started, config=None, features=None):
+    """Apply the rules to a scored transaction, store and publish it; returns the webhook response.
+
+    ``config`` and ``features`` are the risk configuration and local features
+    the transaction was scored with; the features are passed on to the
+    shadow scorers and the retry queue.  Shared by the Flask webhook and the
+    asyncio-native one in ``asgi.py``.
+    """
     transaction_id = data.get('transaction_id')
-    logger.info(f"Processing transaction: {transaction_id}")
-      # Analyze transaction with GROQ
-    risk_analysis = call_groq_api(data)
-    admin_notification = send_admin_notification(data, risk_analysis)
+    if features is None:
+        features = local_features(data)
+    with stage("rules_and_notify"):
+        admin_notification = send_admin_notification(data, risk_analysis, config, features)
+    primary_ms = (time.perf_counter() - started) * 1000
     
     # Build response
     response = {
@@ -332,41 +846,194 @@ def webhook():
         response["alert_type"] = admin_notification["alert_type"]
     
     # Store transaction in ALL_TRANSACTIONS for history
-    transaction_record = {
-        "transaction_id": transaction_id,
-        "timestamp": data.get("timestamp", datetime.utcnow().isoformat() + "Z"),
-        "amount": data.get("amount"),
-        "currency": data.get("currency"),
-        "risk_analysis": risk_analysis,
-        "customer": data.get("customer", {}),
-        "payment_method": data.get("payment_method", {}),
-        "merchant": data.get("merchant", {})
-    }
-    ALL_TRANSACTIONS.append(transaction_record)
+    with stage("record"):
+        transaction_record = build_transaction_record(data, risk_analysis)
+        record_transaction(transaction_record, flagged=admin_notification is not None, features=features)
+    stored = _stream_stored.get()
+    if stored is not None:
+        # The streamed reasoning may now update the stored record
+        _stream_stored.set(None)
+        stored.set()
+    
+    # Mirror a sample to the shadow scorers; they run on their own thread
+    if SHADOW is not None:
+        SHADOW.submit(data, risk_analysis, primary_ms, features)
     
-    return jsonify(response), 200
+    return response
 
 # ✅ Admin notification endpoint (for testing/viewing notifications)
-@app.route('/admin/notifications', methods=['GET'])
-@require_basic_auth("admin", "secret123")
+@bp.route('/admin/notifications', methods=['GET'])
+@require_basic_auth(ADMIN_USERNAME, ADMIN_PASSWORD)
 def get_notifications():
     """Endpoint to retrieve recent notifications"""
-    return jsonify({
-        "notifications": NOTIFICATIONS
-    })
+    notifications = NOTIFICATIONS
+    return RESPONSES.respond("notifications", notifications.version,
+                             lambda: {"notifications": notifications.snapshot()})
 
 # ✅ All transactions endpoint (for transaction history)
-@app.route('/admin/all-transactions', methods=['GET'])
-@require_basic_auth("admin", "secret123")
+@bp.route('/admin/all-transactions', methods=['GET'])
+@require_basic_auth(ADMIN_USERNAME, ADMIN_PASSWORD)
 def get_all_transactions():
     """Endpoint to retrieve all transactions processed by the system"""
+    transactions = ALL_TRANSACTIONS
+    return RESPONSES.respond("all-transactions", transactions.version,
+                             lambda: {"transactions": transactions.snapshot()})
+
+# ✅ Aggregate statistics endpoint (for dashboard summaries)
+@bp.route('/admin/stats', methods=['GET'])
+@require_basic_auth(ADMIN_USERNAME, ADMIN_PASSWORD)
+def get_stats():
+    """Endpoint to retrieve incrementally maintained transaction statistics"""
+    try:
+        top = max(1, min(100, int(request.args.get('top', 10))))
+    except ValueError:
+        return jsonify({"error": "top must be an integer"}), 400
+    snapshot = STATS.snapshot(top=top)
+    snapshot["amount_profiles"] = {
+        "merchants": AMOUNT_PROFILES.summary("merchant", top=top),
+        "categories": AMOUNT_PROFILES.summary("category", top=top)
+    }
+    return jsonify(snapshot)
+
+# ✅ Entity link clusters endpoint
+@bp.route('/admin/clusters', methods=['GET'])
+@require_basic_auth(ADMIN_USERNAME, ADMIN_PASSWORD)
+def get_clusters():
+    """Endpoint to retrieve the largest clusters of customers linked through shared IPs and cards"""
+    try:
+        top = max(1, min(100, int(request.args.get('top', 10))))
+        min_customers = max(1, int(request.args.get('min_customers', 2)))
+    except ValueError:
+        return jsonify({"error": "top and min_customers must be integers"}), 400
     return jsonify({
-        "transactions": ALL_TRANSACTIONS
+        "clusters": ENTITY_LINKS.clusters(top=top, min_customers=min_customers),
+        "index": ENTITY_LINKS.stats()
     })
 
+# ✅ Search endpoint (boolean queries over risk factors, reasoning and merchants)
+@bp.route('/admin/search', methods=['GET'])
+@require_basic_auth(ADMIN_USERNAME, ADMIN_PASSWORD)
+def search_transactions():
+    """Endpoint to search the transaction history, newest first"""
+    try:
+        limit = max(1, min(500, int(request.args.get('limit', 50))))
+        cursor = request.args.get('cursor')
+        cursor = int(cursor) if cursor else None
+        start = parse_time(request.args['start']) if request.args.get('start') else None
+        end = parse_time(request.args['end']) if request.args.get('end') else None
+        min_score = float(request.args['min_score']) if request.args.get('min_score') else None
+        max_score = float(request.args['max_score']) if request.args.get('max_score') else None
+        started = time.perf_counter()
+        result = SEARCH.search(request.args.get('q', ''), start=start, end=end, min_score=min_score,
+                               max_score=max_score, limit=limit, cursor=cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    METRICS.observe("search.query_ms", (time.perf_counter() - started) * 1000)
+    # Records evicted from the history by its memory cap may still be indexed; they are skipped
+    transactions = [record for record in map(ALL_TRANSACTIONS.get, result["transaction_ids"]) if record is not None]
+    return jsonify({"transactions": transactions, "total": result["total"], "next_cursor": result["next_cursor"]})
+
+# ✅ Profiling endpoints (sampling profiler and slow-request capture)
+@bp.route('/admin/profile', methods=['GET'])
+@require_basic_auth(ADMIN_USERNAME, ADMIN_PASSWORD)
+def get_profile():
+    """Endpoint to sample every thread's stack for a few seconds; returns folded stacks for flame graphs"""
+    try:
+        seconds = float(request.args.get('seconds', 5))
+        interval_ms = float(request.args.get('interval_ms', 10))
+    except ValueError:
+        return jsonify({"error": "seconds and interval_ms must be numbers"}), 400
+    if not 0 < seconds <= 60 or not 1 <= interval_ms <= 1000:
+        return jsonify({"error": "seconds must be in (0, 60] and interval_ms in [1, 1000]"}), 400
+    idle = request.args.get('idle', 'true').lower() not in ("0", "false", "no")
+    try:
+        folded, stats = PROFILER.profile(seconds, interval=interval_ms / 1000, idle=idle)
+    except ProfilerBusy as e:
+        return jsonify({"error": str(e)}), 409
+    return folded, 200, {
+        "Content-Type": "text/plain; charset=utf-8",
+        "X-Profile-Samples": str(stats["samples"]),
+        "X-Profile-Sampling-Overhead": str(stats["sampling_overhead"])
+    }
+
+@bp.route('/admin/slow-requests', methods=['GET'])
+@require_basic_auth(ADMIN_USERNAME, ADMIN_PASSWORD)
+def get_slow_requests():
+    """Endpoint to retrieve the captured slow requests with their stage timings"""
+    return jsonify({"threshold_ms": SLOW_REQUESTS.threshold_ms, "requests": SLOW_REQUESTS.entries()})
+
+@bp.before_app_request
+def start_request_timing():
+    SLOW_REQUESTS.start()
+
+@bp.after_app_request
+def capture_slow_request(response):
+    SLOW_REQUESTS.finish(request.method, request.path, response.status_code, lambda: request.get_json(silent=True))
+    return response
+
+# ✅ Metrics endpoint (parse-failure rate and other operational counters)
+@bp.route('/admin/metrics', methods=['GET'])
+@require_basic_auth(ADMIN_USERNAME, ADMIN_PASSWORD)
+def get_metrics():
+    """Endpoint to retrieve the in-process operational metrics"""
+    snapshot = METRICS.snapshot()
+    snapshot["history"] = {
+        "transactions": ALL_TRANSACTIONS.stats(),
+        "notifications": NOTIFICATIONS.stats()
+    }
+    if SCHEDULER is not None:
+        snapshot["lanes"] = SCHEDULER.snapshot()
+    snapshot["subscriptions"] = SUBSCRIPTIONS.stats()
+    snapshot["search_index"] = SEARCH.stats()
+    if RETRY_QUEUE is not None:
+        snapshot["retry_queue"] = RETRY_QUEUE.stats()
+    return jsonify(snapshot)
+
+# ✅ Shadow scoring report (alternative scorers vs. the primary decisions)
+@bp.route('/admin/shadow', methods=['GET'])
+@require_basic_auth(ADMIN_USERNAME, ADMIN_PASSWORD)
+def get_shadow_report():
+    """Endpoint to compare the shadow scorers with the primary decisions"""
+    if SHADOW is None:
+        return jsonify({"error": "Shadow scoring is not enabled"}), 404
+    return jsonify(SHADOW.report())
+
+# ✅ Risk configuration endpoints (view, update and reload without a restart)
+@bp.route('/admin/config', methods=['GET'])
+@require_basic_auth(ADMIN_USERNAME, ADMIN_PASSWORD)
+def get_config():
+    """Endpoint to retrieve the active risk configuration"""
+    return jsonify(CONFIG.get().to_dict())
+
+@bp.route('/admin/config', methods=['PUT'])
+@require_basic_auth(ADMIN_USERNAME, ADMIN_PASSWORD)
+def update_config():
+    """Endpoint to validate and activate new risk configuration values"""
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 400
+    try:
+        config = CONFIG.update(request.get_json())
+    except ConfigError as e:
+        return jsonify({"error": "Invalid risk configuration", "details": e.errors}), 400
+    logger.info("Risk configuration updated to version %s", config.version, extra={"event": "config.updated"})
+    return jsonify(config.to_dict())
+
+@bp.route('/admin/config/reload', methods=['POST'])
+@require_basic_auth(ADMIN_USERNAME, ADMIN_PASSWORD)
+def reload_config():
+    """Endpoint to re-read the risk configuration file immediately"""
+    if CONFIG.path is None:
+        return jsonify({"error": "No risk configuration file configured"}), 400
+    try:
+        config = CONFIG.reload_if_changed(force=True)
+    except (OSError, ValueError) as e:
+        details = e.errors if isinstance(e, ConfigError) else [str(e)]
+        return jsonify({"error": "Invalid risk configuration", "details": details}), 400
+    return jsonify(config.to_dict())
+
 # ✅ Test endpoint for transactions with missing fields
-@app.route('/test-missing-fields', methods=['POST'])
-@require_basic_auth("admin", "secret123")
+@bp.route('/test-missing-fields', methods=['POST'])
+@require_basic_auth(ADMIN_USERNAME, ADMIN_PASSWORD)
 def test_missing_fields():
     """Test endpoint to simulate a transaction with missing or empty fields"""
     # This transaction has empty values that should trigger validation errors
@@ -403,8 +1070,8 @@ def test_missing_fields():
     })
 
 # ✅ Test endpoint to simulate a standard transaction
-@app.route('/test-standard-transaction', methods=['POST'])
-@require_basic_auth("admin", "secret123")
+@bp.route('/test-standard-transaction', methods=['POST'])
+@require_basic_auth(ADMIN_USERNAME, ADMIN_PASSWORD)
 def test_standard_transaction():
     """Test endpoint to simulate a standard low-risk transaction"""
     test_transaction = {
@@ -434,17 +1101,12 @@ def test_standard_transaction():
     if not is_valid:
         return jsonify({"error": f"Invalid test transaction: {validation_message}"}), 400
         
-    # Analyze transaction with GROQ
-    risk_analysis = call_groq_api(test_transaction)
-    admin_notification = send_admin_notification(test_transaction, risk_analysis)
-    
-    # Add to transaction history
-    transaction_record = {
-        **test_transaction,
-        "risk_analysis": risk_analysis,
-        "status": "processed",
-    }
-    ALL_TRANSACTIONS.append(transaction_record)
+    # Analyze transaction with GROQ, then store and notify as the webhook does
+    started = time.perf_counter()
+    config = CONFIG.get()
+    features = local_features(test_transaction)
+    risk_analysis = call_groq_api(test_transaction, config, features)
+    response = process_scored_transaction(test_transaction, risk_analysis, started, config, features)
     
     return jsonify({
         "message": "Standard transaction processed",
@@ -453,8 +1115,8 @@ def test_standard_transaction():
     })
     
 # ✅ Test endpoint to simulate high-risk country transaction
-@app.route('/test-high-risk-country', methods=['POST'])
-@require_basic_auth("admin", "secret123")
+@bp.route('/test-high-risk-country', methods=['POST'])
+@require_basic_auth(ADMIN_USERNAME, ADMIN_PASSWORD)
 def test_high_risk_country():
     """Test endpoint to simulate a transaction from a high-risk country"""
     test_transaction = {
@@ -484,37 +1146,53 @@ def test_high_risk_country():
     if not is_valid:
         return jsonify({"error": f"Invalid test transaction: {validation_message}"}), 400
         
-    # Analyze transaction with GROQ
-    risk_analysis = call_groq_api(test_transaction)
-    admin_notification = send_admin_notification(test_transaction, risk_analysis)
-    
-    # Add to transaction history
-    transaction_record = {
-        **test_transaction,
-        "risk_analysis": risk_analysis,
-        "status": "processed",
-    }
-    ALL_TRANSACTIONS.append(transaction_record)
+    # Analyze transaction with GROQ, then store and notify as the webhook does
+    started = time.perf_counter()
+    config = CONFIG.get()
+    features = local_features(test_transaction)
+    risk_analysis = call_groq_api(test_transaction, config, features)
+    response = process_scored_transaction(test_transaction, risk_analysis, started, config, features)
     
     return jsonify({
         "message": "High-risk country transaction processed",
         "transaction": test_transaction,
         "risk_analysis": risk_analysis,
-        "notification_sent": admin_notification is not None
+        "notification_sent": response.get("admin_notification_sent", False)
     })
 
 # ✅ Socket.IO connection handlers
-@socketio.on('connect')
 def handle_connect():
-    logger.info(f"Client connected: {request.sid}")
+    from flask_socketio import emit, join_room
+    logger.info("Client connected: %s", request.sid, extra={"event": "socket.connected"})
+    join, _ = SUBSCRIPTIONS.connect(request.sid)
+    for room in join:
+        join_room(room)
     emit('connection_established', {'message': 'Connected to risk monitoring system'})
 
-@socketio.on('disconnect')
-def handle_disconnect():
-    logger.info(f"Client disconnected: {request.sid}")
+def handle_disconnect(*args):
+    logger.info("Client disconnected: %s", request.sid, extra={"event": "socket.disconnected"})
+    SUBSCRIPTIONS.disconnect(request.sid)
+
+def handle_subscribe(data=None):
+    """Replace the client's alert filters; the return value is the acknowledgement"""
+    from flask_socketio import join_room, leave_room
+    filters = data.get("filters") if isinstance(data, dict) else data
+    try:
+        join, leave = SUBSCRIPTIONS.subscribe(request.sid, filters)
+    except ValueError as e:
+        return {"error": str(e)}
+    for room in leave:
+        leave_room(room)
+    for room in join:
+        join_room(room)
+    return {"filters": len(filters or [])}
+
+def handle_unsubscribe(data=None):
+    """Drop the client's alert filters: it receives every alert again"""
+    return handle_subscribe([])
 
 # ✅ Error handlers
-@app.errorhandler(404)
+@bp.app_errorhandler(404)
 def not_found(error):
     return jsonify({
         "error": "Endpoint not found",
@@ -522,6 +1200,15 @@ def not_found(error):
             "/webhook",
             "/admin/notifications", 
             "/admin/all-transactions",
+            "/admin/stats",
+            "/admin/clusters",
+            "/admin/search",
+            "/admin/profile",
+            "/admin/slow-requests",
+            "/admin/metrics",
+            "/admin/config",
+            "/admin/config/reload",
+            "/admin/shadow",
             "/test-notification",
             "/test-standard-transaction",
             "/test-high-risk-country",
@@ -529,26 +1216,36 @@ def not_found(error):
         ]
     }), 404
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def internal_error(error):
-    logger.error(f"Internal server error: {error}")
+    logger.error("Internal server error: %s", error, extra={"event": "http.internal_error"})
     return jsonify({"error": "Internal server error"}), 500
 
-@app.errorhandler(400)
+@bp.app_errorhandler(400)
 def bad_request(error):
     return jsonify({"error": "Bad request"}), 400
 
 # ✅ Run the Flask server
 if __name__ == '__main__':
+    app = create_app()
     print("🚀 Starting Transaction Risk Analyzer...")
     print(f"🔑 GROQ API Key configured: {bool(GROQ_API_KEY)}")
     print("📋 Test the API with:")
     print("   POST /webhook - Process transactions (requires Basic Auth)")
     print("   GET  /admin/notifications - Get high-risk notifications (requires Basic Auth)")
     print("   GET  /admin/all-transactions - Get all transactions (requires Basic Auth)")
+    print("   GET  /admin/stats - Get aggregate transaction statistics (requires Basic Auth)")
+    print("   GET  /admin/clusters - Get linked customer clusters (requires Basic Auth)")
+    print("   GET  /admin/search - Search transactions by risk factors, reasoning and merchant (requires Basic Auth)")
+    print("   GET  /admin/profile - Profile the running server for a few seconds (requires Basic Auth)")
+    print("   GET  /admin/slow-requests - Get recent requests slower than SLOW_REQUEST_MS with stage timings (requires Basic Auth)")
+    print("   GET  /admin/metrics - Get operational metrics (requires Basic Auth)")
+    print("   GET  /admin/shadow - Compare shadow scorers with live decisions (requires Basic Auth)")
+    print("   GET/PUT /admin/config - View or update the risk configuration (requires Basic Auth)")
+    print("   POST /admin/config/reload - Re-read the risk configuration file (requires Basic Auth)")
     print("   POST /test-notification - Send test notification (requires Basic Auth)")
     print("   POST /test-standard-transaction - Test standard transaction (requires Basic Auth)")
     print("   POST /test-high-risk-country - Test high-risk country detection (requires Basic Auth)")
     print("   POST /test-missing-fields - Test missing fields validation (requires Basic Auth)")
-    print("   Credentials: admin:secret123")
-    socketio.run(app, host='0.0.0.0', port=8081, debug=True)
\ No newline at end of file
+    print(f"   Credentials: {ADMIN_USERNAME}:{ADMIN_PASSWORD}")
+    get_socketio().run(app, host='0.0.0.0', port=8081, debug=True)
\ No newline at end of file
@@ -0,0 +1,296 @@
+"""Asyncio-native serving mode.
+
+Run with any ASGI server, e.g. ``uvicorn asgi:app --port 8081``.
+
+``POST /webhook`` is handled on the event loop and calls the model with the
+pooled asyncio client from ``async_http``, so an in-flight model call costs a
+coroutine rather than a thread.  Socket.IO is served by python-socketio's
+``AsyncServer``; ``Server.get_socketio()`` returns an emitter for it that can
+be called from the event loop or any thread.  Every other route
+(``/admin/*``, the test endpoints) is the Flask app from ``Server`` running on
+a small thread pool, so authentication, caching and validation are shared
+with the WSGI mode, as are the rules, storage and notification code behind
+the webhook (``Server.process_scored_transaction``).  That code writes the
+audit log, journals and takes locks, so it also runs on the thread pool
+rather than on the event loop, as do reading the risk config snapshot and
+appending to the replay corpus.
+
+Streaming completions, priority lanes and micro-batching are thread-based and
+not used in this mode; ``ASYNC_MAX_CONNECTIONS`` bounds the concurrent model
+calls instead.
+"""
+import asyncio
+import contextvars
+import io
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import Server
+from async_http import AsyncHTTPClient, HTTPStatusError
+from metrics import METRICS
+from profiling import stage
+from structured_logging import log_context
+from risk_core import build_optimized_groq_prompt, fallback_analysis, validate_transaction_data
+
+logger = logging.getLogger(__name__)
+
+
+def __getattr__(name):
+    """Build the default ``app`` on first access (as ``uvicorn asgi:app`` does)"""
+    if name == "app":
+        globals()["app"] = create_asgi_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class AsyncEmitter:
+    """Flask-SocketIO style ``emit(event, data)`` for an AsyncServer, callable from any thread"""
+
+    def __init__(self, sio):
+        self.sio = sio
+        self.loop = None
+        self._tasks = set()
+
+    def emit(self, event, data=None, **kwargs):
+        if self.loop is None or self.loop.is_closed():
+            logger.warning("Socket.IO event %s dropped: event loop not running", event,
+                           extra={"event": "socket.event_dropped"})
+            return
+        coroutine = self.sio.emit(event, data, **kwargs)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            task = self.loop.create_task(coroutine)
+            self._tasks.add(task)  # Keep a reference until the emit has finished
+            task.add_done_callback(self._tasks.discard)
+        else:
+            asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+
+async def request_risk_analysis_async(transaction_data, config, client, features=None, executor=None):
+    """Async counterpart of ``Server.request_risk_analysis`` (non-streamed).
+
+    When the replay corpus is being recorded, the completion is parsed and
+    appended to it on ``executor`` (default: the loop's), off the event loop.
+    """
+    if not Server.GROQ_API_KEY:
+        logger.warning("GROQ API key not configured")
+        return fallback_analysis("API configuration error", "GROQ API key not configured")
+
+    headers = {
+        "Authorization": f"Bearer {Server.GROQ_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    if features is None:
+        features = Server.local_features(transaction_data)
+    prompt = build_optimized_groq_prompt(transaction_data, features, config)
+
+    try:
+        _, body = await client.post(Server.GROQ_API_URL, json.dumps(prompt).encode(), headers, timeout=30)
+        if Server.RECORDER is None:
+            return Server.analysis_from_completion(transaction_data, prompt, json.loads(body))
+        return await asyncio.get_running_loop().run_in_executor(
+            executor, contextvars.copy_context().run, Server.analysis_from_completion, transaction_data, prompt,
+            json.loads(body), True)
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, HTTPStatusError) as e:
+        logger.error("API request failed: %s", e, extra={"event": "model.request_failed"})
+        return fallback_analysis("API error", f"Failed to analyze: {str(e)}")
+    except Exception as e:
+        logger.error("Unexpected error: %s", e, extra={"event": "model.unexpected_error"})
+        return fallback_analysis("Processing error", f"Error during analysis: {str(e)}", risk_score=0.7)
+
+
+async def call_groq_api_async(transaction_data, client, config=None, features=None, executor=None):
+    """Analyze a transaction and stamp the risk config version that was used (default: the active one)"""
+    config = config or Server.CONFIG.get()
+    risk_analysis = await request_risk_analysis_async(transaction_data, config, client, features, executor)
+    risk_analysis["config_version"] = config.version
+    return risk_analysis
+
+
+class RiskAnalyzerApp:
+    """ASGI HTTP app: async ``/webhook``, every other route served by the Flask app on a thread pool"""
+
+    def __init__(self, flask_app, client, emitter, threads=8):
+        self.flask_app = flask_app
+        self.client = client
+        self.emitter = emitter
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="asgi-wsgi")
+        self.in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        # Also covers ASGI servers that do not send lifespan events
+        self.emitter.loop = asyncio.get_running_loop()
+        body = await _read_body(receive)
+        if scope["path"] == "/webhook" and scope["method"] == "POST":
+            Server.SLOW_REQUESTS.start()
+            status, headers, payload = await self.webhook(scope, body)
+            Server.SLOW_REQUESTS.finish("POST", "/webhook", status, lambda: json.loads(body))
+        else:
+            status, headers, payload = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.call_flask, scope, body)
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": payload})
+
+    def _json(self, status, payload):
+        body = (self.flask_app.json.dumps(payload) + "\n").encode()
+        return status, [(b"content-type", b"application/json")], body
+
+    async def webhook(self, scope, body):
+        """Same contract as ``Server.webhook``, with the model call awaited on the event loop"""
+        headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+        if not Server.check_basic_auth(headers.get("authorization"), Server.ADMIN_USERNAME, Server.ADMIN_PASSWORD):
+            return self._json(401, {"error": "Unauthorized"})
+        with stage("parse"):
+            try:
+                data = json.loads(body) if "json" in headers.get("content-type", "") else None
+            except ValueError:
+                data = None
+        if not isinstance(data, dict):
+            return self._json(400, {"error": "Request must be JSON"})
+
+        transaction_id = data.get("transaction_id")
+        loop = asyncio.get_running_loop()
+        with log_context(transaction_id=transaction_id):
+            logger.info("Received transaction: %s", transaction_id, extra={"event": "transaction.received"})
+            with stage("validate"):
+                is_valid, validation_message = validate_transaction_data(data)
+            if not is_valid:
+                logger.warning("Invalid transaction data: %s", validation_message,
+                               extra={"event": "transaction.invalid"})
+                return self._json(400, {"error": f"Invalid transaction data: {validation_message}"})
+
+            logger.info("Processing transaction: %s", transaction_id, extra={"event": "transaction.processing"})
+            started = time.perf_counter()
+            # Scoring and the rules use the same snapshot and features; getting the snapshot may
+            # stat and reload the config file, so it runs on the thread pool
+            config = await loop.run_in_executor(self.executor, Server.CONFIG.get)
+            features = Server.local_features(data)
+            self.in_flight += 1
+            METRICS.set_gauge("asgi.in_flight", self.in_flight)
+            try:
+                with stage("model"):
+                    risk_analysis = await call_groq_api_async(data, self.client, config, features, self.executor)
+            finally:
+                self.in_flight -= 1
+                METRICS.set_gauge("asgi.in_flight", self.in_flight)
+            # Blocking sinks (audit log, journals, locks) must not stall the other coroutines;
+            # the copied context carries the log context and the request's stage timeline
+            response = await loop.run_in_executor(
+                self.executor, contextvars.copy_context().run, Server.process_scored_transaction, data,
+                risk_analysis, started, config, features)
+            return self._json(200, response)
+
+    def call_flask(self, scope, body):
+        """Run the Flask (WSGI) app for one request"""
+        server = scope.get("server") or ("localhost", 80)
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", ""),
+            "PATH_INFO": scope["path"],
+            "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+            "SERVER_NAME": str(server[0]),
+            "SERVER_PORT": str(server[1]),
+            "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+            "REMOTE_ADDR": (scope.get("client") or ("", 0))[0],
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False
+        }
+        for name, value in scope["headers"]:
+            name = name.decode("latin-1").upper().replace("-", "_")
+            value = value.decode("latin-1")
+            key = name if name in ("CONTENT_TYPE", "CONTENT_LENGTH") else f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key.startswith("HTTP_") and key in environ else value
+
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response["status"] = int(status.split(" ", 1)[0])
+            response["headers"] = [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                                   for name, value in headers]
+
+        result = self.flask_app(environ, start_response)
+        try:
+            payload = b"".join(result)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        return response["status"], response["headers"], payload
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+def create_asgi_app():
+    """Application factory for the ASGI mode: Socket.IO plus the HTTP routes"""
+    import socketio
+
+    flask_app = Server.create_app()
+    sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="http://localhost:3000")
+    emitter = AsyncEmitter(sio)
+    Server.socketio = emitter  # Notifications and updates are published through the AsyncServer
+
+    async def connect(sid, environ):
+        logger.info("Client connected: %s", sid, extra={"event": "socket.connected"})
+        join, _ = Server.SUBSCRIPTIONS.connect(sid)
+        for room in join:
+            await sio.enter_room(sid, room)
+        await sio.emit('connection_established', {'message': 'Connected to risk monitoring system'}, to=sid)
+
+    async def disconnect(sid, *args):
+        logger.info("Client disconnected: %s", sid, extra={"event": "socket.disconnected"})
+        Server.SUBSCRIPTIONS.disconnect(sid)
+
+    async def subscribe(sid, data=None):
+        filters = data.get("filters") if isinstance(data, dict) else data
+        try:
+            join, leave = Server.SUBSCRIPTIONS.subscribe(sid, filters)
+        except ValueError as e:
+            return {"error": str(e)}
+        for room in leave:
+            await sio.leave_room(sid, room)
+        for room in join:
+            await sio.enter_room(sid, room)
+        return {"filters": len(filters or [])}
+
+    async def unsubscribe(sid, data=None):
+        return await subscribe(sid, [])
+
+    sio.on('connect', connect)
+    sio.on('disconnect', disconnect)
+    sio.on('subscribe', subscribe)
+    sio.on('unsubscribe', unsubscribe)
+
+    client = AsyncHTTPClient(max_connections=int(os.getenv("ASYNC_MAX_CONNECTIONS", "2000")))
+    http_app = RiskAnalyzerApp(flask_app, client, emitter, threads=int(os.getenv("ASGI_WSGI_THREADS", "8")))
+
+    async def startup():
+        emitter.loop = asyncio.get_running_loop()
+
+    async def shutdown():
+        await client.close()
+
+    return socketio.ASGIApp(sio, other_asgi_app=http_app, on_startup=startup, on_shutdown=shutdown)
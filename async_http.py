@@ -0,0 +1,120 @@
+"""Minimal asyncio HTTP/1.1 client for the model API.
+
+Only what the scoring call needs: POST a JSON body and read the whole
+response (``Content-Length``, chunked or close-delimited), over plain TCP or
+TLS, with keep-alive connections pooled per host.  An in-flight call costs a
+coroutine and a socket instead of a thread, so thousands of slow model calls
+can be outstanding at once.
+"""
+import asyncio
+import ssl
+from collections import deque
+from urllib.parse import urlsplit
+
+
+class HTTPStatusError(Exception):
+    """Non-2xx response"""
+
+    def __init__(self, status, body):
+        super().__init__(f"HTTP {status}: {body[:200]!r}")
+        self.status = status
+        self.body = body
+
+
+class AsyncHTTPClient:
+    """Pooled asyncio HTTP/1.1 client; ``max_connections`` bounds the open sockets"""
+
+    def __init__(self, max_connections=2000, max_idle_per_host=200, connect_timeout=10.0):
+        self.max_idle_per_host = max_idle_per_host
+        self.connect_timeout = connect_timeout
+        self._slots = asyncio.Semaphore(max_connections)
+        self._idle = {}  # (scheme, host, port) -> deque of (reader, writer)
+        self._ssl = None
+
+    async def post(self, url, body, headers=None, timeout=30.0):
+        """POST ``body`` (bytes) and return ``(status, response_body)``; raises HTTPStatusError for non-2xx"""
+        parts = urlsplit(url)
+        secure = parts.scheme == "https"
+        host = parts.hostname
+        port = parts.port or (443 if secure else 80)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        lines = [f"POST {path} HTTP/1.1", f"Host: {parts.netloc}", f"Content-Length: {len(body)}",
+                 "Connection: keep-alive"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        request = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+        async with self._slots:
+            status, response_body = await asyncio.wait_for(
+                self._exchange((parts.scheme, host, port), secure, request), timeout)
+        if not 200 <= status < 300:
+            raise HTTPStatusError(status, response_body)
+        return status, response_body
+
+    async def _exchange(self, key, secure, request):
+        idle = self._idle.get(key)
+        while idle:
+            reader, writer = idle.popleft()
+            try:
+                return await self._roundtrip(key, reader, writer, request)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                continue  # The server closed the idle connection; try the next one or a new one
+        host, port = key[1], key[2]
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=self._ssl_context() if secure else None,
+                                    server_hostname=host if secure else None),
+            self.connect_timeout)
+        return await self._roundtrip(key, reader, writer, request)
+
+    async def _roundtrip(self, key, reader, writer, request):
+        try:
+            writer.write(request)
+            await writer.drain()
+            head = await reader.readuntil(b"\r\n\r\n")
+            status_line, *header_lines = head.decode("latin-1").split("\r\n")
+            status = int(status_line.split(" ", 2)[1])
+            headers = {}
+            for line in header_lines:
+                if ":" in line:
+                    name, value = line.split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+
+            reusable = headers.get("connection", "").lower() != "close"
+            if headers.get("transfer-encoding", "").lower() == "chunked":
+                body = await self._read_chunked(reader)
+            elif "content-length" in headers:
+                body = await reader.readexactly(int(headers["content-length"]))
+            else:
+                body = await reader.read()
+                reusable = False
+        except BaseException:
+            writer.close()
+            raise
+
+        idle = self._idle.setdefault(key, deque())
+        if reusable and len(idle) < self.max_idle_per_host:
+            idle.append((reader, writer))
+        else:
+            writer.close()
+        return status, body
+
+    @staticmethod
+    async def _read_chunked(reader):
+        chunks = []
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";", 1)[0], 16)
+            if size == 0:
+                await reader.readuntil(b"\r\n")  # Trailer terminator (trailers are not supported)
+                return b"".join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+    def _ssl_context(self):
+        if self._ssl is None:
+            self._ssl = ssl.create_default_context()
+        return self._ssl
+
+    async def close(self):
+        for idle in self._idle.values():
+            while idle:
+                _, writer = idle.popleft()
+                writer.close()
@@ -0,0 +1,216 @@
+"""Append-only, write-behind audit log for processed transactions.
+
+Request threads only serialize the record and put it in a bounded in-memory
+buffer; a background writer thread does the disk I/O with group commit (one
+write + fsync per batch of up to ``flush_records`` records or every
+``flush_interval_ms``).  Segments are rotated once they reach
+``segment_bytes`` and closed segments are gzip-compressed.  ``replay()``
+reads every segment back in order so the in-memory stores can be rebuilt at
+startup.
+
+Segment files are JSON lines named ``audit-<index>.log`` (``.log.gz`` once
+compressed); each line is ``{"seq": ..., "ts": ..., "kind": ..., "data": ...}``.
+"""
+import gzip
+import json
+import logging
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+_SEGMENT_PATTERN = re.compile(r"^audit-(\d{8})\.log(\.gz)?$")
+_STOP = object()
+
+
+def list_segments(directory):
+    """Return (index, path) for every segment in ``directory``, oldest first"""
+    if not os.path.isdir(directory):
+        return []
+    segments = {}
+    for name in os.listdir(directory):
+        match = _SEGMENT_PATTERN.match(name)
+        if match:
+            index = int(match.group(1))
+            # A plain segment next to its .gz means compression was interrupted
+            # before the original was removed; the plain file is authoritative
+            if index not in segments or not match.group(2):
+                segments[index] = os.path.join(directory, name)
+    return sorted(segments.items())
+
+
+def read_segment(path):
+    """Yield the entries of one segment, skipping torn or corrupt lines"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as segment:
+        for line in segment:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logger.warning("Skipping corrupt audit entry in %s", path, extra={"event": "audit_log.corrupt_entry"})
+
+
+def replay(directory):
+    """Yield every audit entry stored in ``directory`` in write order"""
+    for _, path in list_segments(directory):
+        yield from read_segment(path)
+
+
+class AuditLog:
+    """Write-behind, group-committed audit log writer"""
+
+    def __init__(self, directory, flush_records=256, flush_interval_ms=50, buffer_size=10000,
+                 segment_bytes=64 * 1024 * 1024, compress=True, fsync=True):
+        self.directory = directory
+        self.flush_records = flush_records
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.segment_bytes = segment_bytes
+        self.compress = compress
+        self.fsync = fsync
+        self._buffer = queue.Queue(maxsize=buffer_size)
+        self._seq_lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        segments = list_segments(directory)
+        # Never append to a segment from a previous run: it may end in a torn line
+        self._segment_index = segments[-1][0] + 1 if segments else 0
+        self._seq = self._last_seq(segments)
+        self._segment = None  # Opened on first write
+
+        self._writer = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+        self._writer.start()
+
+    @staticmethod
+    def _last_seq(segments):
+        for _, path in reversed(segments):
+            last = None
+            for entry in read_segment(path):
+                last = entry.get("seq", last)
+            if last is not None:
+                return last
+        return 0
+
+    def append(self, kind, data):
+        """Queue one record for writing.
+
+        The record is serialized on the calling thread so later in-place
+        changes to ``data`` cannot race with the writer.  Blocks only when the
+        buffer is full, i.e. when the disk cannot keep up.
+        """
+        body = json.dumps(data, default=str)
+        # Sequence numbers are assigned under the lock that also enqueues, so
+        # the file order always matches the sequence order
+        with self._seq_lock:
+            self._seq += 1
+            seq = self._seq
+            line = f'{{"seq": {seq}, "ts": {time.time()!r}, "kind": {json.dumps(kind)}, "data": {body}}}\n'
+            try:
+                self._buffer.put_nowait(line)
+            except queue.Full:
+                METRICS.increment("audit_log.buffer_full")
+                self._buffer.put(line)
+        METRICS.increment("audit_log.appended")
+        return seq
+
+    def flush(self, timeout=5.0):
+        """Block until everything appended so far is durably written"""
+        done = threading.Event()
+        self._buffer.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        """Flush pending records and stop the writer thread"""
+        if self._writer.is_alive():
+            self._buffer.put(_STOP)
+            self._writer.join()
+
+    def _run(self):
+        while True:
+            item = self._buffer.get()
+            batch = []
+            waiters = []
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            # Group commit: gather until N records or T ms after the first one
+            while True:
+                if item is _STOP:
+                    stop = True
+                    break
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.flush_records:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._buffer.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except OSError as e:
+                    METRICS.increment("audit_log.write_errors")
+                    logger.error("Audit log write failed, %d records lost: %s", len(batch), e,
+                                 extra={"event": "audit_log.write_failed"})
+                except Exception:
+                    # Keep the writer alive: appenders would otherwise block forever on a full buffer
+                    METRICS.increment("audit_log.write_errors")
+                    logger.exception("Unexpected audit log write error, %d records lost", len(batch),
+                                     extra={"event": "audit_log.write_failed"})
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                try:
+                    self._close_segment(compress=False)
+                except OSError as e:
+                    logger.error("Closing the audit log segment failed: %s", e,
+                                 extra={"event": "audit_log.close_failed"})
+                return
+
+    def _write_batch(self, batch):
+        started = time.perf_counter()
+        if self._segment is None:
+            self._open_segment()
+        self._segment.write("".join(batch))
+        self._segment.flush()
+        if self.fsync:
+            os.fsync(self._segment.fileno())
+        METRICS.increment("audit_log.flushes")
+        METRICS.observe("audit_log.flush_ms", (time.perf_counter() - started) * 1000)
+        if self._segment.tell() >= self.segment_bytes:
+            self._rotate()
+
+    def _segment_path(self, index):
+        return os.path.join(self.directory, f"audit-{index:08d}.log")
+
+    def _open_segment(self):
+        self._segment = open(self._segment_path(self._segment_index), "a", encoding="utf-8")
+
+    def _close_segment(self, compress):
+        if self._segment is None:
+            return
+        path = self._segment.name
+        self._segment.close()
+        self._segment = None
+        if compress and self.compress:
+            # Compress to a temporary name and rename so a crash never leaves a partial .gz
+            with open(path, "rb") as source, gzip.open(path + ".gz.tmp", "wb") as target:
+                shutil.copyfileobj(source, target)
+            os.replace(path + ".gz.tmp", path + ".gz")
+            os.remove(path)
+
+    def _rotate(self):
+        self._close_segment(compress=True)
+        self._segment_index += 1
+        METRICS.increment("audit_log.segments_rotated")
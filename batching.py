@@ -0,0 +1,121 @@
+"""Adaptive micro-batching of concurrent scoring requests.
+
+Request threads call ``MicroBatcher.submit()`` and block until their result
+is ready.  A collector thread gathers pending requests into a batch and flushes
+it once it holds ``max_batch`` items or the batching window has passed,
+whichever comes first; the batch is then processed with one call on a worker
+thread and the results are handed back to each waiting request.
+
+The window adapts to the arrival rate (an exponentially weighted moving
+average of the gap between requests).  When requests arrive further apart than
+``max_wait_ms`` there is nothing to wait for and batches are flushed
+immediately, so low traffic sees no added latency; under load the window grows
+towards ``max_wait_ms``.  When every worker is busy the collector keeps
+gathering, so batches fill up exactly when the model is the bottleneck.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+_SMOOTHING = 0.2  # Weight of the newest gap in the arrival-interval average
+
+
+class MicroBatcher:
+    """Gather concurrent single requests into batches for ``process_batch``.
+
+    ``process_batch(items)`` must return one result per item, in order; if it
+    raises, every request in the batch receives the exception.
+    """
+
+    def __init__(self, process_batch, max_batch=8, max_wait_ms=10, workers=4):
+        self.process_batch = process_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._workers = threading.BoundedSemaphore(workers)
+        self._lock = threading.Lock()
+        self._last_arrival = None
+        self._interval = float("inf")
+        self._collector = threading.Thread(target=self._collect, name="micro-batcher", daemon=True)
+        self._collector.start()
+
+    def submit(self, item):
+        """Process ``item`` as part of a batch and return its result"""
+        now = time.monotonic()
+        with self._lock:
+            if self._last_arrival is not None:
+                gap = now - self._last_arrival
+                self._interval = gap if self._interval == float("inf") else \
+                    (1 - _SMOOTHING) * self._interval + _SMOOTHING * gap
+            self._last_arrival = now
+        future = Future()
+        self._queue.put((item, future, now))
+        return future.result()
+
+    def window(self):
+        """Current batching window in seconds"""
+        interval = self._interval
+        if interval >= self.max_wait:
+            return 0.0
+        return min(self.max_wait, interval * (self.max_batch - 1))
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._collector.join()
+
+    def _collect(self):
+        while True:
+            entry = self._queue.get()
+            if entry is _STOP:
+                return
+            batch = [entry]
+            window = self.window()
+            METRICS.set_gauge("batching.window_ms", window * 1000)
+            deadline = entry[2] + window
+            stop = self._fill(batch, deadline)
+            # Keep gathering while all workers are busy; the batch can only grow
+            while not self._workers.acquire(timeout=0.001):
+                stop = stop or self._fill(batch, 0)
+            stop = stop or self._fill(batch, 0)
+            threading.Thread(target=self._run, args=(batch,), daemon=True).start()
+            if stop:
+                return
+
+    def _fill(self, batch, deadline):
+        """Add queued requests to ``batch`` until it is full or ``deadline`` passes"""
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                return False
+            if entry is _STOP:
+                return True
+            batch.append(entry)
+        return False
+
+    def _run(self, batch):
+        started = time.monotonic()
+        METRICS.observe("batching.batch_size", len(batch))
+        for _, _, enqueued in batch:
+            METRICS.observe("batching.wait_ms", (started - enqueued) * 1000)
+        try:
+            results = self.process_batch([item for item, _, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"Batch of {len(batch)} produced {len(results)} results")
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+        except Exception as e:
+            logger.error("Batch of %d failed: %s", len(batch), e, extra={"event": "batch.failed"})
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._workers.release()
@@ -0,0 +1,97 @@
+"""Alert routing cost and fan-out with server-side subscription filters.
+
+Registers many analysts with random filters (categories, countries, score
+ranges), then routes synthetic alerts through the predicate index and,
+for comparison, evaluates every client's filters one by one.  Also reports
+how many deliveries (and bytes) broadcasting would send vs routing.
+
+Usage:
+    python benchmarks/bench_alert_routing.py [--clients 5000] [--events 20000]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from subscriptions import ALL_ROOM, SubscriptionIndex, normalize_filter  # noqa: E402
+
+CATEGORIES = ["electronics", "retail", "travel", "gambling", "crypto", "grocery", "books", "fashion"]
+COUNTRIES = ["US", "GB", "DE", "FR", "RU", "IR", "BR", "IN", "NG", "CN"]
+ACTIONS = ["allow", "review", "block"]
+
+
+def make_filter(rng):
+    spec = {}
+    if rng.random() < 0.7:
+        spec["categories"] = rng.sample(CATEGORIES, rng.randint(1, 2))
+    if rng.random() < 0.5:
+        spec["countries"] = rng.sample(COUNTRIES, rng.randint(1, 3))
+    if rng.random() < 0.4:
+        spec["min_score"] = rng.choice([0.5, 0.7, 0.9])
+    return spec
+
+
+def make_event(i, rng):
+    return {
+        "transaction_id": f"tx_{i}",
+        "amount": round(rng.uniform(1, 5000), 2),
+        "risk_analysis": {"risk_score": round(rng.random(), 2), "recommended_action": rng.choice(ACTIONS),
+                          "risk_factors": ["synthetic"], "reasoning": "Synthetic alert"},
+        "customer": {"id": f"cust_{i % 1000}", "country": rng.choice(COUNTRIES)},
+        "merchant": {"id": f"merch_{i % 100}", "category": rng.choice(CATEGORIES)}
+    }
+
+
+def matches(spec, event):
+    """Direct evaluation of one filter, as a per-client loop would do it"""
+    if "categories" in spec and event["merchant"]["category"] not in spec["categories"]:
+        return False
+    if "countries" in spec and event["customer"]["country"] not in spec["countries"]:
+        return False
+    return event["risk_analysis"]["risk_score"] >= spec.get("min_score", 0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--events", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    index = SubscriptionIndex()
+    clients = {}
+    for client in range(args.clients):
+        filters = [make_filter(rng) for _ in range(rng.randint(1, 3))]
+        clients[f"sid_{client}"] = [normalize_filter(spec) for spec in filters]
+        index.subscribe(f"sid_{client}", filters)
+    events = [make_event(i, rng) for i in range(args.events)]
+    event_bytes = sum(len(json.dumps(event)) for event in events) / len(events)
+    members = index._members
+
+    started = time.perf_counter()
+    deliveries = 0
+    for event in events:
+        rooms = index.route(event)
+        deliveries += len(set().union(*(members.get(room, ()) for room in rooms if room != ALL_ROOM)))
+    indexed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for event in events[:max(1, args.events // 20)]:
+        [sid for sid, specs in clients.items() if any(matches(spec, event) for spec in specs)]
+    per_client = (time.perf_counter() - started) / max(1, args.events // 20)
+
+    broadcast = args.clients * args.events
+    print(f"{args.clients} clients, {index.stats()['filters']} distinct filters, {args.events} events")
+    print(f"routing (index):       {indexed / args.events * 1e6:>8.1f} us/event (incl. recipient count)")
+    print(f"per-client evaluation: {per_client * 1e6:>8.1f} us/event")
+    print(f"deliveries: broadcast {broadcast} ({broadcast * event_bytes / 1e6:.0f} MB), "
+          f"routed {deliveries} ({deliveries * event_bytes / 1e6:.0f} MB, "
+          f"{deliveries / args.events:.0f} sockets/event)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Memory and throughput with thousands of in-flight requests: threads vs asyncio.
+
+Each client sends /webhook requests back to back against a slow LLM stub
+(running in its own process, so its threads are not counted).  The ``thread``
+mode runs the Flask app with one thread per in-flight request, as a threaded
+WSGI server does; the ``async`` mode runs the ASGI app from ``asgi.py`` with
+one coroutine per request on a single event loop.  Both are driven in-process
+(no HTTP server in front), and each mode runs in a fresh subprocess so its
+peak RSS can be measured.
+
+Usage:
+    python benchmarks/bench_async_serving.py [--concurrency 1000,2000] [--requests 3] [--delay-ms 1000]
+"""
+import argparse
+import base64
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+HEADERS = {
+    "Authorization": "Basic " + base64.b64encode(b"admin:secret123").decode("utf-8"),
+    "Content-Type": "application/json"
+}
+DEGRADED = ("API error", "API configuration error", "Processing error", "LLM parsing error")
+
+
+def make_transaction(transaction_id):
+    return {
+        "transaction_id": transaction_id,
+        "timestamp": "2025-06-24T12:00:00Z",
+        "amount": 120.0,
+        "currency": "USD",
+        "customer": {"id": "cust_bench", "country": "US", "ip_address": "203.0.113.7"},
+        "payment_method": {"type": "credit_card", "last_four": "4242", "country_of_issue": "US"},
+        "merchant": {"id": "merch_bench", "name": "Bench Shop", "category": "retail"}
+    }
+
+
+def failed(status, risk_analysis):
+    return status != 200 or any(factor in DEGRADED for factor in risk_analysis["risk_factors"])
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run_threads(app, concurrency, requests_per_client):
+    failures = []
+
+    def client(worker):
+        test_client = app.test_client()
+        for i in range(requests_per_client):
+            response = test_client.post('/webhook', headers=HEADERS, json=make_transaction(f"tx_{worker}_{i}"))
+            if failed(response.status_code, response.get_json()["risk_analysis"]):
+                failures.append(worker)
+
+    threads = [threading.Thread(target=client, args=(w,)) for w in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(failures)
+
+
+def run_async(app, concurrency, requests_per_client):
+    import asyncio
+
+    failures = []
+
+    async def request(body):
+        scope = {
+            "type": "http", "method": "POST", "path": "/webhook", "query_string": b"", "root_path": "",
+            "scheme": "http", "http_version": "1.1", "server": ("bench", 80), "client": ("127.0.0.1", 0),
+            "headers": [(name.lower().encode(), value.encode()) for name, value in HEADERS.items()]
+        }
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        await app(scope, receive, send)
+        return sent[0]["status"], sent[1]["body"]
+
+    async def client(worker):
+        for i in range(requests_per_client):
+            status, body = await request(json.dumps(make_transaction(f"tx_{worker}_{i}")).encode())
+            if failed(status, json.loads(body)["risk_analysis"]):
+                failures.append(worker)
+
+    async def main():
+        await asyncio.gather(*(client(w) for w in range(concurrency)))
+
+    asyncio.run(main())
+    return len(failures)
+
+
+def child(args):
+    """Run one mode and print its results as JSON"""
+    import logging
+    import Server
+
+    if args.child == "thread":
+        app, runner = Server.create_app(), run_threads
+    else:
+        import asgi
+        app, runner = asgi.create_asgi_app(), run_async
+    logging.disable(logging.WARNING)  # Thousands of per-request log lines would dominate the timing
+    Server.GROQ_API_KEY = "bench"
+    Server.GROQ_API_URL = args.url
+    Server.GROQ_STREAMING = False
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    failures = runner(app, args.concurrency[0], args.requests)
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        "throughput": args.concurrency[0] * args.requests / elapsed,
+        "rss_mb": peak_rss_mb() - baseline,
+        "failures": failures
+    }))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=lambda value: [int(v) for v in value.split(",")], default=[1000, 2000])
+    parser.add_argument("--requests", type=int, default=3, help="Requests per client")
+    parser.add_argument("--delay-ms", type=float, default=1000, help="Stub time to first token")
+    parser.add_argument("--modes", default="thread,async")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args)
+
+    port = free_port()
+    stub = subprocess.Popen([sys.executable, os.path.join(ROOT, "benchmarks", "llm_stub.py"), "--port", str(port),
+                             "--first-token-delay-ms", str(args.delay_ms), "--token-delay-ms", "0"],
+                            stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}/openai/v1/chat/completions"
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+
+    try:
+        print(f"{'mode':>7}{'in-flight':>11}{'req/s':>9}{'ideal':>8}{'peak RSS (MB)':>15}{'failures':>10}")
+        for concurrency in args.concurrency:
+            ideal = concurrency / (args.delay_ms / 1000.0)
+            for mode in args.modes.split(","):
+                output = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--child", mode, "--url", url,
+                     "--concurrency", str(concurrency), "--requests", str(args.requests)],
+                    capture_output=True, text=True, check=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                print(f"{mode:>7}{concurrency:>11}{result['throughput']:>9.0f}{ideal:>8.0f}"
+                      f"{result['rss_mb']:>15.1f}{result['failures']:>10}")
+    finally:
+        stub.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Throughput/latency trade-off of micro-batching model calls.
+
+Closed-loop clients call call_groq_api() against the local LLM stub with the
+number of concurrent model calls capped (as by an upstream rate limit), for
+several load levels and batch sizes.  Batch size 1 is the unbatched baseline.
+
+Usage:
+    python benchmarks/bench_batching.py [--clients 1,4,16,64] [--batch-sizes 1,4,8] [--seconds S]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Server  # noqa: E402
+from batching import MicroBatcher  # noqa: E402
+from lanes import LaneScheduler  # noqa: E402
+from llm_stub import start_stub  # noqa: E402
+
+
+def make_transaction(transaction_id):
+    return {
+        "transaction_id": transaction_id,
+        "timestamp": "2025-06-24T12:00:00Z",
+        "amount": 120.0,
+        "currency": "USD",
+        "customer": {"id": "cust_bench", "country": "US", "ip_address": "203.0.113.7"},
+        "payment_method": {"type": "credit_card", "last_four": "4242", "country_of_issue": "GB"},
+        "merchant": {"id": "merch_bench", "name": "Bench Shop", "category": "retail"}
+    }
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else float("nan")
+
+
+def run(clients, batch_size, args):
+    Server.SCHEDULER = LaneScheduler(args.concurrency)
+    Server.BATCHER = MicroBatcher(Server.request_batch_risk_analysis, max_batch=batch_size,
+                                  max_wait_ms=args.wait_ms, workers=args.concurrency) if batch_size > 1 else None
+    stop = threading.Event()
+    latencies = []
+
+    def client(worker):
+        i = 0
+        while not stop.is_set():
+            started = time.perf_counter()
+            Server.call_groq_api(make_transaction(f"tx_{worker}_{i}"))
+            latencies.append((time.perf_counter() - started) * 1000)
+            i += 1
+
+    threads = [threading.Thread(target=client, args=(w,)) for w in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    if Server.BATCHER is not None:
+        Server.BATCHER.close()
+    return len(latencies) / elapsed, percentile(latencies, 0.5), percentile(latencies, 0.95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", default="1,4,16,64")
+    parser.add_argument("--batch-sizes", default="1,4,8")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent model calls allowed upstream")
+    parser.add_argument("--wait-ms", type=float, default=10, help="Maximum batching window")
+    parser.add_argument("--first-token-delay-ms", type=float, default=60)
+    parser.add_argument("--token-delay-ms", type=float, default=0.1)
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    server, url = start_stub(first_token_delay=args.first_token_delay_ms / 1000.0,
+                             token_delay=args.token_delay_ms / 1000.0)
+    Server.create_app()
+    Server.GROQ_API_KEY = "bench"
+    Server.GROQ_API_URL = url
+    Server.GROQ_STREAMING = False
+
+    print(f"{'clients':>8}{'batch':>7}{'req/s':>10}{'p50 (ms)':>11}{'p95 (ms)':>11}")
+    for clients in (int(c) for c in args.clients.split(",")):
+        for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+            throughput, p50, p95 = run(clients, batch_size, args)
+            print(f"{clients:>8}{batch_size:>7}{throughput:>10.1f}{p50:>11.1f}{p95:>11.1f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Columnar archive queries vs loading the /admin/all-transactions JSON.
+
+Writes a synthetic month of transactions to a Parquet and an Arrow IPC
+archive (the way the exporter does, in batches), then times predicate
+pushdown queries against both and compares them with the current workflow of
+parsing the whole history as one JSON document and filtering it in Python.
+
+Usage:
+    python benchmarks/bench_columnar_export.py [--rows N]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from columnar_export import flatten, query, write_partitions  # noqa: E402
+from risk_core import build_transaction_record  # noqa: E402
+
+COUNTRIES = ["US", "GB", "DE", "FR", "RU", "IR", "BR", "IN"]
+ACTIONS = ["allow", "allow", "allow", "review", "block"]
+START = datetime(2025, 6, 1, tzinfo=timezone.utc)
+
+
+def make_record(i, rng, rows):
+    timestamp = START + timedelta(seconds=30 * 24 * 3600 * i / rows)
+    transaction = {
+        "transaction_id": f"tx_{i:08d}",
+        "timestamp": timestamp.isoformat().replace("+00:00", "Z"),
+        "amount": round(rng.uniform(1, 5000), 2),
+        "currency": "USD",
+        "customer": {"id": f"cust_{i % 50000}", "country": rng.choice(COUNTRIES), "ip_address": "10.0.0.1"},
+        "payment_method": {"type": "credit_card", "last_four": "1234", "country_of_issue": rng.choice(COUNTRIES)},
+        "merchant": {"id": f"merch_{i % 300}", "name": f"Merchant {i % 300}", "category": "retail"}
+    }
+    return build_transaction_record(transaction, {
+        "risk_score": round(rng.random(), 2),
+        "risk_factors": ["synthetic"],
+        "reasoning": "Synthetic benchmark transaction",
+        "recommended_action": rng.choice(ACTIONS)
+    })
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--batch", type=int, default=100000, help="Rows per exporter flush")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    records = [make_record(i, rng, args.rows) for i in range(args.rows)]
+    base = tempfile.mkdtemp()
+    try:
+        week = (START + timedelta(days=7), START + timedelta(days=14))
+        queries = [
+            ("one week", dict(start=week[0], end=week[1])),
+            ("week + block + RU", dict(start=week[0], end=week[1], action="block", country="RU")),
+            ("month + block", dict(action="block"))
+        ]
+
+        print(f"{args.rows} transactions over 30 days")
+        rows = [flatten(record) for record in records]
+        for file_format in ("parquet", "arrow"):
+            directory = os.path.join(base, file_format)
+            elapsed, _ = timed(lambda: [write_partitions(directory, rows[i:i + args.batch], file_format, i)
+                                        for i in range(0, len(rows), args.batch)])
+            size = sum(os.path.getsize(os.path.join(root, name))
+                       for root, _, names in os.walk(directory) for name in names)
+            print(f"{file_format:>8}: written in {elapsed:.2f}s, {size / 1e6:.0f} MB on disk")
+            for label, predicate in queries:
+                elapsed, table = timed(lambda: query(directory, **predicate))
+                print(f"{'':>10}{label:<20}{table.num_rows:>9} rows {elapsed * 1000:>8.0f} ms")
+
+        blob = json.dumps({"transactions": records})
+        print(f"    json: {len(blob) / 1e6:.0f} MB document")
+        for label, predicate in queries:
+            def scan():
+                start = predicate.get("start")
+                end = predicate.get("end")
+                matches = []
+                for record in json.loads(blob)["transactions"]:
+                    timestamp = datetime.fromisoformat(record["timestamp"].replace("Z", "+00:00"))
+                    if (start and timestamp < start) or (end and timestamp >= end):
+                        continue
+                    if predicate.get("action") and record["risk_analysis"]["recommended_action"] != predicate["action"]:
+                        continue
+                    if predicate.get("country") and record["customer"]["country"] != predicate["country"]:
+                        continue
+                    matches.append(record)
+                return matches
+
+            elapsed, matches = timed(scan)
+            print(f"{'':>10}{label:<20}{len(matches):>9} rows {elapsed * 1000:>8.0f} ms")
+    finally:
+        shutil.rmtree(base)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Throughput of the history store under concurrent writers and readers.
+
+Writer threads append transaction records while reader threads take full
+snapshots (as GET /admin/all-transactions does), for a single shard (one lock,
+the previous design) and for the sharded store.
+
+Usage:
+    python benchmarks/bench_history_concurrency.py [--writers 8] [--readers 2] [--shards 1,16] [--seconds S]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history import TransactionHistory  # noqa: E402
+from risk_core import build_transaction_record  # noqa: E402
+
+ANALYSIS = {"risk_score": 0.2, "risk_factors": ["Amount"], "reasoning": "Typical purchase",
+            "recommended_action": "allow"}
+
+
+def make_transaction(transaction_id):
+    return {
+        "transaction_id": transaction_id,
+        "timestamp": "2025-06-24T12:00:00Z",
+        "amount": 120.0,
+        "currency": "USD",
+        "customer": {"id": "cust_bench", "country": "US", "ip_address": "203.0.113.7"},
+        "payment_method": {"type": "credit_card", "last_four": "4242", "country_of_issue": "US"},
+        "merchant": {"id": "merch_bench", "name": "Bench Shop", "category": "retail"}
+    }
+
+
+def run(shards, args):
+    history = TransactionHistory(max_records=args.max_records, shards=shards)
+    for i in range(args.max_records):
+        history.append(build_transaction_record(make_transaction(f"seed_{i}"), ANALYSIS))
+    stop = threading.Event()
+    appends = [0] * args.writers
+    snapshots = [0] * args.readers
+
+    def writer(worker):
+        i = 0
+        while not stop.is_set():
+            history.append(build_transaction_record(make_transaction(f"tx_{worker}_{i}"), ANALYSIS))
+            i += 1
+        appends[worker] = i
+
+    def reader(worker):
+        count = 0
+        while not stop.is_set():
+            history.snapshot()
+            count += 1
+        snapshots[worker] = count
+
+    threads = [threading.Thread(target=writer, args=(w,)) for w in range(args.writers)]
+    threads += [threading.Thread(target=reader, args=(r,)) for r in range(args.readers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return sum(appends) / elapsed, sum(snapshots) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--shards", default="1,16")
+    parser.add_argument("--max-records", type=int, default=20000)
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    print(f"{'shards':>7}{'appends/s':>12}{'snapshots/s':>13}")
+    for shards in (int(s) for s in args.shards.split(",")):
+        appends, snapshots = run(shards, args)
+        print(f"{shards:>7}{appends:>12.0f}{snapshots:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
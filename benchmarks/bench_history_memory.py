@@ -0,0 +1,84 @@
+"""Per-record memory benchmark for the transaction and notification history.
+
+Uses tracemalloc to compare the previous representation (plain lists of nested
+dicts, with notifications carrying two copies of the transaction) against the
+compact ring-buffer history.
+
+Usage:
+    python benchmarks/bench_history_memory.py [--records N]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history import NotificationHistory, TransactionHistory  # noqa: E402
+from risk_core import build_notification, build_transaction_record  # noqa: E402
+
+COUNTRIES = ["US", "GB", "DE", "FR", "RU", "IR", "BR", "IN"]
+CATEGORIES = ["electronics", "retail", "travel", "gaming", "groceries"]
+FACTORS = ["High amount for merchant category", "IP country differs from card country",
+           "Transaction involves high-risk country: RU", "New customer"]
+
+
+def make_transaction(i, rng):
+    # Round-trip through JSON so every string is a fresh object, as with real requests
+    return json.loads(json.dumps({
+        "transaction_id": f"tx_{i:08d}",
+        "timestamp": f"2025-06-24T12:{i % 60:02d}:{i % 60:02d}Z",
+        "amount": round(rng.uniform(1, 5000), 2),
+        "currency": "USD",
+        "customer": {"id": f"cust_{i % 5000}", "country": rng.choice(COUNTRIES),
+                     "ip_address": f"10.{i % 256}.{i // 256 % 256}.{i % 7}"},
+        "payment_method": {"type": "credit_card", "last_four": f"{i % 10000:04d}",
+                           "country_of_issue": rng.choice(COUNTRIES)},
+        "merchant": {"id": f"merch_{i % 300}", "name": f"Merchant {i % 300}",
+                     "category": rng.choice(CATEGORIES)}
+    }))
+
+
+def make_analysis(rng):
+    return json.loads(json.dumps({
+        "risk_score": round(rng.random(), 2),
+        "risk_factors": rng.sample(FACTORS, 2),
+        "reasoning": "The amount is unusual for this merchant category and the card country differs.",
+        "recommended_action": rng.choice(["allow", "review", "block"])
+    }))
+
+
+def measure(store_factory, records):
+    rng = random.Random(42)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    transactions, notifications = store_factory()
+    for i in range(records):
+        # Request payloads are allocated per request; only what the stores keep survives
+        transaction, analysis = make_transaction(i, rng), make_analysis(rng)
+        transactions.append(build_transaction_record(transaction, analysis))
+        notifications.append(build_notification(transaction, analysis))
+    del transaction, analysis
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return retained / records, (transactions, notifications)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=20000)
+    args = parser.parse_args()
+
+    legacy, _ = measure(lambda: ([], []), args.records)
+    compact, _ = measure(lambda: (TransactionHistory(args.records), NotificationHistory(args.records)), args.records)
+
+    print(f"records: {args.records} (each stored as a transaction and a notification)")
+    print(f"list of dicts:   {legacy:8.0f} bytes/record")
+    print(f"compact history: {compact:8.0f} bytes/record")
+    print(f"savings:         {100 * (1 - compact / legacy):7.1f}%")
+
+
+if __name__ == "__main__":
+    main()
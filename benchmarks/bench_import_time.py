@@ -0,0 +1,84 @@
+"""Cold-start benchmark based on ``python -X importtime``.
+
+Runs each module import in a fresh interpreter, parses the importtime report
+and prints the cumulative import cost plus the most expensive dependencies.
+
+Usage:
+    python benchmarks/bench_import_time.py [module ...] [--runs N] [--budget-ms MS]
+
+With --budget-ms the script exits non-zero if the median import time of any
+module exceeds the budget, so it can be used as a regression guard in CI.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODULES = ["risk_core", "Server"]
+
+
+def measure_import(module, top=5):
+    """Import ``module`` in a fresh interpreter.
+
+    Returns the cumulative import time in microseconds, the heaviest direct
+    dependencies as (depth, cumulative_us, name) tuples and the set of every
+    module imported on its behalf.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    )
+    # importtime lists children before their parent, so every entry since the
+    # previous top-level import belongs to the tree of the next top-level one.
+    subtree = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # Format: "import time:  self_us | cumulative_us | <indent>module"
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        if depth == 0 and name == module:
+            total = int(cumulative_us)
+            break
+        if depth == 0:
+            subtree = []
+        else:
+            subtree.append((depth, int(cumulative_us), name))
+    else:
+        raise RuntimeError(f"{module} was not imported (already loaded at startup?)")
+    loaded = {name for _, _, name in subtree}
+    # Direct dependencies of the measured module are reported one level down
+    heaviest = sorted((e for e in subtree if e[0] == 1), key=lambda e: e[1], reverse=True)[:top]
+    return total, heaviest, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    over_budget = False
+    for module in args.modules:
+        samples = []
+        heaviest = []
+        for _ in range(args.runs):
+            total, heaviest, _ = measure_import(module)
+            samples.append(total / 1000.0)
+        median = statistics.median(samples)
+        print(f"{module}: median {median:.1f} ms, min {min(samples):.1f} ms over {args.runs} runs")
+        for _, cumulative, name in heaviest:
+            print(f"    {cumulative / 1000.0:8.1f} ms  {name}")
+        if args.budget_ms is not None and median > args.budget_ms:
+            print(f"    ❌ over budget ({args.budget_ms:.1f} ms)")
+            over_budget = True
+
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
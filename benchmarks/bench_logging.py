@@ -0,0 +1,127 @@
+"""Per-request logging overhead: synchronous f-string logging vs the queued JSON pipeline.
+
+Replays the log calls of one webhook request (received, processing, high
+risk detected, notification sent) many times against a log file, the way
+the server logged before (f-strings formatted eagerly, written by a
+``StreamHandler`` on the request thread) and with ``structured_logging``
+(lazy arguments, queued, formatted as JSON by the listener thread), with and
+without sampling the per-transaction INFO events.  Reports the time spent on
+the request thread and the time until everything is written, once with a
+local file and once with a sink whose writes block (like stderr piped to a
+busy log collector).
+
+Usage:
+    python benchmarks/bench_logging.py [--requests 50000] [--threads 4] [--sink-delay-us 50]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from structured_logging import build_handler, log_context, skip_record_lookups  # noqa: E402
+
+SOURCE_FILE = logging._srcfile
+
+
+def eager_request(logger, transaction_id):
+    logger.info(f"Received transaction: {transaction_id}")
+    logger.info(f"Processing transaction: {transaction_id}")
+    logger.warning(f"HIGH RISK TRANSACTION DETECTED: {transaction_id}")
+    logger.info(f"Notification sent via Socket.IO for transaction: {transaction_id}")
+
+
+def structured_request(logger, transaction_id):
+    with log_context(transaction_id=transaction_id):
+        logger.info("Received transaction: %s", transaction_id, extra={"event": "transaction.received"})
+        logger.info("Processing transaction: %s", transaction_id, extra={"event": "transaction.processing"})
+        logger.warning("HIGH RISK TRANSACTION DETECTED: %s", transaction_id,
+                       extra={"event": "risk.high_risk_detected"})
+        logger.info("Notification sent via Socket.IO for transaction: %s", transaction_id,
+                    extra={"event": "notification.sent"})
+
+
+class SlowSink:
+    """File whose writes block for a while, releasing the GIL as a blocking pipe write does"""
+
+    def __init__(self, stream, delay):
+        self.stream = stream
+        self.delay = delay
+
+    def write(self, text):
+        if self.delay:
+            time.sleep(self.delay)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def run(label, request, handler, listener, path, args):
+    logger = logging.getLogger(f"bench.{label}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    if listener is not None:
+        listener.start()
+    per_thread = args.requests // args.threads
+
+    def worker(worker_id):
+        for i in range(per_thread):
+            request(logger, f"tx_{worker_id}_{i}")
+
+    threads = [threading.Thread(target=worker, args=(worker_id,)) for worker_id in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    on_thread = time.perf_counter() - started
+    if listener is not None:
+        listener.stop()  # Drains the queue
+    handler.flush()
+    written = time.perf_counter() - started
+    logger.removeHandler(handler)
+    requests = per_thread * args.threads
+    lines = sum(1 for _ in open(path))
+    print(f"{label:<34}{on_thread / requests * 1e6:>10.1f}{written / requests * 1e6:>12.1f}{lines:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--sink-delay-us", type=float, default=50, help="Blocking time of each write to the slow sink")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    print(f"{args.requests} requests on {args.threads} threads, 4 log calls each")
+    for delay in (0, args.sink_delay_us):
+        print(f"\n{'local file' if not delay else f'sink blocking {delay:.0f} us per write':<34}"
+              f"{'us/request':>10}{'us/req (all':>12}{'lines':>10}")
+        print(f"{'':<34}{'on thread':>10}{'written)':>12}")
+        logging._srcfile = SOURCE_FILE  # Restore the defaults for the synchronous baseline
+        logging.logProcesses = logging.logMultiprocessing = True
+        path = os.path.join(directory, f"eager_{delay}.log")
+        with open(path, "w") as stream:
+            handler = logging.StreamHandler(SlowSink(stream, delay / 1e6))
+            handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+            run("before: sync f-strings", eager_request, handler, None, path, args)
+
+        skip_record_lookups()  # As LOG_SKIP_RECORD_LOOKUPS=true does
+        for label, rates in (("after: queued JSON", None),
+                             ("after: queued JSON, INFO sampled 10%",
+                              {"transaction.received": 0.1, "transaction.processing": 0.1, "notification.sent": 0.1})):
+            path = os.path.join(directory, f"structured_{delay}_{len(label)}.log")
+            with open(path, "w") as stream:
+                handler, listener = build_handler(queue_size=args.requests * 4, sample_rates=rates,
+                                                  stream=SlowSink(stream, delay / 1e6))
+                run(label, structured_request, handler, listener, path, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""High-value vs bulk scoring latency under load, FIFO vs priority lanes.
+
+A pool of threads floods call_groq_api() with small bulk transactions while
+one thread sends a high-value transaction from a high-risk country at a fixed
+rate.  Model calls go to the local LLM stub and are limited to
+``--concurrency`` slots, first in one FIFO queue and then with the priority
+lanes.
+
+Usage:
+    python benchmarks/bench_priority_lanes.py [--concurrency N] [--bulk-threads N] [--seconds S]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lanes  # noqa: E402
+import Server  # noqa: E402
+from llm_stub import start_stub  # noqa: E402
+
+
+def make_transaction(transaction_id, amount, country):
+    return {
+        "transaction_id": transaction_id,
+        "timestamp": "2025-06-24T12:00:00Z",
+        "amount": amount,
+        "currency": "USD",
+        "customer": {"id": "cust_bench", "country": country, "ip_address": "203.0.113.7"},
+        "payment_method": {"type": "credit_card", "last_four": "4242", "country_of_issue": country},
+        "merchant": {"id": "merch_bench", "name": "Bench Shop", "category": "retail"}
+    }
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else float("nan")
+
+
+def run(args, classify):
+    lanes.classify = classify
+    Server.SCHEDULER = lanes.LaneScheduler(args.concurrency)
+    stop = threading.Event()
+    latencies = {"high": [], "bulk": []}
+
+    def call(lane, transaction):
+        started = time.perf_counter()
+        Server.call_groq_api(transaction)
+        latencies[lane].append((time.perf_counter() - started) * 1000)
+
+    def bulk_worker(worker):
+        i = 0
+        while not stop.is_set():
+            call("bulk", make_transaction(f"tx_bulk_{worker}_{i}", 5.0, "US"))
+            i += 1
+
+    def high_worker():
+        i = 0
+        while not stop.is_set():
+            call("high", make_transaction(f"tx_high_{i}", 25000.0, "RU"))
+            i += 1
+            time.sleep(args.high_interval_ms / 1000.0)
+
+    threads = [threading.Thread(target=bulk_worker, args=(w,)) for w in range(args.bulk_threads)]
+    threads.append(threading.Thread(target=high_worker))
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--bulk-threads", type=int, default=32)
+    parser.add_argument("--high-interval-ms", type=float, default=50)
+    parser.add_argument("--model-ms", type=float, default=40, help="Simulated model latency")
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    server, url = start_stub(first_token_delay=args.model_ms / 1000.0, token_delay=0)
+    Server.create_app()
+    Server.GROQ_API_KEY = "bench"
+    Server.GROQ_API_URL = url
+    Server.GROQ_STREAMING = False
+
+    prioritized = lanes.classify
+    results = {
+        "fifo": run(args, lambda transaction, high_risk_countries=(): "normal"),
+        "lanes": run(args, prioritized),
+    }
+    server.shutdown()
+
+    print(f"{'mode':<8}{'lane':<6}{'requests':>10}{'p50 (ms)':>11}{'p95 (ms)':>11}{'mean (ms)':>11}")
+    for mode, latencies in results.items():
+        for lane, values in latencies.items():
+            print(f"{mode:<8}{lane:<6}{len(values):>10}{percentile(values, 0.5):>11.1f}"
+                  f"{percentile(values, 0.95):>11.1f}{statistics.fmean(values) if values else float('nan'):>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
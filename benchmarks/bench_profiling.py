@@ -0,0 +1,107 @@
+"""Overhead of the slow-request capture and of the sampling profiler.
+
+Sends webhook requests through the Flask app (the model answered by the
+local LLM stub) in interleaved rounds with the stage timing disabled, with
+it enabled but idle (a threshold no request reaches), and while a profile
+is being sampled, and reports the median per-request latency of each.  The
+cost of the stage timing alone is also measured in isolation, since it is
+far below the run-to-run noise of whole requests.
+
+Usage:
+    python benchmarks/bench_profiling.py [--requests 300] [--rounds 7]
+"""
+import argparse
+import base64
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Server  # noqa: E402
+from llm_stub import start_stub  # noqa: E402
+from profiling import SamplingProfiler, SlowRequestLog, stage  # noqa: E402
+
+HEADERS = {"Authorization": "Basic " + base64.b64encode(b"admin:secret123").decode()}
+
+
+def make_transaction(i):
+    return {
+        "transaction_id": f"tx_bench_{i}",
+        "timestamp": "2025-06-24T12:00:00Z",
+        "amount": 250.0,
+        "currency": "USD",
+        "customer": {"id": f"cust_{i % 500}", "country": "US", "ip_address": f"203.0.113.{i % 250}"},
+        "payment_method": {"type": "credit_card", "last_four": f"{i % 9999:04d}", "country_of_issue": "US"},
+        "merchant": {"id": f"merch_{i % 50}", "name": "Bench Store", "category": "retail"}
+    }
+
+
+def run(client, count, offset):
+    started = time.perf_counter()
+    for i in range(count):
+        response = client.post('/webhook', json=make_transaction(offset + i), headers=HEADERS)
+        assert response.status_code == 200, response.data
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def instrumentation_cost(iterations=100000):
+    """Per-request cost of the timeline: start, the webhook's six stages and finish, in microseconds"""
+    log = SlowRequestLog(threshold_ms=60000)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        log.start()
+        for name in ("parse", "validate", "model", "rules_and_notify", "record", "serialize"):
+            with stage(name):
+                pass
+        log.finish("POST", "/webhook", 200)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300, help="Requests per round and mode")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--interval-ms", type=float, default=10, help="Profiler sampling interval")
+    args = parser.parse_args()
+
+    _, url = start_stub(first_token_delay=0, token_delay=0)
+    app = Server.create_app()
+    logging.disable(logging.CRITICAL)
+    Server.GROQ_API_KEY = "bench"
+    Server.GROQ_API_URL = url
+    client = app.test_client()
+    run(client, args.requests, 0)  # Warm up
+
+    results = {"capture disabled": [], "capture enabled (idle)": [], "while profiling": []}
+    offset = args.requests
+    for _ in range(args.rounds):
+        for mode in results:
+            Server.SLOW_REQUESTS.threshold_ms = None if mode == "capture disabled" else 60000
+            profiler = None
+            if mode == "while profiling":
+                # Long enough to cover the round; joined (waiting out the rest) before the next mode
+                seconds = 2 * results["capture disabled"][-1] * args.requests / 1e6 + 0.1
+                profiler = threading.Thread(target=SamplingProfiler().profile,
+                                            args=(seconds, args.interval_ms / 1000))
+                profiler.start()
+            results[mode].append(run(client, args.requests, offset))
+            offset += args.requests
+            if profiler is not None:
+                profiler.join()
+
+    baseline = statistics.median(results["capture disabled"])
+    print(f"{args.requests} webhook requests x {args.rounds} rounds per mode (median per request)")
+    for mode, samples in results.items():
+        median = statistics.median(samples)
+        print(f"  {mode:<24}{median:>9.1f} us  {(median / baseline - 1) * 100:+6.2f}%")
+    cost = instrumentation_cost()
+    print(f"stage timing alone: {cost:.2f} us per request ({cost / baseline * 100:.3f}% of a request; "
+          f"end-to-end differences above are mostly run-to-run noise)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Replay throughput benchmark.
+
+Builds a synthetic corpus (recorded transactions with their model responses)
+in memory and replays it serially and across worker processes.
+
+Usage:
+    python benchmarks/bench_replay.py [--cases N] [--workers N]
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from replay import run_replay  # noqa: E402
+from risk_config import RiskConfig  # noqa: E402
+from risk_core import build_optimized_groq_prompt  # noqa: E402
+
+COUNTRIES = ["US", "GB", "DE", "FR", "RU", "IR", "BR", "IN"]
+ACTIONS = ["allow", "review", "block"]
+
+
+def make_case(i, rng, config):
+    transaction = {
+        "transaction_id": f"tx_{i:08d}",
+        "timestamp": "2025-06-24T12:00:00Z",
+        "amount": round(rng.uniform(1, 5000), 2),
+        "currency": "USD",
+        "customer": {"id": f"cust_{i % 5000}", "country": rng.choice(COUNTRIES), "ip_address": "10.0.0.1"},
+        "payment_method": {"type": "credit_card", "last_four": "1234", "country_of_issue": rng.choice(COUNTRIES)},
+        "merchant": {"id": f"merch_{i % 300}", "name": f"Merchant {i % 300}", "category": "retail"}
+    }
+    score = round(rng.random(), 2)
+    action = rng.choice(ACTIONS)
+    return {
+        "transaction": transaction,
+        "features": None,
+        "prompt": build_optimized_groq_prompt(transaction, None, config),
+        "llm_content": f'{{"risk_score": {score}, "risk_factors": ["synthetic"], '
+                       f'"reasoning": "synthetic case", "recommended_action": "{action}"}}',
+        "decision": {"risk_score": score, "recommended_action": action}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    config = RiskConfig()
+    rng = random.Random(42)
+    cases = [make_case(i, rng, config) for i in range(args.cases)]
+
+    for workers in sorted({1, args.workers}):
+        report = run_replay(cases, config, workers=workers)
+        print(f"{workers:>3} workers: {report['cases']} cases in {report['elapsed_seconds']:.2f}s "
+              f"({report['cases_per_second']:.0f} cases/s)")
+
+
+if __name__ == "__main__":
+    main()
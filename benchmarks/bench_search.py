@@ -0,0 +1,98 @@
+"""Search latency of the inverted index vs scanning the history.
+
+Indexes synthetic transactions with realistic risk factors, reasoning text
+and merchants, then times boolean queries of varying selectivity against
+the index and against the current workflow of scanning every record's risk
+factors and reasoning in Python.  Also reports the indexing throughput.
+
+Usage:
+    python benchmarks/bench_search.py [--documents 1000000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_index import SearchIndex  # noqa: E402
+
+FACTORS = [
+    "IP address mismatch", "High-risk country: RU", "Unusual amount for customer", "Velocity above threshold",
+    "Card used by 4 customers", "New device", "Billing and shipping country differ", "Amount above the 99th "
+    "percentile for merchant category crypto (percentile 99.6 of 320 transactions)"
+]
+WORDS = ("customer merchant purchase pattern unusual typical history device location amount velocity "
+         "country card billing shipping recent account verified consistent elevated suspicious").split()
+CATEGORIES = ["electronics", "retail", "travel", "gambling", "crypto", "grocery"]
+
+
+def make_record(i, rng):
+    factors = rng.sample(FACTORS, rng.choice([0, 0, 1, 1, 2, 3]))
+    return {
+        "transaction_id": f"tx_{i:08d}",
+        "timestamp": f"2025-06-{1 + i * 30 // 1000000 % 30:02d}T12:00:00Z",
+        "merchant": {"id": f"merch_{i % 5000}", "name": f"{rng.choice(CATEGORIES).title()} Store {i % 5000}"},
+        "risk_analysis": {
+            "risk_score": round(rng.random(), 2),
+            "risk_factors": factors,
+            "reasoning": " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20)))
+        }
+    }
+
+
+def scan(records, query):
+    """The client-side grep the index replaces"""
+    return [record["transaction_id"] for record in reversed(records) if query(record)]
+
+
+def timed(func, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=1000000)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    records = [make_record(i, rng) for i in range(args.documents)]
+    index = SearchIndex(max_documents=args.documents)
+    started = time.perf_counter()
+    for record in records:
+        index.add(record)
+    elapsed = time.perf_counter() - started
+    print(f"indexed {args.documents} documents in {elapsed:.1f}s ({args.documents / elapsed:.0f}/s), "
+          f"{index.stats()['terms']} terms")
+
+    def factors(record):
+        return " ".join(record["risk_analysis"]["risk_factors"]).lower()
+
+    week = (1748736000 + 7 * 86400, 1748736000 + 14 * 86400)
+    queries = [
+        ("merchant:merch_42", {}, lambda r: r["merchant"]["id"] == "merch_42"),
+        ('factor:"ip mismatch" this week', dict(start=week[0], end=week[1]),
+         lambda r: "ip address mismatch" in factors(r) and "2025-06-08" <= r["timestamp"][:10] < "2025-06-15"),
+        ("factor:crypto suspicious", {},
+         lambda r: "crypto" in factors(r) and "suspicious" in r["risk_analysis"]["reasoning"]),
+        ("velocity -factor:velocity min_score=0.9", dict(min_score=0.9),
+         lambda r: "velocity" in r["risk_analysis"]["reasoning"] and "velocity" not in factors(r)
+         and r["risk_analysis"]["risk_score"] >= 0.9),
+        ("factor:ru OR factor:device", {}, lambda r: "ru" in factors(r).split() or "device" in factors(r))
+    ]
+    print(f"{'query':<42}{'matches':>9}{'index ms':>10}{'scan ms':>10}")
+    for label, filters, predicate in queries:
+        query = label.split(" this week")[0].split(" min_score")[0]
+        index_time, result = timed(lambda: index.search(query, limit=50, **filters))
+        scan_time, _ = timed(lambda: scan(records, predicate), repeat=1)
+        print(f"{label:<42}{result['total']:>9}{index_time * 1000:>10.1f}{scan_time * 1000:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
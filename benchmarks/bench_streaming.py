@@ -0,0 +1,70 @@
+"""Time-to-decision benchmark: streamed vs non-streamed GROQ completions.
+
+Runs call_groq_api() against the local LLM stub in both modes and reports the
+latency until a risk decision is available, plus (for streaming) the time
+until the reasoning has been filled in by the background reader.
+
+Usage:
+    python benchmarks/bench_streaming.py [--runs N] [--token-delay-ms MS]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Server  # noqa: E402
+from llm_stub import start_stub  # noqa: E402
+
+TRANSACTION = {
+    "transaction_id": "tx_bench_stream",
+    "timestamp": "2025-06-24T12:00:00Z",
+    "amount": 2500.0,
+    "currency": "USD",
+    "customer": {"id": "cust_bench", "country": "US", "ip_address": "203.0.113.7"},
+    "payment_method": {"type": "credit_card", "last_four": "4242", "country_of_issue": "GB"},
+    "merchant": {"id": "merch_bench", "name": "Bench Electronics", "category": "electronics"}
+}
+
+
+def run(streaming, runs):
+    Server.GROQ_STREAMING = streaming
+    decision_ms, complete_ms = [], []
+    for _ in range(runs):
+        started = time.perf_counter()
+        analysis = Server.call_groq_api(dict(TRANSACTION))
+        decision_ms.append((time.perf_counter() - started) * 1000)
+        assert analysis["recommended_action"] == "block", analysis
+        while analysis.get("analysis_status") == "partial":
+            time.sleep(0.001)
+        complete_ms.append((time.perf_counter() - started) * 1000)
+    return statistics.median(decision_ms), statistics.median(complete_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--first-token-delay-ms", type=float, default=50)
+    parser.add_argument("--token-delay-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    server, url = start_stub(first_token_delay=args.first_token_delay_ms / 1000.0,
+                             token_delay=args.token_delay_ms / 1000.0)
+    Server.create_app()
+    Server.GROQ_API_KEY = "bench"
+    Server.GROQ_API_URL = url
+
+    blocking = run(False, args.runs)
+    streamed = run(True, args.runs)
+    server.shutdown()
+
+    print(f"{'mode':<12}{'decision (ms)':>16}{'complete (ms)':>16}")
+    print(f"{'blocking':<12}{blocking[0]:>16.1f}{blocking[1]:>16.1f}")
+    print(f"{'streaming':<12}{streamed[0]:>16.1f}{streamed[1]:>16.1f}")
+    print(f"time-to-decision speedup: {blocking[0] / streamed[0]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
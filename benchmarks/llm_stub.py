@@ -0,0 +1,130 @@
+"""Local stand-in for the GROQ chat-completions endpoint.
+
+Serves a fixed risk analysis either as a single JSON completion or as an SSE
+stream, with a configurable time-to-first-token and per-token delay, so
+benchmarks can exercise the real HTTP client code without network access.
+Batched prompts (see risk_core.build_batch_groq_prompt) are answered with one
+result per transaction, so longer batches take proportionally longer to
+generate.
+
+Usage:
+    python benchmarks/llm_stub.py --port 8090 --token-delay-ms 20
+
+and point the server at it with GROQ_API_URL=http://127.0.0.1:8090/openai/v1/chat/completions.
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_CONTENT = json.dumps({
+    "risk_score": 0.82,
+    "recommended_action": "block",
+    "risk_factors": ["High amount for merchant category", "IP country differs from card country"],
+    "reasoning": (
+        "The amount is far above what is typical for this merchant category, the card was issued "
+        "in a different country than the customer's IP address suggests, and the merchant category "
+        "has elevated chargeback rates. Together these signals indicate a likely fraudulent purchase "
+        "that should be blocked pending manual verification by the risk team."
+    )
+})
+
+
+_TRANSACTION_ID = re.compile(r'"transaction_id": "([^"]+)"')
+
+
+def batch_content(prompt_text, content):
+    """Answer a batched prompt with ``content`` repeated for every transaction"""
+    analysis = json.loads(content)
+    transaction_ids = list(dict.fromkeys(_TRANSACTION_ID.findall(prompt_text.split("Respond ONLY")[0])))
+    return json.dumps({"results": [dict(analysis, transaction_id=i) for i in transaction_ids]})
+
+
+def split_tokens(content, size=4):
+    """Split content into roughly token-sized chunks"""
+    return [content[i:i + size] for i in range(0, len(content), size)]
+
+
+class StubConfig:
+    """Timing knobs shared by all request handlers"""
+
+    def __init__(self, first_token_delay=0.05, token_delay=0.01, content=DEFAULT_CONTENT):
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.content = content
+
+
+def make_handler(config):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            prompt_text = (request.get("messages") or [{}])[0].get("content", "")
+            content = batch_content(prompt_text, config.content) if '"results"' in prompt_text else config.content
+            tokens = split_tokens(content)
+            time.sleep(config.first_token_delay)
+
+            if not request.get("stream"):
+                # Non-streamed completions arrive only once generation is finished
+                time.sleep(config.token_delay * len(tokens))
+                body = json.dumps({"choices": [{"message": {"role": "assistant", "content": content}}]}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for token in tokens:
+                chunk = {"choices": [{"delta": {"content": token}}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(config.token_delay)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+
+    return StubHandler
+
+
+class StubServer(ThreadingHTTPServer):
+    """Thread-per-connection server with a deep listen backlog"""
+    daemon_threads = True
+    request_queue_size = 4096  # Accept bursts of thousands of concurrent connections
+
+
+def start_stub(port=0, **kwargs):
+    """Start the stub in a daemon thread; returns (server, url)"""
+    server = StubServer(("127.0.0.1", port), make_handler(StubConfig(**kwargs)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/openai/v1/chat/completions"
+    return server, url
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--first-token-delay-ms", type=float, default=50)
+    parser.add_argument("--token-delay-ms", type=float, default=10)
+    args = parser.parse_args()
+    server = StubServer(("127.0.0.1", args.port), make_handler(StubConfig(
+        first_token_delay=args.first_token_delay_ms / 1000.0,
+        token_delay=args.token_delay_ms / 1000.0
+    )))
+    print(f"LLM stub listening on http://127.0.0.1:{args.port}/openai/v1/chat/completions")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
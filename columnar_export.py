@@ -0,0 +1,402 @@
+"""Columnar archive of processed transactions for analytics.
+
+The server (with ``COLUMNAR_EXPORT_DIR``) hands each processed transaction to
+``ColumnarExporter``; request threads only flatten the record into a row and
+queue it, and a background thread writes batches as Parquet (or Arrow IPC)
+files partitioned by transaction date::
+
+    <dir>/date=2025-06-24/part-<first recorded_at>-<seq>.parquet
+
+Files are written under a temporary name and renamed, so readers never see a
+partial file.  Analysis updates (streamed completions, re-scored outage
+decisions) are appended as new rows of the same transaction; queries keep the
+latest row per transaction (by ``recorded_at``) unless ``latest=False``.
+
+Queries read the files directly, memory-mapped, with the time range, action
+and country filters pushed down to partition pruning and row-group
+statistics::
+
+    python columnar_export.py query archive/ --start 2025-06-01 --end 2025-07-01 --action block --country RU
+    python columnar_export.py backfill audit/ archive/
+
+Requires the optional ``pyarrow`` package.
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+_STOP = object()
+
+# Column name, pyarrow type name; see _schema()
+COLUMNS = [
+    ("transaction_id", "string"),
+    ("timestamp", "timestamp"),
+    ("amount", "float64"),
+    ("currency", "string"),
+    ("customer_id", "string"),
+    ("customer_country", "string"),
+    ("ip_address", "string"),
+    ("payment_type", "string"),
+    ("card_last_four", "string"),
+    ("card_country", "string"),
+    ("merchant_id", "string"),
+    ("merchant_name", "string"),
+    ("merchant_category", "string"),
+    ("risk_score", "float64"),
+    ("recommended_action", "string"),
+    ("risk_factors", "list"),
+    ("reasoning", "string"),
+    ("analysis_status", "string"),
+    ("config_version", "int64"),
+    ("flagged", "bool"),
+    ("recorded_at", "timestamp")
+]
+_schema_cache = []
+
+
+def _schema():
+    if not _schema_cache:
+        import pyarrow as pa
+
+        types = {
+            "string": pa.string(),
+            "float64": pa.float64(),
+            "int64": pa.int64(),
+            "bool": pa.bool_(),
+            "timestamp": pa.timestamp("us", tz="UTC"),
+            "list": pa.list_(pa.string())
+        }
+        _schema_cache.append(pa.schema([(name, types[kind]) for name, kind in COLUMNS]))
+    return _schema_cache[0]
+
+
+def _text(value):
+    return None if value is None else str(value)
+
+
+def _number(value, kind=float):
+    try:
+        return None if value is None else kind(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_time(value):
+    """Aware UTC datetime from an ISO-8601 string, or None"""
+    if not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value[:-1] + "+00:00" if value.endswith("Z") else value)
+    except ValueError:
+        return None
+    return parsed.replace(tzinfo=timezone.utc) if parsed.tzinfo is None else parsed.astimezone(timezone.utc)
+
+
+def flatten(record, flagged=False, recorded_at=None):
+    """One archive row (a dict keyed by ``COLUMNS``) from a stored transaction record"""
+    recorded = datetime.fromtimestamp(time.time() if recorded_at is None else recorded_at, timezone.utc)
+    analysis = record.get("risk_analysis") or {}
+    customer = record.get("customer") or {}
+    payment = record.get("payment_method") or {}
+    merchant = record.get("merchant") or {}
+    factors = analysis.get("risk_factors")
+    return {
+        "transaction_id": _text(record.get("transaction_id")),
+        "timestamp": _parse_time(record.get("timestamp")) or recorded,
+        "amount": _number(record.get("amount")),
+        "currency": _text(record.get("currency")),
+        "customer_id": _text(customer.get("id")),
+        "customer_country": _text(customer.get("country")),
+        "ip_address": _text(customer.get("ip_address")),
+        "payment_type": _text(payment.get("type")),
+        "card_last_four": _text(payment.get("last_four")),
+        "card_country": _text(payment.get("country_of_issue")),
+        "merchant_id": _text(merchant.get("id")),
+        "merchant_name": _text(merchant.get("name")),
+        "merchant_category": _text(merchant.get("category")),
+        "risk_score": _number(analysis.get("risk_score")),
+        "recommended_action": _text(analysis.get("recommended_action")),
+        "risk_factors": [str(factor) for factor in factors] if isinstance(factors, list) else None,
+        "reasoning": _text(analysis.get("reasoning")),
+        "analysis_status": _text(analysis.get("analysis_status")),
+        "config_version": _number(analysis.get("config_version"), int),
+        "flagged": bool(flagged),
+        "recorded_at": recorded
+    }
+
+
+def write_partitions(directory, rows, file_format="parquet", sequence=0):
+    """Write rows as one file per date partition; returns the paths written"""
+    import pyarrow as pa
+
+    partitions = defaultdict(list)
+    for row in rows:
+        partitions[row["timestamp"].strftime("%Y-%m-%d")].append(row)
+    stamp = min(row["recorded_at"] for row in rows).strftime("%Y%m%dT%H%M%S%f")
+    paths = []
+    for date, partition_rows in sorted(partitions.items()):
+        table = pa.Table.from_pylist(partition_rows, schema=_schema())
+        partition_dir = os.path.join(directory, f"date={date}")
+        os.makedirs(partition_dir, exist_ok=True)
+        path = os.path.join(partition_dir, f"part-{stamp}-{sequence:06d}{FORMATS[file_format]}")
+        temporary = os.path.join(partition_dir, f".{os.path.basename(path)}.tmp")  # Hidden from readers
+        if file_format == "parquet":
+            import pyarrow.parquet as pq
+
+            pq.write_table(table, temporary, compression="zstd", row_group_size=64 * 1024)
+        else:
+            import pyarrow.ipc as ipc
+
+            # Uncompressed, so readers can memory-map the columns without copying
+            with pa.OSFile(temporary, "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table, max_chunksize=64 * 1024)
+        os.replace(temporary, path)
+        paths.append(path)
+    return paths
+
+
+class ColumnarExporter:
+    """Write-behind exporter of processed transactions to the columnar archive"""
+
+    def __init__(self, directory, file_format="parquet", flush_records=100000, flush_interval=60.0,
+                 buffer_size=200000):
+        if file_format not in FORMATS:
+            raise ValueError(f"Unknown columnar export format: {file_format}")
+        import pyarrow  # noqa: F401  Fail at startup rather than on the first flush
+
+        self.directory = directory
+        self.file_format = file_format
+        self.flush_records = flush_records
+        self.flush_interval = flush_interval
+        self._buffer = queue.Queue(maxsize=buffer_size)
+        self._sequence = 0
+        os.makedirs(directory, exist_ok=True)
+        self._writer = threading.Thread(target=self._run, name="columnar-exporter", daemon=True)
+        self._writer.start()
+
+    def add(self, record, flagged=False):
+        """Queue a transaction record (flattened now, so later in-place changes are not exported)"""
+        try:
+            self._buffer.put_nowait(flatten(record, flagged))
+        except queue.Full:
+            METRICS.increment("columnar_export.dropped")  # The archive must never slow down scoring
+            return
+        METRICS.increment("columnar_export.queued")
+
+    def flush(self, timeout=30.0):
+        """Block until everything added so far has been written"""
+        done = threading.Event()
+        self._buffer.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        """Write pending rows and stop the writer thread"""
+        if self._writer.is_alive():
+            self._buffer.put(_STOP)
+            self._writer.join()
+
+    def _run(self):
+        rows = []
+        waiters = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._buffer.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            stop = item is _STOP
+            if isinstance(item, threading.Event):
+                waiters.append(item)
+            elif isinstance(item, dict):
+                rows.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            if rows and (item is None or stop or waiters or len(rows) >= self.flush_records):
+                self._write(rows)
+                rows = []
+                deadline = None
+            for waiter in waiters:
+                waiter.set()
+            waiters = []
+            if stop:
+                return
+
+    def _write(self, rows):
+        started = time.perf_counter()
+        self._sequence += 1
+        try:
+            write_partitions(self.directory, rows, self.file_format, self._sequence)
+        except Exception as e:
+            METRICS.increment("columnar_export.write_errors")
+            logger.error("Columnar export failed, %d rows lost: %s", len(rows), e, extra={"event": "export.failed"})
+            return
+        METRICS.increment("columnar_export.rows", len(rows))
+        METRICS.observe("columnar_export.flush_ms", (time.perf_counter() - started) * 1000)
+
+
+def open_dataset(directory):
+    """The archive as a memory-mapped, date-partitioned pyarrow dataset
+
+    An archive written in both formats (e.g. after changing
+    ``COLUMNAR_EXPORT_FORMAT``) is read as the union of one dataset per format.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+
+    paths = {file_format: [] for file_format in FORMATS}
+    for root, dirs, names in os.walk(directory):
+        dirs[:] = sorted(name for name in dirs if not name.startswith((".", "_")))
+        for name in sorted(names):
+            for file_format, extension in FORMATS.items():
+                if name.endswith(extension) and not name.startswith((".", "_")):
+                    paths[file_format].append(os.path.join(root, name))
+    schema = _schema().append(pa.field("date", pa.string()))
+    partitioning = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+    filesystem = fs.LocalFileSystem(use_mmap=True)
+    datasets = [
+        ds.dataset(files, format="ipc" if file_format == "arrow" else "parquet", partitioning=partitioning,
+                   partition_base_dir=directory, schema=schema, filesystem=filesystem,
+                   exclude_invalid_files=False)
+        for file_format, files in paths.items() if files
+    ]
+    if not datasets:
+        return ds.dataset([], format="parquet", schema=schema, filesystem=filesystem)
+    return datasets[0] if len(datasets) == 1 else ds.dataset(datasets)
+
+
+def build_filter(start=None, end=None, action=None, country=None):
+    """Dataset filter for ``start <= timestamp < end``, the recommended action and the customer country"""
+    import pyarrow.dataset as ds
+
+    conditions = []
+    if start is not None:
+        conditions += [ds.field("date") >= start.strftime("%Y-%m-%d"), ds.field("timestamp") >= start]
+    if end is not None:
+        conditions += [ds.field("date") <= end.strftime("%Y-%m-%d"), ds.field("timestamp") < end]
+    if action is not None:
+        conditions.append(ds.field("recommended_action") == action)
+    if country is not None:
+        conditions.append(ds.field("customer_country") == country)
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def query(directory, start=None, end=None, action=None, country=None, columns=None, latest=True):
+    """Matching archive rows as a pyarrow Table.
+
+    With ``latest`` (the default) a transaction matches on its most recent
+    analysis only: rows superseded by a later update are dropped even when the
+    update itself does not match the filter.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    dataset = open_dataset(directory)
+    columns = list(columns) if columns else [name for name, _ in COLUMNS]
+    if not latest:
+        return dataset.to_table(columns=columns, filter=build_filter(start, end, action, country))
+
+    # Latest recorded_at of every transaction with more than one row in the time range
+    keys = dataset.to_table(columns=["transaction_id", "recorded_at"], filter=build_filter(start, end))
+    counts = keys.group_by("transaction_id").aggregate([("recorded_at", "count"), ("recorded_at", "max")])
+    revised = counts.filter(pc.greater(counts["recorded_at_count"], 1))
+    scan_columns = columns + [name for name in ("transaction_id", "recorded_at") if name not in columns]
+    table = dataset.to_table(columns=scan_columns, filter=build_filter(start, end, action, country))
+    if revised.num_rows:
+        latest_at = dict(zip(revised["transaction_id"].to_pylist(), revised["recorded_at_max"].to_pylist()))
+        ids, recorded = table["transaction_id"].to_pylist(), table["recorded_at"]
+        keep = pc.invert(pc.is_in(table["transaction_id"], value_set=revised["transaction_id"]))
+        mask = keep.to_pylist()
+        for i in pc.indices_nonzero(pc.invert(keep)).to_pylist():
+            mask[i] = recorded[i].as_py() == latest_at[ids[i]]
+        table = table.filter(pa.array(mask))
+    return table.select(columns)
+
+
+def backfill(audit_directory, directory, file_format="parquet", batch_rows=100000):
+    """Export the transactions of an audit log (with their latest updates) to the archive"""
+    from audit_log import replay
+
+    records, updates, flagged = {}, [], set()
+    for entry in replay(audit_directory):
+        kind, data = entry["kind"], entry["data"]
+        if kind == "transaction":
+            records[data.get("transaction_id")] = (data, entry.get("ts"))
+        elif kind == "notification":
+            flagged.add(data.get("transaction_id"))
+        elif kind == "transaction_update" and data.get("transaction_id") in records:
+            updates.append((data, entry.get("ts")))
+    rows = [flatten(record, transaction_id in flagged, ts) for transaction_id, (record, ts) in records.items()]
+    for update, ts in updates:
+        record, _ = records[update["transaction_id"]]
+        rows.append(flatten(dict(record, risk_analysis=update["risk_analysis"]),
+                            update["transaction_id"] in flagged, ts))
+    for sequence, offset in enumerate(range(0, len(rows), batch_rows)):
+        write_partitions(directory, rows[offset:offset + batch_rows], file_format, sequence)
+    return len(rows)
+
+
+def _timestamp(value):
+    parsed = _parse_time(value)
+    if parsed is None:
+        raise argparse.ArgumentTypeError(f"not an ISO-8601 date or time: {value}")
+    return parsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query or build the columnar transaction archive")
+    commands = parser.add_subparsers(dest="command", required=True)
+    query_parser = commands.add_parser("query", help="Filter archived transactions")
+    query_parser.add_argument("archive", help="Archive directory (COLUMNAR_EXPORT_DIR of the server)")
+    query_parser.add_argument("--start", type=_timestamp, help="Earliest transaction timestamp (inclusive)")
+    query_parser.add_argument("--end", type=_timestamp, help="Latest transaction timestamp (exclusive)")
+    query_parser.add_argument("--action", choices=["allow", "review", "block"])
+    query_parser.add_argument("--country", help="Customer country")
+    query_parser.add_argument("--columns", help="Comma-separated columns to output (default: all)")
+    query_parser.add_argument("--limit", type=int, default=20, help="Rows to print (default 20, 0 for all)")
+    query_parser.add_argument("--count", action="store_true", help="Only print the number of matching rows")
+    query_parser.add_argument("--all-revisions", action="store_true",
+                              help="Include rows superseded by later analysis updates")
+    backfill_parser = commands.add_parser("backfill", help="Export the transactions of an audit log")
+    backfill_parser.add_argument("audit_log", help="Audit log directory (AUDIT_LOG_DIR)")
+    backfill_parser.add_argument("archive", help="Archive directory to write")
+    backfill_parser.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    if args.command == "backfill":
+        rows = backfill(args.audit_log, args.archive, args.format)
+        print(f"Exported {rows} rows in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+        return 0
+
+    columns = args.columns.split(",") if args.columns else None
+    table = query(args.archive, args.start, args.end, args.action, args.country, columns,
+                  latest=not args.all_revisions)
+    print(f"{table.num_rows} rows in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+    if args.count:
+        print(table.num_rows)
+        return 0
+    rows = table.slice(0, args.limit) if args.limit else table
+    for row in rows.to_pylist():
+        print(json.dumps(row, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""Entity link index: customers connected through shared IP addresses and cards.
+
+Every processed transaction links its customer to its IP address and to its
+card fingerprint (``last_four`` plus ``country_of_issue``); connected
+entities form a cluster, kept with a union-find (union by size, path
+halving), so the cluster of a new transaction is found in near-constant time
+during scoring.  Merchants are not linked through (one popular merchant would
+join all of its customers) but are counted per cluster.
+
+Union-find cannot forget a link, so decay is by generations: two overlapping
+generations are fed the same links, a new one is started every half
+``window_seconds``, and the older one answers queries.  A link therefore
+stays visible for at least half a window and at most a full window after it
+was last seen.  A generation is also rotated early when it reaches half of
+``max_entities``, which bounds memory.
+"""
+import heapq
+import threading
+import time
+from datetime import datetime, timezone
+
+KINDS = ("customer", "ip", "card")
+MAX_MERCHANTS = 100  # Distinct merchants counted per cluster
+MAX_MEMBERS = 20  # Members of each kind listed per cluster by clusters()
+
+
+class _Cluster:
+    __slots__ = ("counts", "members", "merchants", "transactions", "last_seen")
+
+    def __init__(self, node):
+        self.counts = {kind: 0 for kind in KINDS}
+        self.counts[node[0]] = 1
+        self.members = [node]
+        self.merchants = set()
+        self.transactions = 0
+        self.last_seen = 0.0
+
+    def absorb(self, other):
+        for kind in KINDS:
+            self.counts[kind] += other.counts[kind]
+        self.members.extend(other.members)
+        if len(self.merchants) < MAX_MERCHANTS:
+            self.merchants.update(list(other.merchants)[:MAX_MERCHANTS - len(self.merchants)])
+        self.transactions += other.transactions
+        self.last_seen = max(self.last_seen, other.last_seen)
+
+    @property
+    def size(self):
+        return len(self.members)
+
+
+class _Generation:
+    """Union-find over the links seen since ``started``"""
+
+    def __init__(self, started):
+        self.started = started
+        self.parent = {}
+        self.clusters = {}  # root -> _Cluster
+        self.links = set()  # (customer, ip or card)
+        self.customers = {}  # ip or card node -> distinct customers linked to it
+
+    def __len__(self):
+        return len(self.parent) + len(self.links)
+
+    def find(self, node):
+        parent = self.parent
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return a
+        if self.clusters[a].size < self.clusters[b].size:
+            a, b = b, a
+        self.parent[b] = a
+        self.clusters[a].absorb(self.clusters.pop(b))
+        return a
+
+    def add(self, customer, others, merchant, at):
+        for node in (customer, *others):
+            if node not in self.parent:
+                self.parent[node] = node
+                self.clusters[node] = _Cluster(node)
+        root = self.find(customer)
+        for other in others:
+            if (customer, other) not in self.links:
+                self.links.add((customer, other))
+                self.customers[other] = self.customers.get(other, 0) + 1
+            root = self.union(root, other)
+        cluster = self.clusters[root]
+        cluster.transactions += 1
+        cluster.last_seen = max(cluster.last_seen, at)
+        if merchant is not None and len(cluster.merchants) < MAX_MERCHANTS:
+            cluster.merchants.add(merchant)
+
+
+def _nodes(transaction):
+    """(customer node, [ip node, card node], merchant id) of a transaction"""
+    customer = transaction.get("customer") or {}
+    payment = transaction.get("payment_method") or {}
+    customer_id = customer.get("id")
+    if customer_id is None:
+        return None, [], None
+    others = []
+    if customer.get("ip_address"):
+        others.append(("ip", customer["ip_address"]))
+    if payment.get("last_four"):
+        others.append(("card", f"{payment['last_four']}:{payment.get('country_of_issue') or ''}"))
+    return ("customer", customer_id), others, (transaction.get("merchant") or {}).get("id")
+
+
+class EntityLinks:
+    """Incremental, decaying index of customers linked through shared IPs and cards"""
+
+    def __init__(self, max_entities=200000, window_seconds=7 * 24 * 3600):
+        self.max_entities = max_entities
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._generations = []  # Oldest first; the oldest answers queries
+
+    def _rotate(self, at):
+        generations = self._generations
+        newest = generations[-1] if generations else None
+        if newest is None or at - newest.started >= self.window_seconds / 2 or \
+                len(newest) >= self.max_entities / 2:
+            generations.append(_Generation(at))
+            if len(generations) > 2:
+                generations.pop(0)
+
+    def observe(self, transaction, at=None):
+        """Add the links of a processed transaction"""
+        if self.max_entities <= 0:
+            return
+        customer, others, merchant = _nodes(transaction)
+        if customer is None:
+            return
+        at = time.time() if at is None else at
+        with self._lock:
+            self._rotate(at)
+            for generation in self._generations:
+                generation.add(customer, others, merchant, at)
+
+    def features(self, transaction):
+        """Size of the cluster the transaction belongs to (or would join), if it links several customers"""
+        customer, others, _ = _nodes(transaction)
+        if customer is None:
+            return {}
+        with self._lock:
+            if not self._generations:
+                return {}
+            generation = self._generations[0]
+            parent = generation.parent
+            roots = {generation.find(node) for node in (customer, *others) if node in parent}
+            counts = {kind: 0 for kind in KINDS}
+            for root in roots:
+                for kind in KINDS:
+                    counts[kind] += generation.clusters[root].counts[kind]
+            for node in (customer, *others):
+                if node not in parent:
+                    counts[node[0]] += 1
+            if counts["customer"] < 2:
+                return {}
+            features = {
+                "linked_customers": counts["customer"],
+                "linked_ips": counts["ip"],
+                "linked_cards": counts["card"]
+            }
+            for other in others:
+                shared = generation.customers.get(other, 0) + ((customer, other) not in generation.links)
+                features[f"{other[0]}_customers"] = shared
+            return features
+
+    def clusters(self, top=10, min_customers=2):
+        """The ``top`` clusters with the most customers"""
+        with self._lock:
+            if not self._generations:
+                return []
+            candidates = (cluster for cluster in self._generations[0].clusters.values()
+                          if cluster.counts["customer"] >= min_customers)
+            largest = heapq.nlargest(top, candidates, key=lambda c: (c.counts["customer"], c.transactions))
+            return [{
+                "customers": cluster.counts["customer"],
+                "ips": cluster.counts["ip"],
+                "cards": cluster.counts["card"],
+                "merchants": len(cluster.merchants),
+                "transactions": cluster.transactions,
+                "last_seen": datetime.fromtimestamp(cluster.last_seen, timezone.utc).isoformat().replace("+00:00", "Z"),
+                "members": {kind: [node[1] for node in cluster.members if node[0] == kind][:MAX_MEMBERS]
+                            for kind in KINDS}
+            } for cluster in largest]
+
+    def stats(self):
+        with self._lock:
+            generation = self._generations[0] if self._generations else _Generation(0)
+            return {
+                "entities": len(generation.parent),
+                "links": len(generation.links),
+                "clusters": len(generation.clusters),
+                "generations": len(self._generations)
+            }
+
+    def clear(self):
+        with self._lock:
+            self._generations = []
@@ -0,0 +1,217 @@
+"""Local geo/IP reputation lookups for risk scoring.
+
+Everything is loaded from a local JSON file (no network access)::
+
+    {
+        "version": "2025-06-01",
+        "high_risk_countries": ["RU", "IR", "KP", "VE", "MM"],
+        "elevated_risk_countries": ["NG"],
+        "networks": [["95.31.0.0/16", "RU"], ["2a02:6b8::/32", "RU"]],
+        "reputation": [["198.51.100.0/24", "tor_exit"]]
+    }
+
+CIDR lists are flattened into disjoint, sorted intervals so a longest-prefix
+match is a single ``bisect`` over a compact ``array`` of interval starts.
+Country risk lists are frozensets.  ``GeoReputationStore`` re-reads the file
+when its modification time changes and swaps in the new tables atomically.
+"""
+import ipaddress
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+IpInfo = namedtuple("IpInfo", ["country", "reputation"])
+_UNKNOWN = IpInfo(None, None)
+
+
+def _flatten(networks):
+    """Turn nested (start, end, value) prefixes into disjoint intervals.
+
+    CIDR blocks either nest or are disjoint, so a stack sweep over blocks
+    sorted by start (widest first) assigns every address the value of its
+    most specific block.
+    """
+    networks.sort(key=lambda network: (network[0], -network[1]))
+    intervals = []
+    stack = []
+    cursor = 0
+
+    def emit(low, high, value):
+        if low <= high:
+            if intervals and intervals[-1][2] == value and intervals[-1][1] + 1 == low:
+                intervals[-1] = (intervals[-1][0], high, value)
+            else:
+                intervals.append((low, high, value))
+
+    for start, end, value in networks:
+        while stack and stack[-1][0] < start:
+            top_end, top_value = stack.pop()
+            emit(cursor, top_end, top_value)
+            cursor = top_end + 1
+        if stack:
+            emit(cursor, start - 1, stack[-1][1])
+        cursor = start
+        stack.append((end, value))
+    while stack:
+        top_end, top_value = stack.pop()
+        emit(cursor, top_end, top_value)
+        cursor = top_end + 1
+    return intervals
+
+
+class PrefixIndex:
+    """Longest-prefix-match index over IPv4 and IPv6 CIDR blocks"""
+
+    def __init__(self, entries):
+        self._labels = []
+        label_ids = {}
+        networks = {4: [], 6: []}
+        for cidr, label in entries:
+            network = ipaddress.ip_network(cidr, strict=False)
+            label = sys.intern(str(label))
+            if label not in label_ids:
+                label_ids[label] = len(self._labels)
+                self._labels.append(label)
+            networks[network.version].append(
+                (int(network.network_address), int(network.broadcast_address), label_ids[label])
+            )
+
+        # IPv4 bounds fit in a machine word; IPv6 needs Python ints
+        self._v4 = self._build(networks[4], lambda: array("I"))
+        self._v6 = self._build(networks[6], list)
+
+    @staticmethod
+    def _build(networks, container):
+        starts, ends, values = container(), container(), array("H")
+        for low, high, value in _flatten(networks):
+            starts.append(low)
+            ends.append(high)
+            values.append(value)
+        return starts, ends, values
+
+    def __len__(self):
+        return len(self._v4[0]) + len(self._v6[0])
+
+    def lookup(self, address, version=4):
+        """Label of the most specific block containing the integer ``address``"""
+        starts, ends, values = self._v4 if version == 4 else self._v6
+        i = bisect_right(starts, address) - 1
+        if i >= 0 and address <= ends[i]:
+            return self._labels[values[i]]
+        return None
+
+
+def parse_ip(ip_string):
+    """Return (integer, version) for an IP string, or (None, None) if invalid"""
+    parts = ip_string.split(".") if isinstance(ip_string, str) else ()
+    if len(parts) == 4:
+        # Fast path for dotted-quad IPv4 without building an ipaddress object
+        value = 0
+        for part in parts:
+            if not (part.isascii() and part.isdigit()) or len(part) > 3:
+                return None, None
+            octet = int(part)
+            if octet > 255:
+                return None, None
+            value = (value << 8) | octet
+        return value, 4
+    try:
+        address = ipaddress.ip_address(ip_string)
+    except (ValueError, TypeError):
+        return None, None
+    return int(address), address.version
+
+
+class GeoReputation:
+    """Immutable set of lookup tables loaded from one data file"""
+
+    def __init__(self, data):
+        self.version = str(data.get("version", "unversioned"))
+        self.high_risk_countries = frozenset(data.get("high_risk_countries", ()))
+        self.elevated_risk_countries = frozenset(data.get("elevated_risk_countries", ()))
+        self.networks = PrefixIndex(data.get("networks", ()))
+        self.reputation = PrefixIndex(data.get("reputation", ()))
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding="utf-8") as data_file:
+            return cls(json.load(data_file))
+
+    def lookup(self, ip_string):
+        """Country and reputation label for an IP address"""
+        address, version = parse_ip(ip_string)
+        if address is None:
+            return _UNKNOWN
+        return IpInfo(self.networks.lookup(address, version), self.reputation.lookup(address, version))
+
+    def country_risk(self, country):
+        """Risk tier of a country code: "high", "elevated" or None"""
+        if country in self.high_risk_countries:
+            return "high"
+        if country in self.elevated_risk_countries:
+            return "elevated"
+        return None
+
+    def features(self, transaction):
+        """IP-derived scoring features for a transaction"""
+        customer = transaction.get("customer") or {}
+        customer_country = customer.get("country")
+        info = self.lookup(customer.get("ip_address"))
+        return {
+            "ip_country": info.country,
+            "ip_country_mismatch": info.country is not None and info.country != customer_country,
+            "ip_country_risk": self.country_risk(info.country),
+            "ip_reputation": info.reputation
+        }
+
+
+class GeoReputationStore:
+    """Hot-reloading holder of the current ``GeoReputation`` tables.
+
+    ``current()`` checks the file's modification time at most every
+    ``check_interval`` seconds; readers never block on a reload because the
+    new tables are built first and then published with a single assignment.
+    """
+
+    def __init__(self, path, check_interval=5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._reload_lock = threading.Lock()
+        self._mtime = os.stat(path).st_mtime_ns
+        self._tables = GeoReputation.from_file(path)
+        self._next_check = time.monotonic() + check_interval
+
+    def current(self):
+        if time.monotonic() >= self._next_check:
+            self.reload_if_changed()
+        return self._tables
+
+    def reload_if_changed(self):
+        """Reload the data file if it changed; keeps the old tables on error"""
+        if not self._reload_lock.acquire(blocking=False):
+            return False  # Another thread is already reloading
+        try:
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                if mtime == self._mtime:
+                    return False
+                tables = GeoReputation.from_file(self.path)
+            except (OSError, ValueError) as e:
+                logger.error("Failed to reload geo reputation data from %s: %s", self.path, e,
+                             extra={"event": "geoip.reload_failed"})
+                return False
+            self._tables = tables
+            self._mtime = mtime
+            logger.info("Loaded geo reputation data version %s", tables.version, extra={"event": "geoip.loaded"})
+            return True
+        finally:
+            self._reload_lock.release()
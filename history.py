@@ -0,0 +1,460 @@
+"""Bounded, memory-efficient in-memory history of processed transactions.
+
+Records are kept as ``CompactTransaction`` objects: one ``__slots__`` object
+per transaction with the nested customer/payment/merchant/risk-analysis dicts
+flattened into attributes, low-cardinality strings (countries, currencies,
+categories, payment types, actions and risk factors) interned, and the risk
+factors stored as a tuple.  The JSON-shaped dicts the API returns are only
+materialized on read.
+
+``TransactionHistory`` and ``NotificationHistory`` are ring buffers over these
+records, bounded both by record count and by an approximate memory cap; the
+oldest records are evicted first.  They are sharded by transaction id so that
+concurrent request threads do not contend on one lock, and readers work on
+immutable per-shard snapshots.  Stored records are never changed: an
+analysis update replaces the record with an updated copy, so a snapshot
+never sees a half-applied update.  Every change gives a history a new
+``version``, drawn from a process-wide counter so that versions are never
+reused across history instances; responses can be cached per version.
+"""
+import heapq
+import itertools
+from abc import ABC, abstractmethod
+import sys
+import threading
+from collections import deque
+
+_intern = sys.intern
+_versions = itertools.count(1)
+
+# Known fields of each nested section, in the order they are materialized
+_CUSTOMER_FIELDS = ("id", "country", "ip_address")
+_PAYMENT_FIELDS = ("type", "last_four", "country_of_issue")
+_MERCHANT_FIELDS = ("id", "name", "category")
+_TOP_LEVEL_FIELDS = ("transaction_id", "timestamp", "amount", "currency", "customer", "payment_method", "merchant")
+_ANALYSIS_FIELDS = ("risk_score", "risk_factors", "reasoning", "recommended_action")
+_ANALYSIS_SLOTS = _ANALYSIS_FIELDS + ("config_version",)
+
+
+def _interned(value):
+    return _intern(value) if type(value) is str else value
+
+
+def _leftovers(section, known):
+    """Fields of ``section`` that have no dedicated slot, or None"""
+    if not section:
+        return None
+    extra = {key: value for key, value in section.items() if key not in known}
+    return extra or None
+
+
+class CompactTransaction:
+    """Slot-based representation of one processed transaction"""
+
+    __slots__ = (
+        "transaction_id", "timestamp", "amount", "currency",
+        "customer_id", "customer_country", "ip_address",
+        "payment_type", "last_four", "card_country",
+        "merchant_id", "merchant_name", "merchant_category",
+        "risk_score", "risk_factors", "reasoning", "action", "config_version",
+        "status", "extra",
+    )
+
+    @classmethod
+    def from_transaction(cls, transaction, risk_analysis, status=None):
+        """Build a compact record from a transaction payload and its analysis"""
+        record = cls()
+        customer = transaction.get("customer") or {}
+        payment_method = transaction.get("payment_method") or {}
+        merchant = transaction.get("merchant") or {}
+
+        record.transaction_id = transaction.get("transaction_id")
+        record.timestamp = transaction.get("timestamp")
+        record.amount = transaction.get("amount")
+        record.currency = _interned(transaction.get("currency"))
+        record.customer_id = customer.get("id")
+        record.customer_country = _interned(customer.get("country"))
+        record.ip_address = customer.get("ip_address")
+        record.payment_type = _interned(payment_method.get("type"))
+        record.last_four = payment_method.get("last_four")
+        record.card_country = _interned(payment_method.get("country_of_issue"))
+        record.merchant_id = _interned(merchant.get("id"))
+        record.merchant_name = _interned(merchant.get("name"))
+        record.merchant_category = _interned(merchant.get("category"))
+        record.status = _interned(status)
+        record.extra = None
+        record.set_analysis(risk_analysis)
+
+        # Anything without a slot is kept verbatim so reads are lossless
+        extra = {}
+        for name, section, known in (
+            ("transaction", transaction, _TOP_LEVEL_FIELDS + ("risk_analysis", "status")),
+            ("customer", customer, _CUSTOMER_FIELDS),
+            ("payment_method", payment_method, _PAYMENT_FIELDS),
+            ("merchant", merchant, _MERCHANT_FIELDS),
+        ):
+            leftovers = _leftovers(section, known)
+            if leftovers:
+                extra[name] = leftovers
+        if extra:
+            record.extra = dict(record.extra or {}, **extra)
+        return record
+
+    def set_analysis(self, risk_analysis):
+        """Replace the stored risk analysis fields"""
+        risk_factors = risk_analysis.get("risk_factors", [])
+        self.risk_score = risk_analysis.get("risk_score")
+        self.risk_factors = tuple(_interned(factor) for factor in risk_factors) if isinstance(risk_factors, list) else risk_factors
+        self.reasoning = risk_analysis.get("reasoning", "")
+        self.action = _interned(risk_analysis.get("recommended_action", "review"))
+        self.config_version = risk_analysis.get("config_version")
+        # Extra analysis keys such as analysis_status are kept verbatim
+        leftovers = _leftovers(risk_analysis, _ANALYSIS_SLOTS)
+        extra = dict(self.extra) if self.extra else {}
+        if leftovers:
+            extra["risk_analysis"] = leftovers
+        else:
+            extra.pop("risk_analysis", None)
+        self.extra = extra or None
+
+    def with_analysis(self, changes):
+        """Copy of this record with a partial risk analysis update (e.g. streamed reasoning) applied"""
+        record = CompactTransaction()
+        for name in self.__slots__:
+            setattr(record, name, getattr(self, name))
+        analysis = self.risk_analysis()
+        analysis.update(changes)
+        record.set_analysis(analysis)
+        return record
+
+    def _extra(self, name):
+        return self.extra.get(name) if self.extra else None
+
+    def _section(self, name, values, fields):
+        section = {field: value for field, value in zip(fields, values) if value is not None}
+        leftovers = self._extra(name)
+        if leftovers:
+            section.update(leftovers)
+        return section
+
+    def customer(self):
+        return self._section("customer", (self.customer_id, self.customer_country, self.ip_address), _CUSTOMER_FIELDS)
+
+    def payment_method(self):
+        return self._section("payment_method", (self.payment_type, self.last_four, self.card_country), _PAYMENT_FIELDS)
+
+    def merchant(self):
+        return self._section("merchant", (self.merchant_id, self.merchant_name, self.merchant_category), _MERCHANT_FIELDS)
+
+    def risk_analysis(self):
+        analysis = {
+            "risk_score": self.risk_score,
+            "risk_factors": list(self.risk_factors) if isinstance(self.risk_factors, tuple) else self.risk_factors,
+            "reasoning": self.reasoning,
+            "recommended_action": self.action
+        }
+        if self.config_version is not None:
+            analysis["config_version"] = self.config_version
+        leftovers = self._extra("risk_analysis")
+        if leftovers:
+            analysis.update(leftovers)
+        return analysis
+
+    def transaction(self):
+        """The original transaction payload"""
+        transaction = {
+            "transaction_id": self.transaction_id,
+            "timestamp": self.timestamp,
+            "amount": self.amount,
+            "currency": self.currency,
+            "customer": self.customer(),
+            "payment_method": self.payment_method(),
+            "merchant": self.merchant()
+        }
+        leftovers = self._extra("transaction")
+        if leftovers:
+            transaction.update(leftovers)
+        return transaction
+
+    def to_record(self):
+        """Materialize in the /admin/all-transactions format"""
+        record = {
+            "transaction_id": self.transaction_id,
+            "timestamp": self.timestamp,
+            "amount": self.amount,
+            "currency": self.currency,
+            "risk_analysis": self.risk_analysis(),
+            "customer": self.customer(),
+            "payment_method": self.payment_method(),
+            "merchant": self.merchant()
+        }
+        leftovers = self._extra("transaction")
+        if leftovers:
+            record.update(leftovers)
+        if self.status is not None:
+            record["status"] = self.status
+        return record
+
+    def to_notification(self):
+        """Materialize in the /admin/notifications (and Socket.IO) format"""
+        analysis = self.risk_analysis()
+        return {
+            "transaction_id": self.transaction_id,
+            "timestamp": self.timestamp,
+            "amount": self.amount,
+            "currency": self.currency,
+            "alert_type": "high_risk_transaction",
+            "status": "flagged",
+            "admin_notification_sent": True,
+            "risk_analysis": {field: analysis.get(field) for field in _ANALYSIS_FIELDS},
+            "customer": self.customer(),
+            "payment_method": self.payment_method(),
+            "merchant": self.merchant(),
+            "transaction_details": self.transaction()
+        }
+
+    def approx_size(self):
+        """Approximate heap footprint in bytes (interned strings are shared and not counted)"""
+        size = sys.getsizeof(self)
+        for value in (self.transaction_id, self.timestamp, self.amount, self.customer_id,
+                      self.ip_address, self.last_four, self.reasoning, self.risk_score):
+            size += sys.getsizeof(value)
+        size += sys.getsizeof(self.risk_factors)
+        if self.extra:
+            size += sys.getsizeof(self.extra) + sum(sys.getsizeof(v) for v in self.extra.values())
+        return size
+
+
+class _Shard:
+    """One partition of a history: entries in arrival order plus a cached read-only view"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = deque()  # (sequence, record, size)
+        self.by_id = {}
+        self.bytes = 0
+        self.changes = 0
+        self.published = (0, ())  # (changes, entries) as of the last read
+
+    def view(self):
+        """Immutable tuple of the entries; rebuilt under the lock only after a change"""
+        changes, entries = self.published
+        if changes != self.changes:
+            with self.lock:
+                self.published = (self.changes, tuple(self.entries))
+            changes, entries = self.published
+        return entries
+
+    def replace(self, record, new_record):
+        """Swap a stored record for its updated copy; the caller holds the lock"""
+        # Updates are usually for recent records, so search from the newest end
+        for offset, (sequence, stored, size) in enumerate(reversed(self.entries)):
+            if stored is record:
+                new_size = new_record.approx_size()
+                self.entries[len(self.entries) - 1 - offset] = (sequence, new_record, new_size)
+                self.bytes += new_size - size
+                break
+        self.by_id[record.transaction_id] = new_record
+        self.changes += 1
+
+    def add(self, entries):
+        with self.lock:
+            for entry in entries:
+                self.entries.append(entry)
+                self.bytes += entry[2]
+                self.by_id[entry[1].transaction_id] = entry[1]
+            self.changes += 1
+
+    def pop_oldest(self):
+        with self.lock:
+            _, record, size = self.entries.popleft()
+            self.bytes -= size
+            if self.by_id.get(record.transaction_id) is record:
+                del self.by_id[record.transaction_id]
+            self.changes += 1
+            return size
+
+
+class CompactHistory(ABC):
+    """Ring buffer of compact records bounded by count and approximate memory.
+
+    Records are partitioned into ``shards`` by transaction id hash, each with
+    its own lock, so concurrent writers rarely contend.  Readers take an
+    immutable view of each shard (rebuilt only if the shard changed since the
+    previous read) and merge them by arrival sequence without blocking
+    writers; lookups by id take no lock at all.  Eviction removes the globally
+    oldest records first.  Subclasses define how items are compacted and
+    materialized.
+    """
+
+    def __init__(self, max_records=100000, max_bytes=None, shards=16):
+        self._shards = [_Shard() for _ in range(shards)]
+        self._sequence = itertools.count()
+        self._evict_lock = threading.Lock()
+        self._removed = 0  # Records evicted or cleared, so next(_sequence) - _removed bounds the count
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.evicted = 0
+        self._version_lock = threading.Lock()
+        self.version = next(_versions)
+
+    @abstractmethod
+    def _compact(self, item):
+        """``CompactTransaction`` for a stored item"""
+
+    @abstractmethod
+    def _materialize(self, record):
+        """The JSON-shaped item for a ``CompactTransaction``"""
+
+    def _bump_version(self):
+        # Drawn and published under a lock so that concurrent writers never move it backwards
+        with self._version_lock:
+            self.version = next(_versions)
+
+    def _shard(self, transaction_id):
+        return self._shards[hash(transaction_id) % len(self._shards)]
+
+    def configure(self, max_records=None, max_bytes=None):
+        """Change the limits that are given (others are kept), evicting immediately if they shrank"""
+        if max_records is not None:
+            self.max_records = max_records
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+        self._evict()
+        self._bump_version()
+
+    def append(self, item):
+        """Compact and store one item, evicting the oldest beyond the limits"""
+        record = self._compact(item)
+        sequence = next(self._sequence)
+        self._shard(record.transaction_id).add([(sequence, record, record.approx_size())])
+        # Cheap pre-check: the exact totals are only summed when the count may be over the cap,
+        # and every 32 appends for the memory cap
+        if sequence + 1 - self._removed > self.max_records or (self.max_bytes is not None and sequence % 32 == 0):
+            self._evict()
+        self._bump_version()
+        return record
+
+    def extend(self, items):
+        """Store several items, taking each shard's lock once for its whole batch"""
+        batches = {}
+        for item in items:
+            record = self._compact(item)
+            batches.setdefault(id(self._shard(record.transaction_id)), []).append(
+                (next(self._sequence), record, record.approx_size()))
+        for shard in self._shards:
+            if id(shard) in batches:
+                shard.add(batches[id(shard)])
+        self._evict()
+        self._bump_version()
+
+    def _totals(self):
+        count = size = 0
+        for shard in self._shards:
+            count += len(shard.entries)
+            size += shard.bytes
+        return count, size
+
+    def _evict(self):
+        count, size = self._totals()
+        if count <= self.max_records and (self.max_bytes is None or size <= self.max_bytes):
+            return
+        with self._evict_lock:
+            count, size = self._totals()
+            # Evict slightly below the limits (0.1%, at most 64 records) so the head scan is amortized
+            slack = min(64, self.max_records // 1000)
+            max_records = self.max_records - slack
+            max_bytes = None if self.max_bytes is None else self.max_bytes - self.max_bytes * slack // max(1, self.max_records)
+            # Entries are only removed under this lock, so each shard's head is stable while we hold it
+            heads = [(shard.entries[0][0], index) for index, shard in enumerate(self._shards) if shard.entries]
+            heapq.heapify(heads)
+            while heads and (count > max_records or (max_bytes is not None and size > max_bytes)):
+                index = heapq.heappop(heads)[1]
+                shard = self._shards[index]
+                size -= shard.pop_oldest()
+                count -= 1
+                self.evicted += 1
+                self._removed += 1
+                if shard.entries:
+                    heapq.heappush(heads, (shard.entries[0][0], index))
+
+    def update_analysis(self, transaction_id, changes):
+        """Update the risk analysis of the latest record for ``transaction_id``"""
+        shard = self._shard(transaction_id)
+        with shard.lock:
+            record = shard.by_id.get(transaction_id)
+            if record is None:
+                return False
+            # Copy-on-write: views taken before the update keep the old record intact
+            shard.replace(record, record.with_analysis(changes))
+        self._bump_version()
+        return True
+
+    def get(self, transaction_id):
+        """Materialized latest record for ``transaction_id``, or None"""
+        record = self._shard(transaction_id).by_id.get(transaction_id)
+        return self._materialize(record) if record is not None else None
+
+    def _ordered(self):
+        """Stored records, oldest first, merged from the shard views"""
+        # Sorting the concatenated views merges their sorted runs in C, faster than heapq.merge
+        entries = sorted(itertools.chain.from_iterable(shard.view() for shard in self._shards))
+        return [record for _, record, _ in entries]
+
+    def snapshot(self):
+        """Materialize every stored record, oldest first"""
+        return [self._materialize(record) for record in self._ordered()]
+
+    def clear(self):
+        with self._evict_lock:
+            for shard in self._shards:
+                with shard.lock:
+                    self._removed += len(shard.entries)
+                    shard.entries.clear()
+                    shard.by_id.clear()
+                    shard.bytes = 0
+                    shard.changes += 1
+        self._bump_version()
+
+    def stats(self):
+        return {
+            "records": len(self),
+            "approx_bytes": sum(shard.bytes for shard in self._shards),
+            "evicted": self.evicted,
+            "shards": len(self._shards)
+        }
+
+    def __len__(self):
+        return sum(len(shard.entries) for shard in self._shards)
+
+    def __getitem__(self, index):
+        return self._materialize(self._ordered()[index])
+
+    def __iter__(self):
+        return iter(self.snapshot())
+
+
+class TransactionHistory(CompactHistory):
+    """History of every processed transaction (the ``ALL_TRANSACTIONS`` store)"""
+
+    def _compact(self, record):
+        transaction = {key: value for key, value in record.items() if key not in ("risk_analysis", "status")}
+        return CompactTransaction.from_transaction(transaction, record.get("risk_analysis") or {},
+                                                   status=record.get("status"))
+
+    def _materialize(self, record):
+        return record.to_record()
+
+
+class NotificationHistory(CompactHistory):
+    """History of high-risk notifications (the ``NOTIFICATIONS`` store)"""
+
+    def _compact(self, notification):
+        # The flattened fields duplicate transaction_details; only one copy is kept
+        transaction = notification.get("transaction_details") or {
+            key: notification.get(key) for key in _TOP_LEVEL_FIELDS
+        }
+        return CompactTransaction.from_transaction(transaction, notification.get("risk_analysis") or {})
+
+    def _materialize(self, record):
+        return record.to_notification()
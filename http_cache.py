@@ -0,0 +1,105 @@
+"""Conditional, compressed JSON responses cached per data version.
+
+The admin list endpoints are polled every 30-60 seconds by each dashboard,
+usually with nothing changed in between.  ``ResponseCache.respond()`` takes
+the version of the data behind a response (see ``CompactHistory.version``):
+
+- The ETag is derived from the version, so a poll with a matching
+  ``If-None-Match`` is answered with 304 without serializing anything.
+- Otherwise the body is serialized once per version, and compressed once per
+  version and encoding (brotli if the ``brotli`` package is installed, else
+  gzip); concurrent clients wait for and share that single encoding pass.
+"""
+import gzip
+import os
+import threading
+
+from flask import Response, current_app, request
+
+from metrics import METRICS
+
+try:
+    import brotli
+except ImportError:  # Optional; gzip is always available
+    brotli = None
+
+# Distinguishes ETags of this process from those of a previous run with the same version numbers
+_INSTANCE = os.urandom(4).hex()
+
+
+class _CachedBody:
+    """Serialized body of one version and its compressed encodings"""
+
+    def __init__(self, version, body):
+        self.version = version
+        self.body = body
+        self.encodings = {"identity": body}
+        self.lock = threading.Lock()
+
+
+class ResponseCache:
+    """Per-key cache of the latest serialized (and compressed) JSON response"""
+
+    def __init__(self, min_compress_bytes=1024, gzip_level=6, brotli_quality=5):
+        self.min_compress_bytes = min_compress_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._entries = {}
+
+    def respond(self, key, version, build):
+        """Flask response for ``build()`` (a JSON-serializable payload) at ``version``.
+
+        ``version`` must be read before the data is snapshotted by ``build``,
+        so a concurrent change yields a newer version on the next poll.
+        """
+        etag = f"{_INSTANCE}-{version}"
+        if request.if_none_match.contains_weak(etag):
+            METRICS.increment("http_cache.not_modified")
+            response = Response(status=304)
+        else:
+            entry = self._entry(key, version, build)
+            encoding = self._negotiate(len(entry.body))
+            response = Response(self._encode(entry, encoding), mimetype="application/json")
+            if encoding != "identity":
+                response.headers["Content-Encoding"] = encoding
+        response.set_etag(etag, weak=True)
+        response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    def _entry(self, key, version, build):
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version == version:
+                METRICS.increment("http_cache.hits")
+                return entry
+            METRICS.increment("http_cache.misses")
+            entry = _CachedBody(version, current_app.json.response(build()).get_data())
+            self._entries[key] = entry
+            return entry
+
+    def _negotiate(self, size):
+        if size < self.min_compress_bytes:
+            return "identity"
+        accepted = request.accept_encodings
+        if brotli is not None and accepted["br"]:
+            return "br"
+        if accepted["gzip"]:
+            return "gzip"
+        return "identity"
+
+    def _encode(self, entry, encoding):
+        with entry.lock:
+            body = entry.encodings.get(encoding)
+            if body is None:
+                METRICS.increment(f"http_cache.encoded.{encoding}")
+                if encoding == "br":
+                    body = brotli.compress(entry.body, quality=self.brotli_quality)
+                else:
+                    body = gzip.compress(entry.body, compresslevel=self.gzip_level, mtime=0)
+                entry.encodings[encoding] = body
+            return body
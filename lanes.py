@@ -0,0 +1,172 @@
+"""Priority lanes for scoring work.
+
+Every model call takes a slot from a ``LaneScheduler`` first.  Transactions
+are classified into the ``high``, ``normal`` and ``bulk`` lanes by amount,
+high-risk country involvement and merchant category.  Each lane has a few
+reserved slots that only it may use, so bulk traffic can never take all the
+capacity and high-value work always has somewhere to run; the remaining
+slots are shared and handed out in priority order.  A waiter that has been
+queued for longer than ``max_wait_ms`` is served before any higher-priority
+waiter, which bounds how long low-priority traffic can be starved.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from metrics import METRICS
+
+LANES = ("high", "normal", "bulk")  # Highest priority first
+HIGH_VALUE_AMOUNT = 1000.0
+BULK_AMOUNT = 50.0
+HIGH_RISK_CATEGORIES = frozenset(["crypto", "gambling", "money_transfer", "wire_transfer", "gift_cards"])
+
+
+def classify(transaction, high_risk_countries=frozenset(), high_value_amount=HIGH_VALUE_AMOUNT,
+             bulk_amount=BULK_AMOUNT, high_risk_categories=HIGH_RISK_CATEGORIES):
+    """Lane for a transaction: "high", "normal" or "bulk" """
+    try:
+        amount = float(transaction.get("amount") or 0.0)
+    except (TypeError, ValueError):
+        amount = 0.0
+    countries = ((transaction.get("customer") or {}).get("country"),
+                 (transaction.get("payment_method") or {}).get("country_of_issue"))
+    category = (transaction.get("merchant") or {}).get("category")
+    if amount >= high_value_amount or category in high_risk_categories or \
+            any(country in high_risk_countries for country in countries):
+        return "high"
+    if amount < bulk_amount:
+        return "bulk"
+    return "normal"
+
+
+def parse_reservations(spec):
+    """Parse "high=2,normal=1,bulk=1" into a dict"""
+    reservations = {}
+    for part in filter(None, (part.strip() for part in spec.split(","))):
+        lane, _, count = part.partition("=")
+        if lane not in LANES:
+            raise ValueError(f"Unknown priority lane: {lane}")
+        reservations[lane] = int(count)
+    return reservations
+
+
+class _Waiter:
+    __slots__ = ("lane", "enqueued", "event", "kind")
+
+    def __init__(self, lane):
+        self.lane = lane
+        self.enqueued = time.monotonic()
+        self.event = threading.Event()
+        self.kind = None
+
+
+class LaneScheduler:
+    """Priority admission control with per-lane reservations and aging"""
+
+    def __init__(self, concurrency, reservations=None, max_wait_ms=2000):
+        if reservations is None:
+            # A quarter of the slots for high-priority work and one each for the
+            # other lanes, once there are enough slots to leave some shared
+            reservations = {"high": concurrency // 4, "normal": 1, "bulk": 1} if concurrency >= 4 else {}
+        self.reservations = {lane: reservations.get(lane, 0) for lane in LANES}
+        self.shared = concurrency - sum(self.reservations.values())
+        if self.shared < 0:
+            raise ValueError("Lane reservations exceed the scoring concurrency")
+        if self.shared == 0 and not all(self.reservations.values()):
+            raise ValueError("Every lane needs a reservation when no slots are shared")
+        self.concurrency = concurrency
+        self.max_wait = max_wait_ms / 1000.0
+        self._lock = threading.Lock()
+        self._queues = {lane: deque() for lane in LANES}
+        self._reserved_in_use = dict.fromkeys(LANES, 0)
+        self._shared_in_use = 0
+        self._in_flight = dict.fromkeys(LANES, 0)
+
+    def _take(self, lane):
+        if self._reserved_in_use[lane] < self.reservations[lane]:
+            self._reserved_in_use[lane] += 1
+            kind = "reserved"
+        elif self._shared_in_use < self.shared:
+            self._shared_in_use += 1
+            kind = "shared"
+        else:
+            return None
+        self._in_flight[lane] += 1
+        return kind
+
+    def acquire(self, lane):
+        """Block until a slot is available for ``lane``; returns the slot kind"""
+        with self._lock:
+            # Slots are dispatched to waiters as soon as they free up, so a free
+            # slot here means nobody queued ahead of us can use it
+            if not self._queues[lane]:
+                kind = self._take(lane)
+                if kind is not None:
+                    METRICS.observe(f"lanes.{lane}.wait_ms", 0.0)
+                    return kind
+            waiter = _Waiter(lane)
+            self._queues[lane].append(waiter)
+            METRICS.set_gauge(f"lanes.{lane}.queued", len(self._queues[lane]))
+        waiter.event.wait()
+        METRICS.observe(f"lanes.{lane}.wait_ms", (time.monotonic() - waiter.enqueued) * 1000)
+        return waiter.kind
+
+    def release(self, lane, kind):
+        with self._lock:
+            if kind == "reserved":
+                self._reserved_in_use[lane] -= 1
+            else:
+                self._shared_in_use -= 1
+            self._in_flight[lane] -= 1
+            self._dispatch()
+
+    def _candidates(self):
+        """Queue heads in service order: starved waiters (oldest first), then by priority"""
+        heads = [self._queues[lane][0] for lane in LANES if self._queues[lane]]
+        deadline = time.monotonic() - self.max_wait
+        starved = sorted((waiter for waiter in heads if waiter.enqueued <= deadline), key=lambda w: w.enqueued)
+        return starved + [waiter for waiter in heads if waiter not in starved], len(starved)
+
+    def _dispatch(self):
+        while True:
+            candidates, starved = self._candidates()
+            for position, waiter in enumerate(candidates):
+                kind = self._take(waiter.lane)
+                if kind is None:
+                    continue
+                queue = self._queues[waiter.lane]
+                queue.popleft()
+                METRICS.set_gauge(f"lanes.{waiter.lane}.queued", len(queue))
+                priority = LANES.index(waiter.lane)
+                if position < starved and any(LANES.index(other.lane) < priority for other in candidates):
+                    METRICS.increment(f"lanes.{waiter.lane}.promoted")  # Served ahead of higher lanes
+                waiter.kind = kind
+                waiter.event.set()
+                break
+            else:
+                return
+
+    @contextmanager
+    def slot(self, lane):
+        """Hold a scoring slot in ``lane`` for the duration of the block"""
+        kind = self.acquire(lane)
+        try:
+            yield
+        finally:
+            self.release(lane, kind)
+
+    def snapshot(self):
+        """Per-lane queue depth, in-flight work and reservations"""
+        with self._lock:
+            return {
+                "concurrency": self.concurrency,
+                "shared": self.shared,
+                "lanes": {
+                    lane: {
+                        "queued": len(self._queues[lane]),
+                        "in_flight": self._in_flight[lane],
+                        "reserved": self.reservations[lane]
+                    } for lane in LANES
+                }
+            }
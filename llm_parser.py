@@ -0,0 +1,274 @@
+"""Tolerant parser for the JSON objects returned by the risk model.
+
+The model is asked to answer with a bare JSON object but in practice wraps it
+in markdown fences, adds a sentence before or after it, leaves trailing commas
+or uses single quotes.  ``parse_json_object`` extracts the first balanced
+object from arbitrary text: the common case is handled by a single C-level
+``raw_decode`` without slicing the input, and only malformed objects go
+through the (slower) character-level repair pass.
+
+``StreamingRiskParser`` does the same incrementally for streamed
+chat-completion deltas, exposing ``risk_score`` and ``recommended_action`` as
+soon as both have arrived so a decision does not wait for the ``reasoning``.
+"""
+import json
+
+from metrics import METRICS, ratio
+
+_DECODER = json.JSONDecoder()
+_MAX_CANDIDATES = 8  # Number of '{' positions tried before giving up
+_WHITESPACE = " \t\r\n"
+
+METRICS.register_derived("llm_parse.failure_rate", ratio("llm_parse.failures", "llm_parse.attempts"))
+
+
+def _repair_object(text, start):
+    """Return a JSON-clean copy of the balanced object beginning at ``start``.
+
+    Single-quoted strings are rewritten with double quotes and trailing commas
+    before ``}``/``]`` are dropped.  Scanning stops once the outermost object
+    is closed, so trailing prose is never touched.  Returns None when the
+    object is not closed before the end of the text.
+    """
+    pieces = []
+    flush_from = start
+    depth = 0
+    quote = None
+    i = start
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if quote is not None:
+            if ch == "\\":
+                if quote == "'" and i + 1 < n and text[i + 1] == "'":
+                    # \' is not a JSON escape; emit the bare apostrophe
+                    pieces.append(text[flush_from:i])
+                    pieces.append("'")
+                    flush_from = i + 2
+                i += 2
+                continue
+            if ch == quote:
+                if quote == "'":
+                    pieces.append(text[flush_from:i])
+                    pieces.append('"')
+                    flush_from = i + 1
+                quote = None
+            elif ch == '"' and quote == "'":
+                pieces.append(text[flush_from:i])
+                pieces.append('\\"')
+                flush_from = i + 1
+        elif ch == '"':
+            quote = '"'
+        elif ch == "'":
+            pieces.append(text[flush_from:i])
+            pieces.append('"')
+            flush_from = i + 1
+            quote = "'"
+        elif ch == "{" or ch == "[":
+            depth += 1
+        elif ch == "}" or ch == "]":
+            depth -= 1
+            if depth == 0:
+                pieces.append(text[flush_from:i + 1])
+                return "".join(pieces)
+        elif ch == ",":
+            j = i + 1
+            while j < n and text[j] in _WHITESPACE:
+                j += 1
+            if j < n and (text[j] == "}" or text[j] == "]"):
+                pieces.append(text[flush_from:i])
+                flush_from = i + 1
+        i += 1
+    return None
+
+
+def parse_json_object(text):
+    """Extract and decode the first JSON object found in ``text``.
+
+    Raises ValueError when no object can be recovered.  Attempts, repairs and
+    failures are counted in the ``llm_parse.*`` metrics.
+    """
+    METRICS.increment("llm_parse.attempts")
+    try:
+        result = _parse_json_object(text)
+    except ValueError:
+        METRICS.increment("llm_parse.failures")
+        raise
+    return result
+
+
+def _parse_json_object(text):
+    if not isinstance(text, str):
+        raise TypeError(f"Expected model output as text, got {type(text).__name__}")
+
+    start = text.find("{")
+    candidates = 0
+    while start != -1 and candidates < _MAX_CANDIDATES:
+        candidates += 1
+        # Fast path: well-formed JSON, decoded in place without slicing
+        try:
+            value, _ = _DECODER.raw_decode(text, start)
+            if isinstance(value, dict):
+                return value
+        except ValueError:
+            repaired = _repair_object(text, start)
+            if repaired is not None:
+                try:
+                    value = json.loads(repaired)
+                    if isinstance(value, dict):
+                        METRICS.increment("llm_parse.repaired")
+                        return value
+                except ValueError:
+                    pass
+        start = text.find("{", start + 1)
+
+    raise ValueError(f"No JSON object found in model output: {text[:100]!r}")
+
+
+def iter_sse_deltas(lines):
+    """Yield the content deltas of an OpenAI-compatible SSE completion stream.
+
+    ``lines`` is any iterable of ``bytes`` or ``str`` lines, such as
+    ``requests.Response.iter_lines()``.  Iteration stops at ``data: [DONE]``.
+    """
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line.startswith("data:"):
+            continue  # Blank keep-alives, comments and other SSE fields
+        payload = line[5:].strip()
+        if payload == "[DONE]":
+            return
+        if not payload:
+            continue
+        chunk = json.loads(payload)
+        for choice in chunk.get("choices", ()):
+            content = (choice.get("delta") or {}).get("content")
+            if content:
+                yield content
+
+
+class StreamingRiskParser:
+    """Incrementally scan streamed model output for the risk JSON object.
+
+    Feed text deltas with ``feed()``.  The scanner keeps its position between
+    calls so every character is examined once.  Top-level fields are recorded
+    as raw slices when their value is terminated, which lets ``decision()``
+    answer before the rest of the object (notably ``reasoning``) has arrived.
+    """
+
+    DECISION_FIELDS = ("risk_score", "recommended_action")
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._quote = None
+        self._object_start = -1
+        self._object_end = -1
+        self._key_start = -1
+        self._key = None
+        self._value_start = -1
+        self._raw_fields = {}
+        self._decoded = {}
+
+    @property
+    def text(self):
+        """All text received so far"""
+        return self._buffer
+
+    @property
+    def complete(self):
+        """True once the outermost object has been closed"""
+        return self._object_end != -1
+
+    def feed(self, delta):
+        """Consume the next chunk of model output"""
+        if not delta:
+            return
+        self._buffer += delta
+        if not self.complete:
+            self._scan()
+
+    def _scan(self):
+        text = self._buffer
+        n = len(text)
+        i = self._pos
+        if self._object_start == -1:
+            i = text.find("{", i)
+            if i == -1:
+                self._pos = n
+                return
+            self._object_start = i
+        while i < n:
+            ch = text[i]
+            if self._quote is not None:
+                if ch == "\\":
+                    if i + 1 >= n:
+                        break  # Escape split across chunks; resume here
+                    i += 2
+                    continue
+                if ch == self._quote:
+                    self._quote = None
+                    if self._depth == 1 and self._key_start != -1:
+                        self._key = text[self._key_start + 1:i]
+                        self._key_start = -1
+            elif ch == '"' or ch == "'":
+                self._quote = ch
+                if self._depth == 1 and self._value_start == -1:
+                    self._key_start = i
+            elif ch == "{" or ch == "[":
+                self._depth += 1
+            elif ch == "}" or ch == "]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._end_value(i)
+                    self._object_end = i + 1
+                    i += 1
+                    break
+            elif self._depth == 1:
+                if ch == ":":
+                    self._value_start = i + 1
+                elif ch == ",":
+                    self._end_value(i)
+            i += 1
+        self._pos = i
+
+    def _end_value(self, end):
+        if self._key is not None and self._value_start != -1:
+            self._raw_fields[self._key] = self._buffer[self._value_start:end].strip()
+        self._key = None
+        self._value_start = -1
+
+    def field(self, name):
+        """Decoded value of a completed top-level field (KeyError if pending)"""
+        if name not in self._decoded:
+            raw = self._raw_fields[name]
+            try:
+                self._decoded[name] = json.loads(raw)
+            except ValueError:
+                # Tolerate single-quoted scalars such as 'block'
+                if len(raw) >= 2 and raw[0] == raw[-1] == "'":
+                    self._decoded[name] = raw[1:-1]
+                else:
+                    raise
+        return self._decoded[name]
+
+    def decision(self):
+        """Return the early decision fields once both have arrived, else None"""
+        if not all(name in self._raw_fields for name in self.DECISION_FIELDS):
+            return None
+        try:
+            return {name: self.field(name) for name in self.DECISION_FIELDS}
+        except ValueError:
+            return None
+
+    def result(self):
+        """Decode the full object from everything received so far.
+
+        Raises ValueError (and counts a parse failure) when the stream ended
+        without a recoverable object.
+        """
+        if self.complete:
+            return parse_json_object(self._buffer[self._object_start:self._object_end])
+        return parse_json_object(self._buffer)
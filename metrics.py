@@ -0,0 +1,83 @@
+"""Minimal in-process metrics registry.
+
+Counters, gauges and timing summaries are kept in plain dicts behind a single
+lock; ``snapshot()`` returns a JSON-serializable copy for the admin endpoint.
+Derived metrics (such as rates) are registered as callables and evaluated on
+snapshot, so the hot path only ever does an increment.
+"""
+import threading
+
+
+class MetricsRegistry:
+    """Thread-safe collection of named counters, gauges and summaries"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._summaries = {}
+        self._derived = {}
+
+    def increment(self, name, value=1):
+        """Add ``value`` to the counter ``name``"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        """Set the gauge ``name`` to ``value``"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name, value):
+        """Record one observation (e.g. a latency in ms) in the summary ``name``"""
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                self._summaries[name] = [1, value, value]
+            else:
+                summary[0] += 1
+                summary[1] += value
+                if value > summary[2]:
+                    summary[2] = value
+
+    def register_derived(self, name, func):
+        """Register ``func(counters)`` to compute metric ``name`` on snapshot"""
+        with self._lock:
+            self._derived[name] = func
+
+    def counter(self, name):
+        """Current value of the counter ``name``"""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self):
+        """Return a JSON-serializable copy of every metric"""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            summaries = {
+                name: {"count": count, "sum": total, "mean": total / count, "max": maximum}
+                for name, (count, total, maximum) in self._summaries.items()
+            }
+            derived = dict(self._derived)
+        for name, func in derived.items():
+            gauges[name] = func(counters)
+        return {"counters": counters, "gauges": gauges, "summaries": summaries}
+
+    def reset(self):
+        """Clear all recorded values (derived metric definitions are kept)"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._summaries.clear()
+
+
+def ratio(numerator, denominator):
+    """Build a derived-metric function computing ``numerator / denominator``"""
+    def compute(counters):
+        total = counters.get(denominator, 0)
+        return counters.get(numerator, 0) / total if total else 0.0
+    return compute
+
+
+METRICS = MetricsRegistry()
@@ -0,0 +1,225 @@
+"""On-demand sampling profiler and slow-request capture.
+
+``SamplingProfiler.profile`` samples the Python stacks of every thread
+(``sys._current_frames``) at a fixed interval for a few seconds and returns
+them in the folded format of ``flamegraph.pl``, speedscope and inferno (one
+``frame;frame;...;leaf count`` line per distinct stack).  It runs in the
+calling thread only while a profile is requested, so it costs nothing the
+rest of the time.
+
+``SlowRequestLog`` times the stages of every request (``stage("model")``
+blocks; a ``contextvars`` timeline, so it works for threads and asyncio
+tasks alike) and keeps the requests slower than a threshold, with their
+stage timings and the shape of their JSON payload (types and keys, never
+values), in a bounded ring buffer.  Outside a request ``stage()`` does
+nothing.
+"""
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+
+from metrics import METRICS
+
+MAX_PROFILE_SECONDS = 60
+MAX_SHAPE_DEPTH = 4
+MAX_SHAPE_KEYS = 50
+# Leaf frames of threads that are waiting for work rather than for a request's dependency
+IDLE_FRAMES = frozenset((
+    ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"), ("queue.py", "get"),
+    ("selectors.py", "select"), ("socketserver.py", "serve_forever"), ("socket.py", "accept")
+))
+
+_timeline = contextvars.ContextVar("request_timeline", default=None)
+
+
+class ProfilerBusy(RuntimeError):
+    """A profile is already running"""
+
+
+class SamplingProfiler:
+    """Statistical profiler over all threads, one profile at a time"""
+
+    def __init__(self):
+        self._running = threading.Lock()
+
+    def profile(self, seconds, interval=0.01, idle=True):
+        """Sample every thread for ``seconds``; returns (folded stacks text, stats dict).
+
+        Threads whose leaf frame is an ``IDLE_FRAMES`` wait are left out unless ``idle``.
+        Raises ProfilerBusy if another profile is running.
+        """
+        if not self._running.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already running")
+        try:
+            return self._sample(min(seconds, MAX_PROFILE_SECONDS), interval, idle)
+        finally:
+            self._running.release()
+
+    def _sample(self, seconds, interval, idle):
+        own = threading.get_ident()
+        labels = {}  # code object -> frame label, cached for the duration of the profile
+        stacks = Counter()
+        samples = 0
+        sampling = 0.0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if not idle and (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        name = getattr(code, "co_qualname", code.co_name)  # co_qualname is Python 3.11+
+                        label = labels[code] = f"{name} ({os.path.basename(code.co_filename)})"
+                    frames.append(label)
+                    frame = frame.f_back
+                frames.append(names.get(ident, f"thread-{ident}"))
+                stacks[";".join(reversed(frames))] += 1
+            samples += 1
+            elapsed = time.perf_counter()
+            sampling += elapsed - now
+            time.sleep(max(0.0, min(interval - (elapsed - now), deadline - elapsed)))
+        duration = time.perf_counter() - started
+        METRICS.increment("profiler.runs")
+        folded = "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        return folded, {
+            "samples": samples,
+            "duration_seconds": round(duration, 3),
+            "sampling_overhead": round(sampling / duration, 4) if duration else 0.0
+        }
+
+
+def payload_shape(value, depth=0):
+    """Structure of a JSON value with types in place of the values"""
+    if isinstance(value, dict):
+        if depth >= MAX_SHAPE_DEPTH:
+            return "object"
+        shape = {key: payload_shape(item, depth + 1) for key, item in list(value.items())[:MAX_SHAPE_KEYS]}
+        if len(value) > MAX_SHAPE_KEYS:
+            shape["..."] = f"{len(value) - MAX_SHAPE_KEYS} more keys"
+        return shape
+    if isinstance(value, list):
+        if depth >= MAX_SHAPE_DEPTH or not value:
+            return f"array[{len(value)}]"
+        return [payload_shape(value[0], depth + 1), f"array[{len(value)}]"]
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return f"string[{len(value)}]"
+    return type(value).__name__
+
+
+class _Timeline:
+    __slots__ = ("started", "stages")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+
+
+class _Stage:
+    """Context manager adding the time of its block to a stage of the current timeline"""
+
+    __slots__ = ("name", "timeline", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.timeline = _timeline.get()
+        if self.timeline is not None:
+            self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        timeline = self.timeline
+        if timeline is not None:
+            timeline.stages[self.name] = timeline.stages.get(self.name, 0.0) + time.perf_counter() - self.started
+
+
+def stage(name):
+    """Time a ``with`` block as stage ``name`` of the current request, if one is being timed"""
+    return _Stage(name)
+
+
+class SlowRequestLog:
+    """Ring buffer of the requests slower than ``threshold_ms`` with their stage timings"""
+
+    def __init__(self, threshold_ms=1000, capacity=100):
+        self.threshold_ms = threshold_ms
+        self._lock = threading.Lock()
+        self._entries = deque(maxlen=capacity)
+
+    @property
+    def capacity(self):
+        return self._entries.maxlen
+
+    @capacity.setter
+    def capacity(self, value):
+        with self._lock:
+            self._entries = deque(self._entries, maxlen=value)
+
+    def start(self):
+        """Start timing a request in the current context; a no-op when capture is disabled"""
+        if self.threshold_ms is None:
+            return
+        _timeline.set(_Timeline())
+
+    def finish(self, method, path, status, payload=None):
+        """Stop timing; captures the request if it was slow.
+
+        ``payload`` is a callable returning the parsed JSON body, only called for slow requests.
+        """
+        timeline = _timeline.get()
+        if timeline is None:
+            return None
+        _timeline.set(None)
+        duration_ms = (time.perf_counter() - timeline.started) * 1000
+        if self.threshold_ms is None or duration_ms < self.threshold_ms:
+            return None
+        stages = {name: round(seconds * 1000, 3) for name, seconds in timeline.stages.items()}
+        try:
+            body = payload() if payload is not None else None
+        except Exception:
+            body = None
+        entry = {
+            "at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            "method": method,
+            "path": path,
+            "status": status,
+            "duration_ms": round(duration_ms, 3),
+            "stages": stages,
+            # Time outside the timed stages: routing, auth, serialization, waiting for the GIL
+            "other_ms": round(max(0.0, duration_ms - sum(stages.values())), 3),
+            "transaction_id": body.get("transaction_id") if isinstance(body, dict) else None,
+            "payload_shape": payload_shape(body) if body is not None else None
+        }
+        with self._lock:
+            self._entries.append(entry)
+        METRICS.increment("slow_requests.captured")
+        return entry
+
+    def entries(self):
+        """Captured requests, newest first"""
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,237 @@
+"""Record live scoring decisions and replay them against the current code.
+
+Recording (enabled in the server with ``RECORD_CORPUS_DIR``) captures, for
+every transaction, the payload, the local features, the prompt sent to the
+model, its raw response, the decision the server returned and the risk
+configuration settings it was made with.  Cases are
+written through the write-behind ``AuditLog`` so recording stays off the
+request path.
+
+Replay runs each case through the current prompt builder, response parser and
+server-side rules with the model "served" from the recorded response, so it is
+deterministic and needs no network.  Each case is replayed with its recorded
+settings unless ``--config`` gives others; cases recorded under another
+config version than the one replayed are counted in ``config_mismatch``.  The
+corpus is split across worker
+processes; the report lists decision diffs, cases whose prompt changed (their
+recorded response may no longer be representative) and throughput::
+
+    python replay.py corpus/ --config risk_config.json --workers 8 --report diff.json
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from risk_config import RiskConfig, derive_config
+from risk_core import (
+    apply_risk_rules,
+    build_optimized_groq_prompt,
+    fallback_analysis,
+    parse_llm_response,
+)
+
+SCORE_TOLERANCE = 1e-9
+
+
+class CorpusRecorder:
+    """Pair each transaction's raw model response with its final decision.
+
+    The response is captured where the model is called and the decision once
+    the server-side rules have run; a case is written when both halves are
+    known, in either order (streamed responses finish after the decision).
+    """
+
+    def __init__(self, directory, max_pending=10000, **audit_log_options):
+        from audit_log import AuditLog
+
+        self.log = AuditLog(directory, **audit_log_options)
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._pending = OrderedDict()
+
+    def record_response(self, transaction_id, prompt, content, batched=False):
+        """``batched``: ``prompt`` scored several transactions and ``content`` is this one's result"""
+        half = {"prompt": prompt, "llm_content": content}
+        if batched:
+            half["batched"] = True
+        self._add(transaction_id, half)
+
+    def record_decision(self, transaction, features, risk_analysis, config=None):
+        """``config``: the ``RiskConfig`` the decision was made with, whose settings are kept for replay"""
+        half = {
+            "transaction": transaction,
+            "features": features,
+            "decision": {
+                "risk_score": risk_analysis.get("risk_score"),
+                "recommended_action": risk_analysis.get("recommended_action"),
+                "config_version": risk_analysis.get("config_version")
+            }
+        }
+        if config is not None:
+            half["config"] = config.settings()
+        self._add(transaction.get("transaction_id"), half)
+
+    def _add(self, transaction_id, half):
+        with self._lock:
+            case = self._pending.pop(transaction_id, None)
+            if case is None:
+                self._pending[transaction_id] = half
+                while len(self._pending) > self.max_pending:
+                    self._pending.popitem(last=False)  # Never completed (e.g. the model call failed)
+                return
+        case.update(half)
+        self.log.append("case", case)
+
+    def close(self):
+        self.log.close()
+
+
+def load_corpus(directory):
+    """Every recorded case in ``directory``, oldest first"""
+    from audit_log import replay
+
+    return [entry["data"] for entry in replay(directory) if entry.get("kind") == "case"]
+
+
+def replay_case(case, config):
+    """Re-score one recorded case with the current code and ``config``"""
+    transaction = case["transaction"]
+    features = case.get("features")
+    content = case["llm_content"]
+    # A batched prompt also lists the other transactions of its batch, so its changes are not detected
+    prompt_changed = (not case.get("batched") and
+                      build_optimized_groq_prompt(transaction, features, config) != case.get("prompt"))
+    try:
+        risk_analysis = parse_llm_response(content)
+    except (ValueError, TypeError):
+        risk_analysis = fallback_analysis("LLM parsing error", f"Could not parse model response: {content[:100]}...")
+    apply_risk_rules(transaction, risk_analysis, features, config.high_risk_country_set, config.high_risk_min_score)
+    return risk_analysis, prompt_changed
+
+
+def _replay_chunk(cases, settings):
+    configs = {}  # Canonical settings -> RiskConfig, so each distinct recorded config is built once
+    results = []
+    for case in cases:
+        try:
+            case_settings = (case.get("config") or {}) if settings is None else settings
+            key = json.dumps(case_settings, sort_keys=True)
+            config = configs.get(key)
+            if config is None:
+                config = configs[key] = derive_config(RiskConfig(), case_settings)
+            risk_analysis, prompt_changed = replay_case(case, config)
+            results.append((risk_analysis["risk_score"], risk_analysis["recommended_action"], prompt_changed,
+                            config.version, None))
+        except Exception as e:
+            results.append((None, None, False, None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def run_replay(cases, config=None, workers=None, chunk_size=500, max_diffs=1000):
+    """Replay ``cases`` in parallel and diff the decisions against the recording.
+
+    Without ``config`` each case is replayed with the settings it was recorded
+    with (the defaults for cases recorded without them).
+    """
+    settings = config.settings() if config is not None else None
+    workers = workers or os.cpu_count() or 1
+    chunks = [cases[i:i + chunk_size] for i in range(0, len(cases), chunk_size)]
+
+    started = time.perf_counter()
+    if workers == 1 or len(chunks) <= 1:
+        results = [_replay_chunk(chunk, settings) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            results = list(pool.map(_replay_chunk, chunks, [settings] * len(chunks)))
+    elapsed = time.perf_counter() - started
+
+    transitions = Counter()
+    diffs = []
+    summary = Counter()
+    for case, (risk_score, action, prompt_changed, version, error) in zip(
+            cases, (r for chunk in results for r in chunk)):
+        summary["cases"] += 1
+        summary["prompt_changed"] += prompt_changed
+        if error is not None:
+            summary["errors"] += 1
+            if len(diffs) < max_diffs:
+                diffs.append({"transaction_id": case["transaction"].get("transaction_id"), "error": error})
+            continue
+        recorded = case["decision"]
+        if recorded.get("config_version") is not None and recorded["config_version"] != version:
+            summary["config_mismatch"] += 1
+        action_changed = action != recorded["recommended_action"]
+        score_changed = abs(risk_score - (recorded["risk_score"] or 0.0)) > SCORE_TOLERANCE
+        if action_changed:
+            summary["action_changed"] += 1
+            transitions[f"{recorded['recommended_action']}->{action}"] += 1
+        if score_changed:
+            summary["score_changed"] += 1
+        if not (action_changed or score_changed):
+            continue
+        summary["changed"] += 1
+        if len(diffs) < max_diffs:
+            diffs.append({
+                "transaction_id": case["transaction"].get("transaction_id"),
+                "recorded": {"risk_score": recorded["risk_score"], "recommended_action": recorded["recommended_action"]},
+                "replayed": {"risk_score": risk_score, "recommended_action": action},
+                "prompt_changed": prompt_changed
+            })
+
+    return {
+        "cases": summary["cases"],
+        "unchanged": summary["cases"] - summary["errors"] - summary["changed"],
+        "action_changed": summary["action_changed"],
+        "score_changed": summary["score_changed"],
+        "prompt_changed": summary["prompt_changed"],
+        "config_mismatch": summary["config_mismatch"],
+        "errors": summary["errors"],
+        "transitions": dict(transitions),
+        "elapsed_seconds": elapsed,
+        "cases_per_second": summary["cases"] / elapsed if elapsed else None,
+        "workers": workers,
+        "diffs": diffs
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded corpus and diff the scoring decisions")
+    parser.add_argument("corpus", help="Corpus directory (RECORD_CORPUS_DIR of the recording server)")
+    parser.add_argument("--config", help="Risk configuration file to replay with "
+                                         "(default: the settings each case was recorded with)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--report", help="Write the full JSON report to this file")
+    parser.add_argument("--fail-on-diff", action="store_true", help="Exit with status 1 if any decision changed")
+    args = parser.parse_args(argv)
+
+    config = None
+    if args.config:
+        with open(args.config, encoding="utf-8") as config_file:
+            config = derive_config(RiskConfig(), json.load(config_file))
+
+    cases = load_corpus(args.corpus)
+    report = run_replay(cases, config, args.workers)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as report_file:
+            json.dump(report, report_file, indent=2)
+
+    print(f"{report['cases']} cases in {report['elapsed_seconds']:.2f}s "
+          f"({report['cases_per_second'] or 0:.0f} cases/s, {report['workers']} workers)")
+    print(f"action changed: {report['action_changed']}  score changed: {report['score_changed']}  "
+          f"prompt changed: {report['prompt_changed']}  errors: {report['errors']}")
+    for transition, count in sorted(report["transitions"].items()):
+        print(f"  {transition}: {count}")
+    if report["config_mismatch"]:
+        print(f"warning: {report['config_mismatch']} cases were recorded with another risk configuration "
+              f"than they were replayed with", file=sys.stderr)
+    changed = report["action_changed"] or report["score_changed"] or report["errors"]
+    return 1 if args.fail_on_diff and changed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
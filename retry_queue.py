@@ -0,0 +1,225 @@
+"""Durable retry queue for transactions scored while the model was unavailable.
+
+When the model call fails, the transaction is answered with a placeholder
+analysis (see ``DEGRADED_FACTORS``).  Those transactions are put in this
+queue and re-scored in the background with exponential backoff and jitter.
+After a failed attempt, every retry waits for that attempt's backoff, so
+an outage costs one probe per backoff period rather than one call per
+queued transaction.
+
+The queue survives restarts through an append-only JSON-lines journal
+(``add`` and ``done`` entries) that is rewritten with only the pending
+entries once it has grown well beyond them.  ``add`` entries are fsynced
+before ``add`` returns, so a queued retry survives a power failure; ``done``
+entries are only flushed, as losing one merely re-scores that transaction
+again.  Memory and disk use are
+bounded by ``max_items``; when the queue is full, the oldest entry is
+dropped.
+"""
+import heapq
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# Risk factors of the placeholder analyses returned when the model call failed
+DEGRADED_FACTORS = frozenset(["API error", "Processing error"])
+
+
+def is_degraded(risk_analysis):
+    """Whether an analysis is a placeholder from a failed model call"""
+    return any(factor in DEGRADED_FACTORS for factor in risk_analysis.get("risk_factors") or ())
+
+
+class RetryQueue:
+    """Background re-scoring of degraded decisions with a durable journal.
+
+    ``rescore(transaction, features)`` returns a new risk analysis (``features``
+    are the local features of the original decision, None for entries queued
+    without them) and
+    ``on_rescored(transaction, old_analysis, new_analysis)`` is called once
+    the new analysis is no longer degraded.
+    """
+
+    def __init__(self, path, rescore, on_rescored, max_items=10000, base_delay=1.0, max_delay=300.0,
+                 max_attempts=20, fsync=True):
+        self.path = path
+        self.fsync = fsync
+        self.rescore = rescore
+        self.on_rescored = on_rescored
+        self.max_items = max_items
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._entries = {}  # transaction_id -> entry, in insertion order
+        self._schedule = []  # (due, sequence, transaction_id) heap
+        self._sequence = 0
+        self._backoff_until = 0.0
+        self._journal_lines = 0
+        self._closed = False
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._load()
+        self._journal = open(path, "a", encoding="utf-8")
+        self._worker = threading.Thread(target=self._run, name="retry-queue", daemon=True)
+        self._worker.start()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as journal:
+            for line in journal:
+                self._journal_lines += 1
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Torn last line after a crash
+                if record.get("op") == "add":
+                    self._entries[record["transaction_id"]] = record["entry"]
+                else:
+                    self._entries.pop(record.get("transaction_id"), None)
+        now = time.time()
+        for transaction_id in self._entries:
+            self._push(transaction_id, now)
+        METRICS.set_gauge("retry.pending", len(self._entries))
+        logger.info("Loaded %d pending retries from %s", len(self._entries), self.path, extra={"event": "retry.loaded"})
+
+    def _push(self, transaction_id, due):
+        self._sequence += 1
+        heapq.heappush(self._schedule, (due, self._sequence, transaction_id))
+
+    def _write(self, record, durable=False):
+        self._journal.write(json.dumps(record, default=str) + "\n")
+        self._journal.flush()
+        if durable and self.fsync:
+            os.fsync(self._journal.fileno())
+        self._journal_lines += 1
+        if self._journal_lines > 2 * len(self._entries) + 1000:
+            self._compact()
+
+    def _compact(self):
+        """Rewrite the journal with only the pending entries"""
+        temporary = self.path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as journal:
+            for transaction_id, entry in self._entries.items():
+                journal.write(json.dumps({"op": "add", "transaction_id": transaction_id, "entry": entry},
+                                         default=str) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+        self._journal.close()
+        os.replace(temporary, self.path)
+        self._journal = open(self.path, "a", encoding="utf-8")
+        self._journal_lines = len(self._entries)
+
+    def add(self, transaction, risk_analysis, features=None):
+        """Queue a degraded decision, with the local features it was made with, for re-scoring"""
+        transaction_id = transaction.get("transaction_id")
+        entry = {
+            "transaction": transaction,
+            "features": features,
+            "risk_analysis": {key: risk_analysis.get(key) for key in
+                              ("risk_score", "risk_factors", "reasoning", "recommended_action")},
+            "queued_at": time.time(),
+            "attempts": 0
+        }
+        with self._lock:
+            if transaction_id not in self._entries and len(self._entries) >= self.max_items:
+                oldest = next(iter(self._entries))
+                self._finish(oldest)
+                METRICS.increment("retry.dropped")
+            self._entries[transaction_id] = entry
+            self._write({"op": "add", "transaction_id": transaction_id, "entry": entry}, durable=True)
+            self._push(transaction_id, time.time() + self._delay(0))
+            METRICS.increment("retry.enqueued")
+            METRICS.set_gauge("retry.pending", len(self._entries))
+            self._wakeup.notify()
+
+    def _finish(self, transaction_id):
+        del self._entries[transaction_id]
+        self._write({"op": "done", "transaction_id": transaction_id})
+        METRICS.set_gauge("retry.pending", len(self._entries))
+
+    def _delay(self, attempts):
+        """Exponential backoff with full jitter between 50% and 150% of the nominal delay"""
+        return min(self.max_delay, self.base_delay * 2 ** attempts) * random.uniform(0.5, 1.5)
+
+    def _next_due(self):
+        """Pop the next due transaction id, waiting as needed; None once closed"""
+        with self._lock:
+            while not self._closed:
+                now = time.time()
+                if self._schedule and self._schedule[0][0] <= now and self._backoff_until <= now:
+                    transaction_id = heapq.heappop(self._schedule)[2]
+                    if transaction_id in self._entries:
+                        return transaction_id, self._entries[transaction_id]
+                    continue  # Finished or dropped since it was scheduled
+                wake_at = max(self._schedule[0][0], self._backoff_until) if self._schedule else None
+                self._wakeup.wait(None if wake_at is None else max(0.0, wake_at - now))
+            return None
+
+    def _run(self):
+        while True:
+            due = self._next_due()
+            if due is None:
+                return
+            transaction_id, entry = due
+            try:
+                risk_analysis = self.rescore(entry["transaction"], entry.get("features"))
+            except Exception as e:
+                logger.error("Re-scoring %s failed: %s", transaction_id, e,
+                             extra={"event": "retry.failed", "transaction_id": transaction_id})
+                risk_analysis = None
+
+            with self._lock:
+                if self._entries.get(transaction_id) is not entry:
+                    continue  # Replaced or dropped while re-scoring
+                if risk_analysis is None or is_degraded(risk_analysis):
+                    entry["attempts"] += 1
+                    METRICS.increment("retry.failed_attempts")
+                    if entry["attempts"] >= self.max_attempts:
+                        logger.warning("Giving up re-scoring %s after %d attempts", transaction_id, entry["attempts"],
+                                       extra={"event": "retry.gave_up", "transaction_id": transaction_id})
+                        METRICS.increment("retry.gave_up")
+                        self._finish(transaction_id)
+                        continue
+                    delay = self._delay(entry["attempts"])
+                    # The backend is likely still down: hold back every retry, not just this one
+                    self._backoff_until = time.time() + delay
+                    self._push(transaction_id, self._backoff_until)
+                    continue
+                self._finish(transaction_id)
+            METRICS.increment("retry.succeeded")
+            try:
+                self.on_rescored(entry["transaction"], entry["risk_analysis"], risk_analysis)
+            except Exception as e:
+                logger.error("Failed to apply re-scored analysis for %s: %s", transaction_id, e,
+                             extra={"event": "retry.apply_failed", "transaction_id": transaction_id})
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": len(self._entries),
+                "backoff_seconds": max(0.0, self._backoff_until - time.time())
+            }
+
+    def close(self):
+        """Stop the worker and close the journal; pending entries stay on disk"""
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+        self._worker.join()
+        with self._lock:
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            self._journal.close()
@@ -0,0 +1,221 @@
+"""Versioned, hot-reloadable risk configuration.
+
+The active configuration is an immutable ``RiskConfig`` snapshot.  Updates
+(from the config file or the admin API) build and validate a complete new
+snapshot and then publish it with a single reference assignment, so request
+threads read ``CONFIG.current`` without taking any lock and always see one
+consistent version for the values they use.
+
+Versions are derived from the settings themselves, so the ``config_version``
+stamped on analyses, audit entries, the columnar archive and the replay
+corpus identifies the same settings in every process and across restarts.
+
+The optional config file is JSON with any subset of the ``RiskConfig``
+fields; missing fields keep their defaults::
+
+    {"block_threshold": 0.65, "high_risk_countries": ["RU", "IR", "KP"]}
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field, fields
+
+from risk_core import (
+    DEFAULT_HIGH_RISK_COUNTRIES,
+    GROQ_MAX_TOKENS,
+    GROQ_MODEL,
+    GROQ_TEMPERATURE,
+    HIGH_RISK_COUNTRY_MIN_SCORE,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RiskConfig:
+    """One immutable version of the tunable risk settings"""
+
+    allow_threshold: float = 0.3
+    block_threshold: float = 0.7
+    high_risk_countries: tuple = DEFAULT_HIGH_RISK_COUNTRIES
+    high_risk_min_score: float = HIGH_RISK_COUNTRY_MIN_SCORE
+    model: str = GROQ_MODEL
+    temperature: float = GROQ_TEMPERATURE
+    max_tokens: int = GROQ_MAX_TOKENS
+    version: int = field(default=None, compare=False)  # Derived from the settings when not given
+    source: str = field(default="default", compare=False)
+
+    def __post_init__(self):
+        if self.version is None:
+            object.__setattr__(self, "version", settings_version(self.settings()))
+
+    @property
+    def high_risk_country_set(self):
+        """The high-risk countries as a frozenset for O(1) membership checks"""
+        cached = self.__dict__.get("_high_risk_country_set")
+        if cached is None:
+            cached = frozenset(self.high_risk_countries)
+            object.__setattr__(self, "_high_risk_country_set", cached)
+        return cached
+
+    def settings(self):
+        """The tunable values as a JSON-serializable dict"""
+        values = asdict(self)
+        values["high_risk_countries"] = list(self.high_risk_countries)
+        del values["version"], values["source"]
+        return values
+
+    def to_dict(self):
+        return {"version": self.version, "source": self.source, "settings": self.settings()}
+
+
+def settings_version(settings):
+    """Stable version number of a settings dict: equal settings get the same number in every process"""
+    canonical = json.dumps(settings, sort_keys=True, separators=(",", ":"))
+    return int(hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:12], 16)  # 48 bits, exact in JSON
+
+
+SETTING_NAMES = tuple(f.name for f in fields(RiskConfig) if f.name not in ("version", "source"))
+
+
+def validate_settings(settings):
+    """Check a full settings dict; returns a list of error messages"""
+    errors = []
+    unknown = sorted(set(settings) - set(SETTING_NAMES))
+    if unknown:
+        errors.append(f"Unknown settings: {', '.join(unknown)}")
+
+    def number(name, low, high):
+        value = settings.get(name)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not low <= value <= high:
+            errors.append(f"{name} must be a number between {low} and {high}")
+            return None
+        return value
+
+    allow = number("allow_threshold", 0.0, 1.0)
+    block = number("block_threshold", 0.0, 1.0)
+    if allow is not None and block is not None and allow >= block:
+        errors.append("allow_threshold must be lower than block_threshold")
+    number("high_risk_min_score", 0.0, 1.0)
+    number("temperature", 0.0, 2.0)
+
+    max_tokens = settings.get("max_tokens")
+    if isinstance(max_tokens, bool) or not isinstance(max_tokens, int) or not 1 <= max_tokens <= 8192:
+        errors.append("max_tokens must be an integer between 1 and 8192")
+
+    model = settings.get("model")
+    if not isinstance(model, str) or not model.strip():
+        errors.append("model must be a non-empty string")
+
+    countries = settings.get("high_risk_countries")
+    if not isinstance(countries, (list, tuple)) or not all(
+            isinstance(country, str) and len(country) == 2 and country.isalpha() and country.isupper()
+            for country in countries):
+        errors.append("high_risk_countries must be a list of ISO 3166-1 alpha-2 codes")
+    return errors
+
+
+class ConfigError(ValueError):
+    """Raised when a configuration update fails validation"""
+
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+def derive_config(base, changes, source=None):
+    """Validated copy of ``base`` with ``changes`` applied (versioned by its settings); raises ConfigError"""
+    settings = dict(base.settings(), **changes)
+    errors = validate_settings(settings)
+    if errors:
+        raise ConfigError(errors)
+    settings["high_risk_countries"] = tuple(settings["high_risk_countries"])
+    return RiskConfig(source=base.source if source is None else source, **settings)
+
+
+class ConfigStore:
+    """Holder of the active ``RiskConfig`` with copy-on-write updates"""
+
+    def __init__(self, path=None, check_interval=5.0):
+        self._write_lock = threading.Lock()
+        self.current = RiskConfig()
+        self.path = None
+        self.check_interval = check_interval
+        self._mtime = None
+        self._next_check = float("inf")
+        if path:
+            self.load_file(path)
+
+    def get(self):
+        """The active snapshot, picking up config file edits when due"""
+        if time.monotonic() >= self._next_check:
+            self.reload_if_changed()
+        return self.current
+
+    def _activate(self, base, changes, source):
+        config = derive_config(base, changes, source=source)
+        self.current = config  # Single reference swap; readers never lock
+        logger.info("Activated risk configuration version %s from %s", config.version, source,
+                    extra={"event": "config.activated"})
+        return config
+
+    def update(self, changes, source="api"):
+        """Validate and activate ``changes`` on top of the current settings.
+
+        The new settings are written back to the config file (if any) so they
+        survive restarts.  Raises ConfigError if validation fails.
+        """
+        if not isinstance(changes, dict):
+            raise ConfigError(["Configuration must be a JSON object"])
+        with self._write_lock:
+            config = self._activate(self.current, changes, source)
+            if self.path:
+                self._write_file(config)
+            return config
+
+    def load_file(self, path):
+        """Use ``path`` as the config file and activate its contents"""
+        self.path = path
+        self._next_check = time.monotonic() + self.check_interval
+        if os.path.exists(path):
+            self.reload_if_changed(force=True)
+
+    def reload_if_changed(self, force=False):
+        """Activate the config file if it changed; invalid files are rejected.
+
+        With ``force`` the file is re-read even if unchanged, waiting for an
+        update or reload already in progress; otherwise a check that finds
+        the lock held is skipped.
+        """
+        if not self._write_lock.acquire(blocking=force):
+            return self.current
+        try:
+            self._next_check = time.monotonic() + self.check_interval
+            if not force and not os.path.exists(self.path):
+                return self.current  # Keep the active settings until a file is written
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime == self._mtime and not force:
+                return self.current
+            self._mtime = mtime
+            with open(self.path, encoding="utf-8") as config_file:
+                changes = json.load(config_file)
+            if not isinstance(changes, dict):
+                raise ConfigError(["Configuration must be a JSON object"])
+            return self._activate(RiskConfig(), changes, "file")
+        except (OSError, ValueError) as e:
+            logger.error("Rejected risk configuration file %s: %s", self.path, e, extra={"event": "config.rejected"})
+            if force:
+                raise
+            return self.current
+        finally:
+            self._write_lock.release()
+
+    def _write_file(self, config):
+        temporary = self.path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as config_file:
+            json.dump(config.settings(), config_file, indent=2)
+        os.replace(temporary, self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
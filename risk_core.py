@@ -0,0 +1,450 @@
+"""Dependency-light core of the Transaction Risk Analyzer.
+
+Everything in this module is pure logic (validation, prompt building, LLM
+response parsing and the deterministic risk rules) and only uses the standard
+library, so it can be imported by tests and CLI tooling without paying for
+Flask, Socket.IO or requests.  Server.py wires these functions into the web app.
+"""
+import json
+from datetime import datetime
+
+from llm_parser import parse_json_object
+
+DEFAULT_HIGH_RISK_COUNTRIES = ('RU', 'IR', 'KP', 'VE', 'MM')
+HIGH_RISK_COUNTRIES = frozenset(DEFAULT_HIGH_RISK_COUNTRIES)
+HIGH_RISK_COUNTRY_MIN_SCORE = 0.8  # Minimum score for transactions touching a high-risk country
+VALID_ACTIONS = ["allow", "review", "block"]
+ALLOW_THRESHOLD = 0.3  # Scores below this are "allow"
+BLOCK_THRESHOLD = 0.7  # Scores at or above this are "block"
+AMOUNT_ANOMALY_PERCENTILE = 0.99  # Amounts at or above this percentile of their merchant/category are flagged
+SHARED_IP_MIN_CUSTOMERS = 5  # An IP address used by this many customers is flagged
+SHARED_CARD_MIN_CUSTOMERS = 3  # A card used by this many customers is flagged
+LINKED_CUSTOMERS_MIN = 10  # A cluster of this many customers linked by IPs and cards is flagged
+
+GROQ_MODEL = "llama3-8b-8192"
+GROQ_TEMPERATURE = 0.1
+GROQ_MAX_TOKENS = 300
+
+
+def utc_now_iso():
+    """Current UTC time in the ISO-8601 'Z' format used throughout the API"""
+    return datetime.utcnow().isoformat() + "Z"
+
+
+def validate_transaction_data(data):
+    """Validate that transaction data has required structure"""
+    if not isinstance(data, dict):
+        return False, "Data must be a JSON object"
+
+    # Required top-level fields
+    required_fields = ["transaction_id", "timestamp", "amount", "currency", "customer", "payment_method", "merchant"]
+
+    for field in required_fields:
+        if field not in data:
+            return False, f"Missing required field: {field}"
+        # Also check for empty values
+        if data[field] == "" or data[field] is None:
+            return False, f"Empty value for required field: {field}"
+
+     # Validate amount is a valid number
+    try:
+        amount = float(data["amount"])
+        if not (isinstance(amount, (int, float)) and amount >= 0 and amount < float('inf')):
+            return False, "Amount must be a valid positive number"
+        data["amount"] = amount  # Convert to float
+    except (ValueError, TypeError):
+        return False, "Amount must be a valid number"
+
+    # Validate customer structure
+    customer = data.get("customer", {})
+    customer_fields = ["id", "country", "ip_address"]
+    for field in customer_fields:
+        if field not in customer:
+            return False, f"Missing customer field: {field}"
+        # Check for empty values
+        if customer[field] == "" or customer[field] is None:
+            return False, f"Empty value for customer field: {field}"
+
+    # Validate payment_method structure
+    payment_method = data.get("payment_method", {})
+    payment_fields = ["type", "last_four", "country_of_issue"]
+    for field in payment_fields:
+        if field not in payment_method:
+            return False, f"Missing payment_method field: {field}"
+        # Check for empty values
+        if payment_method[field] == "" or payment_method[field] is None:
+            return False, f"Empty value for payment_method field: {field}"
+
+    # Validate merchant structure
+    merchant = data.get("merchant", {})
+    merchant_fields = ["id", "name", "category"]
+    for field in merchant_fields:
+        if field not in merchant:
+            return False, f"Missing merchant field: {field}"
+        # Check for empty values
+        if merchant[field] == "" or merchant[field] is None:
+            return False, f"Empty value for merchant field: {field}"
+
+    # Validate data types
+    try:
+        float(data["amount"])
+    except (ValueError, TypeError):
+        return False, "Amount must be a valid number"
+
+    return True, "Valid"
+
+
+def _prompt_settings(config):
+    """(countries, allow, block, model, temperature, max_tokens) for a prompt"""
+    if config is None:
+        return (list(DEFAULT_HIGH_RISK_COUNTRIES), ALLOW_THRESHOLD, BLOCK_THRESHOLD,
+                GROQ_MODEL, GROQ_TEMPERATURE, GROQ_MAX_TOKENS)
+    return (list(config.high_risk_countries), config.allow_threshold, config.block_threshold,
+            config.model, config.temperature, config.max_tokens)
+
+
+def build_optimized_groq_prompt(transaction, features=None, config=None):
+    """Build an optimized prompt for GROQ API based on transaction data
+
+    ``features`` are locally computed signals (e.g. IP geolocation, amount
+    percentiles) that are added to the prompt when available.  ``config`` is
+    the active ``risk_config.RiskConfig``; the module defaults are used
+    without one.
+    """
+    countries, allow, block, model, temperature, max_tokens = _prompt_settings(config)
+    transaction_json = json.dumps(transaction, indent=2)
+    features_text = f"\nLocal Risk Signals:\n{json.dumps(features, indent=2)}\n" if features else ""
+
+    prompt_text = f"""You are a financial risk analyst. Evaluate this transaction and return a risk score (0.0-1.0).
+
+Transaction Data:
+{transaction_json}
+{features_text}
+Consider these risk factors:
+- Geographic anomalies (high-risk countries({countries} vs customer country vs payment country ))
+- Unusual amounts for merchant category
+- Payment method risks
+- IP/location inconsistencies
+- Merchant category and typical fraud rates
+- Merchant's history and reputation
+
+
+Respond ONLY in this JSON format:
+{{
+    "risk_score": 0.0,
+    "risk_factors": ["list", "of", "factors"],
+    "reasoning": "brief explanation",
+    "recommended_action": "allow|review|block"
+}}
+
+Risk thresholds: 0.0-{allow} = allow, {allow}-{block} = review, {block}-1.0 = block"""
+
+    return {
+        "model": model,
+        "messages": [{"role": "user", "content": prompt_text}],
+        "temperature": temperature,
+        "max_tokens": max_tokens
+    }
+
+
+def build_batch_groq_prompt(transactions, features=None, config=None):
+    """Build one prompt that scores several transactions at once
+
+    ``features`` is an optional list of local risk signals aligned with
+    ``transactions``.  The model answers with one result per transaction,
+    keyed by transaction_id (see parse_batch_llm_response).
+    """
+    countries, allow, block, model, temperature, max_tokens = _prompt_settings(config)
+    items = []
+    for i, transaction in enumerate(transactions):
+        item = {"transaction": transaction}
+        if features and features[i]:
+            item["local_risk_signals"] = features[i]
+        items.append(item)
+    prompt_text = f"""You are a financial risk analyst. Evaluate each of these {len(transactions)} transactions independently and return a risk score (0.0-1.0) for each.
+
+Transactions:
+{json.dumps(items, indent=2)}
+
+Consider these risk factors:
+- Geographic anomalies (high-risk countries({countries} vs customer country vs payment country ))
+- Unusual amounts for merchant category
+- Payment method risks
+- IP/location inconsistencies
+- Merchant category and typical fraud rates
+- Merchant's history and reputation
+
+
+Respond ONLY in this JSON format, with one entry per transaction:
+{{
+    "results": [
+        {{
+            "transaction_id": "id of the transaction",
+            "risk_score": 0.0,
+            "risk_factors": ["list", "of", "factors"],
+            "reasoning": "brief explanation",
+            "recommended_action": "allow|review|block"
+        }}
+    ]
+}}
+
+Risk thresholds: 0.0-{allow} = allow, {allow}-{block} = review, {block}-1.0 = block"""
+
+    return {
+        "model": model,
+        "messages": [{"role": "user", "content": prompt_text}],
+        "temperature": temperature,
+        "max_tokens": max_tokens * len(transactions)
+    }
+
+
+def fallback_analysis(risk_factor, reasoning, risk_score=0.5):
+    """Risk analysis used when the model could not be consulted or understood"""
+    return {
+        "risk_score": risk_score,
+        "risk_factors": [risk_factor],
+        "reasoning": reasoning,
+        "recommended_action": "review"
+    }
+
+
+def normalize_risk_analysis(parsed_result):
+    """Validate and sanitize a decoded model response into a risk analysis"""
+    risk_score = float(parsed_result.get("risk_score", 0.5))
+    risk_score = max(0.0, min(1.0, risk_score))  # Clamp between 0 and 1
+
+    risk_factors = parsed_result.get("risk_factors", [])
+    if not isinstance(risk_factors, list):
+        risk_factors = ["Analysis completed"]
+
+    reasoning = parsed_result.get("reasoning", "Risk analysis completed")
+
+    action = str(parsed_result.get("recommended_action", "review")).lower()
+    if action not in VALID_ACTIONS:
+        action = "review"
+
+    return {
+        "risk_score": risk_score,
+        "risk_factors": risk_factors,
+        "reasoning": reasoning,
+        "recommended_action": action
+    }
+
+
+def parse_llm_response(content):
+    """Parse the model's message content into a risk analysis.
+
+    The first JSON object in the content is used, so markdown fences and
+    surrounding prose are ignored.  Raises ValueError or TypeError when the
+    content cannot be understood; callers decide on the fallback.
+    """
+    return normalize_risk_analysis(parse_json_object(content))
+
+
+def parse_batch_llm_response(content, transaction_ids):
+    """Parse a batched answer into {transaction_id: risk analysis}.
+
+    Results are matched by transaction_id (or by position when the model
+    omitted the ids but answered every transaction).  Transactions without a
+    usable result are left out; callers decide how to retry them.  Raises
+    ValueError or TypeError when the content cannot be understood at all.
+    """
+    results = parse_json_object(content).get("results")
+    if not isinstance(results, list):
+        raise ValueError("Batched response has no results list")
+    wanted = {str(transaction_id): transaction_id for transaction_id in transaction_ids}
+    positional = len(results) == len(transaction_ids) and not any(
+        isinstance(result, dict) and "transaction_id" in result for result in results)
+
+    analyses = {}
+    for i, result in enumerate(results):
+        if not isinstance(result, dict):
+            continue
+        transaction_id = transaction_ids[i] if positional else wanted.get(str(result.get("transaction_id")))
+        if transaction_id is None or transaction_id in analyses:
+            continue
+        try:
+            analyses[transaction_id] = normalize_risk_analysis(result)
+        except (ValueError, TypeError):
+            continue
+    return analyses
+
+
+def find_high_risk_country(transaction_data, high_risk_countries=HIGH_RISK_COUNTRIES, ip_country=None):
+    """Return the high-risk country a transaction involves, or None"""
+    customer_country = transaction_data.get("customer", {}).get("country")
+    payment_country = transaction_data.get("payment_method", {}).get("country_of_issue")
+
+    if customer_country in high_risk_countries:
+        return customer_country
+    if payment_country in high_risk_countries:
+        return payment_country
+    if ip_country in high_risk_countries:
+        return ip_country
+    return None
+
+
+def apply_ip_rules(transaction_data, risk_analysis, features):
+    """Add risk factors derived from the local IP geolocation/reputation lookup"""
+    if not features:
+        return
+    risk_factors = risk_analysis.setdefault("risk_factors", [])
+    if features.get("ip_country_mismatch"):
+        customer_country = transaction_data.get("customer", {}).get("country")
+        factor = f"IP address located in {features['ip_country']}, customer country is {customer_country}"
+        if factor not in risk_factors:
+            risk_factors.append(factor)
+    if features.get("ip_reputation"):
+        factor = f"IP address on risk list: {features['ip_reputation']}"
+        if factor not in risk_factors:
+            risk_factors.append(factor)
+
+
+def apply_amount_rules(transaction_data, risk_analysis, features, percentile=AMOUNT_ANOMALY_PERCENTILE):
+    """Add risk factors for amounts unusually high for the merchant or merchant category"""
+    if not features:
+        return
+    risk_factors = risk_analysis.setdefault("risk_factors", [])
+    merchant = transaction_data.get("merchant", {})
+    for scope, label in (("merchant", f"merchant {merchant.get('id')}"),
+                         ("category", f"merchant category {merchant.get('category')}")):
+        rank = features.get(f"{scope}_amount_percentile")
+        if rank is None or rank < percentile:
+            continue
+        factor = (f"Amount above the {percentile * 100:g}th percentile for {label} "
+                  f"(percentile {rank * 100:.1f} of {features[f'{scope}_amount_history']} transactions)")
+        if factor not in risk_factors:
+            risk_factors.append(factor)
+
+
+def link_risk_factors(features):
+    """Risk factors for IP addresses, cards and clusters shared by many customers"""
+    if not features or "linked_customers" not in features:
+        return []
+    factors = []
+    if features.get("ip_customers", 0) >= SHARED_IP_MIN_CUSTOMERS:
+        factors.append(f"IP address shared by {features['ip_customers']} customers")
+    if features.get("card_customers", 0) >= SHARED_CARD_MIN_CUSTOMERS:
+        factors.append(f"Card used by {features['card_customers']} customers")
+    if features["linked_customers"] >= LINKED_CUSTOMERS_MIN:
+        factors.append(f"Customer linked to {features['linked_customers'] - 1} others through shared IP addresses "
+                       f"and cards")
+    return factors
+
+
+def apply_link_rules(risk_analysis, features):
+    """Add risk factors derived from the entity link index"""
+    risk_factors = risk_analysis.setdefault("risk_factors", [])
+    for factor in link_risk_factors(features):
+        if factor not in risk_factors:
+            risk_factors.append(factor)
+
+
+def apply_high_risk_country_rule(transaction_data, risk_analysis, high_risk_countries=HIGH_RISK_COUNTRIES,
+                                 ip_country=None, min_score=None):
+    """Flag transactions involving a high-risk country.
+
+    Adds the high-risk country factor and forces a "block" recommendation the
+    first time the rule fires; with ``min_score`` the risk score is also raised
+    to at least that value.  Returns the offending country, or None when the
+    transaction does not touch the high-risk list.
+    """
+    country = find_high_risk_country(transaction_data, high_risk_countries, ip_country)
+    if country is None:
+        return None
+
+    # Add high-risk country factor if not already present
+    risk_factors = risk_analysis.get("risk_factors", [])
+    if not any(factor.startswith("Transaction involves high-risk country") for factor in risk_factors):
+        risk_factors.append(f"Transaction involves high-risk country: {country}")
+        risk_analysis["risk_factors"] = risk_factors
+        risk_analysis["recommended_action"] = "block"
+        if min_score is not None and (risk_analysis.get("risk_score") or 0.0) < min_score:
+            risk_analysis["risk_score"] = min_score
+
+    return country
+
+
+def apply_risk_rules(transaction_data, risk_analysis, features=None, high_risk_countries=HIGH_RISK_COUNTRIES,
+                     min_score=None):
+    """Apply every server-side rule to a model decision.
+
+    Returns the high-risk country the transaction involves, or None.
+    """
+    apply_ip_rules(transaction_data, risk_analysis, features)
+    apply_amount_rules(transaction_data, risk_analysis, features)
+    apply_link_rules(risk_analysis, features)
+    ip_country = features.get("ip_country") if features else None
+    return apply_high_risk_country_rule(transaction_data, risk_analysis, high_risk_countries, ip_country,
+                                        min_score=min_score)
+
+
+def rule_based_analysis(transaction_data, features=None, high_risk_countries=HIGH_RISK_COUNTRIES,
+                        allow_threshold=ALLOW_THRESHOLD, block_threshold=BLOCK_THRESHOLD,
+                        high_risk_min_score=HIGH_RISK_COUNTRY_MIN_SCORE):
+    """Score a transaction with the local rules alone, without calling a model"""
+    risk_score = 0.1
+    if transaction_data.get("payment_method", {}).get("country_of_issue") != \
+            transaction_data.get("customer", {}).get("country"):
+        risk_score += 0.2
+    if features:
+        risk_score += 0.2 if features.get("ip_country_mismatch") else 0.0
+        risk_score += 0.4 if features.get("ip_reputation") else 0.0
+        risk_score += 0.2 if features.get("ip_country_risk") == "elevated" else 0.0
+        risk_score += 0.2 if max(features.get("merchant_amount_percentile", 0.0),
+                                 features.get("category_amount_percentile", 0.0)) >= AMOUNT_ANOMALY_PERCENTILE else 0.0
+        risk_score += 0.2 if link_risk_factors(features) else 0.0
+    risk_score = min(1.0, risk_score)
+
+    if risk_score >= block_threshold:
+        action = "block"
+    elif risk_score >= allow_threshold:
+        action = "review"
+    else:
+        action = "allow"
+    risk_analysis = {
+        "risk_score": round(risk_score, 4),
+        "risk_factors": [],
+        "reasoning": "Local rule-based score",
+        "recommended_action": action
+    }
+    apply_risk_rules(transaction_data, risk_analysis, features, high_risk_countries, high_risk_min_score)
+    return risk_analysis
+
+
+def build_notification(transaction_data, risk_analysis):
+    """Create a notification in the format expected by the frontend"""
+    return {
+        "transaction_id": transaction_data.get("transaction_id"),
+        "timestamp": transaction_data.get("timestamp"),
+        "amount": transaction_data.get("amount"),
+        "currency": transaction_data.get("currency"),
+        "alert_type": "high_risk_transaction",
+        "status": "flagged",
+        "admin_notification_sent": True,
+        "risk_analysis": {
+            "risk_score": risk_analysis.get("risk_score"),
+            "risk_factors": risk_analysis.get("risk_factors", []),
+            "reasoning": risk_analysis.get("reasoning", ""),
+            "recommended_action": risk_analysis.get("recommended_action", "review")
+        },
+        # Include full transaction details for expanded view
+        "customer": transaction_data.get("customer", {}),
+        "payment_method": transaction_data.get("payment_method", {}),
+        "merchant": transaction_data.get("merchant", {}),
+        "transaction_details": transaction_data  # Keep original for reference
+    }
+
+
+def build_transaction_record(transaction_data, risk_analysis):
+    """Create the history entry stored for every processed transaction"""
+    return {
+        "transaction_id": transaction_data.get("transaction_id"),
+        "timestamp": transaction_data.get("timestamp", utc_now_iso()),
+        "amount": transaction_data.get("amount"),
+        "currency": transaction_data.get("currency"),
+        "risk_analysis": risk_analysis,
+        "customer": transaction_data.get("customer", {}),
+        "payment_method": transaction_data.get("payment_method", {}),
+        "merchant": transaction_data.get("merchant", {})
+    }
@@ -0,0 +1,435 @@
+"""Inverted index over processed transactions for GET /admin/search.
+
+Every recorded transaction gets a document id, in arrival order, and its
+risk factors, reasoning text and merchant id and name are tokenized into
+per-field posting lists: compact ``array``s of document ids, kept sorted, so
+adding a transaction only appends.  Analysis updates (streamed reasoning,
+re-scoring) keep the document id and patch the postings of the terms that
+changed.  The index is bounded like the history: the oldest documents are
+dropped, and their postings trimmed lazily in batches.
+
+Queries are boolean::
+
+    factor:"ip mismatch" AND (merchant:merch_42 OR reasoning:velocity) -action
+
+Terms are ANDed by default; ``OR``, ``NOT``/``-`` and parentheses combine
+them.  ``field:`` restricts a term to ``factor``, ``reasoning`` or
+``merchant``; a quoted phrase matches documents containing all of its words.
+Conjunctions start from the shortest posting list and probe the others by
+binary search, so selective queries stay fast however large the index grows.
+Results are newest first and paginated with a cursor (a document id), which
+stays stable while new transactions arrive.
+"""
+import heapq
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
+
+FIELDS = ("factor", "reasoning", "merchant")
+MAX_TOKEN_LENGTH = 40
+MAX_QUERY_TERMS = 32
+STOP_WORDS = frozenset((
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "in", "is", "it", "its", "of", "on",
+    "or", "that", "the", "this", "to", "was", "were", "which", "with"
+))
+_TOKEN = re.compile(r"\w+")
+_QUERY_TOKEN = re.compile(r'\s*(?:(\()|(\))|(-)?(?:(\w+):)?(?:"([^"]*)"|([^\s()"]+)))')
+
+
+def tokenize(text):
+    """Lower-cased word tokens of ``text`` without stop words, in order"""
+    if not isinstance(text, str):
+        return []
+    return [token for token in _TOKEN.findall(text.lower())
+            if token not in STOP_WORDS and len(token) <= MAX_TOKEN_LENGTH]
+
+
+def _analysis_terms(risk_analysis):
+    terms = set()
+    for factor in (risk_analysis or {}).get("risk_factors") or ():
+        terms.update(("factor", token) for token in tokenize(factor))
+    terms.update(("reasoning", token) for token in tokenize((risk_analysis or {}).get("reasoning")))
+    return terms
+
+
+def document_terms(record):
+    """(field, token) pairs indexed for a transaction record"""
+    merchant = record.get("merchant") or {}
+    terms = _analysis_terms(record.get("risk_analysis"))
+    merchant_id = merchant.get("id")
+    if isinstance(merchant_id, str) and merchant_id:
+        # The whole id is a term too, so ids with punctuation match exactly
+        terms.add(("merchant", merchant_id.lower()))
+        terms.update(("merchant", token) for token in tokenize(merchant_id))
+    terms.update(("merchant", token) for token in tokenize(merchant.get("name")))
+    return terms
+
+
+def _timestamp(value):
+    """Epoch seconds of an ISO-8601 timestamp, or None"""
+    if not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value[:-1] + "+00:00" if value.endswith("Z") else value)
+    except ValueError:
+        return None
+    return (parsed.replace(tzinfo=timezone.utc) if parsed.tzinfo is None else parsed).timestamp()
+
+
+def parse_time(value):
+    """Epoch seconds of an ISO-8601 date or datetime query parameter; raises ValueError"""
+    timestamp = _timestamp(value)
+    if timestamp is None:
+        raise ValueError(f"Invalid timestamp: {value!r}")
+    return timestamp
+
+
+def parse_query(text):
+    """Parse a boolean query into a tree; raises ValueError.
+
+    Nodes are ``("term", field, tokens)``, ``("and", children)``,
+    ``("or", children)`` and ``("not", child)``.
+    """
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError("Query must not be empty")
+    tokens = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = _QUERY_TOKEN.match(text, position)
+        if match is None or match.end() == position:
+            raise ValueError(f"Cannot parse query at: {text[position:]!r}")
+        position = match.end()
+        opening, closing, negated, field, phrase, word = match.groups()
+        if opening or closing:
+            tokens.append(opening or closing)
+        elif word in ("AND", "OR", "NOT") and not negated and not field:
+            tokens.append(word)
+        else:
+            if field is not None and field.lower() not in FIELDS:
+                raise ValueError(f"Unknown field {field!r}; expected one of {', '.join(FIELDS)}")
+            value = phrase if phrase is not None else word
+            if field is None and phrase is None and ":" in value:
+                raise ValueError(f"Unknown field in {value!r}; expected one of {', '.join(FIELDS)}")
+            term = ("term", field.lower() if field else None, tuple(tokenize(value)))
+            tokens.append(("not", term) if negated else term)
+    parser = _QueryParser(tokens)
+    tree = parser.expression()
+    if parser.position != len(tokens):
+        raise ValueError("Unbalanced parentheses in query")
+    if sum(1 for token in tokens if isinstance(token, tuple)) > MAX_QUERY_TERMS:
+        raise ValueError(f"At most {MAX_QUERY_TERMS} terms per query")
+    tree = _simplify(tree)
+    if tree is None:
+        raise ValueError("Query has no searchable words")
+    _check_negations(tree)
+    return tree
+
+
+class _QueryParser:
+    """Recursive descent over the query tokens: OR binds looser than AND, NOT binds tightest"""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def expression(self):
+        children = [self.conjunction()]
+        while self.peek() == "OR":
+            self.position += 1
+            children.append(self.conjunction())
+        return children[0] if len(children) == 1 else ("or", children)
+
+    def conjunction(self):
+        children = [self.unary()]
+        while self.peek() not in (None, ")", "OR"):
+            if self.peek() == "AND":
+                self.position += 1
+            children.append(self.unary())
+        return children[0] if len(children) == 1 else ("and", children)
+
+    def unary(self):
+        token = self.peek()
+        self.position += 1
+        if token == "NOT":
+            return ("not", self.unary())
+        if token == "(":
+            node = self.expression()
+            if self.peek() != ")":
+                raise ValueError("Unbalanced parentheses in query")
+            self.position += 1
+            return node
+        if isinstance(token, tuple):
+            return token
+        raise ValueError("Query is incomplete" if token is None else f"Unexpected {token!r} in query")
+
+
+def _simplify(node):
+    """Drop terms that are only stop words; None if nothing searchable remains"""
+    kind = node[0]
+    if kind == "term":
+        return node if node[2] else None
+    if kind == "not":
+        child = _simplify(node[1])
+        return None if child is None else ("not", child)
+    children = [child for child in map(_simplify, node[1]) if child is not None]
+    if not children:
+        return None
+    return children[0] if len(children) == 1 else (kind, children)
+
+
+def _check_negations(node, negatable=False):
+    """A negation is only meaningful next to a positive term in a conjunction"""
+    kind = node[0]
+    if kind == "not":
+        if not negatable:
+            raise ValueError("NOT must be combined with a term that is not negated, e.g. 'velocity -merchant:m1'")
+        _check_negations(node[1])
+    elif kind == "and":
+        if all(child[0] == "not" for child in node[1]):
+            raise ValueError("A conjunction needs at least one term that is not negated")
+        for child in node[1]:
+            _check_negations(child, negatable=True)
+    elif kind == "or":
+        for child in node[1]:
+            _check_negations(child)
+
+
+def _contains(postings, doc):
+    index = bisect_left(postings, doc)
+    return index < len(postings) and postings[index] == doc
+
+
+def _restrict(candidates, other):
+    """Documents of the set ``candidates`` also in ``other`` (a set or a sorted posting array)"""
+    if isinstance(other, set) or len(candidates) * 16 >= len(other):
+        return candidates.intersection(other)
+    return {doc for doc in candidates if _contains(other, doc)}
+
+
+def _exclude(candidates, other):
+    if isinstance(other, set) or len(candidates) * 16 >= len(other):
+        return candidates.difference(other)
+    return {doc for doc in candidates if not _contains(other, doc)}
+
+
+def _evaluate(node, postings):
+    """Matching documents of a query node: a set, or a sorted posting array for a single term"""
+    kind = node[0]
+    if kind == "term":
+        _, field, tokens = node
+        fields = (field,) if field else FIELDS
+        per_token = []
+        for token in tokens:
+            lists = [postings.get((name, token)) for name in fields]
+            lists = [docs for docs in lists if docs]
+            if not lists:
+                return set()
+            per_token.append(lists[0] if len(lists) == 1 else set().union(*lists))
+        return _conjunction(per_token)
+    if kind == "or":
+        return set().union(*(_evaluate(child, postings) for child in node[1]))
+    positives = [_evaluate(child, postings) for child in node[1] if child[0] != "not"]
+    result = _conjunction(positives)
+    for child in node[1]:
+        if child[0] == "not" and result:
+            result = _exclude(result if isinstance(result, set) else set(result), _evaluate(child[1], postings))
+    return result
+
+
+def _conjunction(parts):
+    if len(parts) == 1:
+        return parts[0]
+    parts = sorted(parts, key=len)
+    result = set(parts[0])
+    for part in parts[1:]:
+        if not result:
+            break
+        result = _restrict(result, part)
+    return result
+
+
+def _query_terms(node):
+    if node[0] == "term":
+        _, field, tokens = node
+        for token in tokens:
+            for name in ((field,) if field else FIELDS):
+                yield name, token
+    elif node[0] == "not":
+        yield from _query_terms(node[1])
+    else:
+        for child in node[1]:
+            yield from _query_terms(child)
+
+
+class SearchIndex:
+    """Bounded, incrementally updated inverted index of transaction records"""
+
+    def __init__(self, max_documents=100000):
+        self.max_documents = max_documents
+        self._lock = threading.Lock()
+        self._postings = {}  # (field, token) -> array of document ids, ascending
+        self._base = 0  # Document id of _transaction_ids[0]; older documents were dropped
+        self._trimmed = 0  # Postings hold no document ids below this
+        self._transaction_ids = []  # Per document, None once superseded by a newer record of the same transaction
+        self._timestamps = array("d")
+        self._scores = array("d")
+        self._documents = {}  # transaction id -> document id
+        self._superseded = set()
+        self.dropped = 0
+
+    def add(self, record):
+        """Index a transaction record; a record with a known transaction id supersedes the previous one"""
+        transaction_id = record.get("transaction_id")
+        analysis = record.get("risk_analysis") or {}
+        terms = document_terms(record)
+        timestamp = _timestamp(record.get("timestamp"))
+        with self._lock:
+            doc = self._base + len(self._transaction_ids)
+            previous = self._documents.get(transaction_id)
+            if previous is not None:
+                self._transaction_ids[previous - self._base] = None
+                self._superseded.add(previous)
+            self._documents[transaction_id] = doc
+            self._transaction_ids.append(transaction_id)
+            self._timestamps.append(time.time() if timestamp is None else timestamp)
+            self._scores.append(_score(analysis.get("risk_score")))
+            postings = self._postings
+            for term in terms:
+                docs = postings.get(term)
+                if docs is None:
+                    postings[term] = array("q", (doc,))
+                else:
+                    docs.append(doc)
+            if len(self._transaction_ids) > self.max_documents:
+                self._drop_oldest()
+        return doc
+
+    def update(self, transaction_id, risk_analysis, previous=None):
+        """Re-index the analysis of a transaction; ``previous`` is the analysis it replaces.
+
+        Without ``previous`` the terms of the old analysis cannot be removed and keep matching.
+        """
+        old_terms = _analysis_terms(previous) if previous is not None else set()
+        new_terms = _analysis_terms(risk_analysis)
+        with self._lock:
+            doc = self._documents.get(transaction_id)
+            if doc is None:
+                return False
+            self._scores[doc - self._base] = _score(risk_analysis.get("risk_score"))
+            for term in old_terms - new_terms:
+                docs = self._postings.get(term)
+                if docs is not None:
+                    index = bisect_left(docs, doc)
+                    if index < len(docs) and docs[index] == doc:
+                        del docs[index]
+                        if not docs:
+                            del self._postings[term]
+            for term in new_terms - old_terms:
+                docs = self._postings.get(term)
+                if docs is None:
+                    self._postings[term] = array("q", (doc,))
+                elif not docs or docs[-1] < doc:
+                    docs.append(doc)
+                elif not _contains(docs, doc):
+                    # Updates usually follow their transaction closely, so this inserts near the tail
+                    insort(docs, doc)
+        return True
+
+    def _drop_oldest(self):
+        """Drop the oldest documents down to 99% of the limit (called with the lock held)"""
+        count = len(self._transaction_ids) - self.max_documents + min(1024, self.max_documents // 100)
+        for offset, transaction_id in enumerate(self._transaction_ids[:count]):
+            if transaction_id is not None:
+                del self._documents[transaction_id]
+            else:
+                self._superseded.discard(self._base + offset)
+        del self._transaction_ids[:count]
+        del self._timestamps[:count]
+        del self._scores[:count]
+        self._base += count
+        self.dropped += count
+        # Queries skip dropped ids themselves; postings are trimmed once a quarter of the index is stale
+        if self._base - self._trimmed >= max(1, self.max_documents // 4):
+            for term in list(self._postings):
+                docs = self._postings[term]
+                stale = bisect_left(docs, self._base)
+                if stale == len(docs):
+                    del self._postings[term]
+                elif stale:
+                    del docs[:stale]
+            self._trimmed = self._base
+
+    def search(self, query, start=None, end=None, min_score=None, max_score=None, limit=50, cursor=None):
+        """Transaction ids matching ``query``, newest first; raises ValueError for an invalid query.
+
+        ``start``/``end`` (epoch seconds, end exclusive) filter on the transaction timestamp and
+        ``min_score``/``max_score`` on the risk score.  Returns ``{"transaction_ids", "total",
+        "next_cursor"}``; pass ``next_cursor`` as ``cursor`` for the following page.
+        """
+        tree = parse_query(query) if isinstance(query, str) else query
+        with self._lock:
+            base = self._base
+            # Copies of the postings involved, so evaluation runs without the lock
+            postings = {}
+            for term in set(_query_terms(tree)):
+                docs = self._postings.get(term)
+                if docs:
+                    postings[term] = docs[bisect_left(docs, base):]
+        matches = _evaluate(tree, postings)
+        with self._lock:
+            if not isinstance(matches, set):
+                matches = set(matches)
+            matches.difference_update(self._superseded)
+            base = self._base
+            timestamps, scores, transaction_ids = self._timestamps, self._scores, self._transaction_ids
+            if matches and min(matches) < base:
+                matches = [doc for doc in matches if doc >= base]
+            if start is not None or end is not None:
+                low = float("-inf") if start is None else start
+                high = float("inf") if end is None else end
+                matches = [doc for doc in matches if low <= timestamps[doc - base] < high]
+            if min_score is not None or max_score is not None:
+                # Documents without a score (NaN) fail both comparisons
+                low = float("-inf") if min_score is None else min_score
+                high = float("inf") if max_score is None else max_score
+                matches = [doc for doc in matches if low <= scores[doc - base] <= high]
+            total = len(matches)
+            pool = matches if cursor is None else [doc for doc in matches if doc < cursor]
+            page = heapq.nlargest(limit + 1, pool)
+            more = len(page) > limit
+            page = page[:limit]
+            return {
+                "transaction_ids": [transaction_ids[doc - base] for doc in page],
+                "total": total,
+                "next_cursor": page[-1] if more else None
+            }
+
+    def clear(self):
+        with self._lock:
+            self._base += len(self._transaction_ids)
+            self._trimmed = self._base
+            self._postings.clear()
+            self._transaction_ids.clear()
+            del self._timestamps[:]
+            del self._scores[:]
+            self._documents.clear()
+            self._superseded.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "documents": len(self._documents),
+                "terms": len(self._postings),
+                "dropped": self.dropped
+            }
+
+
+def _score(value):
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else float("nan")
@@ -0,0 +1,163 @@
+"""Shadow scoring: compare alternative scorers against live traffic.
+
+A sample of processed transactions is mirrored to one or more shadow scorers
+(a different model or prompt settings, or the local rules alone).  The
+primary decision has already been made when a transaction is submitted; the
+shadow scorers run on a background worker thread, so they never add latency
+to ``/webhook``.  When the bounded queue is full, samples are dropped rather
+than slowing the request thread down.
+
+Each shadow decision is compared with the primary one and folded into a
+per-scorer ``ShadowComparison``: agreement rate, an action confusion matrix,
+score deltas and both latencies, plus the most recent disagreements.
+"""
+import copy
+import logging
+import queue
+import threading
+import time
+import zlib
+from collections import deque
+
+from metrics import METRICS
+from stats import ACTIONS
+
+logger = logging.getLogger(__name__)
+
+
+def sampled(transaction_id, sample_rate):
+    """Deterministic sampling decision, so a retried transaction samples the same way"""
+    if sample_rate >= 1.0:
+        return True
+    if sample_rate <= 0.0:
+        return False
+    return zlib.crc32(str(transaction_id).encode("utf-8")) / 0xFFFFFFFF < sample_rate
+
+
+class ShadowComparison:
+    """Running comparison of one shadow scorer with the primary decisions"""
+
+    def __init__(self, name, recent=50):
+        self.name = name
+        self.count = 0
+        self.errors = 0
+        self.agreements = 0
+        self.confusion = {primary: dict.fromkeys(ACTIONS, 0) for primary in ACTIONS}
+        self.delta_sum = 0.0
+        self.abs_delta_sum = 0.0
+        self.max_abs_delta = 0.0
+        self.primary_ms = 0.0
+        self.shadow_ms = 0.0
+        self.shadow_max_ms = 0.0
+        self.disagreements = deque(maxlen=recent)
+
+    def add(self, transaction_id, primary, shadow, primary_ms, shadow_ms):
+        primary_action = primary.get("recommended_action", "review")
+        shadow_action = shadow.get("recommended_action", "review")
+        delta = float(shadow.get("risk_score") or 0.0) - float(primary.get("risk_score") or 0.0)
+        self.count += 1
+        self.confusion.setdefault(primary_action, dict.fromkeys(ACTIONS, 0))
+        row = self.confusion[primary_action]
+        row[shadow_action] = row.get(shadow_action, 0) + 1
+        self.delta_sum += delta
+        self.abs_delta_sum += abs(delta)
+        self.max_abs_delta = max(self.max_abs_delta, abs(delta))
+        self.primary_ms += primary_ms or 0.0
+        self.shadow_ms += shadow_ms
+        self.shadow_max_ms = max(self.shadow_max_ms, shadow_ms)
+        if primary_action == shadow_action:
+            self.agreements += 1
+        else:
+            self.disagreements.append({
+                "transaction_id": transaction_id,
+                "primary": {"risk_score": primary.get("risk_score"), "recommended_action": primary_action},
+                "shadow": {"risk_score": shadow.get("risk_score"), "recommended_action": shadow_action},
+                "score_delta": round(delta, 4)
+            })
+
+    def report(self):
+        count = self.count
+        return {
+            "name": self.name,
+            "compared": count,
+            "errors": self.errors,
+            "agreement_rate": self.agreements / count if count else None,
+            "action_confusion": {primary: dict(row) for primary, row in self.confusion.items()},
+            "score_delta": {
+                "mean": self.delta_sum / count if count else None,
+                "mean_abs": self.abs_delta_sum / count if count else None,
+                "max_abs": self.max_abs_delta
+            },
+            "latency_ms": {
+                "primary_mean": self.primary_ms / count if count else None,
+                "shadow_mean": self.shadow_ms / count if count else None,
+                "shadow_max": self.shadow_max_ms
+            },
+            "recent_disagreements": list(self.disagreements)
+        }
+
+
+class ShadowRunner:
+    """Mirror sampled transactions to shadow scorers on a background thread.
+
+    ``scorers`` maps a name to a callable ``scorer(transaction, features) -> risk_analysis``;
+    ``features`` are the local features the primary decision was made with, so
+    both are compared on the same signals.
+    """
+
+    def __init__(self, scorers, sample_rate=0.1, queue_size=1000):
+        self.scorers = dict(scorers)
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        self._comparisons = {name: ShadowComparison(name) for name in self.scorers}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._worker = threading.Thread(target=self._run, name="shadow-scoring", daemon=True)
+        self._worker.start()
+
+    def submit(self, transaction, primary_analysis, primary_ms=None, features=None):
+        """Queue a processed transaction and its local features for shadow scoring if it is sampled"""
+        if not self.scorers or not sampled(transaction.get("transaction_id"), self.sample_rate):
+            return False
+        # Copies, so later in-place updates (e.g. streamed reasoning) do not race
+        item = (copy.deepcopy(transaction), copy.deepcopy(features), dict(primary_analysis), primary_ms)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            METRICS.increment("shadow.dropped")
+            return False
+        METRICS.increment("shadow.sampled")
+        return True
+
+    def wait(self):
+        """Block until every queued transaction has been shadow-scored"""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            transaction, features, primary, primary_ms = self._queue.get()
+            try:
+                for name, scorer in self.scorers.items():
+                    self._score(name, scorer, transaction, features, primary, primary_ms)
+            finally:
+                self._queue.task_done()
+
+    def _score(self, name, scorer, transaction, features, primary, primary_ms):
+        started = time.perf_counter()
+        try:
+            shadow = scorer(copy.deepcopy(transaction), copy.deepcopy(features))
+            shadow_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._comparisons[name].add(transaction.get("transaction_id"), primary, shadow, primary_ms,
+                                            shadow_ms)
+        except Exception as e:
+            # Also covers results the comparison cannot handle, so the worker keeps running
+            logger.error("Shadow scorer %s failed: %s", name, e, extra={"event": "shadow.failed"})
+            METRICS.increment("shadow.errors")
+            with self._lock:
+                self._comparisons[name].errors += 1
+
+    def report(self):
+        """JSON-serializable comparison of every shadow scorer with the primary"""
+        with self._lock:
+            scorers = [comparison.report() for comparison in self._comparisons.values()]
+        return {"sample_rate": self.sample_rate, "pending": self._queue.qsize(), "scorers": scorers}
@@ -0,0 +1,249 @@
+"""Streaming amount statistics per merchant and merchant category.
+
+``TDigest`` is a merging t-digest: a fixed-size set of weighted centroids
+(about ``compression`` of them, densest at the tails) plus a small buffer of
+raw values that is folded in when full.  Digests merge, so partial profiles
+(e.g. from several workers or a replayed corpus) can be combined.  The rank
+of a value is a binary search over the centroids' prefix sums plus a scan of
+the buffer, so it can be computed for every transaction.
+
+``AmountProfiles`` keeps a digest and a running mean/variance (Welford) per
+``merchant.id`` and per ``merchant.category``; the number of keys is bounded
+with least-recently-used eviction, so memory stays fixed.
+"""
+import bisect
+import math
+import threading
+from collections import OrderedDict
+
+SCOPES = (("merchant", "id"), ("category", "category"))
+MIN_HISTORY = 20  # Observations needed before a key's percentiles are used as features
+
+
+class TDigest:
+    """Mergeable quantile sketch with bounded memory (merging t-digest, k1 scale function)"""
+
+    def __init__(self, compression=100, buffer_size=64):
+        self.compression = compression
+        self.buffer_size = buffer_size
+        self.means = []
+        self.weights = []
+        self._centers = []  # Rank of each centroid's mean: weight before it plus half its own
+        self._buffer = []
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value, weight=1):
+        self._buffer.append((value, weight))
+        self.count += weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) >= self.buffer_size:
+            self._compress()
+
+    def merge(self, other):
+        """Fold another digest into this one"""
+        self._buffer.extend(zip(other.means, other.weights))
+        self._buffer.extend(other._buffer)
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+
+    def _k_limit(self, q):
+        """Upper quantile of a centroid starting at ``q`` (one unit of the k1 scale further)"""
+        k = self.compression / (2 * math.pi) * math.asin(2 * q - 1) + 1
+        if k >= self.compression / 4:
+            return 1.0
+        return (math.sin(k * 2 * math.pi / self.compression) + 1) / 2
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        points = sorted(list(zip(self.means, self.weights)) + self._buffer)
+        self._buffer = []
+        total = self.count
+        means, weights = [], []
+        mean, weight = points[0]
+        done = 0.0
+        limit = self._k_limit(0.0)
+        for value, value_weight in points[1:]:
+            if (done + weight + value_weight) / total <= limit:
+                weight += value_weight
+                mean += (value - mean) * value_weight / weight
+            else:
+                means.append(mean)
+                weights.append(weight)
+                done += weight
+                limit = self._k_limit(done / total)
+                mean, weight = value, value_weight
+        means.append(mean)
+        weights.append(weight)
+        self.means, self.weights = means, weights
+        centers, before = [], 0.0
+        for weight in weights:
+            centers.append(before + weight / 2)
+            before += weight
+        self._centers = centers
+
+    def cdf(self, value):
+        """Estimated fraction of observations below ``value``, counting ties as half (mid-rank)"""
+        if self.count == 0:
+            return math.nan
+        if value < self.min:
+            return 0.0
+        if value > self.max:
+            return 1.0
+        if self.min == self.max:
+            return 0.5
+        rank = 0.0
+        means, centers, weights = self.means, self._centers, self.weights
+        if means:
+            i = bisect.bisect_right(means, value)
+            first = bisect.bisect_left(means, value)
+            if first < i:
+                # Centroids at exactly ``value`` (discrete amounts): the weight before them plus half their own
+                rank = centers[first] - weights[first] / 2 + sum(weights[first:i]) / 2
+            else:
+                # Otherwise interpolate between neighbouring centroids; the minimum and maximum are
+                # point masses of (at least) one observation, counted as half
+                if i == 0:
+                    low, low_rank, high, high_rank = self.min, 0.5, means[0], centers[0]
+                elif i == len(means):
+                    low, low_rank, high, high_rank = means[-1], centers[-1], self.max, sum(weights) - 0.5
+                else:
+                    low, low_rank, high, high_rank = means[i - 1], centers[i - 1], means[i], centers[i]
+                rank = low_rank + (high_rank - low_rank) * ((value - low) / (high - low) if high > low else 1.0)
+        for buffered, weight in self._buffer:
+            if buffered < value:
+                rank += weight
+            elif buffered == value:
+                rank += weight / 2
+        return min(1.0, rank / self.count)
+
+    def quantile(self, q):
+        """Estimated value at quantile ``q`` (0..1)"""
+        if self.count == 0:
+            return math.nan
+        self._compress()
+        target = q * self.count
+        centers = self._centers
+        i = bisect.bisect_left(centers, target)
+        if i == 0:
+            low, low_rank, high, high_rank = self.min, 0.0, self.means[0], centers[0]
+        elif i == len(centers):
+            low, low_rank, high, high_rank = self.means[-1], centers[-1], self.max, self.count
+        else:
+            low, low_rank, high, high_rank = self.means[i - 1], centers[i - 1], self.means[i], centers[i]
+        if high_rank <= low_rank:
+            return high
+        return low + (high - low) * (target - low_rank) / (high_rank - low_rank)
+
+
+class AmountStats:
+    """Amount distribution of one merchant or category: t-digest plus running mean/variance"""
+
+    def __init__(self, compression=100):
+        self.digest = TDigest(compression)
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, amount):
+        self.digest.add(amount)
+        self.count += 1
+        delta = amount - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (amount - self.mean)
+
+    def merge(self, other):
+        """Combine with another profile (Chan et al. parallel variance)"""
+        self.digest.merge(other.digest)
+        count = self.count + other.count
+        if count:
+            delta = other.mean - self.mean
+            self._m2 += other._m2 + delta * delta * self.count * other.count / count
+            self.mean += delta * other.count / count
+        self.count = count
+
+    @property
+    def stddev(self):
+        return math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": round(self.mean, 2),
+            "stddev": round(self.stddev, 2),
+            "p50": round(self.digest.quantile(0.5), 2),
+            "p90": round(self.digest.quantile(0.9), 2),
+            "p99": round(self.digest.quantile(0.99), 2)
+        }
+
+
+def _amount(transaction):
+    amount = transaction.get("amount")
+    return float(amount) if isinstance(amount, (int, float)) and not isinstance(amount, bool) else None
+
+
+class AmountProfiles:
+    """Per-merchant and per-category amount profiles, bounded to ``max_keys`` (least recently used evicted)"""
+
+    def __init__(self, max_keys=10000, compression=100, min_history=MIN_HISTORY):
+        self.max_keys = max_keys
+        self.compression = compression
+        self.min_history = min_history
+        self._lock = threading.Lock()
+        self._profiles = OrderedDict()  # (scope, key) -> AmountStats
+
+    def _keys(self, transaction):
+        merchant = transaction.get("merchant") or {}
+        return [(scope, merchant.get(field)) for scope, field in SCOPES if merchant.get(field) is not None]
+
+    def observe(self, transaction):
+        """Add a processed transaction's amount to its merchant and category profiles"""
+        amount = _amount(transaction)
+        if amount is None or self.max_keys <= 0:
+            return
+        with self._lock:
+            for key in self._keys(transaction):
+                profile = self._profiles.get(key)
+                if profile is None:
+                    profile = self._profiles[key] = AmountStats(self.compression)
+                    if len(self._profiles) > self.max_keys:
+                        self._profiles.popitem(last=False)
+                else:
+                    self._profiles.move_to_end(key)
+                profile.add(amount)
+
+    def features(self, transaction):
+        """Percentile and z-score of the amount within each profile with enough history"""
+        amount = _amount(transaction)
+        if amount is None:
+            return {}
+        features = {}
+        with self._lock:
+            for scope, key in self._keys(transaction):
+                profile = self._profiles.get((scope, key))
+                if profile is None or profile.count < self.min_history:
+                    continue
+                features[f"{scope}_amount_percentile"] = round(profile.digest.cdf(amount), 4)
+                if profile.stddev > 0:
+                    features[f"{scope}_amount_zscore"] = round((amount - profile.mean) / profile.stddev, 2)
+                features[f"{scope}_amount_history"] = profile.count
+        return features
+
+    def summary(self, scope, top=10):
+        """Profiles of the ``top`` busiest keys of a scope"""
+        with self._lock:
+            profiles = [(key, profile) for (key_scope, key), profile in self._profiles.items() if key_scope == scope]
+            profiles.sort(key=lambda item: item[1].count, reverse=True)
+            return {str(key): profile.summary() for key, profile in profiles[:top]}
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+    def __len__(self):
+        return len(self._profiles)
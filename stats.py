@@ -0,0 +1,202 @@
+"""Incrementally maintained aggregate statistics for GET /admin/stats.
+
+Every processed transaction updates the rollups once, in constant time, when
+it is recorded; reading them never rescans the history.  Merchant and
+country rankings use a bounded Space-Saving counter so memory stays fixed
+however many distinct keys are seen, and the time series are fixed-size rings
+of per-minute and per-hour buckets.
+"""
+import heapq
+import threading
+import time
+
+HISTOGRAM_BUCKETS = 10  # Risk-score histogram bins of width 0.1
+ACTIONS = ("allow", "review", "block")
+
+
+def _risk_score(analysis):
+    """Risk score of an analysis clamped to [0, 1] (0 when missing or invalid)"""
+    try:
+        return min(1.0, max(0.0, float(analysis.get("risk_score") or 0.0)))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _histogram_bin(risk_score):
+    return min(int(risk_score * HISTOGRAM_BUCKETS), HISTOGRAM_BUCKETS - 1)
+
+
+class TopCounter:
+    """Approximate heavy-hitter counter with a fixed number of slots (Space-Saving)
+
+    Keys are grouped in buckets by count (the Stream-Summary layout), so
+    incrementing a key and evicting a smallest one are both constant time.
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self._counts = {}
+        self._labels = {}
+        self._buckets = {}  # count -> {key: None}, insertion ordered
+        self._min = 0
+
+    def _increment(self, key, count):
+        """Move ``key`` from the bucket of ``count`` to the next one"""
+        bucket = self._buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[count]
+            if self._min == count:
+                self._min = count + 1
+        self._buckets.setdefault(count + 1, {})[key] = None
+        self._counts[key] = count + 1
+
+    def add(self, key, label=None):
+        counts = self._counts
+        if key in counts:
+            self._increment(key, counts[key])
+        elif len(counts) < self.capacity:
+            counts[key] = 1
+            self._buckets.setdefault(1, {})[key] = None
+            self._min = 1
+        else:
+            # Replace a smallest counter; its count bounds the new key's error
+            bucket = self._buckets[self._min]
+            victim = next(iter(bucket))
+            del bucket[victim]
+            del counts[victim]
+            self._labels.pop(victim, None)
+            bucket[key] = None
+            counts[key] = self._min
+            self._increment(key, self._min)
+        if label is not None:
+            self._labels[key] = label
+
+    def top(self, k):
+        return [
+            {"key": key, "label": self._labels.get(key, key), "count": count}
+            for key, count in heapq.nlargest(k, self._counts.items(), key=lambda item: item[1])
+        ]
+
+
+class TimeSeries:
+    """Fixed ring of time buckets holding count/flagged/blocked/score totals"""
+
+    def __init__(self, bucket_seconds, buckets):
+        self.bucket_seconds = bucket_seconds
+        self.buckets = buckets
+        self._starts = [None] * buckets
+        self._values = [None] * buckets
+
+    def add(self, at, risk_score, action, flagged):
+        bucket = int(at // self.bucket_seconds)
+        slot = bucket % self.buckets
+        if self._starts[slot] != bucket:
+            self._starts[slot] = bucket
+            self._values[slot] = [0, 0, 0, 0.0]
+        values = self._values[slot]
+        values[0] += 1
+        values[1] += 1 if flagged else 0
+        values[2] += 1 if action == "block" else 0
+        values[3] += risk_score
+
+    def series(self, now):
+        """Buckets within the window, oldest first"""
+        newest = int(now // self.bucket_seconds)
+        result = []
+        for bucket in range(newest - self.buckets + 1, newest + 1):
+            slot = bucket % self.buckets
+            if self._starts[slot] == bucket:
+                count, flagged, blocked, score_sum = self._values[slot]
+                result.append({
+                    "start": bucket * self.bucket_seconds,
+                    "count": count,
+                    "flagged": flagged,
+                    "blocked": blocked,
+                    "mean_risk_score": score_sum / count
+                })
+        return result
+
+
+class TransactionStats:
+    """Rollups updated once per recorded transaction"""
+
+    def __init__(self, top_capacity=1000, minutes=60, hours=48):
+        self._lock = threading.Lock()
+        self.total = 0
+        self.flagged = 0
+        self.amount_by_currency = {}
+        self.by_action = dict.fromkeys(ACTIONS, 0)
+        self.risk_histogram = [0] * HISTOGRAM_BUCKETS
+        self.risk_score_sum = 0.0
+        self.merchants = TopCounter(top_capacity)
+        self.countries = TopCounter(top_capacity)
+        self.per_minute = TimeSeries(60, minutes)
+        self.per_hour = TimeSeries(3600, hours)
+
+    def record(self, transaction_record, flagged=False, at=None):
+        """Add one processed transaction (in the /admin/all-transactions format)"""
+        at = time.time() if at is None else at
+        analysis = transaction_record.get("risk_analysis") or {}
+        risk_score = _risk_score(analysis)
+        action = analysis.get("recommended_action", "review")
+        merchant = transaction_record.get("merchant") or {}
+        country = (transaction_record.get("customer") or {}).get("country")
+        currency = transaction_record.get("currency")
+        amount = transaction_record.get("amount")
+
+        with self._lock:
+            self.total += 1
+            self.flagged += 1 if flagged else 0
+            if isinstance(amount, (int, float)):
+                self.amount_by_currency[currency] = self.amount_by_currency.get(currency, 0.0) + amount
+            self.by_action[action] = self.by_action.get(action, 0) + 1
+            self.risk_histogram[_histogram_bin(risk_score)] += 1
+            self.risk_score_sum += risk_score
+            if merchant.get("id") is not None:
+                self.merchants.add(merchant["id"], merchant.get("name"))
+            if country is not None:
+                self.countries.add(country)
+            self.per_minute.add(at, risk_score, action, flagged)
+            self.per_hour.add(at, risk_score, action, flagged)
+
+    def reclassify(self, old_analysis, new_analysis):
+        """Move one re-scored transaction from its old decision to the new one
+
+        The action counts, risk-score histogram and mean score are corrected.
+        The time series keep the decision as it was made, and the flagged
+        count is unchanged since re-scoring sends no notification.
+        """
+        old_score, new_score = _risk_score(old_analysis), _risk_score(new_analysis)
+        old_action = old_analysis.get("recommended_action", "review")
+        new_action = new_analysis.get("recommended_action", "review")
+        with self._lock:
+            self.by_action[old_action] = self.by_action.get(old_action, 0) - 1
+            self.by_action[new_action] = self.by_action.get(new_action, 0) + 1
+            self.risk_histogram[_histogram_bin(old_score)] -= 1
+            self.risk_histogram[_histogram_bin(new_score)] += 1
+            self.risk_score_sum += new_score - old_score
+
+    def snapshot(self, top=10, now=None):
+        """JSON-serializable view of all rollups"""
+        now = time.time() if now is None else now
+        with self._lock:
+            return {
+                "totals": {
+                    "transactions": self.total,
+                    "flagged": self.flagged,
+                    "amount_by_currency": dict(self.amount_by_currency),
+                    "mean_risk_score": self.risk_score_sum / self.total if self.total else 0.0
+                },
+                "by_action": dict(self.by_action),
+                "risk_histogram": [
+                    {"min": i / HISTOGRAM_BUCKETS, "max": (i + 1) / HISTOGRAM_BUCKETS, "count": count}
+                    for i, count in enumerate(self.risk_histogram)
+                ],
+                "top_merchants": self.merchants.top(top),
+                "top_countries": self.countries.top(top),
+                "timeseries": {
+                    "per_minute": self.per_minute.series(now),
+                    "per_hour": self.per_hour.series(now)
+                }
+            }
@@ -0,0 +1,206 @@
+"""Structured, sampled, non-blocking logging.
+
+``configure_logging`` replaces the synchronous root handler with a
+``QueueHandler``: request threads only decide whether to keep a record and
+put it on a bounded queue, and a ``QueueListener`` thread formats it (the
+``%``-style arguments are merged there, not on the request thread) and
+writes it.  Records are JSON objects with the context bound by
+``log_context`` (the transaction id of the request being handled) and any
+``extra`` fields, or plain text with ``fmt="text"``.
+
+Call sites name their message type with ``extra={"event": ...}``; each type
+can be sampled (keep a fraction) and rate limited (at most N per second,
+token bucket) with specs like ``"transaction.received=0.1"`` and
+``"risk.high_risk_detected=50"``.  Records at ERROR and above are never
+sampled, rate limited or dropped: they are queued even when the queue is
+full, while lower levels are then counted as dropped.
+"""
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+import time
+
+from metrics import METRICS
+
+# LogRecord attributes that are not extra fields
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_context = contextvars.ContextVar("log_context", default={})
+
+
+class _LogContext:
+    __slots__ = ("fields", "token")
+
+    def __init__(self, fields):
+        self.fields = fields
+
+    def __enter__(self):
+        self.token = _context.set({**_context.get(), **self.fields})
+
+    def __exit__(self, *exc_info):
+        _context.reset(self.token)
+
+
+def log_context(**fields):
+    """Bind fields (e.g. ``transaction_id``) to every record logged in a ``with`` block"""
+    return _LogContext(fields)
+
+
+def parse_rates(spec):
+    """Parse "transaction.received=0.1,transaction.processing=0.5" into a dict"""
+    rates = {}
+    for part in filter(None, (part.strip() for part in (spec or "").split(","))):
+        event, _, value = part.partition("=")
+        try:
+            rates[event.strip()] = float(value)
+        except ValueError:
+            raise ValueError(f"Invalid rate for {event.strip()!r}: {value!r}") from None
+    return rates
+
+
+class _TokenBucket:
+    __slots__ = ("rate", "tokens", "updated")
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class SamplingFilter(logging.Filter):
+    """Per-event sampling and rate limits; ERROR and above always pass"""
+
+    def __init__(self, sample_rates=None, rate_limits=None):
+        super().__init__()
+        self.sample_rates = dict(sample_rates or {})
+        self._lock = threading.Lock()
+        self._buckets = {event: _TokenBucket(rate) for event, rate in (rate_limits or {}).items()}
+        self._random = random.random
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR:
+            return True
+        event = getattr(record, "event", None)
+        if event is None:
+            return True
+        rate = self.sample_rates.get(event)
+        if rate is not None and self._random() >= rate:
+            METRICS.increment("logging.sampled_out")
+            return False
+        bucket = self._buckets.get(event)
+        if bucket is not None:
+            with self._lock:
+                allowed = bucket.take()
+            if not allowed:
+                METRICS.increment("logging.rate_limited")
+                return False
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, context and extra fields"""
+
+    def __init__(self):
+        super().__init__()
+        self._second = (None, "")  # Formatted date and time of the last second seen
+
+    def format(self, record):
+        second = int(record.created)
+        if self._second[0] != second:
+            self._second = (second, time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second)))
+        entry = {
+            "ts": f"{self._second[1]}.{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key in record.__dict__.keys() - _RECORD_ATTRIBUTES:
+            entry.setdefault(key, record.__dict__[key])
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that defers formatting to the listener and drops records below ERROR when full.
+
+    The queue is a ``SimpleQueue`` (no locking in Python) bounded approximately by ``max_size``.
+    """
+
+    def __init__(self, max_size=10000):
+        super().__init__(queue.SimpleQueue())
+        self.max_size = max_size
+
+    def prepare(self, record):
+        # Runs on the logging thread: bind the context.  The message is merged with its
+        # arguments by the listener; only a traceback is rendered here, while its frames are current
+        for key, value in _context.get().items():
+            record.__dict__.setdefault(key, value)
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if record.levelno < logging.ERROR and self.queue.qsize() >= self.max_size:
+            METRICS.increment("logging.dropped")
+            return
+        self.queue.put_nowait(record)
+
+
+def skip_record_lookups():
+    """Stop filling in the caller's file and line and the process name of every record.
+
+    Neither format uses them, and finding the caller is most of the cost of creating a
+    record (see "Optimization" in the logging HOWTO).  This changes module-level
+    ``logging`` settings for the whole process: ``%(filename)s``, ``%(lineno)d``,
+    ``%(funcName)s`` and ``%(processName)s`` become placeholders in every handler.
+    """
+    logging._srcfile = None
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
+
+def build_handler(fmt="json", queue_size=10000, sample_rates=None, rate_limits=None, stream=None):
+    """Queue handler with the sampling filter, and the listener that writes its records"""
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == "json" else
+                        logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+    handler = NonBlockingQueueHandler(queue_size)
+    handler.addFilter(SamplingFilter(sample_rates, rate_limits))
+    return handler, logging.handlers.QueueListener(handler.queue, output)
+
+
+def configure_logging(level=logging.INFO, fmt="json", queue_size=10000, sample_rates=None, rate_limits=None,
+                      stream=None, skip_lookups=False):
+    """Install the queue handler on the root logger; returns the started listener, or None.
+
+    Like ``logging.basicConfig``, it does nothing when the root logger already has handlers.
+    ``skip_lookups`` opts in to ``skip_record_lookups()`` (process-wide).
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return None
+    if skip_lookups:
+        skip_record_lookups()
+    handler, listener = build_handler(fmt, queue_size, sample_rates, rate_limits, stream)
+    listener.start()
+    root.addHandler(handler)
+    root.setLevel(level)
+    return listener
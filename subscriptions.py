@@ -0,0 +1,222 @@
+"""Server-side filter subscriptions for the Socket.IO alert events.
+
+A client sends ``subscribe`` with a list of filters, e.g.::
+
+    {"filters": [{"categories": ["electronics"], "countries": ["RU", "IR"], "min_score": 0.8},
+                 {"actions": ["block"]}]}
+
+and receives the events matching any of them.  Each distinct filter is a
+room shared by every client subscribed to it; clients without filters stay in
+``ALL_ROOM`` and receive everything, as before.  Filters are compiled into an
+immutable index (one ``dict`` per field from value to rooms, plus the rooms
+that accept any value), rebuilt on subscription changes, so routing an event
+is a few set lookups and intersections regardless of the number of clients.
+The event is then emitted once to the matching rooms; Socket.IO delivers it
+once per socket even when several of its filters match.
+"""
+import hashlib
+import json
+import threading
+
+from metrics import METRICS
+
+ALL_ROOM = "alerts:all"
+MAX_FILTERS = 20  # Filters per client
+VALID_ACTIONS = ("allow", "review", "block")
+
+
+def _upper(value):
+    return value.upper() if isinstance(value, str) else value
+
+
+# Filter field -> how the event value is read from a notification or transaction record
+SET_FIELDS = {
+    "categories": lambda record: (record.get("merchant") or {}).get("category"),
+    "merchants": lambda record: (record.get("merchant") or {}).get("id"),
+    "countries": lambda record: _upper((record.get("customer") or {}).get("country")),
+    "actions": lambda record: (record.get("risk_analysis") or {}).get("recommended_action")
+}
+RANGE_FIELDS = ("min_score", "max_score", "min_amount", "max_amount")
+
+
+def normalize_filter(spec):
+    """Validate a filter and return it in canonical form; raises ValueError"""
+    if not isinstance(spec, dict):
+        raise ValueError("A filter must be an object")
+    unknown = set(spec) - set(SET_FIELDS) - set(RANGE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown filter fields: {', '.join(sorted(unknown))}")
+    normalized = {}
+    for field in SET_FIELDS:
+        values = spec.get(field)
+        if values is None:
+            continue
+        if not isinstance(values, list) or not values or not all(isinstance(v, str) for v in values):
+            raise ValueError(f"{field} must be a non-empty list of strings")
+        if field == "countries":
+            values = [value.upper() for value in values]
+        if field == "actions" and not set(values) <= set(VALID_ACTIONS):
+            raise ValueError(f"actions must be among {', '.join(VALID_ACTIONS)}")
+        normalized[field] = sorted(set(values))
+    for field in RANGE_FIELDS:
+        value = spec.get(field)
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"{field} must be a number")
+        normalized[field] = float(value)
+    return normalized
+
+
+def room_for(normalized):
+    """Room name of a canonical filter (identical filters share a room)"""
+    key = json.dumps(normalized, sort_keys=True)
+    return "alerts:" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+class _Index:
+    """Immutable predicate index over the active filters"""
+
+    def __init__(self, filters):
+        self.rooms = frozenset(filters)
+        self.fields = []  # (read, value -> rooms, rooms accepting any value), only for fields some filter uses
+        for field, read in SET_FIELDS.items():
+            by_value = {}
+            for room, spec in filters.items():
+                for value in spec.get(field, ()):
+                    by_value.setdefault(value, set()).add(room)
+            if by_value:
+                wildcard = frozenset(room for room, spec in filters.items() if field not in spec)
+                # Precomputed union with the wildcard rooms, so matching does no set building
+                self.fields.append((read, {value: frozenset(rooms) | wildcard for value, rooms in by_value.items()},
+                                    wildcard))
+        self.ranges = {
+            room: (spec.get("min_score"), spec.get("max_score"), spec.get("min_amount"), spec.get("max_amount"))
+            for room, spec in filters.items() if any(field in spec for field in RANGE_FIELDS)
+        }
+
+    def match(self, record):
+        candidates = self.rooms
+        for rooms in sorted((by_value.get(read(record), wildcard) for read, by_value, wildcard in self.fields),
+                            key=len):
+            candidates = candidates & rooms
+            if not candidates:
+                return []
+        if not self.ranges:
+            return list(candidates)
+        score = _number((record.get("risk_analysis") or {}).get("risk_score"))
+        amount = _number(record.get("amount"))
+        matched = []
+        for room in candidates:
+            bounds = self.ranges.get(room)
+            if bounds is not None:
+                min_score, max_score, min_amount, max_amount = bounds
+                if (min_score is not None and (score is None or score < min_score)) or \
+                        (max_score is not None and (score is None or score > max_score)) or \
+                        (min_amount is not None and (amount is None or amount < min_amount)) or \
+                        (max_amount is not None and (amount is None or amount > max_amount)):
+                    continue
+            matched.append(room)
+        return matched
+
+
+class SubscriptionIndex:
+    """Client subscriptions, their rooms and the compiled routing index"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filters = {}  # room -> canonical filter
+        self._members = {ALL_ROOM: set()}  # room -> sids
+        self._rooms = {}  # sid -> rooms
+        self._index = _Index({})
+        self._sizes = {ALL_ROOM: 0}  # room -> member count, replaced (never mutated) under the lock
+
+    def connect(self, sid):
+        """Register a new client; returns the rooms it joins"""
+        return self.subscribe(sid, [])
+
+    def subscribe(self, sid, filters):
+        """Replace a client's filters (empty: receive everything); returns (rooms to join, rooms to leave).
+
+        Raises ValueError for invalid filters, leaving the subscription unchanged.
+        """
+        if filters is None:
+            filters = []
+        if not isinstance(filters, list):
+            raise ValueError("filters must be a list")
+        if len(filters) > MAX_FILTERS:
+            raise ValueError(f"At most {MAX_FILTERS} filters per client")
+        specs = {}
+        for spec in filters:
+            normalized = normalize_filter(spec)
+            specs[room_for(normalized)] = normalized
+        rooms = set(specs) or {ALL_ROOM}
+        with self._lock:
+            previous = self._rooms.get(sid, set())
+            self._rooms[sid] = rooms
+            changed = False
+            for room in previous - rooms:
+                changed |= self._leave(sid, room)
+            for room in rooms - previous:
+                self._members.setdefault(room, set()).add(sid)
+                if room != ALL_ROOM and room not in self._filters:
+                    self._filters[room] = specs[room]
+                    changed = True
+            if changed:
+                self._index = _Index(dict(self._filters))
+            self._publish_sizes()
+        return rooms - previous, previous - rooms
+
+    def disconnect(self, sid):
+        """Forget a client; returns the rooms it was in"""
+        with self._lock:
+            rooms = self._rooms.pop(sid, set())
+            changed = False
+            for room in rooms:
+                changed |= self._leave(sid, room)
+            if changed:
+                self._index = _Index(dict(self._filters))
+            self._publish_sizes()
+        return rooms
+
+    def _publish_sizes(self):
+        self._sizes = {room: len(members) for room, members in self._members.items()}
+
+    def _leave(self, sid, room):
+        """Remove a client from a room; True if the room's filter is no longer used"""
+        members = self._members.get(room)
+        if members is None:
+            return False
+        members.discard(sid)
+        if members or room == ALL_ROOM:
+            return False
+        del self._members[room]
+        self._filters.pop(room, None)
+        return True
+
+    def route(self, record):
+        """Rooms that should receive an event about ``record``, with fan-out metrics.
+
+        Lock-free: the recipients are counted from the published room sizes,
+        so a socket with several matching filters counts once per filter.
+        """
+        rooms = [ALL_ROOM] + self._index.match(record)
+        sizes = self._sizes
+        recipients = sum(sizes.get(room, 0) for room in rooms)
+        METRICS.increment("alerts.events")
+        METRICS.increment("alerts.deliveries", recipients)
+        METRICS.observe("alerts.fanout_sockets", recipients)
+        METRICS.observe("alerts.fanout_rooms", len(rooms))
+        return rooms
+
+    def stats(self):
+        with self._lock:
+            return {
+                "clients": len(self._rooms),
+                "unfiltered_clients": len(self._members[ALL_ROOM]),
+                "filters": len(self._filters)
+            }
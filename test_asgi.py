@@ -0,0 +1,166 @@
+import unittest
+from unittest.mock import patch, AsyncMock, MagicMock
+import asyncio
+import base64
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import Server
+import asgi
+from async_http import AsyncHTTPClient
+from testing_helpers import make_transaction
+
+
+class CompletionHandler(BaseHTTPRequestHandler):
+    """Local chat-completions endpoint answering with a fixed analysis"""
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    content = '{"risk_score": 0.2, "recommended_action": "allow", "risk_factors": [], "reasoning": "ok"}'
+
+    def setup(self):
+        super().setup()
+        CompletionHandler.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps({"choices": [{"message": {"content": self.content}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+async def asgi_request(app, method, path, headers=None, body=b""):
+    """Call an ASGI app in-process; returns (status, headers, body)"""
+    scope = {
+        "type": "http", "method": method, "path": path, "query_string": b"", "root_path": "",
+        "scheme": "http", "http_version": "1.1", "server": ("testserver", 80), "client": ("127.0.0.1", 5000),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return sent[0]["status"], dict(sent[0]["headers"]), b"".join(message.get("body", b"") for message in sent[1:])
+
+
+class TestAsgiApp(unittest.TestCase):
+    """Tests for the asyncio-native serving mode"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.saved = {name: Server.__dict__.get(name) for name in ("app", "socketio")}
+        cls.stub = ThreadingHTTPServer(("127.0.0.1", 0), CompletionHandler)
+        threading.Thread(target=cls.stub.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.stub.server_address[1]}/openai/v1/chat/completions"
+        cls.app = asgi.create_asgi_app()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stub.shutdown()
+        for name, value in cls.saved.items():
+            if value is None:
+                Server.__dict__.pop(name, None)
+            else:
+                setattr(Server, name, value)
+
+    def setUp(self):
+        credentials = base64.b64encode(b"admin:secret123").decode("utf-8")
+        self.headers = {"Authorization": f"Basic {credentials}", "Content-Type": "application/json"}
+
+    def run_requests(self, *requests):
+        async def run():
+            return await asyncio.gather(*(asgi_request(self.app, *request) for request in requests))
+        return asyncio.run(run())
+
+    def test_webhook_scores_with_async_client(self):
+        threads = []
+
+        def on_thread(function):
+            def call(*args, **kwargs):
+                threads.append((function.__name__, threading.current_thread().name))
+                return function(*args, **kwargs)
+            return call
+
+        recorder = MagicMock()
+        recorder.record_response.side_effect = on_thread(lambda *args: None)
+        with patch('Server.GROQ_API_KEY', 'dummy_api_key'), \
+                patch('Server.GROQ_API_URL', self.url), \
+                patch('Server.NOTIFICATIONS', Server.NotificationHistory()), \
+                patch('Server.ALL_TRANSACTIONS', Server.TransactionHistory()), \
+                patch.object(Server.socketio.sio, 'emit', new_callable=AsyncMock) as mock_emit, \
+                patch('Server.record_transaction', side_effect=on_thread(Server.record_transaction)), \
+                patch.object(Server.CONFIG, 'get', side_effect=on_thread(Server.CONFIG.get)), \
+                patch('Server.RECORDER', recorder), \
+                self.assertLogs('asgi', level='INFO') as logs:
+            results = self.run_requests(
+                ("POST", "/webhook", self.headers, json.dumps(make_transaction("tx_1")).encode()),
+                ("POST", "/webhook", self.headers, json.dumps(make_transaction("tx_2", country="RU")).encode()))
+            (status, headers, body), (high_status, _, high_body) = results
+            self.assertEqual(status, 200)
+            self.assertEqual(headers[b"content-type"], b"application/json")
+            self.assertEqual(json.loads(body)["risk_analysis"]["recommended_action"], "allow")
+            self.assertEqual(high_status, 200)
+            self.assertTrue(json.loads(high_body)["admin_notification_sent"])
+            self.assertEqual(mock_emit.call_args[0][0], "new_transaction")
+            self.assertEqual(len(Server.ALL_TRANSACTIONS), 2)
+            # The config snapshot, corpus recording, storage and notification run on the thread pool,
+            # never on the event loop
+            self.assertEqual(len(threads), 6)
+            self.assertTrue(all(name.startswith("asgi-wsgi") for _, name in threads), threads)
+        self.assertEqual(sum("Received transaction" in line for line in logs.output), 2)
+
+    def test_webhook_rejects_bad_requests(self):
+        (unauthorized, _, _), (not_json, _, body), (invalid, _, _) = self.run_requests(
+            ("POST", "/webhook", {"Content-Type": "application/json"}, b"{}"),
+            ("POST", "/webhook", self.headers, b"This is not JSON"),
+            ("POST", "/webhook", self.headers, b'{"transaction_id": "tx_1"}'))
+        self.assertEqual(unauthorized, 401)
+        self.assertEqual((not_json, json.loads(body)["error"]), (400, "Request must be JSON"))
+        self.assertEqual(invalid, 400)
+
+    def test_api_outage_falls_back(self):
+        with patch('Server.GROQ_API_KEY', 'dummy_api_key'), \
+                patch('Server.GROQ_API_URL', "http://127.0.0.1:9/unreachable"), \
+                patch('Server.ALL_TRANSACTIONS', Server.TransactionHistory()):
+            [(status, _, body)] = self.run_requests(
+                ("POST", "/webhook", self.headers, json.dumps(make_transaction("tx_1")).encode()))
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)["risk_analysis"]["risk_factors"], ["API error"])
+
+    def test_admin_routes_are_served_by_flask(self):
+        with patch('Server.ALL_TRANSACTIONS', Server.TransactionHistory()):
+            (status, headers, body), (unauthorized, _, _) = self.run_requests(
+                ("GET", "/admin/all-transactions", self.headers),
+                ("GET", "/admin/all-transactions"))
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body), {"transactions": []})
+        self.assertIn(b"etag", headers)
+        self.assertEqual(unauthorized, 401)
+
+    def test_client_reuses_connections(self):
+        async def run():
+            client = AsyncHTTPClient()
+            for _ in range(3):
+                status, body = await client.post(self.url, b"{}", {"Content-Type": "application/json"})
+                self.assertEqual(status, 200)
+                self.assertIn("choices", json.loads(body))
+            await client.close()
+
+        before = CompletionHandler.connections
+        asyncio.run(run())
+        self.assertEqual(CompletionHandler.connections - before, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+from unittest.mock import patch
+import os
+import tempfile
+import Server
+from audit_log import AuditLog, list_segments, replay
+from history import NotificationHistory, TransactionHistory
+from metrics import METRICS
+
+
+class TestAuditLog(unittest.TestCase):
+    """Tests for the write-behind audit log"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = self.tmp.name
+        METRICS.reset()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_append_and_replay(self):
+        """Records are written in order and replayed with sequence numbers"""
+        log = AuditLog(self.directory, flush_interval_ms=5)
+        for i in range(10):
+            log.append("transaction", {"transaction_id": f"tx_{i}"})
+        log.close()
+
+        entries = list(replay(self.directory))
+        self.assertEqual([e["data"]["transaction_id"] for e in entries], [f"tx_{i}" for i in range(10)])
+        self.assertEqual([e["seq"] for e in entries], list(range(1, 11)))
+
+    def test_group_commit(self):
+        """Records appended together are flushed in a few batches, not one by one"""
+        log = AuditLog(self.directory, flush_records=50, flush_interval_ms=1000)
+        for i in range(100):
+            log.append("transaction", {"transaction_id": f"tx_{i}"})
+        self.assertTrue(log.flush())
+        self.assertLessEqual(METRICS.counter("audit_log.flushes"), 3)
+        self.assertEqual(len(list(replay(self.directory))), 100)
+        log.close()
+
+    def test_writer_survives_unexpected_errors(self):
+        """A batch failing with any exception is counted and the writer keeps going"""
+        log = AuditLog(self.directory, flush_interval_ms=5)
+        with patch.object(log, '_write_batch', side_effect=[ValueError("bad batch"), None]), \
+                self.assertLogs('audit_log', level='ERROR'):
+            log.append("transaction", {"transaction_id": "tx_lost"})
+            self.assertTrue(log.flush())
+            self.assertTrue(log._writer.is_alive())
+        log.append("transaction", {"transaction_id": "tx_kept"})
+        log.close()
+        self.assertEqual(METRICS.counter("audit_log.write_errors"), 1)
+        self.assertEqual([e["data"]["transaction_id"] for e in replay(self.directory)], ["tx_kept"])
+
+    def test_rotation_and_compression(self):
+        """Full segments are rotated and gzip-compressed, and still replay in order"""
+        log = AuditLog(self.directory, flush_records=1, segment_bytes=200)
+        for i in range(20):
+            log.append("transaction", {"transaction_id": f"tx_{i}", "padding": "x" * 50})
+        log.close()
+
+        segments = list_segments(self.directory)
+        self.assertGreater(len(segments), 1)
+        self.assertTrue(all(path.endswith(".gz") for _, path in segments[:-1]))
+        self.assertEqual([e["data"]["transaction_id"] for e in replay(self.directory)],
+                         [f"tx_{i}" for i in range(20)])
+
+    def test_reopen_continues_sequence_and_skips_torn_line(self):
+        """A restarted writer starts a new segment and continues the sequence"""
+        log = AuditLog(self.directory)
+        log.append("transaction", {"transaction_id": "tx_1"})
+        log.close()
+        with open(list_segments(self.directory)[-1][1], "a") as segment:
+            segment.write('{"seq": 2, "kind": "transac')  # Simulated crash mid-write
+
+        log = AuditLog(self.directory)
+        log.append("transaction", {"transaction_id": "tx_2"})
+        log.close()
+
+        entries = list(replay(self.directory))
+        self.assertEqual([e["data"]["transaction_id"] for e in entries], ["tx_1", "tx_2"])
+        self.assertEqual(entries[-1]["seq"], 2)
+        self.assertEqual(len(list_segments(self.directory)), 2)
+
+    def test_server_restores_stores_from_log(self):
+        """Transactions, notifications and streamed updates are rebuilt at startup"""
+        log = AuditLog(self.directory)
+        analysis = {"risk_score": 0.9, "risk_factors": [], "reasoning": "", "recommended_action": "block"}
+        log.append("transaction", {"transaction_id": "tx_1", "risk_analysis": analysis})
+        log.append("notification", {"transaction_id": "tx_1", "risk_analysis": analysis,
+                                    "transaction_details": {"transaction_id": "tx_1"}})
+        log.append("transaction_update", {"transaction_id": "tx_1", "risk_analysis": dict(
+            analysis, reasoning="done", risk_factors=["IP mismatch"])})
+        log.close()
+
+        with patch('Server.ALL_TRANSACTIONS', TransactionHistory()) as transactions, \
+                patch('Server.NOTIFICATIONS', NotificationHistory()) as notifications:
+            Server.restore_from_audit_log(self.directory)
+            self.assertEqual(transactions[0]["risk_analysis"]["reasoning"], "done")
+            self.assertEqual(notifications[0]["risk_analysis"]["risk_factors"], ["IP mismatch"])
+
+
+if __name__ == '__main__':
+    unittest.main()
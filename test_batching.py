@@ -0,0 +1,103 @@
+import unittest
+from unittest.mock import patch
+import json
+import threading
+import time
+import Server
+from batching import MicroBatcher
+from risk_core import build_batch_groq_prompt, parse_batch_llm_response
+from testing_helpers import make_transaction, completion
+
+
+class TestMicroBatcher(unittest.TestCase):
+    """Tests for gathering concurrent requests into micro-batches"""
+
+    def test_concurrent_requests_are_batched(self):
+        sizes = []
+
+        def process(items):
+            sizes.append(len(items))
+            time.sleep(0.05)
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher(process, max_batch=4, max_wait_ms=20, workers=1)
+        results = {}
+        threads = [threading.Thread(target=lambda i=i: results.__setitem__(i, batcher.submit(i))) for i in range(9)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        batcher.close()
+        self.assertEqual(results, {i: i * 2 for i in range(9)})
+        self.assertEqual(sum(sizes), 9)
+        self.assertLessEqual(max(sizes), 4)
+        self.assertLess(len(sizes), 9)
+
+    def test_low_traffic_is_not_delayed(self):
+        batcher = MicroBatcher(lambda items: items, max_batch=8, max_wait_ms=500)
+        for i in range(3):
+            started = time.monotonic()
+            self.assertEqual(batcher.submit(i), i)
+            self.assertLess(time.monotonic() - started, 0.25)
+            time.sleep(0.01)
+        batcher.close()
+
+    def test_errors_reach_every_request(self):
+        batcher = MicroBatcher(lambda items: 1 / 0)
+        with self.assertRaises(ZeroDivisionError):
+            batcher.submit("tx")
+        batcher.close()
+
+
+class TestBatchedScoring(unittest.TestCase):
+    """Tests for multi-transaction prompts and demultiplexing their results"""
+
+    def test_parse_by_id_and_position(self):
+        content = json.dumps({"results": [
+            {"transaction_id": "tx_2", "risk_score": 0.9, "recommended_action": "block"},
+            {"transaction_id": "tx_1", "risk_score": 0.1, "recommended_action": "allow"},
+        ]})
+        analyses = parse_batch_llm_response(content, ["tx_1", "tx_2", "tx_3"])
+        self.assertEqual(analyses["tx_1"]["recommended_action"], "allow")
+        self.assertEqual(analyses["tx_2"]["risk_score"], 0.9)
+        self.assertNotIn("tx_3", analyses)
+
+        content = '{"results": [{"risk_score": 0.2}, {"risk_score": 0.8, "recommended_action": "BLOCK"}]}'
+        analyses = parse_batch_llm_response(content, ["tx_1", "tx_2"])
+        self.assertEqual(analyses["tx_2"]["recommended_action"], "block")
+
+    def test_prompt_lists_every_transaction(self):
+        prompt = build_batch_groq_prompt([make_transaction("tx_1"), make_transaction("tx_2")])
+        self.assertIn('"transaction_id": "tx_2"', prompt["messages"][0]["content"])
+        self.assertEqual(prompt["max_tokens"], 600)
+
+    @patch('Server.GROQ_API_KEY', 'dummy_api_key')
+    @patch('Server.requests.post')
+    def test_missing_results_are_retried_individually(self, mock_post):
+        mock_post.side_effect = [
+            completion(json.dumps({"results": [
+                {"transaction_id": "tx_1", "risk_score": 0.1, "recommended_action": "allow"}
+            ]})),
+            completion('{"risk_score": 0.5, "recommended_action": "review"}')
+        ]
+        config = Server.CONFIG.current
+        results = Server.request_batch_risk_analysis([(make_transaction("tx_1"), config, {}),
+                                                      (make_transaction("tx_2"), config, {})])
+        self.assertEqual([r["recommended_action"] for r in results], ["allow", "review"])
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertIn('"results"', json.loads(mock_post.call_args_list[0][1]["data"])["messages"][0]["content"])
+
+    @patch('Server.GROQ_API_KEY', 'dummy_api_key')
+    @patch('Server.requests.post')
+    def test_call_groq_api_uses_batcher(self, mock_post):
+        mock_post.return_value = completion('{"risk_score": 0.3}')  # A lone request uses the single prompt
+        batcher = MicroBatcher(Server.request_batch_risk_analysis, max_batch=4)
+        with patch('Server.BATCHER', batcher):
+            analysis = Server.call_groq_api(make_transaction("tx_1"))
+        batcher.close()
+        self.assertEqual(analysis["risk_score"], 0.3)
+        self.assertEqual(analysis["config_version"], Server.CONFIG.current.version)
+
+
+if __name__ == '__main__':
+    unittest.main()
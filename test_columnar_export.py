@@ -0,0 +1,129 @@
+import unittest
+from unittest.mock import patch
+import contextlib
+import importlib.util
+import io
+import os
+import tempfile
+from datetime import datetime, timezone
+import Server
+from audit_log import AuditLog
+from risk_core import build_transaction_record
+
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+if HAS_PYARROW:
+    import columnar_export
+    from columnar_export import ColumnarExporter, query
+
+
+def make_record(transaction_id, timestamp, action="allow", country="US", score=0.1):
+    transaction = {
+        "transaction_id": transaction_id,
+        "timestamp": timestamp,
+        "amount": 100.0,
+        "currency": "USD",
+        "customer": {"id": "cust_1", "country": country, "ip_address": "10.0.0.1"},
+        "payment_method": {"type": "credit_card", "last_four": "1111", "country_of_issue": "US"},
+        "merchant": {"id": "merch_1", "name": "Shop", "category": "retail"}
+    }
+    return build_transaction_record(transaction, {
+        "risk_score": score, "risk_factors": [], "reasoning": "ok", "recommended_action": action})
+
+
+def day(date, hour=12):
+    return datetime(2025, 6, date, hour, tzinfo=timezone.utc)
+
+
+@unittest.skipUnless(HAS_PYARROW, "pyarrow is not installed")
+class TestColumnarExport(unittest.TestCase):
+    """Tests for the date-partitioned columnar archive"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def export(self, records, file_format="parquet"):
+        exporter = ColumnarExporter(self.directory, file_format=file_format)
+        for record, flagged in records:
+            exporter.add(record, flagged=flagged)
+        self.assertTrue(exporter.flush())
+        exporter.close()
+
+    def test_partitioned_export_and_pushdown_query(self):
+        self.export([
+            (make_record("tx_1", "2025-06-01T10:00:00Z"), False),
+            (make_record("tx_2", "2025-06-02T10:00:00Z", "block", "RU", 0.9), True),
+            (make_record("tx_3", "2025-06-03T10:00:00Z", "block", "RU", 0.95), True),
+            (make_record("tx_4", "2025-06-03T11:00:00Z", "block", "US", 0.8), False)
+        ])
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ["date=2025-06-01", "date=2025-06-02", "date=2025-06-03"])
+
+        table = query(self.directory, start=day(2, 0), end=day(4, 0), action="block", country="RU")
+        self.assertEqual(table["transaction_id"].to_pylist(), ["tx_2", "tx_3"])
+        self.assertEqual(table["flagged"].to_pylist(), [True, True])
+        self.assertEqual(query(self.directory, end=day(3, 10)).num_rows, 2)
+        self.assertEqual(query(self.directory, columns=["risk_score"]).column_names, ["risk_score"])
+
+    def test_updates_supersede_earlier_rows(self):
+        record = make_record("tx_1", "2025-06-01T10:00:00Z", "review", score=0.5)
+        self.export([(record, False)])
+        record["risk_analysis"] = dict(record["risk_analysis"], recommended_action="block", risk_score=0.9,
+                                       analysis_status="rescored")
+        self.export([(record, True), (make_record("tx_2", "2025-06-01T11:00:00Z", "review"), False)])
+
+        self.assertEqual(query(self.directory, action="review")["transaction_id"].to_pylist(), ["tx_2"])
+        latest = query(self.directory, action="block")
+        self.assertEqual(latest["analysis_status"].to_pylist(), ["rescored"])
+        self.assertEqual(query(self.directory, action="review", latest=False).num_rows, 2)
+
+    def test_arrow_format(self):
+        self.export([(make_record(f"tx_{i}", f"2025-06-0{i % 3 + 1}T10:00:00Z"), False) for i in range(9)],
+                    file_format="arrow")
+        self.assertTrue(all(name.endswith(".arrow") for name in os.listdir(os.path.join(self.directory,
+                                                                                       "date=2025-06-01"))))
+        self.assertEqual(query(self.directory, start=day(2, 0)).num_rows, 6)
+
+    def test_mixed_formats(self):
+        record = make_record("tx_1", "2025-06-01T10:00:00Z", "review")
+        self.export([(record, False)])
+        record["risk_analysis"] = dict(record["risk_analysis"], recommended_action="block")
+        self.export([(record, True), (make_record("tx_2", "2025-06-02T10:00:00Z"), False)], file_format="arrow")
+
+        self.assertEqual(query(self.directory, latest=False).num_rows, 3)
+        self.assertEqual(query(self.directory, action="block")["transaction_id"].to_pylist(), ["tx_1"])
+        self.assertEqual(query(self.directory, start=day(2, 0))["transaction_id"].to_pylist(), ["tx_2"])
+
+    def test_backfill_and_cli(self):
+        audit_directory = tempfile.mkdtemp()
+        log = AuditLog(audit_directory, fsync=False)
+        log.append("transaction", make_record("tx_1", "2025-06-01T10:00:00Z", "review"))
+        log.append("transaction", make_record("tx_2", "2025-06-01T11:00:00Z", "block", "RU"))
+        log.append("notification", {"transaction_id": "tx_2"})
+        log.append("transaction_update", {"transaction_id": "tx_1", "risk_analysis": {
+            "risk_score": 0.9, "risk_factors": [], "reasoning": "re-scored", "recommended_action": "block"}})
+        log.close()
+
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertEqual(columnar_export.main(["backfill", audit_directory, self.directory]), 0)
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                columnar_export.main(["query", self.directory, "--action", "block", "--count"])
+        self.assertEqual(output.getvalue().strip(), "2")
+        table = query(self.directory, country="RU")
+        self.assertEqual(table["flagged"].to_pylist(), [True])
+
+    def test_server_exports_records_and_updates(self):
+        exporter = ColumnarExporter(self.directory)
+        record = make_record("tx_1", "2025-06-01T10:00:00Z", "review")
+        with patch('Server.EXPORTER', exporter), patch('Server.ALL_TRANSACTIONS', Server.TransactionHistory()):
+            Server.record_transaction(record)
+            Server.update_stored_analysis("tx_1", dict(record["risk_analysis"], recommended_action="allow"))
+            Server.export_update("tx_1")
+        exporter.flush()
+        exporter.close()
+        self.assertEqual(query(self.directory)["recommended_action"].to_pylist(), ["allow"])
+        self.assertEqual(query(self.directory, latest=False).num_rows, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+from unittest.mock import patch
+import base64
+import json
+from Server import app
+from entity_links import EntityLinks
+from risk_core import apply_risk_rules
+from testing_helpers import make_transaction
+
+
+class TestEntityLinks(unittest.TestCase):
+    """Tests for the union-find entity link index"""
+
+    def test_shared_ip(self):
+        links = EntityLinks()
+        for i in range(5):
+            links.observe(make_transaction(f"tx_{i}", customer=f"cust_{i}", last_four=f"000{i}"), at=100)
+        features = links.features(make_transaction("tx_new", customer="cust_new", last_four="9999"))
+        self.assertEqual(features, {"linked_customers": 6, "linked_ips": 1, "linked_cards": 6,
+                                    "ip_customers": 6, "card_customers": 1})
+        risk_analysis = {"risk_score": 0.1, "risk_factors": [], "recommended_action": "allow"}
+        apply_risk_rules(make_transaction("tx_new", customer="cust_new"), risk_analysis, features)
+        self.assertEqual(risk_analysis["risk_factors"], ["IP address shared by 6 customers"])
+        self.assertEqual(links.features(make_transaction("tx_other", customer="cust_other", ip="10.9.9.9", last_four="8888")), {})
+
+    def test_clusters_are_transitive(self):
+        links = EntityLinks()
+        links.observe(make_transaction("tx_1", customer="cust_a", ip="10.0.0.1", last_four="1111", merchant="m1"), at=100)
+        links.observe(make_transaction("tx_2", customer="cust_b", ip="10.0.0.1", last_four="2222", merchant="m2"), at=110)
+        links.observe(make_transaction("tx_3", customer="cust_c", ip="10.0.0.3", last_four="2222", merchant="m2"), at=120)
+        links.observe(make_transaction("tx_4", customer="cust_d", ip="10.0.0.4", last_four="4444"), at=130)
+        features = links.features(make_transaction("tx_5", customer="cust_c", ip="10.0.0.3", last_four="2222"))
+        self.assertEqual((features["linked_customers"], features["card_customers"]), (3, 2))
+
+        [cluster] = links.clusters()
+        self.assertEqual((cluster["customers"], cluster["ips"], cluster["cards"]), (3, 2, 2))
+        self.assertEqual((cluster["merchants"], cluster["transactions"]), (2, 3))
+        self.assertEqual(sorted(cluster["members"]["customer"]), ["cust_a", "cust_b", "cust_c"])
+        self.assertEqual(cluster["last_seen"], "1970-01-01T00:02:00Z")
+
+    def test_links_decay(self):
+        links = EntityLinks(window_seconds=100)
+        links.observe(make_transaction("tx_1", customer="cust_a"), at=0)
+        links.observe(make_transaction("tx_2", customer="cust_b"), at=60)
+        self.assertEqual(links.features(make_transaction("tx_3", customer="cust_c"))["ip_customers"], 3)
+        links.observe(make_transaction("tx_4", customer="cust_d", ip="10.0.0.9", last_four="9999"), at=120)
+        # cust_a (last seen at 0) is forgotten; cust_b (at 60) is still linked
+        self.assertEqual(links.features(make_transaction("tx_5", customer="cust_c"))["ip_customers"], 2)
+        links.observe(make_transaction("tx_6", customer="cust_d", ip="10.0.0.9", last_four="9999"), at=200)
+        self.assertEqual(links.features(make_transaction("tx_7", customer="cust_c")), {})
+
+    def test_memory_is_bounded(self):
+        links = EntityLinks(max_entities=1000)
+        for i in range(5000):
+            links.observe(make_transaction(f"tx_{i}", customer=f"cust_{i}", ip=f"10.0.{i // 256}.{i % 256}",
+                                           last_four=f"{i:04d}"), at=100)
+        self.assertLessEqual(links.stats()["entities"] + links.stats()["links"], 1000)
+
+
+class TestClustersEndpoint(unittest.TestCase):
+    """Tests for GET /admin/clusters"""
+
+    def setUp(self):
+        self.client = app.test_client()
+        credentials = base64.b64encode(b"admin:secret123").decode("utf-8")
+        self.auth_headers = {"Authorization": f"Basic {credentials}"}
+
+    def test_clusters_endpoint(self):
+        links = EntityLinks()
+        for i in range(3):
+            links.observe(make_transaction(f"tx_{i}", customer=f"cust_{i}", last_four=f"000{i}"))
+        links.observe(make_transaction("tx_solo", customer="cust_solo", ip="10.1.1.1", last_four="5555"))
+        with patch('Server.ENTITY_LINKS', links):
+            response = self.client.get('/admin/clusters?top=5', headers=self.auth_headers)
+            self.assertEqual(self.client.get('/admin/clusters?top=x', headers=self.auth_headers).status_code, 400)
+        self.assertEqual(response.status_code, 200)
+        body = json.loads(response.data)
+        self.assertEqual([cluster["customers"] for cluster in body["clusters"]], [3])
+        self.assertEqual(body["index"]["clusters"], 2)
+
+    def test_clusters_requires_auth(self):
+        self.assertEqual(self.client.get('/admin/clusters').status_code, 401)
+
+
+if __name__ == '__main__':
+    unittest.main()
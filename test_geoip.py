@@ -0,0 +1,109 @@
+import unittest
+from unittest.mock import patch
+import json
+import os
+import tempfile
+import time
+import Server
+from geoip import GeoReputation, GeoReputationStore, PrefixIndex, parse_ip
+from risk_core import build_optimized_groq_prompt
+
+SAMPLE_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "geo_reputation.json")
+
+
+class TestPrefixIndex(unittest.TestCase):
+    """Tests for the longest-prefix-match index"""
+
+    def test_most_specific_block_wins(self):
+        """Nested blocks override their parent only inside their own range"""
+        index = PrefixIndex([["10.0.0.0/8", "A"], ["10.1.0.0/16", "B"], ["10.1.2.0/24", "C"], ["11.0.0.0/8", "D"]])
+        lookup = lambda ip: index.lookup(*parse_ip(ip))
+        self.assertEqual(lookup("10.0.0.1"), "A")
+        self.assertEqual(lookup("10.1.0.1"), "B")
+        self.assertEqual(lookup("10.1.2.255"), "C")
+        self.assertEqual(lookup("10.1.3.0"), "B")
+        self.assertEqual(lookup("10.2.0.0"), "A")
+        self.assertEqual(lookup("11.255.255.255"), "D")
+        self.assertIsNone(lookup("12.0.0.0"))
+        self.assertIsNone(lookup("9.255.255.255"))
+
+    def test_ipv6(self):
+        index = PrefixIndex([["2001:db8::/32", "US"]])
+        self.assertEqual(index.lookup(*parse_ip("2001:db8::1")), "US")
+        self.assertIsNone(index.lookup(*parse_ip("2001:db9::1")))
+
+    def test_invalid_addresses(self):
+        self.assertEqual(parse_ip("300.1.1.1"), (None, None))
+        self.assertEqual(parse_ip("not-an-ip"), (None, None))
+        self.assertEqual(parse_ip(None), (None, None))
+        self.assertEqual(parse_ip("1.2.3.\u00b2"), (None, None))  # Unicode digits pass str.isdigit()
+
+
+class TestGeoReputation(unittest.TestCase):
+    """Tests for the geo/IP features and their use in scoring"""
+
+    def setUp(self):
+        self.tables = GeoReputation.from_file(SAMPLE_DATA)
+        self.transaction = {
+            "transaction_id": "tx_geo_1",
+            "timestamp": "2025-06-24T12:00:00Z",
+            "amount": 100.0,
+            "currency": "USD",
+            "customer": {"id": "cust_1", "country": "US", "ip_address": "95.31.18.119"},
+            "payment_method": {"type": "credit_card", "last_four": "1111", "country_of_issue": "US"},
+            "merchant": {"id": "merch_1", "name": "Shop", "category": "retail"}
+        }
+
+    def test_features(self):
+        """IP country, mismatch and reputation are derived locally"""
+        features = self.tables.features(self.transaction)
+        self.assertEqual(features, {
+            "ip_country": "RU", "ip_country_mismatch": True, "ip_country_risk": "high", "ip_reputation": None
+        })
+        self.assertIsInstance(self.tables.high_risk_countries, frozenset)
+
+    def test_unparseable_ip_has_no_features(self):
+        self.transaction["customer"]["ip_address"] = "1.2.3.\u0663"
+        self.assertEqual(self.tables.features(self.transaction), {
+            "ip_country": None, "ip_country_mismatch": False, "ip_country_risk": None, "ip_reputation": None
+        })
+
+    def test_features_feed_scoring(self):
+        """IP features reach the prompt, the risk factors and the high-risk rule"""
+        with patch('Server.GEO', GeoReputationStore(SAMPLE_DATA)), patch('Server.socketio.emit'):
+            prompt = Server.build_optimized_groq_prompt(self.transaction, Server.geo_features(self.transaction))
+            self.assertIn('"ip_country": "RU"', prompt["messages"][0]["content"])
+
+            analysis = {"risk_score": 0.2, "risk_factors": [], "recommended_action": "allow"}
+            notification = Server.send_admin_notification(self.transaction, analysis)
+            self.assertIsNotNone(notification)
+            self.assertIn("IP address located in RU, customer country is US", analysis["risk_factors"])
+            self.assertIn("Transaction involves high-risk country: RU", analysis["risk_factors"])
+        Server.NOTIFICATIONS.clear()
+
+    def test_prompt_unchanged_without_features(self):
+        self.assertEqual(build_optimized_groq_prompt(self.transaction, None), build_optimized_groq_prompt(self.transaction))
+
+    def test_hot_reload(self):
+        """A changed data file is picked up without a restart"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "geo.json")
+            with open(path, "w") as data_file:
+                json.dump({"version": "1", "high_risk_countries": ["RU"]}, data_file)
+            store = GeoReputationStore(path, check_interval=0)
+            self.assertEqual(store.current().version, "1")
+
+            with open(path, "w") as data_file:
+                json.dump({"version": "2", "high_risk_countries": ["RU", "BY"]}, data_file)
+            os.utime(path, ns=(time.time_ns(), time.time_ns() + 1000000))
+            self.assertEqual(store.current().version, "2")
+            self.assertIn("BY", store.current().high_risk_countries)
+
+            with open(path, "w") as data_file:
+                data_file.write("{broken")
+            os.utime(path, ns=(time.time_ns(), time.time_ns() + 2000000))
+            self.assertEqual(store.current().version, "2")  # Bad files are rejected
+
+
+if __name__ == '__main__':
+    unittest.main()
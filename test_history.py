@@ -0,0 +1,158 @@
+import unittest
+import copy
+import threading
+from history import CompactHistory, NotificationHistory, TransactionHistory
+from risk_core import build_notification, build_transaction_record
+
+
+class TestCompactHistory(unittest.TestCase):
+    """Tests for the bounded, compact transaction and notification stores"""
+
+    def setUp(self):
+        self.transaction = {
+            "transaction_id": "tx_hist_1",
+            "timestamp": "2025-06-24T12:00:00Z",
+            "amount": 2500.0,
+            "currency": "USD",
+            "customer": {"id": "cust_1", "country": "RU", "ip_address": "95.31.18.119", "email": "a@b.c"},
+            "payment_method": {"type": "credit_card", "last_four": "1234", "country_of_issue": "RU"},
+            "merchant": {"id": "merch_1", "name": "Test Merchant", "category": "electronics"},
+            "channel": "web"
+        }
+        self.analysis = {
+            "risk_score": 0.9,
+            "risk_factors": ["High-risk country"],
+            "reasoning": "Country on the high-risk list",
+            "recommended_action": "block",
+            "analysis_status": "partial"
+        }
+
+    def test_transaction_round_trip(self):
+        """Records materialize exactly as they were stored, including unknown fields"""
+        history = TransactionHistory()
+        record = build_transaction_record(self.transaction, self.analysis)
+        expected = copy.deepcopy(record)
+        expected["channel"] = "web"
+        record["channel"] = "web"
+        history.append(record)
+        self.assertEqual(history[0], expected)
+        self.assertEqual(history.snapshot(), [expected])
+
+    def test_status_field_kept(self):
+        """Test-endpoint records carry a status field"""
+        history = TransactionHistory()
+        history.append({**self.transaction, "risk_analysis": self.analysis, "status": "processed"})
+        self.assertEqual(history[-1]["status"], "processed")
+
+    def test_notification_round_trip(self):
+        """Notifications keep a single copy of the transaction but materialize both views"""
+        history = NotificationHistory()
+        notification = build_notification(self.transaction, self.analysis)
+        expected = copy.deepcopy(notification)
+        history.append(notification)
+        self.assertEqual(history[0], expected)
+
+    def test_strings_are_interned(self):
+        """Low-cardinality values share one string object across records"""
+        history = TransactionHistory()
+        for i in range(2):
+            transaction = copy.deepcopy(self.transaction)
+            transaction["transaction_id"] = f"tx_{i}"
+            transaction["merchant"]["category"] = "".join(["electro", "nics"])  # Distinct string objects
+            history.append(build_transaction_record(transaction, self.analysis))
+        first, second = history._ordered()
+        self.assertIs(first.merchant_category, second.merchant_category)
+
+    def test_ring_buffer_eviction(self):
+        """The oldest records are evicted beyond the count and memory caps"""
+        history = TransactionHistory(max_records=3)
+        for i in range(5):
+            history.append(build_transaction_record(dict(self.transaction, transaction_id=f"tx_{i}"), self.analysis))
+        self.assertEqual([r["transaction_id"] for r in history], ["tx_2", "tx_3", "tx_4"])
+        self.assertIsNone(history.get("tx_0"))
+        self.assertEqual(history.stats()["evicted"], 2)
+
+        per_record = history.stats()["approx_bytes"] // 3
+        history.configure(max_bytes=per_record * 2)
+        self.assertLessEqual(len(history), 2)
+
+    def test_update_analysis(self):
+        """Streamed reasoning replaces the stored record; records already read are never changed"""
+        history = NotificationHistory()
+        history.append(build_notification(self.transaction, self.analysis))
+        [before] = history._ordered()
+        version = history.version
+        self.assertTrue(history.update_analysis("tx_hist_1", {"reasoning": "Final", "risk_factors": ["A", "B"]}))
+        self.assertFalse(history.update_analysis("tx_missing", {"reasoning": "x"}))
+        self.assertEqual(history[0]["risk_analysis"]["reasoning"], "Final")
+        self.assertEqual(history[0]["risk_analysis"]["risk_factors"], ["A", "B"])
+        self.assertEqual(history.get("tx_hist_1")["risk_analysis"]["reasoning"], "Final")
+        self.assertEqual(before.risk_analysis()["reasoning"], self.analysis["reasoning"])
+        self.assertGreater(history.version, version)
+        self.assertEqual(len(history), 1)
+
+
+    def test_base_class_is_abstract(self):
+        with self.assertRaises(TypeError):
+            CompactHistory()
+
+
+class TestConcurrentHistory(unittest.TestCase):
+    """Stress test of the sharded history with concurrent writers and readers"""
+
+    def test_concurrent_writers_and_readers(self):
+        writers, per_writer = 8, 500
+        history = TransactionHistory(max_records=writers * per_writer)
+        analysis = {"risk_score": 0.1, "risk_factors": [], "reasoning": "", "recommended_action": "allow"}
+        errors = []
+        done = threading.Event()
+
+        def write(worker):
+            for i in range(per_writer):
+                transaction = {"transaction_id": f"tx_{worker}_{i}", "amount": float(i), "currency": "USD"}
+                history.append(build_transaction_record(transaction, analysis))
+                if i % 50 == 0:
+                    history.update_analysis(f"tx_{worker}_{i}", {"reasoning": "updated"})
+
+        def read():
+            while not done.is_set():
+                snapshot = history.snapshot()
+                ids = [record["transaction_id"] for record in snapshot]
+                if len(ids) != len(set(ids)):
+                    errors.append("duplicate records in snapshot")
+                for worker in range(writers):
+                    # Each writer's records appear in the order they were written
+                    amounts = [record["amount"] for record in snapshot
+                               if record["transaction_id"].startswith(f"tx_{worker}_")]
+                    if amounts != sorted(amounts):
+                        errors.append(f"writer {worker} out of order")
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        threads = [threading.Thread(target=write, args=(w,)) for w in range(writers)]
+        for thread in readers + threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        done.set()
+        for thread in readers:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(history), writers * per_writer)
+        self.assertEqual(history.get("tx_3_100")["risk_analysis"]["reasoning"], "updated")
+
+        # Shrinking the cap evicts the globally oldest records
+        newest = history.snapshot()[-writers:]
+        history.configure(max_records=writers)
+        self.assertEqual(history.snapshot(), newest)
+
+    def test_configure_keeps_limits_not_given(self):
+        history = TransactionHistory(max_records=10, max_bytes=4096)
+        history.configure(max_records=5)
+        self.assertEqual((history.max_records, history.max_bytes), (5, 4096))
+        history.configure(max_bytes=2048)
+        self.assertEqual((history.max_records, history.max_bytes), (5, 2048))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+from unittest.mock import patch
+import base64
+import gzip
+import json
+import Server
+from history import NotificationHistory, TransactionHistory
+from risk_core import build_transaction_record
+
+
+def make_record(transaction_id):
+    transaction = {
+        "transaction_id": transaction_id,
+        "timestamp": "2025-06-24T12:00:00Z",
+        "amount": 100.0,
+        "currency": "USD",
+        "customer": {"id": "cust_1", "country": "US", "ip_address": "10.0.0.1"},
+        "payment_method": {"type": "credit_card", "last_four": "1111", "country_of_issue": "US"},
+        "merchant": {"id": "merch_1", "name": "Shop", "category": "retail"}
+    }
+    return build_transaction_record(transaction, {"risk_score": 0.2, "risk_factors": [], "reasoning": "ok",
+                                                  "recommended_action": "allow"})
+
+
+class TestCachedAdminResponses(unittest.TestCase):
+    """Tests for ETag revalidation and compression of the polled admin lists"""
+
+    def setUp(self):
+        Server.app.config['TESTING'] = True
+        self.client = Server.app.test_client()
+        self.headers = {"Authorization": "Basic " + base64.b64encode(b"admin:secret123").decode("utf-8")}
+
+    def test_unchanged_poll_is_not_modified(self):
+        transactions = TransactionHistory()
+        transactions.append(make_record("tx_1"))
+        with patch('Server.ALL_TRANSACTIONS', transactions), \
+                patch.object(transactions, 'snapshot', wraps=transactions.snapshot) as snapshot:
+            first = self.client.get('/admin/all-transactions', headers=self.headers)
+            self.assertEqual(first.status_code, 200)
+            etag = first.headers["ETag"]
+
+            second = self.client.get('/admin/all-transactions', headers=dict(self.headers, **{"If-None-Match": etag}))
+            self.assertEqual(second.status_code, 304)
+            self.assertEqual(second.data, b"")
+            self.assertEqual(snapshot.call_count, 1)
+
+            transactions.update_analysis("tx_1", {"reasoning": "changed"})
+            third = self.client.get('/admin/all-transactions', headers=dict(self.headers, **{"If-None-Match": etag}))
+            self.assertEqual(third.status_code, 200)
+            self.assertNotEqual(third.headers["ETag"], etag)
+            self.assertEqual(third.get_json()["transactions"][0]["risk_analysis"]["reasoning"], "changed")
+
+    def test_large_responses_are_compressed_once(self):
+        notifications = NotificationHistory()
+        with patch('Server.NOTIFICATIONS', notifications), \
+                patch('Server.ALL_TRANSACTIONS', TransactionHistory()):
+            small = self.client.get('/admin/notifications', headers=dict(self.headers, **{"Accept-Encoding": "gzip"}))
+            self.assertNotIn("Content-Encoding", small.headers)
+
+            for i in range(50):
+                record = make_record(f"tx_{i}")
+                notifications.append(Server.build_notification(record, record["risk_analysis"]))
+            with patch('http_cache.gzip.compress', wraps=gzip.compress) as compress:
+                responses = [self.client.get('/admin/notifications',
+                                             headers=dict(self.headers, **{"Accept-Encoding": "gzip"}))
+                             for _ in range(3)]
+            self.assertEqual(compress.call_count, 1)
+            self.assertEqual(responses[0].headers["Content-Encoding"], "gzip")
+            self.assertEqual(responses[0].headers["Vary"], "Accept-Encoding")
+            payload = json.loads(gzip.decompress(responses[2].data))
+            self.assertEqual(len(payload["notifications"]), 50)
+
+            plain = self.client.get('/admin/notifications', headers=self.headers)
+            self.assertNotIn("Content-Encoding", plain.headers)
+            self.assertEqual(plain.get_json(), payload)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+import subprocess
+import sys
+import os
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+HEAVY_DEPENDENCIES = ["flask", "flask_cors", "flask_socketio", "requests", "dotenv"]
+
+
+def imported_modules(statement):
+    """Run an import in a fresh interpreter and return the modules it loaded"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    )
+    return {
+        line.split("|")[-1].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:")
+    }
+
+
+class TestImportTime(unittest.TestCase):
+    """Guard the cold-start cost of the dependency-light core"""
+
+    def test_risk_core_has_no_heavy_dependencies(self):
+        """Importing the core must not pull in the web stack or HTTP client"""
+        loaded = imported_modules("import risk_core")
+        self.assertIn("risk_core", loaded)
+        for dependency in HEAVY_DEPENDENCIES:
+            self.assertNotIn(dependency, loaded)
+
+    def test_server_defers_optional_dependencies(self):
+        """Importing Server only needs Flask; the rest is loaded by create_app()"""
+        loaded = imported_modules("import Server")
+        for dependency in ["flask_cors", "flask_socketio", "requests", "dotenv"]:
+            self.assertNotIn(dependency, loaded)
+
+    def test_create_app_builds_the_app(self):
+        """The application factory registers the routes and Socket.IO server"""
+        import Server
+        app = Server.create_app()
+        rules = {rule.rule for rule in app.url_map.iter_rules()}
+        self.assertIn("/webhook", rules)
+        self.assertIn("/admin/all-transactions", rules)
+        self.assertIs(app.extensions["socketio"], Server.get_socketio())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import threading
+import time
+from lanes import LaneScheduler, classify, parse_reservations
+from metrics import METRICS
+from testing_helpers import make_transaction
+
+
+class TestLanes(unittest.TestCase):
+    """Tests for priority-lane classification and slot scheduling"""
+
+    def start_waiter(self, scheduler, lane, order):
+        def run():
+            kind = scheduler.acquire(lane)
+            order.append(lane)
+            scheduler.release(lane, kind)
+        thread = threading.Thread(target=run)
+        thread.start()
+        deadline = time.time() + 2
+        while scheduler.snapshot()["lanes"][lane]["queued"] == 0 and time.time() < deadline:
+            time.sleep(0.001)
+        return thread
+
+    def test_classify(self):
+        self.assertEqual(classify(make_transaction(amount=25000.0)), "high")
+        self.assertEqual(classify(make_transaction(amount=100.0, country="RU"), frozenset(["RU"])), "high")
+        self.assertEqual(classify(make_transaction(amount=100.0, category="gambling")), "high")
+        self.assertEqual(classify(make_transaction(amount=5.0)), "bulk")
+        self.assertEqual(classify(make_transaction(amount=100.0)), "normal")
+
+    def test_higher_lane_is_served_first(self):
+        scheduler = LaneScheduler(1)
+        kind = scheduler.acquire("normal")
+        order = []
+        threads = [self.start_waiter(scheduler, "bulk", order), self.start_waiter(scheduler, "high", order)]
+        scheduler.release("normal", kind)
+        for thread in threads:
+            thread.join(2)
+        self.assertEqual(order, ["high", "bulk"])
+
+    def test_starved_waiter_is_promoted(self):
+        scheduler = LaneScheduler(1, max_wait_ms=0)
+        kind = scheduler.acquire("normal")
+        order = []
+        threads = [self.start_waiter(scheduler, "bulk", order), self.start_waiter(scheduler, "high", order)]
+        promoted = METRICS.counter("lanes.bulk.promoted")
+        scheduler.release("normal", kind)
+        for thread in threads:
+            thread.join(2)
+        self.assertEqual(order, ["bulk", "high"])
+        self.assertEqual(METRICS.counter("lanes.bulk.promoted"), promoted + 1)
+
+    def test_reservations_keep_capacity_for_high_lane(self):
+        scheduler = LaneScheduler(4, reservations=parse_reservations("high=1,bulk=1"))
+        bulk = [scheduler.acquire("bulk") for _ in range(3)]
+        self.assertEqual(sorted(bulk), ["reserved", "shared", "shared"])
+        order = []
+        thread = self.start_waiter(scheduler, "bulk", order)
+        self.assertEqual(scheduler.acquire("high"), "reserved")  # Does not wait behind bulk traffic
+        scheduler.release("high", "reserved")
+        self.assertEqual(order, [])
+        scheduler.release("bulk", bulk.pop())
+        thread.join(2)
+        self.assertEqual(order, ["bulk"])
+
+    def test_invalid_reservations(self):
+        with self.assertRaises(ValueError):
+            LaneScheduler(2, reservations={"high": 3})
+        with self.assertRaises(ValueError):
+            LaneScheduler(1, reservations={"high": 1})
+        with self.assertRaises(ValueError):
+            parse_reservations("urgent=1")
+
+
+if __name__ == '__main__':
+    unittest.main()
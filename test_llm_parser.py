@@ -0,0 +1,84 @@
+import unittest
+from llm_parser import StreamingRiskParser, iter_sse_deltas, parse_json_object
+from metrics import METRICS
+
+
+class TestParseJsonObject(unittest.TestCase):
+    """Tests for extracting the risk JSON from free-form model output"""
+
+    def setUp(self):
+        METRICS.reset()
+
+    def test_preamble_and_trailing_prose(self):
+        """Text around the object is ignored"""
+        content = 'Here is my analysis:\n{"risk_score": 0.4, "recommended_action": "review"}\nLet me know!'
+        self.assertEqual(parse_json_object(content), {"risk_score": 0.4, "recommended_action": "review"})
+
+    def test_markdown_fence(self):
+        """Fenced output with a language tag is accepted"""
+        content = '```json\n{"risk_score": 0.1, "risk_factors": []}\n```'
+        self.assertEqual(parse_json_object(content)["risk_score"], 0.1)
+
+    def test_trailing_commas_and_single_quotes(self):
+        """Common malformations are repaired"""
+        content = "{'risk_score': 0.9, 'risk_factors': ['Card \"test\" mismatch', 'IP',], 'reasoning': 'It\\'s odd',}"
+        result = parse_json_object(content)
+        self.assertEqual(result["risk_score"], 0.9)
+        self.assertEqual(result["risk_factors"], ['Card "test" mismatch', 'IP'])
+        self.assertEqual(result["reasoning"], "It's odd")
+        self.assertEqual(METRICS.counter("llm_parse.repaired"), 1)
+
+    def test_apostrophes_inside_double_quotes_untouched(self):
+        """Only quote characters outside strings are rewritten"""
+        content = '{"reasoning": "Merchant\'s history, fine", "risk_score": 0.2,}'
+        self.assertEqual(parse_json_object(content)["reasoning"], "Merchant's history, fine")
+
+    def test_failure_is_counted(self):
+        """Unrecoverable output raises and feeds the failure-rate metric"""
+        parse_json_object('{"risk_score": 0.2}')
+        with self.assertRaises(ValueError):
+            parse_json_object('{"risk_score": 0.2')
+        snapshot = METRICS.snapshot()
+        self.assertEqual(snapshot["counters"]["llm_parse.failures"], 1)
+        self.assertEqual(snapshot["gauges"]["llm_parse.failure_rate"], 0.5)
+
+
+class TestStreamingRiskParser(unittest.TestCase):
+    """Tests for incremental parsing of streamed completions"""
+
+    def test_decision_before_reasoning(self):
+        """Score and action are available before the object is closed"""
+        parser = StreamingRiskParser()
+        chunks = ['Sure! {"risk_sc', 'ore": 0.', '85, "recommended_action": "bl', 'ock", "reas',
+                  'oning": "Large amount, {odd} pattern']
+        for chunk in chunks[:2]:
+            parser.feed(chunk)
+        self.assertIsNone(parser.decision())
+        for chunk in chunks[2:]:
+            parser.feed(chunk)
+        self.assertEqual(parser.decision(), {"risk_score": 0.85, "recommended_action": "block"})
+        self.assertFalse(parser.complete)
+
+        parser.feed('", "risk_factors": ["amount"]} trailing text')
+        self.assertTrue(parser.complete)
+        self.assertEqual(parser.result()["reasoning"], "Large amount, {odd} pattern")
+
+    def test_sse_deltas(self):
+        """Content deltas are extracted from SSE data lines"""
+        lines = [
+            b'data: {"choices": [{"delta": {"role": "assistant"}}]}',
+            b'',
+            b'data: {"choices": [{"delta": {"content": "{\\"risk_score\\": 0.3,"}}]}',
+            b': keep-alive',
+            b'data: {"choices": [{"delta": {"content": " \\"recommended_action\\": \\"review\\"}"}}]}',
+            b'data: [DONE]',
+            b'data: {"choices": [{"delta": {"content": "ignored"}}]}',
+        ]
+        parser = StreamingRiskParser()
+        for delta in iter_sse_deltas(lines):
+            parser.feed(delta)
+        self.assertEqual(parser.result(), {"risk_score": 0.3, "recommended_action": "review"})
+
+
+if __name__ == '__main__':
+    unittest.main()
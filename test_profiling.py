@@ -0,0 +1,115 @@
+import unittest
+from unittest.mock import patch
+import base64
+import json
+import threading
+import time
+import Server
+from profiling import ProfilerBusy, SamplingProfiler, SlowRequestLog, payload_shape, stage
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class TestSamplingProfiler(unittest.TestCase):
+    """Tests for the on-demand sampling profiler"""
+
+    def test_folded_stacks(self):
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_loop, args=(stop,), name="busy-worker")
+        worker.start()
+        try:
+            folded, stats = SamplingProfiler().profile(0.2, interval=0.005)
+        finally:
+            stop.set()
+            worker.join()
+        lines = folded.splitlines()
+        busy = [line for line in lines if line.startswith("busy-worker;")]
+        self.assertTrue(busy)
+        stack, count = busy[0].rsplit(" ", 1)
+        self.assertIn("busy_loop (test_profiling.py)", stack.split(";"))
+        self.assertGreater(int(count), 0)
+        self.assertGreater(stats["samples"], 10)
+
+    def test_one_profile_at_a_time(self):
+        profiler = SamplingProfiler()
+        thread = threading.Thread(target=profiler.profile, args=(0.3,))
+        thread.start()
+        time.sleep(0.05)
+        with self.assertRaises(ProfilerBusy):
+            profiler.profile(0.1)
+        thread.join()
+
+
+class TestSlowRequestLog(unittest.TestCase):
+    """Tests for stage timings and the slow-request ring buffer"""
+
+    def test_captures_slow_requests_only(self):
+        log = SlowRequestLog(threshold_ms=20, capacity=2)
+        log.start()
+        with stage("model"):
+            pass
+        self.assertIsNone(log.finish("POST", "/webhook", 200))
+        for i in range(3):
+            log.start()
+            with stage("model"):
+                time.sleep(0.025)
+            log.finish("POST", "/webhook", 200, lambda: {"transaction_id": f"tx_{i}", "amount": 1.5})
+        entries = log.entries()
+        self.assertEqual([entry["transaction_id"] for entry in entries], ["tx_2", "tx_1"])
+        self.assertGreaterEqual(entries[0]["stages"]["model"], 25)
+        self.assertEqual(entries[0]["payload_shape"], {"transaction_id": "string[4]", "amount": "number"})
+
+    def test_stage_outside_a_request(self):
+        with stage("model"):
+            pass
+        self.assertIsNone(SlowRequestLog(threshold_ms=None).finish("GET", "/", 200))
+
+    def test_payload_shape(self):
+        self.assertEqual(payload_shape({"items": [{"id": 1}, {"id": 2}], "flag": True, "note": None}),
+                         {"items": [{"id": "number"}, "array[2]"], "flag": "boolean", "note": "null"})
+
+
+class TestProfilingEndpoints(unittest.TestCase):
+    """Tests for GET /admin/profile and GET /admin/slow-requests"""
+
+    def setUp(self):
+        self.client = Server.app.test_client()
+        credentials = base64.b64encode(b"admin:secret123").decode("utf-8")
+        self.auth_headers = {"Authorization": f"Basic {credentials}"}
+
+    def test_slow_webhook_is_captured(self):
+        transaction = {
+            "transaction_id": "tx_slow",
+            "timestamp": "2025-06-24T12:00:00Z",
+            "amount": 100.0,
+            "currency": "USD",
+            "customer": {"id": "cust_1", "country": "US", "ip_address": "10.0.0.1"},
+            "payment_method": {"type": "credit_card", "last_four": "1111", "country_of_issue": "US"},
+            "merchant": {"id": "merch_1", "name": "Shop", "category": "retail"}
+        }
+        with patch('Server.SLOW_REQUESTS', SlowRequestLog(threshold_ms=0)), \
+                patch('Server.ALL_TRANSACTIONS', Server.TransactionHistory()), \
+                patch('Server.GROQ_API_KEY', None):
+            self.client.post('/webhook', json=transaction, headers=self.auth_headers)
+            response = self.client.get('/admin/slow-requests', headers=self.auth_headers)
+        body = json.loads(response.data)
+        [entry] = [entry for entry in body["requests"] if entry["path"] == "/webhook"]
+        self.assertEqual((entry["status"], entry["transaction_id"]), (200, "tx_slow"))
+        self.assertEqual(set(entry["stages"]), {"parse", "validate", "model", "rules_and_notify", "record",
+                                                "serialize"})
+        self.assertEqual(entry["payload_shape"]["customer"]["country"], "string[2]")
+
+    def test_profile_endpoint(self):
+        response = self.client.get('/admin/profile?seconds=0.1&interval_ms=5', headers=self.auth_headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith("text/plain"))
+        self.assertGreater(int(response.headers["X-Profile-Samples"]), 0)
+        self.assertEqual(self.client.get('/admin/profile?seconds=600', headers=self.auth_headers).status_code, 400)
+        self.assertEqual(self.client.get('/admin/profile').status_code, 401)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+from unittest.mock import patch
+import base64
+import json
+import os
+import tempfile
+import Server
+from replay import CorpusRecorder, load_corpus, main, run_replay
+from risk_config import ConfigStore, RiskConfig
+from testing_helpers import make_transaction, completion
+
+
+class TestReplay(unittest.TestCase):
+    """Tests for recording live decisions and replaying them deterministically"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        Server.app.config['TESTING'] = True
+        self.client = Server.app.test_client()
+        self.headers = {"Authorization": "Basic " + base64.b64encode(b"admin:secret123").decode("utf-8")}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    @patch('Server.GROQ_API_KEY', 'dummy_api_key')
+    @patch('Server.requests.post')
+    def record(self, transactions, contents, mock_post):
+        mock_post.side_effect = [completion(content) for content in contents]
+        recorder = CorpusRecorder(self.directory.name, fsync=False)
+        with patch('Server.RECORDER', recorder), \
+                patch('Server.NOTIFICATIONS', Server.NotificationHistory()), \
+                patch('Server.ALL_TRANSACTIONS', Server.TransactionHistory()), \
+                patch('Server.socketio.emit'):
+            for transaction in transactions:
+                response = self.client.post('/webhook', headers=self.headers, json=transaction)
+                self.assertEqual(response.status_code, 200)
+        recorder.close()
+        return load_corpus(self.directory.name)
+
+    def test_record_and_replay_without_changes(self):
+        cases = self.record(
+            [make_transaction("tx_1"), make_transaction("tx_2", country="RU"), make_transaction("tx_3")],
+            ['{"risk_score": 0.1, "recommended_action": "allow", "risk_factors": [], "reasoning": "ok"}',
+             '```json\n{"risk_score": 0.4, "recommended_action": "review"}\n```',
+             'not json at all']
+        )
+        self.assertEqual(len(cases), 3)
+        self.assertEqual(cases[1]["decision"]["recommended_action"], "block")
+        self.assertIn("prompt", cases[0])
+
+        report = run_replay(cases, workers=1)
+        self.assertEqual(report["cases"], 3)
+        self.assertEqual(report["unchanged"], 3)
+        self.assertEqual(report["prompt_changed"], 0)
+        self.assertEqual(report["diffs"], [])
+
+    def test_replay_reports_decision_diffs(self):
+        cases = self.record(
+            [make_transaction("tx_1", country="BY"), make_transaction("tx_2")],
+            ['{"risk_score": 0.2, "recommended_action": "allow"}', '{"risk_score": 0.2, "recommended_action": "allow"}']
+        )
+        config = RiskConfig(high_risk_countries=("BY",), block_threshold=0.6)
+        report = run_replay(cases * 600, config, workers=2, chunk_size=300)
+        self.assertEqual(report["cases"], 1200)
+        self.assertEqual(report["action_changed"], 600)
+        self.assertEqual(report["transitions"], {"allow->block": 600})
+        self.assertEqual(report["prompt_changed"], 1200)  # Thresholds and countries are in the prompt
+        self.assertEqual(report["diffs"][0]["replayed"], {"risk_score": 0.8, "recommended_action": "block"})
+
+    def test_replay_uses_the_recorded_config(self):
+        """Cases recorded under a non-default config replay unchanged; older cases are flagged as mismatched"""
+        store = ConfigStore()
+        store.update({"high_risk_countries": ["BY"], "block_threshold": 0.6})
+        with patch('Server.CONFIG', store):
+            cases = self.record([make_transaction("tx_1", country="BY")],
+                                ['{"risk_score": 0.2, "recommended_action": "allow"}'])
+        self.assertEqual(cases[0]["config"]["high_risk_countries"], ["BY"])
+        report = run_replay(cases, workers=1)
+        self.assertEqual((report["unchanged"], report["prompt_changed"], report["config_mismatch"]), (1, 0, 0))
+
+        legacy = dict(cases[0])
+        del legacy["config"]
+        self.assertEqual(run_replay([legacy], workers=1)["config_mismatch"], 1)
+
+    def test_command_line(self):
+        self.record([make_transaction("tx_1")], ['{"risk_score": 0.2, "recommended_action": "allow"}'])
+        config_path = os.path.join(self.directory.name, "risk_config.json")
+        with open(config_path, "w") as config_file:
+            json.dump({"high_risk_countries": ["US"]}, config_file)
+        with patch('builtins.print'):
+            self.assertEqual(main([self.directory.name, "--workers", "1"]), 0)
+            self.assertEqual(main([self.directory.name, "--config", config_path, "--fail-on-diff"]), 1)
+
+    @patch('Server.GROQ_API_KEY', 'dummy_api_key')
+    @patch('Server.requests.post')
+    def test_batched_calls_are_recorded(self, mock_post):
+        """Each transaction of a batched call is recorded with its own result"""
+        mock_post.side_effect = [
+            completion(json.dumps({"results": [
+                {"transaction_id": "tx_1", "risk_score": 0.1, "recommended_action": "allow"}
+            ]})),
+            completion('{"risk_score": 0.5, "recommended_action": "review"}')
+        ]
+        recorder = CorpusRecorder(self.directory.name, fsync=False)
+        transactions = [make_transaction("tx_1"), make_transaction("tx_2")]
+        config = Server.CONFIG.current
+        with patch('Server.RECORDER', recorder):
+            analyses = Server.request_batch_risk_analysis([(transaction, config, {}) for transaction in transactions])
+            for transaction, risk_analysis in zip(transactions, analyses):
+                recorder.record_decision(transaction, {}, risk_analysis)
+        recorder.close()
+
+        cases = {case["transaction"]["transaction_id"]: case for case in load_corpus(self.directory.name)}
+        self.assertTrue(cases["tx_1"]["batched"])
+        self.assertIn('"results"', cases["tx_1"]["prompt"]["messages"][0]["content"])
+        self.assertNotIn("batched", cases["tx_2"])  # Retried on its own
+        report = run_replay(list(cases.values()), workers=1)
+        self.assertEqual((report["unchanged"], report["prompt_changed"]), (2, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
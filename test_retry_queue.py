@@ -0,0 +1,108 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import base64
+import os
+import tempfile
+import threading
+import requests
+import Server
+from retry_queue import RetryQueue, is_degraded
+from risk_core import fallback_analysis
+from testing_helpers import make_transaction, completion
+
+
+class TestRetryQueue(unittest.TestCase):
+    """Tests for the durable re-scoring queue of degraded decisions"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "retries.jsonl")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_degraded_detection(self):
+        self.assertTrue(is_degraded(fallback_analysis("API error", "timeout")))
+        self.assertTrue(is_degraded(fallback_analysis("Processing error", "bad json", 0.7)))
+        self.assertFalse(is_degraded(fallback_analysis("API configuration error", "no key")))
+        self.assertFalse(is_degraded({"risk_score": 0.2, "risk_factors": []}))
+
+    def test_pending_entries_survive_restart_and_are_bounded(self):
+        degraded = fallback_analysis("API error", "timeout")
+        queue = RetryQueue(self.path, MagicMock(), MagicMock(), max_items=2, base_delay=60)
+        for i in range(3):
+            queue.add(make_transaction(f"tx_{i}"), degraded)
+        queue.close()
+
+        queue = RetryQueue(self.path, MagicMock(return_value=degraded), MagicMock(), max_items=2, base_delay=60)
+        pending = list(queue._entries)
+        queue.close()
+        self.assertEqual(pending, ["tx_1", "tx_2"])
+
+    def test_added_entries_are_fsynced(self):
+        queue = RetryQueue(self.path, MagicMock(), MagicMock(), base_delay=60)
+        with patch('retry_queue.os.fsync') as mock_fsync:
+            queue.add(make_transaction("tx_1"), fallback_analysis("API error", "timeout"))
+            self.assertEqual(mock_fsync.call_count, 1)
+        queue.close()
+
+    def test_retries_with_backoff_until_recovered(self):
+        done = threading.Event()
+        results = []
+        rescore = MagicMock(side_effect=[fallback_analysis("API error", "down"), RuntimeError("down"),
+                                         {"risk_score": 0.9, "risk_factors": [], "recommended_action": "block"}])
+
+        def on_rescored(transaction, old_analysis, risk_analysis):
+            results.append((transaction["transaction_id"], old_analysis["recommended_action"],
+                            risk_analysis["recommended_action"]))
+            done.set()
+
+        queue = RetryQueue(self.path, rescore, on_rescored, base_delay=0.01)
+        queue.add(make_transaction("tx_1"), fallback_analysis("API error", "timeout"))
+        self.assertTrue(done.wait(5))
+        queue.close()
+        self.assertEqual(rescore.call_count, 3)
+        self.assertEqual(results, [("tx_1", "review", "block")])
+        self.assertEqual(queue.stats()["pending"], 0)
+
+
+class TestRescoringIntegration(unittest.TestCase):
+    """Tests for queuing outage decisions from the webhook and applying corrections"""
+
+    def setUp(self):
+        Server.app.config['TESTING'] = True
+        self.client = Server.app.test_client()
+        self.headers = {"Authorization": "Basic " + base64.b64encode(b"admin:secret123").decode("utf-8")}
+
+    @patch('Server.GROQ_API_KEY', 'dummy_api_key')
+    @patch('Server.requests.post')
+    def test_outage_decision_is_corrected(self, mock_post):
+        queue = MagicMock()
+        with patch('Server.RETRY_QUEUE', queue), \
+                patch('Server.NOTIFICATIONS', Server.NotificationHistory()), \
+                patch('Server.ALL_TRANSACTIONS', Server.TransactionHistory()), \
+                patch('Server.STATS', Server.TransactionStats()), \
+                patch('Server.socketio.emit') as mock_emit:
+            mock_post.side_effect = requests.exceptions.ConnectionError("down")
+            response = self.client.post('/webhook', headers=self.headers, json=make_transaction("tx_1"))
+            self.assertEqual(response.get_json()["risk_analysis"]["risk_factors"], ["API error"])
+            transaction, old_analysis, features = queue.add.call_args[0]
+            self.assertNotIn("risk_analysis", transaction)
+            self.assertIsInstance(features, dict)  # The features of the live decision, re-used for re-scoring
+
+            mock_post.side_effect = None
+            mock_post.return_value = completion('{"risk_score": 0.9, "recommended_action": "block"}')
+            Server.apply_rescored_analysis(transaction, old_analysis,
+                                          Server.rescore_transaction(transaction, features))
+
+            stored = Server.ALL_TRANSACTIONS.get("tx_1")["risk_analysis"]
+            self.assertEqual(stored["recommended_action"], "block")
+            self.assertEqual(stored["analysis_status"], "rescored")
+            self.assertEqual(Server.STATS.snapshot()["by_action"], {"allow": 0, "review": 0, "block": 1})
+            event, update = mock_emit.call_args[0]
+            self.assertEqual(event, "transaction_corrected")
+            self.assertEqual(update["previous_analysis"]["recommended_action"], "review")
+
+
+if __name__ == '__main__':
+    unittest.main()
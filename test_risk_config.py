@@ -0,0 +1,166 @@
+import unittest
+from unittest.mock import patch
+import base64
+import json
+import os
+import tempfile
+import threading
+import Server
+from risk_config import ConfigError, ConfigStore, RiskConfig
+from risk_core import build_optimized_groq_prompt
+
+
+class TestConfigStore(unittest.TestCase):
+    """Tests for validation, versioning and hot reload of the risk configuration"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "risk_config.json")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_defaults_reproduce_original_prompt(self):
+        """The default config renders exactly the built-in prompt"""
+        transaction = {"transaction_id": "tx_1", "amount": 10.0}
+        self.assertEqual(build_optimized_groq_prompt(transaction, config=RiskConfig()),
+                         build_optimized_groq_prompt(transaction))
+
+    def test_update_creates_new_version(self):
+        store = ConfigStore()
+        old = store.current
+        new = store.update({"block_threshold": 0.6, "high_risk_countries": ["RU", "BY"]})
+        self.assertNotEqual(new.version, old.version)
+        self.assertIs(store.current, new)
+        self.assertEqual(old.block_threshold, 0.7)  # Earlier snapshots are never mutated
+        self.assertIn("BY", new.high_risk_country_set)
+        prompt = build_optimized_groq_prompt({}, config=new)["messages"][0]["content"]
+        self.assertIn("['RU', 'BY']", prompt)
+        self.assertIn("0.3-0.6 = review, 0.6-1.0 = block", prompt)
+
+    def test_invalid_update_is_rejected(self):
+        store = ConfigStore()
+        for changes in ({"allow_threshold": 0.8}, {"max_tokens": 0}, {"high_risk_countries": ["russia"]},
+                        {"unknown": 1}, {"temperature": "hot"}):
+            with self.assertRaises(ConfigError):
+                store.update(changes)
+        self.assertEqual(store.current.version, RiskConfig().version)
+
+    def test_file_reload_and_persistence(self):
+        with open(self.path, "w") as config_file:
+            json.dump({"model": "llama3-70b-8192"}, config_file)
+        store = ConfigStore(self.path)
+        self.assertEqual(store.current.model, "llama3-70b-8192")
+        self.assertEqual(store.current.source, "file")
+
+        store.update({"max_tokens": 200})
+        with open(self.path) as config_file:
+            self.assertEqual(json.load(config_file)["max_tokens"], 200)
+        self.assertIs(store.reload_if_changed(), store.current)  # Own write is not re-read
+
+        with open(self.path, "w") as config_file:
+            json.dump({"allow_threshold": 0.9}, config_file)  # Invalid: allow >= block
+        os.utime(self.path, ns=(1, 1))
+        version = store.current.version
+        store.reload_if_changed()
+        self.assertEqual(store.current.version, version)
+        self.assertEqual(store.current.max_tokens, 200)
+
+    def test_versions_identify_settings_across_restarts(self):
+        """The same settings get the same version in a new process; other settings get another"""
+        store = ConfigStore(self.path)
+        updated = store.update({"block_threshold": 0.65})
+        restarted = ConfigStore(self.path)
+        self.assertEqual(restarted.current.version, updated.version)
+        self.assertEqual(ConfigStore().update({"block_threshold": 0.65}).version, updated.version)
+        self.assertNotEqual(store.update({"block_threshold": 0.6}).version, updated.version)
+        self.assertEqual(store.update({"block_threshold": 0.7}).version, RiskConfig().version)
+
+    def test_forced_reload_waits_for_the_lock(self):
+        """A forced reload is not skipped while another update holds the lock"""
+        with open(self.path, "w") as config_file:
+            json.dump({"max_tokens": 200}, config_file)
+        store = ConfigStore(self.path)
+        with open(self.path, "w") as config_file:
+            json.dump({"max_tokens": 300}, config_file)
+        store._write_lock.acquire()
+        threading.Timer(0.05, store._write_lock.release).start()
+        self.assertEqual(store.reload_if_changed(force=True).max_tokens, 300)
+
+
+class TestConfigEndpoints(unittest.TestCase):
+    """Tests for the admin configuration endpoints and version stamping"""
+
+    def setUp(self):
+        Server.app.config['TESTING'] = True
+        self.client = Server.app.test_client()
+        self.headers = {
+            "Authorization": "Basic " + base64.b64encode(b"admin:secret123").decode("utf-8")
+        }
+        self.transaction = {
+            "transaction_id": "tx_config_1",
+            "timestamp": "2025-06-24T12:00:00Z",
+            "amount": 100.0,
+            "currency": "USD",
+            "customer": {"id": "cust_1", "country": "BY", "ip_address": "10.0.0.1"},
+            "payment_method": {"type": "credit_card", "last_four": "1111", "country_of_issue": "BY"},
+            "merchant": {"id": "merch_1", "name": "Shop", "category": "retail"}
+        }
+
+    @patch('Server.GROQ_API_KEY', '')
+    def test_update_applies_without_restart(self):
+        with patch('Server.CONFIG', ConfigStore()), \
+                patch('Server.NOTIFICATIONS', Server.NotificationHistory()), \
+                patch('Server.ALL_TRANSACTIONS', Server.TransactionHistory()), \
+                patch('Server.socketio.emit'):
+            response = self.client.put('/admin/config', headers=self.headers,
+                                       json={"high_risk_countries": ["BY"], "high_risk_min_score": 0.9})
+            self.assertEqual(response.status_code, 200)
+            version = response.get_json()["version"]
+            self.assertEqual(version, Server.CONFIG.current.version)
+            self.assertNotEqual(version, RiskConfig().version)
+
+            response = self.client.post('/webhook', headers=self.headers, json=self.transaction)
+            risk_analysis = response.get_json()["risk_analysis"]
+            self.assertEqual(risk_analysis["config_version"], version)
+            self.assertEqual(risk_analysis["recommended_action"], "block")
+            self.assertEqual(risk_analysis["risk_score"], 0.9)
+            self.assertEqual(Server.ALL_TRANSACTIONS[0]["risk_analysis"]["config_version"], version)
+
+            response = self.client.get('/admin/config', headers=self.headers)
+            self.assertEqual(response.get_json()["settings"]["high_risk_countries"], ["BY"])
+
+    @patch('Server.GROQ_API_KEY', '')
+    def test_rules_use_the_scoring_config(self):
+        """A config update while a transaction is being scored does not change the rules applied to it"""
+        store = ConfigStore()
+        scoring_version = store.update({"high_risk_countries": ["BY"], "high_risk_min_score": 0.9}).version
+
+        def score_then_update(transaction_data, config=None, features=None):
+            risk_analysis = Server.fallback_analysis("API configuration error", "GROQ API key not configured")
+            risk_analysis["config_version"] = config.version
+            store.update({"high_risk_countries": ["RU"]})  # Hot reload between scoring and the rules
+            return risk_analysis
+
+        with patch('Server.CONFIG', store), \
+                patch('Server.call_groq_api', side_effect=score_then_update), \
+                patch('Server.NOTIFICATIONS', Server.NotificationHistory()), \
+                patch('Server.ALL_TRANSACTIONS', Server.TransactionHistory()), \
+                patch('Server.publish'):
+            response = self.client.post('/webhook', headers=self.headers, json=self.transaction)
+            risk_analysis = response.get_json()["risk_analysis"]
+            self.assertNotEqual(store.current.version, scoring_version)
+            self.assertEqual(risk_analysis["config_version"], scoring_version)
+            self.assertEqual(risk_analysis["risk_score"], 0.9)
+            self.assertTrue(response.get_json()["admin_notification_sent"])
+
+    def test_invalid_update_returns_errors(self):
+        with patch('Server.CONFIG', ConfigStore()):
+            response = self.client.put('/admin/config', headers=self.headers, json={"block_threshold": 2})
+            self.assertEqual(response.status_code, 400)
+            self.assertTrue(response.get_json()["details"])
+            self.assertEqual(Server.CONFIG.current.version, RiskConfig().version)
+
+
+if __name__ == '__main__':
+    unittest.main()
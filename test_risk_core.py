@@ -0,0 +1,62 @@
+import unittest
+from risk_core import (
+    apply_high_risk_country_rule,
+    build_transaction_record,
+    parse_llm_response,
+)
+
+
+class TestRiskCore(unittest.TestCase):
+    """Unit tests for the dependency-light scoring helpers"""
+
+    def setUp(self):
+        self.transaction = {
+            "transaction_id": "tx_core_1",
+            "timestamp": "2025-06-24T12:00:00Z",
+            "amount": 250.0,
+            "currency": "USD",
+            "customer": {"id": "cust_1", "country": "US", "ip_address": "10.0.0.1"},
+            "payment_method": {"type": "credit_card", "last_four": "1111", "country_of_issue": "US"},
+            "merchant": {"id": "merch_1", "name": "Shop", "category": "retail"}
+        }
+
+    def test_parse_llm_response_strips_markdown_and_clamps(self):
+        """Fenced JSON is accepted and out-of-range values are sanitized"""
+        content = '```json\n{"risk_score": 1.7, "risk_factors": "none", "recommended_action": "DENY"}\n```'
+        result = parse_llm_response(content)
+        self.assertEqual(result["risk_score"], 1.0)
+        self.assertEqual(result["risk_factors"], ["Analysis completed"])
+        self.assertEqual(result["recommended_action"], "review")
+
+    def test_parse_llm_response_rejects_non_json(self):
+        """Unparseable content raises so the caller can fall back"""
+        with self.assertRaises(ValueError):
+            parse_llm_response("I cannot help with that")
+
+    def test_high_risk_country_rule(self):
+        """A high-risk payment country adds the factor once and forces block"""
+        self.transaction["payment_method"]["country_of_issue"] = "IR"
+        analysis = {"risk_score": 0.1, "risk_factors": [], "recommended_action": "allow"}
+
+        self.assertEqual(apply_high_risk_country_rule(self.transaction, analysis), "IR")
+        self.assertEqual(apply_high_risk_country_rule(self.transaction, analysis), "IR")
+        self.assertEqual(analysis["risk_factors"], ["Transaction involves high-risk country: IR"])
+        self.assertEqual(analysis["recommended_action"], "block")
+
+    def test_low_risk_country_untouched(self):
+        """Transactions outside the high-risk list are left alone"""
+        analysis = {"risk_score": 0.1, "risk_factors": [], "recommended_action": "allow"}
+        self.assertIsNone(apply_high_risk_country_rule(self.transaction, analysis))
+        self.assertEqual(analysis["recommended_action"], "allow")
+
+    def test_build_transaction_record(self):
+        """History records keep the transaction fields next to the analysis"""
+        analysis = {"risk_score": 0.1}
+        record = build_transaction_record(self.transaction, analysis)
+        self.assertEqual(record["transaction_id"], "tx_core_1")
+        self.assertIs(record["risk_analysis"], analysis)
+        self.assertEqual(record["merchant"]["category"], "retail")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import unittest
+from unittest.mock import patch
+import base64
+import json
+import Server
+from search_index import SearchIndex, parse_query
+
+
+def make_record(transaction_id, risk_factors, reasoning, merchant="merch_1", name="Shop", score=0.5,
+                timestamp="2025-06-01T10:00:00Z"):
+    return {
+        "transaction_id": transaction_id,
+        "timestamp": timestamp,
+        "amount": 100.0,
+        "currency": "USD",
+        "customer": {"id": "cust_1", "country": "US", "ip_address": "10.0.0.1"},
+        "payment_method": {"type": "credit_card", "last_four": "1111", "country_of_issue": "US"},
+        "merchant": {"id": merchant, "name": name, "category": "retail"},
+        "risk_analysis": {"risk_score": score, "risk_factors": risk_factors, "reasoning": reasoning,
+                          "recommended_action": "review"}
+    }
+
+
+class TestSearchIndex(unittest.TestCase):
+    """Tests for the inverted index and its boolean queries"""
+
+    def setUp(self):
+        self.index = SearchIndex()
+        self.index.add(make_record("tx_1", ["IP address mismatch"], "Velocity is unusually high"))
+        self.index.add(make_record("tx_2", ["High-risk country: RU"], "IP mismatch and high velocity",
+                                   merchant="merch_2", score=0.9))
+        self.index.add(make_record("tx_3", [], "Looks normal", name="Crypto Exchange",
+                                   timestamp="2025-06-03T10:00:00Z"))
+
+    def search(self, query, **filters):
+        return self.index.search(query, **filters)["transaction_ids"]
+
+    def test_boolean_queries(self):
+        self.assertEqual(self.search('factor:"ip mismatch"'), ["tx_1"])
+        self.assertEqual(self.search("velocity"), ["tx_2", "tx_1"])
+        self.assertEqual(self.search("velocity -merchant:merch_2"), ["tx_1"])
+        self.assertEqual(self.search("mismatch OR crypto"), ["tx_3", "tx_2", "tx_1"])
+        self.assertEqual(self.search("(factor:ru OR merchant:crypto) AND NOT velocity"), ["tx_3"])
+        self.assertEqual(self.search("merchant:MERCH_1"), ["tx_3", "tx_1"])
+        self.assertEqual(self.search("reasoning:ip"), ["tx_2"])
+
+    def test_invalid_queries(self):
+        for query in ("", "-velocity", "NOT velocity OR crypto", "colour:red", "(velocity", "velocity)", "the"):
+            with self.assertRaises(ValueError):
+                parse_query(query)
+
+    def test_filters_and_pagination(self):
+        self.assertEqual(self.search("velocity", min_score=0.8), ["tx_2"])
+        self.assertEqual(self.search("shop OR crypto", start=1748736000 + 86400), ["tx_3"])
+        first = self.index.search("shop OR crypto", limit=2)
+        self.assertEqual((first["transaction_ids"], first["total"]), (["tx_3", "tx_2"], 3))
+        second = self.index.search("shop OR crypto", limit=2, cursor=first["next_cursor"])
+        self.assertEqual((second["transaction_ids"], second["next_cursor"]), (["tx_1"], None))
+
+    def test_updates_and_resubmissions(self):
+        self.index.update("tx_1", {"risk_score": 0.1, "risk_factors": [], "reasoning": "Verified customer"},
+                          previous={"risk_factors": ["IP address mismatch"], "reasoning": "Velocity is unusually high"})
+        self.assertEqual(self.search("velocity"), ["tx_2"])
+        self.assertEqual(self.search("verified", max_score=0.2), ["tx_1"])
+        self.index.add(make_record("tx_2", [], "Resubmitted"))
+        self.assertEqual(self.search("velocity"), [])
+        self.assertEqual(self.search("resubmitted"), ["tx_2"])
+
+    def test_size_is_bounded(self):
+        index = SearchIndex(max_documents=1000)
+        for i in range(5000):
+            index.add(make_record(f"tx_{i}", ["Unusual amount"], "Large purchase", merchant=f"merch_{i}"))
+        self.assertLessEqual(index.stats()["documents"], 1000)
+        self.assertLess(index.stats()["terms"], 1400)  # Postings of dropped documents are trimmed in batches
+        result = index.search("unusual", limit=1)
+        self.assertEqual((result["transaction_ids"], result["total"]), (["tx_4999"], index.stats()["documents"]))
+        self.assertEqual(index.search("merchant:merch_0")["total"], 0)
+
+
+class TestSearchEndpoint(unittest.TestCase):
+    """Tests for GET /admin/search"""
+
+    def setUp(self):
+        self.client = Server.app.test_client()
+        credentials = base64.b64encode(b"admin:secret123").decode("utf-8")
+        self.auth_headers = {"Authorization": f"Basic {credentials}"}
+
+    def test_search_endpoint(self):
+        with patch('Server.SEARCH', SearchIndex()), patch('Server.ALL_TRANSACTIONS', Server.TransactionHistory()), \
+                patch('Server.NOTIFICATIONS', Server.NotificationHistory()):
+            Server.record_transaction(make_record("tx_1", ["IP address mismatch"], "Looks risky"))
+            Server.record_transaction(make_record("tx_2", ["Unusual amount"], "Looks risky", score=0.9,
+                                                  timestamp="2025-06-02T10:00:00Z"))
+            Server.update_stored_analysis("tx_1", {"risk_score": 0.2, "risk_factors": [],
+                                                   "reasoning": "Cleared by analyst", "recommended_action": "allow"})
+            response = self.client.get('/admin/search?q=risky&start=2025-06-02&min_score=0.5',
+                                       headers=self.auth_headers)
+            cleared = self.client.get('/admin/search?q=factor:mismatch OR cleared', headers=self.auth_headers)
+            invalid = self.client.get('/admin/search?q=-risky', headers=self.auth_headers)
+        self.assertEqual(response.status_code, 200)
+        body = json.loads(response.data)
+        self.assertEqual([record["transaction_id"] for record in body["transactions"]], ["tx_2"])
+        self.assertEqual((body["total"], body["next_cursor"]), (1, None))
+        self.assertEqual(json.loads(cleared.data)["transactions"][0]["risk_analysis"]["recommended_action"], "allow")
+        self.assertEqual(invalid.status_code, 400)
+        self.assertIn("error", json.loads(invalid.data))
+
+    def test_search_requires_auth(self):
+        self.assertEqual(self.client.get('/admin/search?q=risky').status_code, 401)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+from unittest.mock import patch
+import base64
+import json
+import Server
+from risk_core import rule_based_analysis
+from shadow import ShadowRunner, sampled
+from testing_helpers import make_transaction
+
+
+class TestShadowRunner(unittest.TestCase):
+    """Tests for mirroring traffic to shadow scorers and comparing decisions"""
+
+    def test_comparison_report(self):
+        runner = ShadowRunner({
+            "same": lambda transaction, features: {"risk_score": 0.25, "recommended_action": "allow"},
+            "strict": lambda transaction, features: {"risk_score": 0.75, "recommended_action": "block"},
+            "broken": lambda transaction, features: 1 / 0
+        }, sample_rate=1.0)
+        for i in range(4):
+            runner.submit(make_transaction(f"tx_{i}"), {"risk_score": 0.2, "recommended_action": "allow"}, 12.0)
+        runner.wait()
+
+        report = {scorer["name"]: scorer for scorer in runner.report()["scorers"]}
+        self.assertEqual(report["same"]["agreement_rate"], 1.0)
+        self.assertAlmostEqual(report["same"]["score_delta"]["mean"], 0.05)
+        self.assertEqual(report["strict"]["agreement_rate"], 0.0)
+        self.assertEqual(report["strict"]["action_confusion"]["allow"]["block"], 4)
+        self.assertEqual(len(report["strict"]["recent_disagreements"]), 4)
+        self.assertEqual(report["strict"]["latency_ms"]["primary_mean"], 12.0)
+        self.assertEqual(report["broken"]["errors"], 4)
+        self.assertEqual(report["broken"]["compared"], 0)
+
+    def test_unexpected_results_do_not_stop_the_worker(self):
+        """A result the comparison cannot handle counts as an error and the next item is still scored"""
+        results = iter([None, {"risk_score": 0.2, "recommended_action": "allow"}])
+        runner = ShadowRunner({"odd": lambda transaction, features: next(results)}, sample_rate=1.0)
+        with self.assertLogs('shadow', level='ERROR'):
+            for i in range(2):
+                runner.submit(make_transaction(f"tx_{i}"), {"risk_score": 0.2, "recommended_action": "allow"})
+                runner.wait()
+        self.assertTrue(runner._worker.is_alive())
+        report = runner.report()["scorers"][0]
+        self.assertEqual((report["errors"], report["compared"]), (1, 1))
+
+    def test_sampling_is_deterministic(self):
+        chosen = [sampled(f"tx_{i}", 0.25) for i in range(2000)]
+        self.assertEqual(chosen, [sampled(f"tx_{i}", 0.25) for i in range(2000)])
+        self.assertAlmostEqual(sum(chosen) / len(chosen), 0.25, delta=0.05)
+        self.assertFalse(sampled("tx_1", 0.0))
+
+    def test_rule_based_scorer(self):
+        self.assertEqual(rule_based_analysis(make_transaction("tx_1"))["recommended_action"], "allow")
+        self.assertEqual(rule_based_analysis(make_transaction("tx_2", card_country="GB"))["recommended_action"],
+                         "review")
+        analysis = rule_based_analysis(make_transaction("tx_3", country="RU"))
+        self.assertEqual(analysis["recommended_action"], "block")
+        self.assertEqual(analysis["risk_score"], 0.8)
+
+    @patch('Server.GROQ_API_KEY', '')
+    def test_webhook_mirrors_traffic(self):
+        """The webhook answers first; the shadow scorers see the primary decision afterwards"""
+        Server.app.config['TESTING'] = True
+        client = Server.app.test_client()
+        headers = {"Authorization": "Basic " + base64.b64encode(b"admin:secret123").decode("utf-8")}
+        runner = ShadowRunner(Server.build_shadow_scorers(json.dumps([{"name": "rules", "type": "rules"}])),
+                              sample_rate=1.0)
+        with patch('Server.SHADOW', runner), \
+                patch('Server.NOTIFICATIONS', Server.NotificationHistory()), \
+                patch('Server.ALL_TRANSACTIONS', Server.TransactionHistory()):
+            response = client.post('/webhook', headers=headers, json=make_transaction("tx_shadow_1"))
+            self.assertEqual(response.status_code, 200)
+            runner.wait()
+            report = client.get('/admin/shadow', headers=headers).get_json()
+        scorer = report["scorers"][0]
+        self.assertEqual(scorer["compared"], 1)
+        self.assertEqual(scorer["action_confusion"]["review"]["allow"], 1)
+
+    @patch('Server.GROQ_API_KEY', '')
+    def test_shadow_scorers_see_the_live_features(self):
+        """Shadow scorers get the features of the live decision, not ones recomputed after recording"""
+        Server.app.config['TESTING'] = True
+        client = Server.app.test_client()
+        headers = {"Authorization": "Basic " + base64.b64encode(b"admin:secret123").decode("utf-8")}
+        seen = []
+        runner = ShadowRunner({"capture": lambda transaction, features: seen.append(features) or {}},
+                              sample_rate=1.0)
+        calls = iter(range(1, 100))
+        with patch('Server.SHADOW', runner), \
+                patch('Server.local_features', side_effect=lambda transaction: {"computed": next(calls)}), \
+                patch('Server.NOTIFICATIONS', Server.NotificationHistory()), \
+                patch('Server.ALL_TRANSACTIONS', Server.TransactionHistory()):
+            client.post('/webhook', headers=headers, json=make_transaction("tx_shadow_2"))
+            runner.wait()
+            self.assertEqual(Server.local_features.call_count, 1)
+        self.assertEqual(seen, [{"computed": 1}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import unittest
+from unittest.mock import patch
+import base64
+import json
+import random
+import Server
+from Server import app
+from risk_core import apply_risk_rules, rule_based_analysis
+from sketches import AmountProfiles, AmountStats, TDigest
+from testing_helpers import make_transaction
+
+
+class TestTDigest(unittest.TestCase):
+    """Tests for the mergeable quantile sketch"""
+
+    def setUp(self):
+        rng = random.Random(7)
+        self.values = [rng.lognormvariate(4, 1) for _ in range(20000)]
+        self.ordered = sorted(self.values)
+
+    def assert_accurate(self, digest):
+        for q in (0.01, 0.1, 0.5, 0.9, 0.99):
+            exact = self.ordered[int(q * len(self.ordered))]
+            self.assertAlmostEqual(digest.cdf(exact), q, delta=0.005 if q in (0.01, 0.99) else 0.01)
+        self.assertEqual(digest.cdf(self.ordered[0] - 1), 0.0)
+        self.assertEqual(digest.cdf(self.ordered[-1] + 1), 1.0)
+
+    def test_rank_and_quantile_accuracy(self):
+        digest = TDigest()
+        for value in self.values:
+            digest.add(value)
+        self.assert_accurate(digest)
+        self.assertLess(len(digest.means), 200)  # Memory does not grow with the stream
+        median = self.ordered[len(self.ordered) // 2]
+        self.assertAlmostEqual(digest.quantile(0.5), median, delta=median * 0.02)
+
+    def test_merge(self):
+        left, right = TDigest(), TDigest()
+        for i, value in enumerate(self.values):
+            (left if i % 2 else right).add(value)
+        left.merge(right)
+        self.assertEqual(left.count, len(self.values))
+        self.assert_accurate(left)
+
+    def test_discrete_values_get_their_mid_rank(self):
+        digest = TDigest()
+        for i in range(4000):
+            digest.add((9.99, 19.99)[i % 2])
+        self.assertAlmostEqual(digest.cdf(9.99), 0.25, delta=0.02)
+        self.assertAlmostEqual(digest.cdf(19.99), 0.75, delta=0.02)
+
+    def test_running_mean_and_variance(self):
+        left, right = AmountStats(), AmountStats()
+        for amount in (10.0, 20.0, 30.0):
+            left.add(amount)
+        for amount in (40.0, 50.0):
+            right.add(amount)
+        left.merge(right)
+        self.assertEqual(left.count, 5)
+        self.assertAlmostEqual(left.mean, 30.0)
+        self.assertAlmostEqual(left.stddev, 250.0 ** 0.5)
+
+
+class TestAmountProfiles(unittest.TestCase):
+    """Tests for the per-merchant/per-category amount features and rule"""
+
+    def test_features_need_history(self):
+        profiles = AmountProfiles(min_history=20)
+        for i in range(19):
+            profiles.observe(make_transaction(f"tx_{i}", 50.0 + i))
+        self.assertEqual(profiles.features(make_transaction("tx_new", 500.0)), {})
+        profiles.observe(make_transaction("tx_19", 69.0))
+        features = profiles.features(make_transaction("tx_new", 500.0))
+        self.assertEqual(features["merchant_amount_percentile"], 1.0)
+        self.assertEqual(profiles.features(make_transaction("tx_new", 69.0))["merchant_amount_percentile"], 0.975)
+        self.assertEqual(features["category_amount_history"], 20)
+        self.assertGreater(features["category_amount_zscore"], 3)
+        self.assertLess(profiles.features(make_transaction("tx_new", 51.0))["merchant_amount_percentile"], 0.2)
+
+    def test_fixed_prices_are_not_unusual(self):
+        """A merchant selling a few fixed prices is not flagged for its most expensive one"""
+        profiles = AmountProfiles()
+        for i in range(2000):
+            profiles.observe(make_transaction(f"tx_{i}", (4.5, 5.0, 5.5, 12.0)[i % 4]))
+        features = profiles.features(make_transaction("tx_new", 12.0))
+        self.assertAlmostEqual(features["merchant_amount_percentile"], 0.875, delta=0.02)
+        risk_analysis = {"risk_score": 0.2, "risk_factors": [], "recommended_action": "allow"}
+        apply_risk_rules(make_transaction("tx_new", 12.0), risk_analysis, features)
+        self.assertEqual(risk_analysis["risk_factors"], [])
+
+    def test_key_count_is_bounded(self):
+        profiles = AmountProfiles(max_keys=4)
+        for i in range(10):
+            profiles.observe(make_transaction(f"tx_{i}", 10.0, merchant=f"merch_{i}", category="electronics"))
+        self.assertEqual(len(profiles), 4)
+        self.assertEqual(set(profiles.summary("merchant")), {"merch_7", "merch_8", "merch_9"})
+        self.assertEqual(profiles.summary("category")["electronics"]["count"], 10)
+
+    def test_rules_flag_unusual_amounts(self):
+        features = {"category_amount_percentile": 0.995, "category_amount_history": 250,
+                    "merchant_amount_percentile": 0.5, "merchant_amount_history": 40}
+        transaction = make_transaction("tx_1", 900.0, category="electronics")
+        risk_analysis = {"risk_score": 0.2, "risk_factors": [], "recommended_action": "allow"}
+        self.assertIsNone(apply_risk_rules(transaction, risk_analysis, features))
+        self.assertEqual(risk_analysis["risk_factors"], [
+            "Amount above the 99th percentile for merchant category electronics (percentile 99.5 of 250 transactions)"])
+        self.assertAlmostEqual(rule_based_analysis(transaction, features)["risk_score"], 0.3)
+
+
+class TestAmountFeaturesInWebhook(unittest.TestCase):
+    """The live percentile reaches the prompt and the risk factors"""
+
+    def setUp(self):
+        self.client = app.test_client()
+        credentials = base64.b64encode(b"admin:secret123").decode("utf-8")
+        self.auth_headers = {"Authorization": f"Basic {credentials}", "Content-Type": "application/json"}
+
+    @patch('Server.GROQ_API_KEY', 'dummy_api_key')
+    @patch('Server.requests.post')
+    def test_outlier_amount(self, mock_post):
+        mock_post.return_value.json.return_value = {"choices": [{"message": {"content": json.dumps({
+            "risk_score": 0.2, "recommended_action": "allow", "risk_factors": [], "reasoning": "ok"})}}]}
+        profiles = AmountProfiles()
+        with patch('Server.AMOUNT_PROFILES', profiles), patch('Server.socketio.emit'), \
+                patch('Server.ALL_TRANSACTIONS', Server.TransactionHistory()):
+            for i in range(30):
+                response = self.client.post('/webhook', headers=self.auth_headers,
+                                            json=make_transaction(f"tx_{i}", 40.0 + i % 3 * 10, category="books"))
+                self.assertNotIn("Amount above", " ".join(response.get_json()["risk_analysis"]["risk_factors"]))
+            response = self.client.post('/webhook', headers=self.auth_headers,
+                                        json=make_transaction("tx_big", 4000.0, category="books"))
+        factors = response.get_json()["risk_analysis"]["risk_factors"]
+        self.assertIn("Amount above the 99th percentile for merchant category books "
+                      "(percentile 100.0 of 30 transactions)", factors)
+        prompt = json.loads(mock_post.call_args[1]["data"])["messages"][-1]["content"]
+        self.assertIn('"category_amount_percentile": 1.0', prompt)
+        self.assertEqual(profiles.summary("category")["books"]["count"], 31)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+from unittest.mock import patch
+import base64
+import json
+from Server import app
+from stats import TopCounter, TransactionStats
+
+
+def make_record(transaction_id, score, action, merchant="merch_1", country="US", amount=100.0):
+    return {
+        "transaction_id": transaction_id,
+        "amount": amount,
+        "currency": "USD",
+        "risk_analysis": {"risk_score": score, "recommended_action": action},
+        "customer": {"id": "cust_1", "country": country},
+        "merchant": {"id": merchant, "name": merchant.title(), "category": "retail"}
+    }
+
+
+class TestTransactionStats(unittest.TestCase):
+    """Tests for the incrementally maintained /admin/stats rollups"""
+
+    def test_rollups(self):
+        """Totals, action counts, histogram and rankings follow each record"""
+        stats = TransactionStats()
+        stats.record(make_record("tx_1", 0.05, "allow"), at=120)
+        stats.record(make_record("tx_2", 0.95, "block", merchant="merch_2", country="RU"), flagged=True, at=130)
+        stats.record(make_record("tx_3", 1.0, "block", merchant="merch_2", country="RU"), flagged=True, at=200)
+
+        snapshot = stats.snapshot(top=1, now=200)
+        self.assertEqual(snapshot["totals"]["transactions"], 3)
+        self.assertEqual(snapshot["totals"]["flagged"], 2)
+        self.assertEqual(snapshot["totals"]["amount_by_currency"], {"USD": 300.0})
+        self.assertEqual(snapshot["by_action"], {"allow": 1, "review": 0, "block": 2})
+        self.assertEqual(snapshot["risk_histogram"][0]["count"], 1)
+        self.assertEqual(snapshot["risk_histogram"][9]["count"], 2)
+        self.assertEqual(snapshot["top_merchants"], [{"key": "merch_2", "label": "Merch_2", "count": 2}])
+        self.assertEqual(snapshot["top_countries"][0]["key"], "RU")
+        self.assertEqual([b["count"] for b in snapshot["timeseries"]["per_minute"]], [2, 1])
+        self.assertEqual(snapshot["timeseries"]["per_hour"][0]["blocked"], 2)
+
+    def test_time_series_window(self):
+        """Buckets older than the window are not reported"""
+        stats = TransactionStats(minutes=2)
+        stats.record(make_record("tx_old", 0.1, "allow"), at=0)
+        stats.record(make_record("tx_new", 0.1, "allow"), at=180)
+        self.assertEqual([b["start"] for b in stats.snapshot(now=180)["timeseries"]["per_minute"]], [180])
+
+    def test_top_counter_is_bounded(self):
+        """The heavy-hitter counter never tracks more than its capacity"""
+        counter = TopCounter(capacity=3)
+        for key in ["a", "a", "a", "b", "c", "d", "e"]:
+            counter.add(key)
+        self.assertEqual(len(counter._counts), 3)
+        self.assertEqual(counter.top(1)[0]["key"], "a")
+
+    def test_top_counter_replaces_a_smallest_key(self):
+        """A new key takes over the oldest of the smallest counters"""
+        counter = TopCounter(capacity=3)
+        for key in ["a", "a", "b", "b", "c", "d", "d"]:
+            counter.add(key)
+        self.assertEqual({item["key"]: item["count"] for item in counter.top(3)}, {"a": 2, "b": 2, "d": 3})
+        counter.add("e")
+        self.assertEqual({item["key"]: item["count"] for item in counter.top(3)}, {"b": 2, "d": 3, "e": 3})
+
+    def test_reclassify_moves_scores(self):
+        """A re-scored transaction moves between actions and histogram bins"""
+        stats = TransactionStats()
+        stats.record(make_record("tx_1", 0.5, "review"), at=120)
+        stats.reclassify({"risk_score": 0.5, "recommended_action": "review"},
+                         {"risk_score": 0.9, "recommended_action": "block"})
+        snapshot = stats.snapshot(now=120)
+        self.assertEqual(snapshot["by_action"], {"allow": 0, "review": 0, "block": 1})
+        self.assertEqual(snapshot["risk_histogram"][5]["count"], 0)
+        self.assertEqual(snapshot["risk_histogram"][9]["count"], 1)
+        self.assertAlmostEqual(snapshot["totals"]["mean_risk_score"], 0.9)
+        self.assertEqual(snapshot["timeseries"]["per_minute"][0]["blocked"], 0)
+
+
+class TestStatsEndpoint(unittest.TestCase):
+    """Tests for GET /admin/stats"""
+
+    def setUp(self):
+        self.client = app.test_client()
+        credentials = base64.b64encode(b"admin:secret123").decode("utf-8")
+        self.auth_headers = {"Authorization": f"Basic {credentials}"}
+
+    def test_stats_endpoint(self):
+        """The endpoint returns the current rollups"""
+        stats = TransactionStats()
+        stats.record(make_record("tx_1", 0.2, "allow"))
+        with patch('Server.STATS', stats):
+            response = self.client.get('/admin/stats', headers=self.auth_headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)["totals"]["transactions"], 1)
+
+    def test_stats_requires_auth(self):
+        self.assertEqual(self.client.get('/admin/stats').status_code, 401)
+
+
+if __name__ == '__main__':
+    unittest.main()
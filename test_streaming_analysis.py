@@ -0,0 +1,156 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import base64
+import json
+import threading
+import time
+import Server
+from Server import call_groq_api, ALL_TRANSACTIONS, NOTIFICATIONS
+
+
+def sse_lines(content, size=5):
+    """Encode content as OpenAI-style SSE lines, a few characters per delta"""
+    for i in range(0, len(content), size):
+        chunk = {"choices": [{"delta": {"content": content[i:i + size]}}]}
+        yield f"data: {json.dumps(chunk)}".encode()
+    yield b"data: [DONE]"
+
+
+class TestStreamingAnalysis(unittest.TestCase):
+    """Tests for early decisions on streamed GROQ completions"""
+
+    def setUp(self):
+        NOTIFICATIONS.clear()
+        ALL_TRANSACTIONS.clear()
+        self.client = Server.app.test_client()  # Creates the app now, before the tests patch its settings
+        self.transaction = {
+            "transaction_id": "tx_stream_1",
+            "timestamp": "2025-06-24T12:00:00Z",
+            "amount": 900.0,
+            "currency": "USD",
+            "customer": {"id": "cust_1", "country": "US", "ip_address": "10.0.0.1"},
+            "payment_method": {"type": "credit_card", "last_four": "1111", "country_of_issue": "RU"},
+            "merchant": {"id": "merch_1", "name": "Shop", "category": "retail"}
+        }
+
+    def stored_analysis(self):
+        return ALL_TRANSACTIONS.get(self.transaction["transaction_id"])["risk_analysis"]
+
+    def wait_for_completion(self):
+        deadline = time.time() + 2
+        while self.stored_analysis().get("analysis_status") == "partial" and time.time() < deadline:
+            time.sleep(0.005)
+
+    @patch('Server.GROQ_STREAMING', True)
+    @patch('Server.GROQ_API_KEY', 'dummy_api_key')
+    @patch('Server.requests.post')
+    def test_early_decision_then_reasoning(self, mock_post):
+        """The decision is returned before the reasoning has been streamed"""
+        release = threading.Event()
+        content = ('{"risk_score": 0.75, "recommended_action": "block", '
+                   '"risk_factors": ["Card country mismatch"], "reasoning": "Card issued abroad"}')
+        lines = list(sse_lines(content))
+        split = next(i for i, line in enumerate(lines) if b"reas" in line)
+
+        def iter_lines():
+            yield from lines[:split]
+            release.wait(2)  # Hold the rest of the stream until the decision is out
+            yield from lines[split:]
+
+        mock_response = MagicMock()
+        mock_response.iter_lines.side_effect = iter_lines
+        mock_post.return_value = mock_response
+
+        with patch('Server.publish') as mock_publish:
+            analysis = call_groq_api(self.transaction)
+            self.assertTrue(mock_post.call_args[1]['stream'])
+            self.assertTrue(json.loads(mock_post.call_args[1]['data'])['stream'])
+            self.assertEqual(analysis["risk_score"], 0.75)
+            self.assertEqual(analysis["recommended_action"], "block")
+            self.assertEqual(analysis["analysis_status"], "partial")
+
+            response = Server.process_scored_transaction(self.transaction, analysis, time.perf_counter())
+            self.assertEqual(NOTIFICATIONS[0]["risk_analysis"]["reasoning"], "")
+
+            release.set()
+            self.wait_for_completion()
+
+            completed = self.stored_analysis()
+            self.assertEqual(completed["analysis_status"], "complete")
+            self.assertEqual(completed["reasoning"], "Card issued abroad")
+            self.assertEqual(completed["risk_factors"],
+                             ["Card country mismatch", "Transaction involves high-risk country: RU"])
+            self.assertEqual(completed["config_version"], analysis["config_version"])
+            # The analysis returned to the client is never changed by the background thread
+            self.assertIs(response["risk_analysis"], analysis)
+            self.assertEqual(analysis["analysis_status"], "partial")
+            self.assertEqual(analysis["risk_factors"], ["Transaction involves high-risk country: RU"])
+            self.assertEqual(NOTIFICATIONS[0]["risk_analysis"]["reasoning"], "Card issued abroad")
+            self.assertEqual(mock_publish.call_args[0][0], 'transaction_updated')
+            mock_response.close.assert_called()
+
+    @patch('Server.GROQ_STREAMING', True)
+    @patch('Server.GROQ_API_KEY', 'dummy_api_key')
+    @patch('Server.requests.post')
+    def test_completion_waits_until_stored(self, mock_post):
+        """Reasoning that arrives before the transaction is stored is applied after it"""
+        content = ('{"risk_score": 0.2, "recommended_action": "allow", '
+                   '"risk_factors": ["Known customer"], "reasoning": "Usual purchase"}')
+        mock_response = MagicMock()
+        mock_response.iter_lines.return_value = sse_lines(content)
+        mock_post.return_value = mock_response
+        self.transaction["payment_method"]["country_of_issue"] = "US"
+
+        with patch('Server.publish') as mock_publish:
+            analysis = call_groq_api(self.transaction)
+            deadline = time.time() + 2
+            while not mock_response.close.called and time.time() < deadline:
+                time.sleep(0.005)
+            time.sleep(0.05)  # The stream has been read; nothing may be published yet
+            mock_publish.assert_not_called()
+
+            Server.process_scored_transaction(self.transaction, analysis, time.perf_counter())
+            self.wait_for_completion()
+
+            self.assertEqual(self.stored_analysis()["reasoning"], "Usual purchase")
+            self.assertEqual(mock_publish.call_args[0][0], 'transaction_updated')
+            self.assertEqual(analysis["analysis_status"], "partial")
+
+    @patch('Server.GROQ_STREAMING', True)
+    @patch('Server.GROQ_API_KEY', 'dummy_api_key')
+    @patch('Server.requests.post')
+    def test_test_endpoint_completes_streamed_reasoning(self, mock_post):
+        """The simulation endpoints store the transaction like the webhook, releasing the streamed reasoning"""
+        content = ('{"risk_score": 0.2, "recommended_action": "allow", '
+                   '"risk_factors": [], "reasoning": "Usual purchase"}')
+        mock_response = MagicMock()
+        mock_response.iter_lines.return_value = sse_lines(content)
+        mock_post.return_value = mock_response
+        headers = {"Authorization": "Basic " + base64.b64encode(b"admin:secret123").decode("utf-8")}
+
+        with patch('Server.publish'):
+            response = self.client.post('/test-standard-transaction', headers=headers)
+            self.assertEqual(response.status_code, 200)
+            self.transaction = response.get_json()["transaction"]
+            self.wait_for_completion()
+        self.assertEqual(self.stored_analysis()["analysis_status"], "complete")
+        self.assertEqual(self.stored_analysis()["reasoning"], "Usual purchase")
+
+    @patch('Server.GROQ_STREAMING', True)
+    @patch('Server.GROQ_API_KEY', 'dummy_api_key')
+    @patch('Server.requests.post')
+    def test_stream_without_decision_fields(self, mock_post):
+        """A stream that never yields a decision falls back to the full parse"""
+        mock_response = MagicMock()
+        mock_response.iter_lines.return_value = sse_lines('Sorry, {"reasoning": "unsure"}')
+        mock_post.return_value = mock_response
+
+        analysis = call_groq_api(self.transaction)
+
+        self.assertNotIn("analysis_status", analysis)
+        self.assertEqual(analysis["risk_score"], 0.5)
+        self.assertEqual(analysis["reasoning"], "unsure")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+import io
+import json
+import logging
+from metrics import METRICS
+from structured_logging import NonBlockingQueueHandler, build_handler, configure_logging, log_context, parse_rates
+
+
+class CountingArgument:
+    """Log argument that counts how often it is formatted"""
+
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+        return "tx_1"
+
+
+class TestStructuredLogging(unittest.TestCase):
+    """Tests for the queued JSON logging with sampling and rate limits"""
+
+    def setUp(self):
+        self.stream = io.StringIO()
+        self.logger = logging.getLogger(f"test_structured_logging.{self.id()}")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+
+    def attach(self, **options):
+        handler, listener = build_handler(stream=self.stream, **options)
+        self.logger.addHandler(handler)
+        listener.start()
+        self.addCleanup(self.logger.removeHandler, handler)
+        return listener
+
+    def records(self):
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_json_records_with_context(self):
+        listener = self.attach()
+        argument = CountingArgument()
+        with log_context(transaction_id="tx_1"):
+            self.logger.info("Processing transaction: %s", argument, extra={"event": "transaction.processing"})
+        self.logger.warning("Outside the request")
+        listener.stop()
+        first, second = self.records()
+        self.assertEqual((first["message"], first["level"]), ("Processing transaction: tx_1", "INFO"))
+        self.assertEqual((first["transaction_id"], first["event"]), ("tx_1", "transaction.processing"))
+        self.assertNotIn("transaction_id", second)
+        self.assertEqual(argument.formatted, 1)
+
+    def test_sampling_and_rate_limits(self):
+        listener = self.attach(sample_rates={"transaction.received": 0.0},
+                               rate_limits={"risk.high_risk_detected": 2})
+        argument = CountingArgument()
+        for _ in range(5):
+            self.logger.info("Received transaction: %s", argument, extra={"event": "transaction.received"})
+            self.logger.warning("HIGH RISK: %s", "tx_1", extra={"event": "risk.high_risk_detected"})
+            self.logger.error("Failed: %s", "boom", extra={"event": "transaction.received"})
+        listener.stop()
+        events = [(record["level"], record["event"]) for record in self.records()]
+        self.assertEqual(events.count(("INFO", "transaction.received")), 0)
+        self.assertEqual(events.count(("WARNING", "risk.high_risk_detected")), 2)
+        self.assertEqual(events.count(("ERROR", "transaction.received")), 5)
+        self.assertEqual(argument.formatted, 0)  # Dropped records are never formatted
+
+    def test_full_queue_drops_only_below_error(self):
+        handler = NonBlockingQueueHandler(max_size=1)
+        self.logger.addHandler(handler)
+        self.addCleanup(self.logger.removeHandler, handler)
+        before = METRICS.counter("logging.dropped")
+        self.logger.info("first")
+        self.logger.info("second")
+        self.logger.error("kept")
+        self.assertEqual(METRICS.counter("logging.dropped") - before, 1)
+        self.assertEqual([handler.queue.get_nowait().getMessage() for _ in range(2)], ["first", "kept"])
+
+    def test_configure_keeps_record_lookups_by_default(self):
+        """Caller file/line lookups are process-wide; they are only turned off on request"""
+        root = logging.getLogger()
+        saved = (root.handlers[:], root.level, logging._srcfile, logging.logProcesses, logging.logMultiprocessing)
+        root.handlers = []
+        try:
+            listener = configure_logging(stream=self.stream)
+            listener.stop()
+            self.assertEqual((logging._srcfile, logging.logProcesses, logging.logMultiprocessing), saved[2:])
+            root.handlers = []
+            configure_logging(stream=self.stream, skip_lookups=True).stop()
+            self.assertIsNone(logging._srcfile)
+        finally:
+            root.handlers, logging._srcfile, logging.logProcesses, logging.logMultiprocessing = (
+                saved[0], saved[2], saved[3], saved[4])
+            root.setLevel(saved[1])
+
+    def test_parse_rates(self):
+        self.assertEqual(parse_rates("transaction.received=0.1, notification.sent=0.5"),
+                         {"transaction.received": 0.1, "notification.sent": 0.5})
+        self.assertEqual(parse_rates(None), {})
+        with self.assertRaises(ValueError):
+            parse_rates("transaction.received=often")
+
+
+if __name__ == '__main__':
+    unittest.main()
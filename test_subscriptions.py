@@ -0,0 +1,109 @@
+import unittest
+from unittest.mock import patch
+import Server
+from metrics import METRICS
+from subscriptions import ALL_ROOM, SubscriptionIndex, normalize_filter, room_for
+
+
+def make_notification(transaction_id, category="electronics", country="US", score=0.9, amount=100.0):
+    return {
+        "transaction_id": transaction_id,
+        "amount": amount,
+        "risk_analysis": {"risk_score": score, "recommended_action": "block"},
+        "customer": {"id": "cust_1", "country": country},
+        "merchant": {"id": "merch_1", "category": category}
+    }
+
+
+class TestSubscriptionIndex(unittest.TestCase):
+    """Tests for filter validation and predicate-index routing"""
+
+    def test_normalize_filter(self):
+        self.assertEqual(normalize_filter({"countries": ["ru", "IR", "RU"], "min_score": 1}),
+                         {"countries": ["IR", "RU"], "min_score": 1.0})
+        for spec in ({"colour": ["red"]}, {"countries": "RU"}, {"actions": ["approve"]}, {"min_score": "high"}, []):
+            with self.assertRaises(ValueError):
+                normalize_filter(spec)
+
+    def test_routing(self):
+        index = SubscriptionIndex()
+        index.connect("everything")
+        index.subscribe("electronics", [{"categories": ["electronics"]}])
+        index.subscribe("russia_high", [{"countries": ["RU"], "min_score": 0.8}])
+        index.subscribe("both", [{"categories": ["electronics"]}, {"countries": ["RU"], "min_score": 0.8}])
+        electronics = room_for({"categories": ["electronics"]})
+        russia = room_for({"countries": ["RU"], "min_score": 0.8})
+
+        self.assertEqual(set(index.route(make_notification("tx_1"))), {ALL_ROOM, electronics})
+        self.assertEqual(set(index.route(make_notification("tx_2", "books", "RU"))), {ALL_ROOM, russia})
+        self.assertEqual(set(index.route(make_notification("tx_3", "books", "RU", score=0.5))), {ALL_ROOM})
+        self.assertEqual(set(index.route(make_notification("tx_5", "books", "ru"))), {ALL_ROOM, russia})
+        self.assertEqual(set(index.route(make_notification("tx_4", "electronics", "RU"))),
+                         {ALL_ROOM, electronics, russia})
+        self.assertEqual(index.stats(), {"clients": 4, "unfiltered_clients": 1, "filters": 2})
+
+    def test_shared_rooms_are_released(self):
+        index = SubscriptionIndex()
+        join, leave = index.subscribe("a", [{"actions": ["block"]}])
+        self.assertEqual(leave, set())
+        index.subscribe("b", [{"actions": ["block"]}])
+        self.assertEqual(index.stats()["filters"], 1)
+        index.disconnect("a")
+        self.assertEqual(index.route(make_notification("tx_1"))[1:], list(join))
+        join_all, leave_block = index.subscribe("b", [])
+        self.assertEqual((join_all, leave_block), ({ALL_ROOM}, join))
+        self.assertEqual(index.stats()["filters"], 0)
+        with self.assertRaises(ValueError):
+            index.subscribe("b", [{"actions": ["approve"]}])
+        self.assertEqual(index.stats()["unfiltered_clients"], 1)
+
+    def test_fanout_metrics(self):
+        index = SubscriptionIndex()
+        index.connect("a")
+        index.subscribe("b", [{"categories": ["electronics"]}, {"actions": ["block"]}])
+        index.subscribe("c", [{"categories": ["books"]}])
+        before = METRICS.counter("alerts.deliveries")
+        index.route(make_notification("tx_1"))
+        # Counted from the room sizes: "b" matches two filters and counts once for each
+        self.assertEqual(METRICS.counter("alerts.deliveries") - before, 3)
+        index.disconnect("b")
+        index.route(make_notification("tx_2"))
+        self.assertEqual(METRICS.counter("alerts.deliveries") - before, 4)
+
+
+class TestSocketIOSubscriptions(unittest.TestCase):
+    """Alerts reach only the Socket.IO clients whose filters match"""
+
+    def test_clients_receive_matching_alerts(self):
+        with patch('Server.SUBSCRIPTIONS', SubscriptionIndex()), \
+                patch('Server.NOTIFICATIONS', Server.NotificationHistory()):
+            everything = Server.socketio.test_client(Server.app)
+            electronics = Server.socketio.test_client(Server.app)
+            russia = Server.socketio.test_client(Server.app)
+            self.assertEqual(electronics.emit('subscribe', {"filters": [{"categories": ["electronics"]}]},
+                                             callback=True), {"filters": 1})
+            russia.emit('subscribe', {"filters": [{"countries": ["RU"]}]})
+            self.assertIn("error", russia.emit('subscribe', {"filters": [{"min_score": "x"}]}, callback=True))
+            for client in (everything, electronics, russia):
+                client.get_received()
+
+            transaction = {
+                "transaction_id": "tx_1",
+                "amount": 100.0,
+                "customer": {"id": "cust_1", "country": "RU", "ip_address": "10.0.0.1"},
+                "payment_method": {"type": "credit_card", "last_four": "1111", "country_of_issue": "RU"},
+                "merchant": {"id": "merch_1", "name": "Shop", "category": "books"}
+            }
+            Server.send_admin_notification(transaction, {"risk_score": 0.9, "risk_factors": [],
+                                                         "recommended_action": "block"})
+
+            self.assertEqual([event["name"] for event in everything.get_received()], ["new_transaction"])
+            self.assertEqual(electronics.get_received(), [])
+            self.assertEqual([event["args"][0]["transaction_id"] for event in russia.get_received()], ["tx_1"])
+            for client in (everything, electronics, russia):
+                client.disconnect()
+            self.assertEqual(Server.SUBSCRIPTIONS.stats()["clients"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
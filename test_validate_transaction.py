@@ -1,5 +1,5 @@
 import pytest
-from Server import validate_transaction_data
+from risk_core import validate_transaction_data
 
 # Valid transaction fixture for testing
 @pytest.fixture
@@ -3,6 +3,7 @@ from unittest.mock import patch, MagicMock
 from flask import Flask
 import json
 import base64
+import Server
 from Server import app, webhook
 
 class TestWebhookEndpoint(unittest.TestCase):
@@ -81,10 +82,13 @@ class TestWebhookEndpoint(unittest.TestCase):
         self.assertEqual(response_data['risk_analysis']['recommended_action'], 'allow')
         
         # Verify that the API was called with our transaction data
-        mock_call_groq.assert_called_once_with(self.valid_transaction)
+        # Scored and checked against the same config snapshot and local features
+        features = mock_call_groq.call_args[0][2]
+        mock_call_groq.assert_called_once_with(self.valid_transaction, Server.CONFIG.current, features)
         
         # Verify notification function was called with correct parameters
-        mock_send_notification.assert_called_once_with(self.valid_transaction, mock_risk_analysis)
+        mock_send_notification.assert_called_once_with(self.valid_transaction, mock_risk_analysis,
+                                                       Server.CONFIG.current, features)
     
     def test_webhook_missing_auth(self):
         """Test webhook rejects requests with missing authentication"""
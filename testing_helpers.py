@@ -0,0 +1,23 @@
+"""Shared builders for the tests: webhook payloads and mocked model responses"""
+from unittest.mock import MagicMock
+
+
+def make_transaction(transaction_id="tx_1", amount=100.0, country="US", card_country="US", customer="cust_1",
+                     ip="10.0.0.1", last_four="1111", merchant="merch_1", category="retail"):
+    """A valid webhook transaction payload"""
+    return {
+        "transaction_id": transaction_id,
+        "timestamp": "2025-06-24T12:00:00Z",
+        "amount": amount,
+        "currency": "USD",
+        "customer": {"id": customer, "country": country, "ip_address": ip},
+        "payment_method": {"type": "credit_card", "last_four": last_four, "country_of_issue": card_country},
+        "merchant": {"id": merchant, "name": "Shop", "category": category}
+    }
+
+
+def completion(content):
+    """Mocked ``requests`` response of a (non-streamed) chat completion with ``content``"""
+    response = MagicMock()
+    response.json.return_value = {"choices": [{"message": {"content": content}}]}
+    return response